@@ -30,6 +30,8 @@ export interface McpServerConfig {
   }
   // For internal server, we can pass user context
   internal?: boolean
+  // Unix domain socket of a co-located server (run.py --uds); the URL then only supplies the path
+  socketPath?: string
 }
 
 export class McpClient {
@@ -67,7 +69,8 @@ export class McpClient {
         body: JSON.stringify({
           type: 'listTools'
         }),
-        signal: AbortSignal.timeout(10000)
+        signal: AbortSignal.timeout(10000),
+        ...(this.serverConfig.socketPath ? { unix: this.serverConfig.socketPath } : {})
       })
 
       if (!response.ok) {
@@ -117,7 +120,8 @@ export class McpClient {
           name,
           args
         }),
-        signal: AbortSignal.timeout(30000)
+        signal: AbortSignal.timeout(30000),
+        ...(this.serverConfig.socketPath ? { unix: this.serverConfig.socketPath } : {})
       })
 
       if (!response.ok) {
@@ -159,12 +163,13 @@ export class McpClient {
   /**
    * Create a client for an external MCP server
    */
-  static createExternalClient(url: string, name: string, auth?: { token: string }): McpClient {
+  static createExternalClient(url: string, name: string, auth?: { token: string }, socketPath?: string): McpClient {
     return new McpClient({
       url,
       name,
       auth: auth ? { type: 'bearer', token: auth.token } : undefined,
-      internal: false
+      internal: false,
+      socketPath
     })
   }
 }
@@ -105,8 +105,8 @@ async function loadSystemPrompt(reqId?: string): Promise<string> {
 /**
  * Get configured external MCP servers
  */
-function getConfiguredMcpServers(): Array<{ name: string; url: string }> {
-  const servers: Array<{ name: string; url: string }> = []
+function getConfiguredMcpServers(): Array<{ name: string; url: string; socketPath?: string }> {
+  const servers: Array<{ name: string; url: string; socketPath?: string }> = []
   
   // External MCP servers from environment (user-configured)
   const externalServersEnv = process.env.EXTERNAL_MCP_SERVERS
@@ -118,7 +118,8 @@ function getConfiguredMcpServers(): Array<{ name: string; url: string }> {
           if (server.name && server.url) {
             servers.push({
               name: server.name,
-              url: server.url
+              url: server.url,
+              socketPath: typeof server.socketPath === 'string' ? server.socketPath : undefined
             })
           }
         }
@@ -196,7 +197,7 @@ async function setupTools(token: string | undefined, aiContext: AIContext, reqId
     
     for (const server of mcpServers) {
       try {
-        const mcpClient = McpClient.createExternalClient(server.url, server.name, { token: token! })
+        const mcpClient = McpClient.createExternalClient(server.url, server.name, { token: token! }, server.socketPath)
         mcpManager.addServer(server.name, mcpClient)
       } catch (error) {
         logger.server.warn('Failed to add MCP server', {
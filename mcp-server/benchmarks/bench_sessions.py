@@ -0,0 +1,152 @@
+"""
+Memory per MCP session.
+
+Two measurements:
+
+- ``records`` (default): 100k ``SessionRegistry`` records, i.e. what the
+  extensions keep per idle session
+- ``http``: real streamable HTTP sessions (transport, server task, event
+  store and the records above) created by ``initialize`` requests against
+  the in-process ASGI app; use the per-session figure as
+  ``MCP_SESSION_OVERHEAD_KB``. ``--event-buffer-size 0`` measures the
+  sessions without event stores, ``--events N`` stores N server
+  notifications in each session's GET stream buffer after ``tools/list``
+
+Reference, ``--mode http --sessions 2000`` (Python 3.11, mcp 1.19), per
+session after ``initialize`` and ``tools/list``:
+
+- without event stores (``--event-buffer-size 0``): 50.5 KiB
+- with ``SessionEventStore`` (the ``tools/list`` response buffered): 51.1 KiB
+- same, plus one buffered notification (``--events 1``): 51.3 KiB
+
+RSS is read from /proc (Linux); elsewhere the peak RSS is used.
+
+Usage:
+    uv run python benchmarks/bench_sessions.py --sessions 100000
+    uv run python benchmarks/bench_sessions.py --mode http --sessions 2000
+    uv run python benchmarks/bench_sessions.py --mode http --event-buffer-size 0
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import resource
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from proxy_smart_mcp.metrics import ServerMetrics  # noqa: E402
+from proxy_smart_mcp.sessions import (  # noqa: E402
+    DEFAULT_EVENT_BUFFER_SIZE,
+    SessionRegistry,
+    register_session_tracking,
+)
+
+CLIENTS = [f"client-{i}" for i in range(50)]
+SCOPES = [
+    ("openid", "fhirUser", "patient/*.read"),
+    ("openid", "fhirUser", "user/*.read", "user/*.write"),
+    ("openid", "admin"),
+]
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def report(label: str, sessions: int, before: int, after: int, elapsed: float) -> None:
+    per_session = (after - before) / max(1, sessions)
+    print(f"{label}: {sessions} sessions in {elapsed:.2f}s")
+    print(f"  RSS {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB")
+    print(f"  {per_session:.0f} bytes ({per_session / 1024:.2f} KiB) per session")
+
+
+async def bench_records(count: int) -> None:
+    registry = SessionRegistry(max_sessions=0, memory_cap=0, idle_timeout=0, metrics=ServerMetrics())
+    ids = [uuid.uuid4().hex for _ in range(count)]
+    callers = [uuid.uuid4().hex[:32] for _ in range(len(CLIENTS) * 4)]
+
+    gc.collect()
+    before = rss_bytes()
+    started = time.perf_counter()
+    for i, session_id in enumerate(ids):
+        scopes = SCOPES[i % len(SCOPES)]
+        registry.touch(session_id, caller=callers[i % len(callers)], client_id=CLIENTS[i % len(CLIENTS)],
+                       scopes=scopes)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    report("records", len(registry), before, rss_bytes(), elapsed)
+
+
+async def bench_http(count: int, event_buffer_size: int, events: int) -> None:
+    import httpx
+    import mcp.types as mt
+    from fastmcp import FastMCP
+    from mcp.server.streamable_http import GET_STREAM_KEY
+
+    mcp = FastMCP("bench-sessions")
+
+    @mcp.tool
+    def ping() -> str:
+        return "pong"
+
+    registry = register_session_tracking(
+        mcp, SessionRegistry(max_sessions=0, memory_cap=0, idle_timeout=0, metrics=ServerMetrics()),
+        event_buffer_size=event_buffer_size,
+    )
+    app = mcp.http_app(path="/mcp")
+    headers = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+    initialize = {
+        "jsonrpc": "2.0", "id": 1, "method": "initialize",
+        "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+                   "clientInfo": {"name": "bench", "version": "1"}},
+    }
+    list_tools = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+    notification = mt.JSONRPCMessage(mt.JSONRPCNotification(jsonrpc="2.0", method="notifications/tools/list_changed"))
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            # Warm up imports and caches before measuring
+            await client.post("/mcp", json=initialize, headers=headers)
+            gc.collect()
+            before = rss_bytes()
+            started = time.perf_counter()
+            for _ in range(count):
+                response = await client.post("/mcp", json=initialize, headers=headers)
+                session_headers = dict(headers, **{"mcp-session-id": response.headers["mcp-session-id"]})
+                await client.post("/mcp", json=list_tools, headers=session_headers)
+                store = registry._managers[0]._server_instances[session_headers["mcp-session-id"]]._event_store
+                for _ in range(events if store is not None else 0):
+                    # What the transport's message router does for a notification without a GET stream
+                    await store.store_event(GET_STREAM_KEY, notification)
+            elapsed = time.perf_counter() - started
+            gc.collect()
+            report("http", count, before, rss_bytes(), elapsed)
+            print(f"  tracked by registry: {len(registry)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["records", "http"], default="records")
+    parser.add_argument("--sessions", type=int, default=None, help="default: 100000 (records), 2000 (http)")
+    parser.add_argument("--event-buffer-size", type=int, default=DEFAULT_EVENT_BUFFER_SIZE,
+                        help="events kept per stream (http; 0: no event stores)")
+    parser.add_argument("--events", type=int, default=0, help="notifications buffered per session (http)")
+    args = parser.parse_args()
+    if args.mode == "records":
+        asyncio.run(bench_records(args.sessions or 100_000))
+    else:
+        asyncio.run(bench_http(args.sessions or 2000, args.event_buffer_size, args.events))
+
+
+if __name__ == "__main__":
+    main()
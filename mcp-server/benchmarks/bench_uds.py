@@ -0,0 +1,134 @@
+"""
+Tool call latency over TCP loopback vs a Unix domain socket.
+
+Starts an in-process streamable HTTP server with a trivial tool, first on
+127.0.0.1 and then on a Unix socket (``proxy_smart_mcp.uds``), and times
+``tools/call`` round trips from a keep-alive httpx client on each.
+
+Usage:
+    uv run python benchmarks/bench_uds.py --calls 2000 --concurrency 1
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+from fastmcp import FastMCP
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from proxy_smart_mcp.uds import install_uds_listener  # noqa: E402
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 0, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "bench", "version": "1"}},
+}
+
+
+def build_server() -> FastMCP:
+    mcp = FastMCP("bench-uds")
+
+    @mcp.tool
+    def ping() -> str:
+        return "pong"
+
+    return mcp
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(client: httpx.AsyncClient) -> None:
+    for _ in range(200):
+        try:
+            await client.get("/mcp")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.02)
+    raise RuntimeError("server did not start")
+
+
+async def run_calls(client: httpx.AsyncClient, calls: int, concurrency: int) -> List[float]:
+    response = await client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+    headers = dict(HEADERS, **{"mcp-session-id": response.headers["mcp-session-id"]})
+    await client.post("/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"}, headers=headers)
+
+    latencies: List[float] = []
+    counter = iter(range(1, calls + 1))
+
+    async def worker() -> None:
+        for request_id in counter:
+            body = {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+                    "params": {"name": "ping", "arguments": {}}}
+            started = time.perf_counter()
+            result = await client.post("/mcp", json=body, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            result.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def bench(label: str, mcp: FastMCP, client: httpx.AsyncClient, server_kwargs: dict,
+                calls: int, concurrency: int, warmup: int) -> None:
+    server = asyncio.create_task(mcp.run_http_async(show_banner=False, log_level="critical", **server_kwargs))
+    try:
+        async with client:
+            await wait_until_ready(client)
+            await run_calls(client, warmup, concurrency)
+            started = time.perf_counter()
+            latencies = await run_calls(client, calls, concurrency)
+            elapsed = time.perf_counter() - started
+    finally:
+        server.cancel()
+        try:
+            await server
+        except asyncio.CancelledError:
+            pass
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:>4}: mean {statistics.mean(latencies) * 1000:.3f} ms  "
+          f"p50 {statistics.median(latencies) * 1000:.3f} ms  p99 {p99 * 1000:.3f} ms  "
+          f"{calls / elapsed:.0f} calls/s")
+
+
+async def main(calls: int, concurrency: int, warmup: int) -> None:
+    port = free_port()
+    limits = httpx.Limits(max_keepalive_connections=concurrency, max_connections=concurrency)
+    await bench(
+        "tcp", build_server(),
+        httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits),
+        {"host": "127.0.0.1", "port": port}, calls, concurrency, warmup,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="mcp-bench-") as directory:
+        path = os.path.join(directory, "mcp.sock")
+        mcp = build_server()
+        install_uds_listener(mcp, path)
+        await bench(
+            "uds", mcp,
+            httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=path, limits=limits), base_url="http://mcp"),
+            {}, calls, concurrency, warmup,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency, args.warmup))
@@ -0,0 +1,39 @@
+"""
+Entrypoint for the Proxy Smart MCP server.
+
+Loads the generated composition from ``generated_mcp/`` (regenerate with
+``bun run generate:mcp``), installs the hand-written extensions from
+``src/proxy_smart_mcp`` and hands over to the generated ``main()``, so all
+of its CLI flags (--transport, --host, --port, --validate-tokens) apply.
+``--uds PATH`` (or ``MCP_UDS_PATH``) serves the HTTP transport on a Unix
+domain socket instead of host/port, for clients on the same host. With
+--validate-tokens, tokens are checked against the issuer and JWKS URI
+discovered for ``MCP_RESOURCE_URL`` (default ``BACKEND_API_URL``).
+
+Usage:
+    uv run python run.py --transport http --port 8000
+    uv run python run.py --transport http --uds /run/proxy-smart/mcp.sock
+"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+for path in (project_root / "src", project_root / "generated_mcp"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from proxy_smart_backend_mcp_generated import main, main_mcp  # noqa: E402
+
+from proxy_smart_mcp.discovery import install_discovered_verifier  # noqa: E402
+from proxy_smart_mcp.extensions import install_extensions  # noqa: E402
+from proxy_smart_mcp.uds import UDS_PATH, install_uds_listener, pop_uds_argument  # noqa: E402
+
+
+if __name__ == "__main__":
+    uds_path = pop_uds_argument(sys.argv) or UDS_PATH
+    install_extensions(main_mcp)
+    install_discovered_verifier(main_mcp)
+    if uds_path:
+        install_uds_listener(main_mcp, uds_path)
+    main()
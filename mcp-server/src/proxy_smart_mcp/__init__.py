@@ -0,0 +1,27 @@
+"""
+Hand-written runtime extensions for the generated Proxy Smart MCP server.
+
+The tool modules under ``generated_mcp/`` are regenerated from the backend's
+OpenAPI specification and must not be edited. Everything that has to survive
+regeneration (discovery, caching, extra tools, middleware) lives here.
+"""
+
+from .discovery import (
+    AuthorizationServerMetadata,
+    DiscoveryError,
+    DiscoveryResolver,
+    discover_token_endpoint,
+    get_discovery_resolver,
+    install_discovered_verifier,
+)
+from .extensions import install_extensions
+
+__all__ = [
+    "AuthorizationServerMetadata",
+    "DiscoveryError",
+    "DiscoveryResolver",
+    "discover_token_endpoint",
+    "get_discovery_resolver",
+    "install_discovered_verifier",
+    "install_extensions",
+]
@@ -0,0 +1,321 @@
+"""
+Asynchronous, batched audit log of tool invocations.
+
+``AuditMiddleware`` records who called which tool with which arguments and
+how the call ended, without writing on the request path: records go into a
+bounded in-memory queue and a background task writes them in batches (up to
+``MCP_AUDIT_BATCH_SIZE`` records, or whatever arrived within
+``MCP_AUDIT_FLUSH_MS``) as JSON lines. Serialization, argument redaction and
+file I/O run in a worker thread. Steps of an ``execute_tool_plan`` are
+recorded too, with ``plan_step`` set, so they can be told apart from (and
+attributed to) the client's plan call.
+
+The file at ``MCP_AUDIT_LOG`` rotates when it reaches ``MCP_AUDIT_MAX_BYTES``;
+rotated segments are gzip-compressed (``audit.jsonl.1.gz`` is the newest)
+and at most ``MCP_AUDIT_BACKUPS`` are kept.
+
+When the writer falls behind and the queue is full, ``MCP_AUDIT_DROP_POLICY``
+decides: ``drop_oldest`` (default) or ``drop_newest`` discard a record and
+count it as ``audit.dropped``; ``block`` makes the calling request wait for
+queue space, trading latency for a complete trail.
+
+Auditing is disabled unless ``MCP_AUDIT_LOG`` is set.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO
+
+import mcp.types as mt
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .backend import caller_access_token, caller_fingerprint, request_deadline
+from .composite import plan_step
+from .metrics import ServerMetrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+DEFAULT_AUDIT_PATH = os.getenv("MCP_AUDIT_LOG", "")
+DEFAULT_QUEUE_SIZE = int(os.getenv("MCP_AUDIT_QUEUE_SIZE", "10000"))
+DEFAULT_BATCH_SIZE = int(os.getenv("MCP_AUDIT_BATCH_SIZE", "256"))
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("MCP_AUDIT_FLUSH_MS", "1000")) / 1000
+DEFAULT_MAX_BYTES = int(os.getenv("MCP_AUDIT_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_BACKUPS = int(os.getenv("MCP_AUDIT_BACKUPS", "10"))
+DEFAULT_DROP_POLICY = os.getenv("MCP_AUDIT_DROP_POLICY", DROP_OLDEST)
+
+REDACTED = "[redacted]"
+_SECRET_MARKERS = ("secret", "password", "token", "assertion", "credential", "private_key")
+
+
+def redact(value: Any) -> Any:
+    """Copy of ``value`` with secret-looking keys (client_secret, password, ...) masked."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if any(marker in str(key).lower() for marker in _SECRET_MARKERS) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class AuditLog:
+    """
+    Bounded queue of audit records drained to a rotating JSONL file.
+
+    Args:
+        path: Audit file; rotated segments are written next to it
+        queue_size: Records held in memory before the drop policy applies
+        batch_size: Most records written per batch
+        flush_interval: Seconds a partial batch waits for more records
+        max_bytes: Rotate once the file reaches this size (<= 0: never)
+        backups: Compressed segments to keep
+        drop_policy: ``drop_oldest``, ``drop_newest`` or ``block``
+        metrics: Metrics registry
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_AUDIT_PATH,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        drop_policy: str = DEFAULT_DROP_POLICY,
+        metrics: Optional[ServerMetrics] = None,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {', '.join(DROP_POLICIES)}")
+        self.path = Path(path)
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.drop_policy = drop_policy
+        self.metrics = metrics or get_metrics()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._kick: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flushing = 0
+        self._file: Optional[TextIO] = None
+        self._size = 0
+        self.metrics.gauge("audit.queue", lambda: self._queue.qsize() if self._queue is not None else 0)
+
+    def _ensure_writer(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._kick = asyncio.Event()
+            self._loop = loop
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return self._queue
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue a record without waiting; returns False if it was dropped."""
+        queue = self._ensure_writer()
+        if queue.full():
+            if self.drop_policy == DROP_OLDEST:
+                queue.get_nowait()
+                queue.task_done()
+            else:
+                # drop_newest, or block from a context that cannot wait
+                self._drop()
+                return False
+            self._drop()
+        queue.put_nowait(record)
+        if queue.qsize() >= self.batch_size:
+            self._kick.set()
+        return True
+
+    async def record(self, record: Dict[str, Any]) -> bool:
+        """Queue a record, waiting for space under the ``block`` policy."""
+        queue = self._ensure_writer()
+        if self.drop_policy == BLOCK and queue.full():
+            started = time.monotonic()
+            self._kick.set()
+            await queue.put(record)
+            self.metrics.observe("audit.backpressure", None, time.monotonic() - started)
+            return True
+        return self.submit(record)
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        self.metrics.incr("audit.dropped", self.drop_policy)
+
+    async def flush(self) -> None:
+        """Wait until every queued record has been written."""
+        if self._queue is None:
+            return
+        self._ensure_writer()
+        self._flushing += 1
+        try:
+            self._kick.set()
+            await self._queue.join()
+        finally:
+            self._flushing -= 1
+
+    async def close(self) -> None:
+        """Flush, stop the writer and close the file."""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self._close_file)
+
+    async def _run(self) -> None:
+        # Background work is not bound by the deadline of the call that started it
+        request_deadline.set(None)
+        queue, kick = self._queue, self._kick
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() + 1 < self.batch_size and not self._flushing:
+                kick.clear()
+                try:
+                    await asyncio.wait_for(kick.wait(), self.flush_interval)
+                except TimeoutError:
+                    pass
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as exc:
+                self.write_errors += 1
+                self.metrics.incr("audit.write_errors")
+                logger.error("Failed to write %d audit records: %s", len(batch), exc)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+            self.metrics.observe("audit.flush", None, time.monotonic() - started)
+
+    # Worker thread -------------------------------------------------------
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        lines = []
+        for record in batch:
+            record["arguments"] = redact(record.get("arguments"))
+            lines.append(json.dumps(record, default=str, separators=(",", ":")))
+        data = "\n".join(lines) + "\n"
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._size = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data.encode("utf-8"))
+        self.written += len(batch)
+        self.batches += 1
+        self.metrics.incr("audit.written", amount=len(batch))
+        if 0 < self.max_bytes <= self._size:
+            self._rotate()
+
+    def _segment(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{index}.gz")
+
+    def _rotate(self) -> None:
+        self._close_file()
+        if self.backups <= 0:
+            self.path.unlink(missing_ok=True)
+            return
+        self._segment(self.backups).unlink(missing_ok=True)
+        for index in range(self.backups - 1, 0, -1):
+            if self._segment(index).exists():
+                self._segment(index).rename(self._segment(index + 1))
+        with open(self.path, "rb") as source, gzip.open(self._segment(1), "wb") as target:
+            shutil.copyfileobj(source, target)
+        self.path.unlink()
+        self.rotations += 1
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+            "drop_policy": self.drop_policy,
+        }
+
+
+class AuditMiddleware(Middleware):
+    """
+    Record every tools/call, including denied, failed and cancelled ones.
+
+    The middleware runs outside the API-client middleware that validates the
+    caller's token, so a record is only built once the call has returned or
+    raised: by then the validated AccessToken is in the request's context
+    state. Calls rejected by token validation itself carry no client_id.
+    """
+
+    def __init__(self, audit: AuditLog):
+        self.audit = audit
+
+    def _record(self, context: MiddlewareContext[mt.CallToolRequestParams], started: float,
+                outcome: str, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        ctx = context.fastmcp_context
+        # Set further in by ApiClientContextMiddleware; only valid after call_next
+        access_token = caller_access_token(ctx)
+        return {
+            "ts": time.time(),
+            "tool": context.message.name,
+            "caller": caller_fingerprint(ctx),
+            "client_id": getattr(access_token, "client_id", None),
+            "arguments": context.message.arguments,
+            "plan_step": plan_step.get(),
+            "outcome": outcome,
+            "error": str(error) if error is not None else None,
+            "duration_ms": round((time.monotonic() - started) * 1000, 3),
+        }
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        started = time.monotonic()
+        try:
+            result = await call_next(context)
+        except asyncio.CancelledError:
+            # Cannot wait for queue space while being cancelled
+            self.audit.submit(self._record(context, started, "cancelled"))
+            raise
+        except Exception as exc:
+            await self.audit.record(self._record(context, started, "error", exc))
+            raise
+        await self.audit.record(self._record(context, started, "ok"))
+        return result
+
+
+def register_audit_log(mcp: FastMCP, audit: Optional[AuditLog] = None) -> Optional[AuditLog]:
+    """Audit tool calls to ``MCP_AUDIT_LOG``; does nothing if no log is configured."""
+    if audit is None:
+        if not DEFAULT_AUDIT_PATH:
+            return None
+        audit = AuditLog()
+    mcp.add_middleware(AuditMiddleware(audit))
+    return audit
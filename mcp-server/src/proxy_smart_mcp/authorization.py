@@ -0,0 +1,204 @@
+"""
+Precomputed scope-to-tool authorization.
+
+Tools can require OAuth scopes, declared as ``meta={"required_scopes": [...]}``,
+as ``scope:<name>`` tags, or by name pattern in ``MCP_TOOL_SCOPES`` (a JSON
+object of glob -> scope list, e.g. ``{"delete_*": ["admin"]}``).
+
+``ScopeIndex`` compiles those requirements once per tool set: every scope
+that some tool requires gets a bit, each tool a required-scope mask. A
+token's scopes are encoded to a mask once (cached per scope set), so a call
+check is a single ``required & ~granted`` test, and the filtered
+``tools/list`` for a mask is cached. Tools without requirements are always
+allowed; callers without a validated token have no scopes.
+
+Tools are indexed by key, the name clients see (prefixed for mounted
+servers). The index is rebuilt on ``invalidate()`` or when a tool missing
+from it shows up, at most once per ``MCP_SCOPE_INDEX_REBUILD_INTERVAL``
+seconds. Until then an unindexed tool is hidden and its calls are rejected.
+"""
+
+import fnmatch
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import mcp.types as mt
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .backend import caller_scopes
+
+logger = logging.getLogger(__name__)
+
+SCOPE_TAG_PREFIX = "scope:"
+DEFAULT_CACHE_SIZE = 1024
+# Minimum seconds between index rebuilds triggered by unindexed tool names
+DEFAULT_REBUILD_INTERVAL = float(os.getenv("MCP_SCOPE_INDEX_REBUILD_INTERVAL", "5"))
+
+
+def load_scope_rules(raw: Optional[str] = None) -> List[Tuple[str, FrozenSet[str]]]:
+    """Parse ``MCP_TOOL_SCOPES`` into (glob, scopes) rules."""
+    raw = os.getenv("MCP_TOOL_SCOPES", "") if raw is None else raw
+    if not raw.strip():
+        return []
+    try:
+        rules = json.loads(raw)
+    except ValueError:
+        logger.warning("Ignoring MCP_TOOL_SCOPES: not valid JSON")
+        return []
+    if not isinstance(rules, dict) or not all(
+        isinstance(scopes, list) and all(isinstance(scope, str) for scope in scopes)
+        for scopes in rules.values()
+    ):
+        logger.warning("Ignoring MCP_TOOL_SCOPES: expected an object of glob -> list of scopes")
+        return []
+    return [(pattern, frozenset(scopes)) for pattern, scopes in rules.items()]
+
+
+def required_scopes(
+    tool: Any,
+    rules: Sequence[Tuple[str, FrozenSet[str]]] = (),
+    name: Optional[str] = None,
+) -> FrozenSet[str]:
+    """Collect the scopes a tool requires from its meta, tags and name rules."""
+    name = name or tool.name
+    scopes = set((getattr(tool, "meta", None) or {}).get("required_scopes") or ())
+    scopes.update(tag[len(SCOPE_TAG_PREFIX):] for tag in getattr(tool, "tags", ()) or ()
+                  if tag.startswith(SCOPE_TAG_PREFIX))
+    for pattern, rule_scopes in rules:
+        if fnmatch.fnmatchcase(name, pattern):
+            scopes.update(rule_scopes)
+    return frozenset(scopes)
+
+
+class ScopeIndex:
+    """
+    Bitset index of tool scope requirements.
+
+    Args:
+        requirements: Tool name -> required scopes
+        cache_size: Bound of the scope-set and allowed-tools caches
+    """
+
+    def __init__(self, requirements: Mapping[str, Iterable[str]], cache_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        all_scopes = sorted({scope for scopes in requirements.values() for scope in scopes})
+        self.bits: Dict[str, int] = {scope: 1 << index for index, scope in enumerate(all_scopes)}
+        self.required: Dict[str, int] = {
+            name: self._encode(scopes) for name, scopes in requirements.items()
+        }
+        self.tool_names: FrozenSet[str] = frozenset(requirements)
+        self._masks: "OrderedDict[FrozenSet[str], int]" = OrderedDict()
+        self._allowed: "OrderedDict[int, FrozenSet[str]]" = OrderedDict()
+
+    def _encode(self, scopes: Iterable[str]) -> int:
+        mask = 0
+        for scope in scopes:
+            mask |= self.bits.get(scope, 0)
+        return mask
+
+    def _remember(self, cache: OrderedDict, key: Any, value: Any) -> Any:
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def mask(self, scopes: FrozenSet[str]) -> int:
+        """Encode a token's scopes (cached per scope set)."""
+        mask = self._masks.get(scopes)
+        if mask is None:
+            mask = self._remember(self._masks, scopes, self._encode(scopes))
+        return mask
+
+    def allows(self, tool_name: str, mask: int) -> bool:
+        return not self.required.get(tool_name, 0) & ~mask
+
+    def allowed_tools(self, mask: int) -> FrozenSet[str]:
+        """Names of the tools a scope mask grants (cached per mask)."""
+        allowed = self._allowed.get(mask)
+        if allowed is None:
+            allowed = self._remember(self._allowed, mask, frozenset(
+                name for name, required in self.required.items() if not required & ~mask
+            ))
+        return allowed
+
+    def missing(self, tool_name: str, mask: int) -> List[str]:
+        absent = self.required.get(tool_name, 0) & ~mask
+        return sorted(scope for scope, bit in self.bits.items() if absent & bit)
+
+
+class ScopeAuthorizationMiddleware(Middleware):
+    """Filter tools/list and guard tools/call with a ScopeIndex."""
+
+    # Runs inside the API-client middleware (see fastpath.install_fast_path)
+    needs_access_token = True
+
+    def __init__(
+        self,
+        mcp: FastMCP,
+        rules: Optional[Sequence[Tuple[str, FrozenSet[str]]]] = None,
+        rebuild_interval: float = DEFAULT_REBUILD_INTERVAL,
+    ):
+        self.mcp = mcp
+        self.rules = load_scope_rules() if rules is None else list(rules)
+        self.rebuild_interval = rebuild_interval
+        self.rebuilds = 0
+        self._index: Optional[ScopeIndex] = None
+        self._built_at = -math.inf
+
+    async def build(self) -> ScopeIndex:
+        """(Re)compile the index from the server's current tools."""
+        # Stamped before the await so concurrent misses do not all rebuild
+        self._built_at = time.monotonic()
+        tools = await self.mcp.get_tools()
+        self._index = ScopeIndex({key: required_scopes(tool, self.rules, key) for key, tool in tools.items()})
+        self.rebuilds += 1
+        return self._index
+
+    def invalidate(self) -> None:
+        """Rebuild on the next request, e.g. after the tool list changed."""
+        self._index = None
+
+    async def index(self, keys: Iterable[str] = ()) -> ScopeIndex:
+        """
+        The current index, rebuilt if it is missing, or if one of keys is not
+        indexed and the last rebuild is older than rebuild_interval.
+        """
+        index = self._index
+        if index is None:
+            return await self.build()
+        if (
+            time.monotonic() - self._built_at >= self.rebuild_interval
+            and any(key not in index.tool_names for key in keys)
+        ):
+            return await self.build()
+        return index
+
+    async def on_list_tools(self, context: MiddlewareContext, call_next):
+        tools = await call_next(context)
+        index = await self.index(tool.key for tool in tools)
+        allowed = index.allowed_tools(index.mask(caller_scopes(context.fastmcp_context)))
+        return [tool for tool in tools if tool.key in allowed]
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        name = context.message.name
+        index = await self.index((name,))
+        if name not in index.tool_names:
+            raise ToolError(f"Unknown tool: {name}")
+        mask = index.mask(caller_scopes(context.fastmcp_context))
+        if not index.allows(name, mask):
+            raise ToolError(f"Tool '{name}' requires scope(s): {', '.join(index.missing(name, mask))}")
+        return await call_next(context)
+
+
+def register_scope_authorization(mcp: FastMCP, **kwargs: Any) -> ScopeAuthorizationMiddleware:
+    """Add scope-based tool authorization to the server."""
+    middleware = ScopeAuthorizationMiddleware(mcp, **kwargs)
+    mcp.add_middleware(middleware)
+    return middleware
@@ -0,0 +1,270 @@
+"""
+Direct access to the Proxy Smart backend for hand-written tools.
+
+Generated tools call the backend through the synchronous OpenAPI client that
+ApiClientContextMiddleware stores in the request state. Extension tools that
+need concurrency (bulk fan-out, FHIR streaming, caches) use a pooled async
+httpx client instead, authenticated with the same caller token.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, FrozenSet, Optional
+
+import httpx
+from fastmcp import Context
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Backend API base URL (same default as the generated middleware)
+BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:8445")
+
+# Connection pool shared by all extension tools
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+ANONYMOUS_CALLER = "anonymous"
+
+# Absolute time.monotonic() deadline of the current tool call, if any
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class BackendError(Exception):
+    """Raised when a backend call fails; carries the HTTP status if any."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_backend_client() -> httpx.AsyncClient:
+    """Return the pooled async client for the current event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=BACKEND_API_URL,
+            timeout=DEFAULT_TIMEOUT,
+            limits=DEFAULT_LIMITS,
+        )
+        _client_loop = loop
+    return _client
+
+
+def set_backend_client(client: Optional[httpx.AsyncClient]) -> None:
+    """Replace the pooled client (used by tests and custom transports)."""
+    global _client, _client_loop
+    _client = client
+    _client_loop = asyncio.get_running_loop() if client is not None else None
+
+
+def get_caller_token(ctx: Optional[Context]) -> Optional[str]:
+    """
+    Resolve the caller's bearer token.
+
+    Order: API client attached by ApiClientContextMiddleware, then the
+    Authorization header of the HTTP request, then BACKEND_API_TOKEN (STDIO).
+
+    Args:
+        ctx: FastMCP context of the current request
+
+    Returns:
+        Bearer token, or None if the caller is anonymous
+    """
+    if ctx is not None:
+        try:
+            api_client = ctx.get_state("api_client")
+        except Exception:
+            api_client = None
+        if getattr(api_client, "built", True) is False:
+            # Unbuilt LazyApiClient: the header carries the same token
+            api_client = None
+        token = getattr(getattr(api_client, "configuration", None), "access_token", None)
+        if token:
+            return token
+
+        try:
+            from fastmcp.server.dependencies import get_http_headers
+
+            auth_header = get_http_headers(include_all=True).get("authorization", "")
+        except Exception:
+            auth_header = ""
+        if auth_header.lower().startswith("bearer "):
+            return auth_header[7:]
+
+    return os.getenv("BACKEND_API_TOKEN")
+
+
+def caller_fingerprint(ctx: Optional[Context]) -> str:
+    """Stable, non-reversible identifier of the caller, for keying per-caller state."""
+    token = get_caller_token(ctx)
+    if not token:
+        return ANONYMOUS_CALLER
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def caller_access_token(ctx: Optional[Context]) -> Any:
+    """
+    The caller's validated AccessToken, or None.
+
+    Uses the AccessToken stored by ApiClientContextMiddleware, then the one
+    from FastMCP's auth provider.
+    """
+    access_token = None
+    if ctx is not None:
+        try:
+            access_token = ctx.get_state("access_token")
+        except Exception:
+            access_token = None
+    if access_token is None:
+        try:
+            from fastmcp.server.dependencies import get_access_token
+
+            access_token = get_access_token()
+        except Exception:
+            access_token = None
+    return access_token
+
+
+def caller_scopes(ctx: Optional[Context]) -> FrozenSet[str]:
+    """Scopes of the caller's validated access token; empty if it was not validated."""
+    return frozenset(getattr(caller_access_token(ctx), "scopes", None) or ())
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text[:500] or response.reason_phrase
+    if isinstance(body, dict):
+        return str(body.get("error") or body.get("message") or body)
+    return str(body)
+
+
+def _request_timeout() -> httpx.Timeout:
+    deadline = request_deadline.get()
+    if deadline is None:
+        return DEFAULT_TIMEOUT
+    remaining = max(deadline - time.monotonic(), 0.001)
+    if remaining >= DEFAULT_TIMEOUT.read:
+        return DEFAULT_TIMEOUT
+    return httpx.Timeout(remaining, connect=min(remaining, DEFAULT_TIMEOUT.connect))
+
+
+def _auth_headers(ctx: Optional[Context], headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    request_headers = {"Accept": "application/json"}
+    token = get_caller_token(ctx)
+    if token:
+        request_headers["Authorization"] = f"Bearer {token}"
+    if headers:
+        request_headers.update(headers)
+    return request_headers
+
+
+async def backend_request(
+    ctx: Optional[Context],
+    method: str,
+    path: str,
+    *,
+    json: Any = None,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> httpx.Response:
+    """
+    Send an authenticated request to the backend.
+
+    Args:
+        ctx: FastMCP context (used to resolve the caller token)
+        method: HTTP method
+        path: Path relative to BACKEND_API_URL
+        json: Optional JSON body
+        params: Optional query parameters
+        headers: Optional extra headers
+
+    Returns:
+        The successful response (2xx or 304)
+
+    Raises:
+        BackendError: On transport errors and non-success status codes
+    """
+    try:
+        response = await get_backend_client().request(
+            method, path, json=json, params=params, headers=_auth_headers(ctx, headers),
+            timeout=_request_timeout(),
+        )
+    except httpx.HTTPError as exc:
+        raise BackendError(f"{method} {path} failed: {exc}") from exc
+    except asyncio.CancelledError:
+        # httpx closes the in-flight connection when the awaiting task is cancelled
+        get_metrics().incr("backend.cancelled")
+        raise
+
+    if response.status_code >= 400:
+        raise BackendError(
+            f"{method} {path} returned {response.status_code}: {_error_message(response)}",
+            status_code=response.status_code,
+        )
+    return response
+
+
+async def backend_json(
+    ctx: Optional[Context],
+    method: str,
+    path: str,
+    **kwargs: Any,
+) -> Any:
+    """Send an authenticated request and return the decoded JSON body."""
+    response = await backend_request(ctx, method, path, **kwargs)
+    if not response.content:
+        return None
+    return response.json()
+
+
+@asynccontextmanager
+async def backend_stream(
+    ctx: Optional[Context],
+    method: str,
+    path: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[httpx.Response]:
+    """
+    Send an authenticated request and yield the response with its body unread.
+
+    The body is consumed by the caller (``aiter_text``/``aiter_bytes``) and the
+    connection returns to the pool when the context exits.
+
+    Raises:
+        BackendError: On transport errors and non-success status codes
+    """
+    client = get_backend_client()
+    request = client.build_request(
+        method, path, params=params, headers=_auth_headers(ctx, headers), timeout=_request_timeout()
+    )
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.HTTPError as exc:
+        raise BackendError(f"{method} {path} failed: {exc}") from exc
+
+    try:
+        if response.status_code >= 400:
+            await response.aread()
+            raise BackendError(
+                f"{method} {path} returned {response.status_code}: {_error_message(response)}",
+                status_code=response.status_code,
+            )
+        yield response
+    finally:
+        await response.aclose()
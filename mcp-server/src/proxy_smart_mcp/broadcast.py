@@ -0,0 +1,323 @@
+"""
+Fan-out hub for server notifications on streamable HTTP GET streams.
+
+Sending ``notifications/tools/list_changed`` through each session builds,
+validates and serializes the message once per session. ``BroadcastHub``
+does it once per publish: the JSON-RPC payload and its SSE frame are built
+a single time and the same bytes are queued for every subscriber.
+
+``register_broadcast`` wires the hub into the server:
+
+- ``add_tool`` / ``remove_tool`` on the server publish
+  ``notifications/tools/list_changed``, also outside a request (FastMCP
+  itself only notifies the session whose request changed the tool set). An
+  added tool's required scopes (see ``authorization``) are the broadcast's
+  required scopes, so clients that cannot see the tool are not told about it
+- every streamable HTTP ``GET`` stream (the SSE stream an MCP session opens
+  for server-initiated messages) subscribes while it is open, with the
+  scopes of the caller's token (FastMCP auth) or of its tracked session,
+  and receives broadcasts as SSE frames written next to the transport's own
+  events
+
+Broadcast frames carry no event id, so they are not replayed when a client
+resumes a stream with ``Last-Event-ID``; clients re-list tools on reconnect.
+
+A subscriber only receives broadcasts whose required scopes it holds; a
+per-scope index keeps that filter proportional to the matching subscribers
+rather than all of them. Subscribers are small (``__slots__``, a shared
+interned scope set, no idle task, and a queue allocated on the first
+broadcast they receive): a drain task runs only while a subscriber has
+queued broadcasts. A full queue drops its oldest broadcast; a subscriber
+whose sink fails is removed.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, Optional, Set
+
+from fastmcp import FastMCP
+from starlette.datastructures import Headers
+from starlette.middleware import Middleware as ASGIMiddleware
+
+from .authorization import load_scope_rules, required_scopes
+from .sessions import SESSION_HEADER, SessionRegistry, get_session_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 64
+
+TOOLS_LIST_CHANGED = "notifications/tools/list_changed"
+RESOURCES_LIST_CHANGED = "notifications/resources/list_changed"
+PROMPTS_LIST_CHANGED = "notifications/prompts/list_changed"
+
+SSE_CONTENT_TYPE = "text/event-stream"
+
+
+@dataclass(frozen=True)
+class Broadcast:
+    """One notification, serialized once for all subscribers."""
+
+    method: str
+    payload: bytes
+    frame: bytes
+    required_scopes: FrozenSet[str] = frozenset()
+
+
+Sink = Callable[[Broadcast], Awaitable[None]]
+
+
+def sse_frame(payload: bytes) -> bytes:
+    """The SSE event the streamable HTTP transport writes for a message."""
+    return b"event: message\r\ndata: " + payload + b"\r\n\r\n"
+
+
+class Subscription:
+    """A subscriber's scope set, bounded queue and optional delivery sink."""
+
+    __slots__ = ("hub", "scopes", "queue_size", "dropped", "delivered", "_queue", "_sink", "_task")
+
+    def __init__(self, hub: "BroadcastHub", scopes: FrozenSet[str], queue_size: int, sink: Optional[Sink]):
+        self.hub = hub
+        self.scopes = scopes
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.delivered = 0
+        self._queue: "Optional[asyncio.Queue[Broadcast]]" = None
+        self._sink = sink
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queue(self) -> "asyncio.Queue[Broadcast]":
+        # Most streams never receive a broadcast; allocate on first use
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        return self._queue
+
+    def _offer(self, broadcast: Broadcast) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(broadcast)
+        if self._sink is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while not self.queue.empty():
+            broadcast = self.queue.get_nowait()
+            try:
+                await self._sink(broadcast)
+            except Exception as exc:
+                logger.debug("Dropping broadcast subscriber: %s", exc)
+                self.hub.unsubscribe(self)
+                return
+            self.delivered += 1
+
+    async def get(self) -> Broadcast:
+        """Wait for the next broadcast (for subscribers without a sink)."""
+        broadcast = await self.queue.get()
+        self.delivered += 1
+        return broadcast
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class BroadcastHub:
+    """
+    Publish notifications once to many subscribers.
+
+    Args:
+        queue_size: Default per-subscriber queue bound
+    """
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.published = 0
+        self._subscribers: Set[Subscription] = set()
+        self._by_scope: Dict[str, Set[Subscription]] = {}
+        self._scope_sets: Dict[FrozenSet[str], FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(
+        self,
+        scopes: Iterable[str] = (),
+        sink: Optional[Sink] = None,
+        queue_size: Optional[int] = None,
+    ) -> Subscription:
+        scope_set = frozenset(scopes)
+        # Streams of the same client share one scope set object
+        scope_set = self._scope_sets.setdefault(scope_set, scope_set)
+        subscription = Subscription(self, scope_set, queue_size or self.queue_size, sink)
+        self._subscribers.add(subscription)
+        for scope in subscription.scopes:
+            self._by_scope.setdefault(scope, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription not in self._subscribers:
+            return
+        self._subscribers.discard(subscription)
+        for scope in subscription.scopes:
+            holders = self._by_scope.get(scope)
+            if holders is not None:
+                holders.discard(subscription)
+                if not holders:
+                    del self._by_scope[scope]
+
+    def _recipients(self, required: FrozenSet[str]) -> Iterable[Subscription]:
+        if not required:
+            return list(self._subscribers)
+        candidates = min((self._by_scope.get(scope, set()) for scope in required), key=len)
+        return [subscription for subscription in candidates if required <= subscription.scopes]
+
+    def publish(
+        self,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        required_scopes: Iterable[str] = (),
+    ) -> int:
+        """
+        Serialize a notification once and queue it for matching subscribers.
+
+        Returns:
+            Number of subscribers it was queued for
+        """
+        required = frozenset(required_scopes)
+        recipients = self._recipients(required)
+        self.published += 1
+        if not recipients:
+            return 0
+        notification: Dict[str, Any] = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            notification["params"] = params
+        payload = json.dumps(notification, separators=(",", ":")).encode()
+        broadcast = Broadcast(method=method, payload=payload, frame=sse_frame(payload), required_scopes=required)
+        for subscription in recipients:
+            subscription._offer(broadcast)
+        return len(recipients)
+
+    def tools_changed(self, required_scopes: Iterable[str] = ()) -> int:
+        return self.publish(TOOLS_LIST_CHANGED, required_scopes=required_scopes)
+
+    def resources_changed(self, required_scopes: Iterable[str] = ()) -> int:
+        return self.publish(RESOURCES_LIST_CHANGED, required_scopes=required_scopes)
+
+    def prompts_changed(self, required_scopes: Iterable[str] = ()) -> int:
+        return self.publish(PROMPTS_LIST_CHANGED, required_scopes=required_scopes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": sum(subscription.dropped for subscription in self._subscribers),
+        }
+
+
+def stream_scopes(scope: Dict[str, Any], session_id: str, registry: Optional[SessionRegistry]) -> FrozenSet[str]:
+    """Scopes of a GET stream's caller: its validated token, else its tracked session."""
+    access_token = getattr(scope.get("user"), "access_token", None)
+    if access_token is not None:
+        return frozenset(access_token.scopes or ())
+    state = registry.get(session_id) if registry is not None else None
+    return state.scopes if state is not None else frozenset()
+
+
+class BroadcastStreamMiddleware:
+    """
+    ASGI middleware subscribing streamable HTTP GET streams to the hub.
+
+    All writes to a subscribed stream go through one lock, so broadcast
+    frames are never interleaved with the transport's own events.
+    """
+
+    def __init__(self, app: Any, hub: BroadcastHub, registry: Optional[SessionRegistry] = None):
+        self.app = app
+        self.hub = hub
+        self.registry = registry
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        session_id = headers.get(SESSION_HEADER)
+        if session_id is None or SSE_CONTENT_TYPE not in headers.get("accept", ""):
+            return await self.app(scope, receive, send)
+
+        lock = asyncio.Lock()
+        subscription: Optional[Subscription] = None
+        streaming = False
+
+        async def deliver(broadcast: Broadcast) -> None:
+            async with lock:
+                if not streaming:
+                    raise ConnectionError("stream closed")
+                await send({"type": "http.response.body", "body": broadcast.frame, "more_body": True})
+
+        async def send_locked(message: Dict[str, Any]) -> None:
+            nonlocal streaming, subscription
+            async with lock:
+                if message["type"] == "http.response.start":
+                    content_type = Headers(raw=message.get("headers") or []).get("content-type", "")
+                    streaming = message["status"] == 200 and content_type.startswith(SSE_CONTENT_TYPE)
+                elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                    streaming = False
+                await send(message)
+            if streaming and subscription is None:
+                subscription = self.hub.subscribe(stream_scopes(scope, session_id, self.registry), sink=deliver)
+
+        try:
+            await self.app(scope, receive, send_locked)
+        finally:
+            streaming = False
+            if subscription is not None:
+                subscription.close()
+
+
+_hub: Optional[BroadcastHub] = None
+
+
+def get_broadcast_hub() -> BroadcastHub:
+    """Return the process-wide notification hub."""
+    global _hub
+    if _hub is None:
+        _hub = BroadcastHub()
+    return _hub
+
+
+def register_broadcast(
+    mcp: FastMCP,
+    hub: Optional[BroadcastHub] = None,
+    registry: Optional[SessionRegistry] = None,
+) -> BroadcastHub:
+    """Publish this server's tool list changes and serve them on its GET streams."""
+    if hub is None:
+        hub = get_broadcast_hub()
+    if registry is None:
+        registry = get_session_registry()
+    rules = load_scope_rules()
+    add_tool, remove_tool, http_app = mcp.add_tool, mcp.remove_tool, mcp.http_app
+
+    def add_tool_and_broadcast(tool: Any) -> Any:
+        added = add_tool(tool)
+        hub.tools_changed(required_scopes(added, rules, name=added.key))
+        return added
+
+    def remove_tool_and_broadcast(name: str) -> None:
+        remove_tool(name)
+        # The removed tool's scopes are gone with it; tell every stream
+        hub.tools_changed()
+
+    def http_app_with_broadcast(*args: Any, middleware: Optional[list] = None, **kwargs: Any) -> Any:
+        middleware = [*(middleware or []), ASGIMiddleware(BroadcastStreamMiddleware, hub=hub, registry=registry)]
+        return http_app(*args, middleware=middleware, **kwargs)
+
+    mcp.add_tool = add_tool_and_broadcast
+    mcp.remove_tool = remove_tool_and_broadcast
+    mcp.http_app = http_app_with_broadcast
+    return hub
@@ -0,0 +1,179 @@
+"""
+Bulk-operation tools for healthcare users, roles and SMART apps.
+
+Provisioning a tenant through the generated tools costs one ``tools/call``
+per entity. The bulk variants accept arrays, fan out to the backend with
+bounded concurrency, report per-item success or failure and emit progress
+notifications (when the client sends a progress token) as items complete.
+"""
+
+import asyncio
+import logging
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from .backend import BackendError, backend_json
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BULK_CONCURRENCY = 8
+MAX_BULK_CONCURRENCY = 32
+MAX_BULK_ITEMS = 5000
+
+
+@dataclass(frozen=True)
+class BulkResource:
+    """Backend collection that supports bulk create/update/delete."""
+
+    name: str
+    path: str
+    id_label: str
+
+
+BULK_RESOURCES = (
+    BulkResource(name="healthcare_users", path="/admin/healthcare-users", id_label="userId"),
+    BulkResource(name="roles", path="/admin/roles", id_label="roleName"),
+    BulkResource(name="smart_apps", path="/admin/smart-apps", id_label="clientId"),
+)
+
+
+@dataclass
+class BulkItemResult:
+    """Outcome of one item in a bulk operation."""
+
+    index: int
+    ok: bool
+    result: Any = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+async def run_bulk(
+    items: List[Any],
+    operation: Callable[[Any], Awaitable[Any]],
+    *,
+    concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    ctx: Optional[Context] = None,
+    label: str = "items",
+) -> Dict[str, Any]:
+    """
+    Apply an async operation to every item with bounded concurrency.
+
+    Args:
+        items: Inputs, one per backend call
+        operation: Coroutine function performing the call for one item
+        concurrency: Maximum calls in flight
+        ctx: Optional context for progress notifications
+        label: Noun used in progress messages
+
+    Returns:
+        Summary with ``total``, ``succeeded``, ``failed`` and per-item ``results``
+        in input order
+    """
+    if len(items) > MAX_BULK_ITEMS:
+        raise ToolError(f"Bulk request has {len(items)} items; the maximum is {MAX_BULK_ITEMS}")
+
+    total = len(items)
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, MAX_BULK_CONCURRENCY)))
+    results: List[Optional[BulkItemResult]] = [None] * total
+    done = 0
+    failed = 0
+
+    async def run_one(index: int, item: Any) -> None:
+        nonlocal done, failed
+        async with semaphore:
+            try:
+                outcome = BulkItemResult(index=index, ok=True, result=await operation(item))
+            except BackendError as exc:
+                outcome = BulkItemResult(index=index, ok=False, error=str(exc), status_code=exc.status_code)
+            except Exception as exc:
+                outcome = BulkItemResult(index=index, ok=False, error=str(exc))
+        results[index] = outcome
+        done += 1
+        if not outcome.ok:
+            failed += 1
+        if ctx is not None:
+            await ctx.report_progress(done, total, f"{done}/{total} {label} processed ({failed} failed)")
+
+    await asyncio.gather(*(run_one(index, item) for index, item in enumerate(items)))
+
+    return {
+        "total": total,
+        "succeeded": total - failed,
+        "failed": failed,
+        "results": [asdict(result) for result in results],
+    }
+
+
+def _item_path(resource: BulkResource, item_id: Any) -> str:
+    if not isinstance(item_id, str) or not item_id:
+        raise ToolError(f"Each item needs a non-empty string '{resource.id_label}'")
+    return f"{resource.path}/{quote(item_id, safe='')}"
+
+
+def _register_resource_tools(mcp: FastMCP, resource: BulkResource) -> None:
+    async def bulk_create(
+        items: List[Dict[str, Any]],
+        ctx: Context,
+        concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        async def create(body: Dict[str, Any]) -> Any:
+            return await backend_json(ctx, "POST", resource.path, json=body)
+
+        return await run_bulk(items, create, concurrency=concurrency, ctx=ctx, label=resource.name)
+
+    async def bulk_update(
+        items: List[Dict[str, Any]],
+        ctx: Context,
+        concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        async def update(item: Dict[str, Any]) -> Any:
+            return await backend_json(ctx, "PUT", _item_path(resource, item.get("id")), json=item.get("data") or {})
+
+        return await run_bulk(items, update, concurrency=concurrency, ctx=ctx, label=resource.name)
+
+    async def bulk_delete(
+        ids: List[str],
+        ctx: Context,
+        concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        async def delete(item_id: str) -> Any:
+            return await backend_json(ctx, "DELETE", _item_path(resource, item_id))
+
+        return await run_bulk(ids, delete, concurrency=concurrency, ctx=ctx, label=resource.name)
+
+    entity = resource.name.replace("_", " ")
+    mcp.tool(
+        bulk_create,
+        name=f"bulk_create_{resource.name}",
+        description=(
+            f"Create many {entity} in one call. 'items' is a list of create request bodies "
+            f"(same shape as the single create tool). Returns per-item success or failure."
+        ),
+    )
+    mcp.tool(
+        bulk_update,
+        name=f"bulk_update_{resource.name}",
+        description=(
+            f"Update many {entity} in one call. Each item is {{\"id\": <{resource.id_label}>, "
+            f"\"data\": <update request body>}}. Returns per-item success or failure."
+        ),
+    )
+    mcp.tool(
+        bulk_delete,
+        name=f"bulk_delete_{resource.name}",
+        description=(
+            f"Delete many {entity} in one call. 'ids' is a list of {resource.id_label} values. "
+            f"Returns per-item success or failure."
+        ),
+    )
+
+
+def register_bulk_tools(mcp: FastMCP) -> None:
+    """Register bulk create/update/delete tools for every bulk resource."""
+    for resource in BULK_RESOURCES:
+        _register_resource_tools(mcp, resource)
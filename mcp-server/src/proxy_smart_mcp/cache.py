@@ -0,0 +1,157 @@
+"""
+Bounded in-memory cache shared by the extension caches.
+
+``BoundedTTLCache`` is an LRU map bounded by entry count and total byte size
+whose entries expire after a TTL. It is not thread-safe; all callers run on
+the server's event loop.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+@dataclass
+class CacheEntry:
+    """A cached value with its accounting and validator metadata."""
+
+    value: Any
+    size: int
+    expires_at: float
+    etag: Optional[str] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) >= self.expires_at
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss/eviction counters of a cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+class BoundedTTLCache:
+    """
+    LRU cache bounded by entry count and total size, with per-entry TTL.
+
+    Args:
+        max_entries: Maximum number of entries
+        max_bytes: Maximum sum of entry sizes
+        ttl: Default entry lifetime in seconds
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not entry.is_expired()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the live entry for key (counting a hit or miss)."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.is_expired():
+            self._remove(key)
+            self.stats.expirations += 1
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        size: int,
+        *,
+        ttl: Optional[float] = None,
+        etag: Optional[str] = None,
+        **meta: Any,
+    ) -> Optional[CacheEntry]:
+        """
+        Insert or replace an entry, evicting least-recently-used entries.
+
+        Returns:
+            The new entry, or None if the value alone exceeds max_bytes
+        """
+        self._remove(key)
+        if size > self.max_bytes:
+            return None
+
+        while self._entries and (
+            len(self._entries) >= self.max_entries or self._bytes + size > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+        entry = CacheEntry(
+            value=value,
+            size=size,
+            expires_at=time.monotonic() + (self.ttl if ttl is None else ttl),
+            etag=etag,
+            meta=meta,
+        )
+        self._entries[key] = entry
+        self._bytes += size
+        return entry
+
+    def touch(self, key: Hashable, ttl: Optional[float] = None) -> None:
+        """Extend the lifetime of an entry (e.g. after a successful revalidation)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches predicate; return the count."""
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,357 @@
+"""
+Composite tool execution: run a small DAG of tool calls in one request.
+
+Agents often chain admin tools (list smart apps -> get each app -> fetch its
+launch contexts), paying an LLM round trip plus an MCP round trip per step.
+The ``execute_tool_plan`` tool accepts a declarative plan instead:
+
+    {
+      "steps": [
+        {"id": "apps", "tool": "admin_list_smart_apps"},
+        {"id": "details", "tool": "admin_get_smart_app",
+         "for_each": "apps.result",
+         "arguments": {"client_id": {"$ref": "$item.clientId"}}}
+      ]
+    }
+
+Values of the form ``{"$ref": "<step>.<path>"}`` are replaced with data from
+an earlier step's result; ``for_each`` fans a step out over a list and exposes
+each element as ``$item``. Dependencies are inferred from references (plus an
+optional explicit ``depends_on``), and every step starts as soon as its own
+dependencies finish, so independent branches run concurrently on the server.
+
+Steps run through the server middleware (auth, API client, timeouts) with
+``plan_step`` set to the step id, so middleware that shapes results for the
+client (paging) leaves nested results whole and per-call accounting can
+tell nested steps from client calls. FastMCP has no public API for that;
+``call_tool_with_middleware`` is the only place that reaches into it.
+
+A ``for_each`` step fails with its first failing call; the calls still
+running for the other items are cancelled.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, List, Optional, Set
+
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+logger = logging.getLogger(__name__)
+
+COMPOSITE_TOOL_NAME = "execute_tool_plan"
+
+# Guard rails for a single plan
+MAX_PLAN_STEPS = 50
+MAX_FAN_OUT = 100
+DEFAULT_MAX_CONCURRENCY = 8
+MAX_CONCURRENCY = 16
+
+ITEM_REF = "$item"
+
+# Id of the plan step a tools/call runs for; None for calls made by the client
+plan_step: ContextVar[Optional[str]] = ContextVar("plan_step", default=None)
+
+
+class PlanError(ToolError):
+    """Raised when a tool plan is malformed."""
+
+
+@dataclass
+class PlanStep:
+    """One tool call in a plan."""
+
+    id: str
+    tool: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    depends_on: Set[str] = field(default_factory=set)
+    for_each: Optional[str] = None
+
+
+def _collect_refs(value: Any, refs: Set[str]) -> None:
+    if isinstance(value, dict):
+        if set(value) == {"$ref"} and isinstance(value["$ref"], str):
+            refs.add(value["$ref"])
+            return
+        for item in value.values():
+            _collect_refs(item, refs)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_refs(item, refs)
+
+
+def _ref_step(ref: str) -> str:
+    return ref.split(".", 1)[0]
+
+
+def lookup_path(data: Any, path: str) -> Any:
+    """
+    Resolve a dotted path (``result.0.clientId``) inside a JSON value.
+
+    Args:
+        data: Root value
+        path: Dot-separated keys; numeric segments index into lists
+
+    Returns:
+        The referenced value
+
+    Raises:
+        PlanError: If a segment does not exist
+    """
+    current = data
+    for segment in path.split(".") if path else []:
+        if isinstance(current, list):
+            try:
+                current = current[int(segment)]
+            except (ValueError, IndexError):
+                raise PlanError(f"Invalid list index '{segment}' in reference path '{path}'")
+        elif isinstance(current, dict):
+            if segment not in current:
+                raise PlanError(f"Key '{segment}' not found in reference path '{path}'")
+            current = current[segment]
+        else:
+            raise PlanError(f"Cannot resolve '{segment}' in reference path '{path}'")
+    return current
+
+
+def _resolve_ref(ref: str, results: Dict[str, Any], item: Any) -> Any:
+    step_id, _, path = ref.partition(".")
+    if step_id == ITEM_REF:
+        return lookup_path(item, path)
+    return lookup_path(results[step_id], path)
+
+
+def substitute_refs(value: Any, results: Dict[str, Any], item: Any = None) -> Any:
+    """Replace every ``{"$ref": ...}`` in value with the referenced data."""
+    if isinstance(value, dict):
+        if set(value) == {"$ref"} and isinstance(value["$ref"], str):
+            return _resolve_ref(value["$ref"], results, item)
+        return {key: substitute_refs(item_value, results, item) for key, item_value in value.items()}
+    if isinstance(value, list):
+        return [substitute_refs(element, results, item) for element in value]
+    return value
+
+
+def parse_plan(plan: Dict[str, Any]) -> List[PlanStep]:
+    """
+    Validate a plan and return its steps.
+
+    Args:
+        plan: Plan object with a ``steps`` list
+
+    Returns:
+        Parsed steps in declaration order
+
+    Raises:
+        PlanError: On duplicate ids, unknown references, recursion or cycles
+    """
+    raw_steps = plan.get("steps") if isinstance(plan, dict) else None
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise PlanError("Plan must contain a non-empty 'steps' list")
+    if len(raw_steps) > MAX_PLAN_STEPS:
+        raise PlanError(f"Plan has {len(raw_steps)} steps; the maximum is {MAX_PLAN_STEPS}")
+
+    steps: List[PlanStep] = []
+    seen: Set[str] = set()
+    for index, raw in enumerate(raw_steps):
+        if not isinstance(raw, dict):
+            raise PlanError(f"Step {index} must be an object")
+        step_id = raw.get("id")
+        tool = raw.get("tool")
+        if not isinstance(step_id, str) or not step_id or step_id == ITEM_REF or "." in step_id:
+            raise PlanError(f"Step {index} needs a string 'id' without dots")
+        if step_id in seen:
+            raise PlanError(f"Duplicate step id '{step_id}'")
+        if not isinstance(tool, str) or not tool:
+            raise PlanError(f"Step '{step_id}' needs a 'tool' name")
+        if tool == COMPOSITE_TOOL_NAME:
+            raise PlanError(f"Step '{step_id}' cannot call {COMPOSITE_TOOL_NAME} recursively")
+        seen.add(step_id)
+
+        arguments = raw.get("arguments") or {}
+        if not isinstance(arguments, dict):
+            raise PlanError(f"Step '{step_id}' arguments must be an object")
+        for_each = raw.get("for_each")
+        if for_each is not None and not isinstance(for_each, str):
+            raise PlanError(f"Step '{step_id}' for_each must be a reference path string")
+
+        refs: Set[str] = set()
+        _collect_refs(arguments, refs)
+        if for_each:
+            refs.add(for_each)
+        depends_on = {_ref_step(ref) for ref in refs} - {ITEM_REF}
+        explicit = raw.get("depends_on")
+        if explicit is not None:
+            if not isinstance(explicit, list) or not all(isinstance(dep, str) for dep in explicit):
+                raise PlanError(f"Step '{step_id}' depends_on must be a list of step ids")
+            depends_on.update(explicit)
+
+        if any(_ref_step(ref) == ITEM_REF for ref in refs) and not for_each:
+            raise PlanError(f"Step '{step_id}' references {ITEM_REF} without for_each")
+
+        steps.append(PlanStep(
+            id=step_id,
+            tool=tool,
+            arguments=arguments,
+            depends_on=depends_on,
+            for_each=for_each,
+        ))
+
+    for step in steps:
+        unknown = step.depends_on - seen
+        if unknown:
+            raise PlanError(f"Step '{step.id}' depends on unknown step(s): {sorted(unknown)}")
+
+    _check_acyclic(steps)
+    return steps
+
+
+def _check_acyclic(steps: List[PlanStep]) -> None:
+    remaining = {step.id: set(step.depends_on) for step in steps}
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise PlanError(f"Plan contains a dependency cycle among: {sorted(remaining)}")
+        for step_id in ready:
+            del remaining[step_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def tool_result_to_data(result: Any) -> Any:
+    """Extract JSON data from a ToolResult (structured content first, then text)."""
+    structured = getattr(result, "structured_content", None)
+    if structured is not None:
+        return structured
+
+    texts = [getattr(block, "text", None) for block in getattr(result, "content", []) or []]
+    texts = [text for text in texts if text is not None]
+    if len(texts) == 1:
+        try:
+            return json.loads(texts[0])
+        except (json.JSONDecodeError, ValueError):
+            return texts[0]
+    return texts
+
+
+def call_tool_with_middleware(server: FastMCP, name: str, arguments: Dict[str, Any]) -> Awaitable[Any]:
+    """
+    Call a tool through the server's middleware chain.
+
+    Wraps the private ``FastMCP._call_tool_middleware(key, arguments)``
+    (FastMCP 2.x); test_composite pins its signature.
+
+    Raises:
+        PlanError: If the installed FastMCP no longer provides it
+    """
+    call = getattr(server, "_call_tool_middleware", None)
+    if call is None:
+        raise PlanError("This FastMCP version cannot run tools through middleware for plans")
+    return call(name, arguments)
+
+
+class PlanExecutor:
+    """Execute parsed plan steps against a FastMCP server."""
+
+    def __init__(self, server: FastMCP, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.server = server
+        self._semaphore = asyncio.Semaphore(min(max(1, max_concurrency), MAX_CONCURRENCY))
+
+    async def _call(self, step: PlanStep, arguments: Dict[str, Any]) -> Any:
+        async with self._semaphore:
+            # Goes through the server middleware so auth/API client state applies
+            token = plan_step.set(step.id)
+            try:
+                result = await call_tool_with_middleware(self.server, step.tool, arguments)
+            finally:
+                plan_step.reset(token)
+        return tool_result_to_data(result)
+
+    async def _run_step(self, step: PlanStep, results: Dict[str, Any]) -> Any:
+        if not step.for_each:
+            arguments = substitute_refs(step.arguments, results)
+            return await self._call(step, arguments)
+
+        items = _resolve_ref(step.for_each, results, None)
+        if not isinstance(items, list):
+            raise PlanError(f"for_each of step '{step.id}' does not reference a list")
+        if len(items) > MAX_FAN_OUT:
+            raise PlanError(f"for_each of step '{step.id}' has {len(items)} items; the maximum is {MAX_FAN_OUT}")
+
+        # The first failure fails the step; the task group cancels the other items
+        try:
+            async with asyncio.TaskGroup() as group:
+                calls = [
+                    group.create_task(self._call(step, substitute_refs(step.arguments, results, item)))
+                    for item in items
+                ]
+        except BaseExceptionGroup as exc:
+            raise exc.exceptions[0] from None
+        return [call.result() for call in calls]
+
+    async def execute(self, steps: List[PlanStep]) -> Dict[str, Any]:
+        """
+        Run all steps, each as soon as its dependencies have completed.
+
+        Returns:
+            ``results`` (per step), ``errors`` (per failed or skipped step)
+            and ``duration_ms``
+        """
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run(step: PlanStep) -> None:
+            for dep in step.depends_on:
+                await asyncio.shield(tasks[dep])
+            failed = sorted(dep for dep in step.depends_on if dep in errors)
+            if failed:
+                errors[step.id] = f"Skipped: dependency failed ({', '.join(failed)})"
+                return
+            try:
+                results[step.id] = await self._run_step(step, results)
+            except Exception as exc:
+                logger.warning("Plan step '%s' (%s) failed: %s", step.id, step.tool, exc)
+                errors[step.id] = str(exc)
+
+        # Tasks are created in declaration order; acyclicity guarantees every
+        # awaited dependency task exists before it is awaited
+        for step in steps:
+            tasks[step.id] = asyncio.ensure_future(run(step))
+        await asyncio.gather(*tasks.values())
+
+        return {
+            "results": results,
+            "errors": errors,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+def register_composite_tool(mcp: FastMCP) -> None:
+    """Register ``execute_tool_plan`` on the composed server."""
+
+    @mcp.tool(name=COMPOSITE_TOOL_NAME)
+    async def execute_tool_plan(
+        plan: Dict[str, Any],
+        ctx: Context,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> Dict[str, Any]:
+        """
+        Execute several tool calls with data dependencies in a single request.
+
+        Each step is {"id", "tool", "arguments", "depends_on"?, "for_each"?}.
+        Use {"$ref": "<step_id>.<path>"} inside arguments to pass an earlier
+        step's result (numeric path segments index lists). With "for_each":
+        "<step_id>.<path>" the step runs once per list element, available as
+        {"$ref": "$item.<path>"}. Independent steps run concurrently, at most
+        max_concurrency (up to 16) calls at a time.
+        Returns per-step results and per-step errors.
+        """
+        steps = parse_plan(plan)
+        await ctx.info(f"Executing tool plan with {len(steps)} steps")
+        return await PlanExecutor(ctx.fastmcp, max_concurrency).execute(steps)
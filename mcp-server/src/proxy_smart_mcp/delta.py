@@ -0,0 +1,262 @@
+"""
+Delta sync ("changed since") for collection list tools.
+
+Agents re-list smart apps, launch contexts, identity providers and users to
+check for changes, re-reading the whole collection each time.
+``DeltaSyncMiddleware`` adds an optional ``since_cursor`` argument to those
+list tools. When present, the tool runs as usual, its items are folded into
+a versioned per-caller snapshot, and the response carries only what was
+added, changed or removed since the cursor, plus a new cursor:
+
+    {"result": {"cursor": "9f2c.7", "full_sync": false,
+                "added": [...], "changed": [...], "removed": ["app-3"]}}
+
+Pass an empty ``since_cursor`` for the initial full sync. A cursor from an
+evicted or restarted snapshot, or older than the retained removal history,
+yields a full sync. The advertised output schema of each extended tool allows
+either the original ``result`` or the delta object.
+"""
+
+import hashlib
+import json
+import secrets
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import mcp.types as mt
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+
+from .backend import caller_fingerprint
+
+CURSOR_ARG = "since_cursor"
+
+# Collection name fragment -> item id field
+DELTA_COLLECTIONS = (
+    ("smart_apps", "clientId"),
+    ("launch_contexts", "userId"),
+    ("idps", "alias"),
+    ("identity_providers", "alias"),
+    ("healthcare_users", "id"),
+)
+
+DEFAULT_MAX_SNAPSHOTS = 256
+DEFAULT_TOMBSTONE_LIMIT = 10_000
+
+
+DELTA_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "cursor": {"type": "string"},
+        "full_sync": {"type": "boolean"},
+        "added": {"type": "array"},
+        "changed": {"type": "array"},
+        "removed": {"type": "array"},
+    },
+    "required": ["cursor", "full_sync", "added", "changed", "removed"],
+}
+
+
+def _digest(item: Any) -> bytes:
+    encoded = json.dumps(item, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+
+@dataclass
+class _Tracked:
+    item: Any
+    digest: bytes
+    created: int
+    changed: int
+
+
+class VersionedSnapshot:
+    """
+    Items of one collection with the version at which each last changed.
+
+    Versions advance once per ``apply`` that observed a change; removals are
+    kept as tombstones (bounded) so deltas can report them.
+    """
+
+    def __init__(self, id_field: str, tombstone_limit: int = DEFAULT_TOMBSTONE_LIMIT):
+        self.id_field = id_field
+        self.tombstone_limit = tombstone_limit
+        self.epoch = secrets.token_hex(4)
+        self.version = 0
+        self.horizon = 0  # deltas from versions below this need a full sync
+        self._items: Dict[str, _Tracked] = {}
+        self._tombstones: "OrderedDict[str, int]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def apply(self, items: Sequence[Any]) -> None:
+        """Fold the current full collection into the snapshot."""
+        version = self.version + 1
+        changed = False
+        seen = set()
+
+        for item in items:
+            if not isinstance(item, dict) or item.get(self.id_field) in (None, ""):
+                continue
+            item_id = str(item[self.id_field])
+            seen.add(item_id)
+            digest = _digest(item)
+            tracked = self._items.get(item_id)
+            if tracked is None:
+                self._items[item_id] = _Tracked(item, digest, created=version, changed=version)
+                self._tombstones.pop(item_id, None)
+                changed = True
+            elif tracked.digest != digest:
+                tracked.item, tracked.digest, tracked.changed = item, digest, version
+                changed = True
+
+        for item_id in [item_id for item_id in self._items if item_id not in seen]:
+            del self._items[item_id]
+            self._tombstones[item_id] = version
+            self._tombstones.move_to_end(item_id)
+            changed = True
+
+        while len(self._tombstones) > self.tombstone_limit:
+            _, removed_at = self._tombstones.popitem(last=False)
+            self.horizon = max(self.horizon, removed_at)
+
+        if changed:
+            self.version = version
+
+    def cursor(self) -> str:
+        return f"{self.epoch}.{self.version}"
+
+    def _since_version(self, cursor: Optional[str]) -> Optional[int]:
+        if not cursor:
+            return None
+        epoch, _, version = cursor.partition(".")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        since = int(version)
+        if since < self.horizon or since > self.version:
+            return None
+        return since
+
+    def changes_since(self, cursor: Optional[str]) -> Dict[str, Any]:
+        """Return the delta from cursor to the current version."""
+        since = self._since_version(cursor)
+        if since is None:
+            return {
+                "cursor": self.cursor(),
+                "full_sync": True,
+                "added": [tracked.item for tracked in self._items.values()],
+                "changed": [],
+                "removed": [],
+            }
+
+        added: List[Any] = []
+        changed: List[Any] = []
+        for tracked in self._items.values():
+            if tracked.created > since:
+                added.append(tracked.item)
+            elif tracked.changed > since:
+                changed.append(tracked.item)
+        removed = [item_id for item_id, version in self._tombstones.items() if version > since]
+        return {
+            "cursor": self.cursor(),
+            "full_sync": False,
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+        }
+
+
+def delta_output_schema(schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Widen a tool output schema so ``result`` may also hold a delta object."""
+    properties = (schema or {}).get("properties") or {}
+    if "result" not in properties:
+        # No schema, or a free-form object that already admits the delta
+        return schema
+    result = properties["result"]
+    if DELTA_SCHEMA in result.get("anyOf", []):
+        return schema
+    widened = dict(schema)
+    widened["properties"] = {**properties, "result": {"anyOf": [result, DELTA_SCHEMA]}}
+    return widened
+
+
+def delta_id_field(tool_name: str) -> Optional[str]:
+    """Return the id field for a delta-capable list tool, or None."""
+    if "list" not in tool_name.split("_"):
+        return None
+    for fragment, id_field in DELTA_COLLECTIONS:
+        if fragment in tool_name:
+            return id_field
+    return None
+
+
+class DeltaSyncMiddleware(Middleware):
+    """Return only changes since a cursor from collection list tools."""
+
+    def __init__(self, max_snapshots: int = DEFAULT_MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[Tuple[str, str, str], VersionedSnapshot]" = OrderedDict()
+
+    def snapshot(self, key: Tuple[str, str, str], id_field: str) -> VersionedSnapshot:
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = VersionedSnapshot(id_field)
+            self._snapshots[key] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        self._snapshots.move_to_end(key)
+        return snapshot
+
+    async def on_list_tools(self, context: MiddlewareContext, call_next):
+        tools = await call_next(context)
+        extended = []
+        for tool in tools:
+            properties = (tool.parameters or {}).get("properties") or {}
+            if delta_id_field(tool.name) is None or CURSOR_ARG in properties:
+                extended.append(tool)
+                continue
+            parameters = dict(tool.parameters or {})
+            parameters["properties"] = {
+                **properties,
+                CURSOR_ARG: {
+                    "type": "string",
+                    "description": (
+                        "Delta sync: pass the cursor from a previous delta response to get only "
+                        "items added, changed or removed since then; pass \"\" to start."
+                    ),
+                },
+            }
+            extended.append(tool.model_copy(update={
+                "parameters": parameters,
+                "output_schema": delta_output_schema(tool.output_schema),
+            }))
+        return extended
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        name = context.message.name
+        arguments = dict(context.message.arguments or {})
+        id_field = delta_id_field(name)
+        if id_field is None or CURSOR_ARG not in arguments:
+            return await call_next(context)
+
+        cursor = arguments.pop(CURSOR_ARG)
+        context = context.copy(message=mt.CallToolRequestParams(
+            name=name, arguments=arguments, _meta=context.message.meta
+        ))
+        result = await call_next(context)
+
+        data = result.structured_content
+        items = data.get("result") if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return result
+
+        key = (
+            caller_fingerprint(context.fastmcp_context),
+            name,
+            json.dumps(arguments, sort_keys=True, default=str),
+        )
+        snapshot = self.snapshot(key, id_field)
+        snapshot.apply(items)
+        return ToolResult(structured_content={"result": snapshot.changes_since(cursor)})
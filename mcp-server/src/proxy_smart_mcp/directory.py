@@ -0,0 +1,416 @@
+"""
+In-memory lookup index of healthcare users and roles.
+
+Finding a practitioner by partial name through the generated tools costs a
+backend call (and a Keycloak admin query) every time. ``DirectoryIndex``
+keeps a per-caller snapshot of users and roles in a prefix/trigram index:
+
+- built from a full snapshot on first lookup,
+- refreshed incrementally in the background once older than the refresh
+  interval (only added, changed or removed records touch the index),
+- marked stale by ``DirectoryInvalidationMiddleware`` whenever a mutating
+  user or role tool succeeds, so the next lookup reloads first.
+
+``find_healthcare_users`` / ``find_roles`` answer from the index; ``live=true``
+forces a backend query.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import mcp.types as mt
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .backend import BackendError, backend_json, caller_fingerprint, get_caller_token, request_deadline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = float(os.getenv("DIRECTORY_REFRESH_SECONDS", "300"))
+DEFAULT_MAX_CALLERS = 16
+SNAPSHOT_PAGE_SIZE = 500
+DEFAULT_LOOKUP_LIMIT = 20
+
+USERS_PATH = "/admin/healthcare-users"
+ROLES_PATH = "/admin/roles"
+
+USER_FIELDS = ("username", "email", "firstName", "lastName", "npi", "practitionerId", "organization")
+ROLE_FIELDS = ("name", "description")
+
+# Tool names that change users or roles (generated and bulk tools)
+MUTATING_VERBS = frozenset({
+    "create", "update", "delete", "add", "remove", "assign", "unassign", "reset",
+    "post", "put", "patch",
+})
+DIRECTORY_FRAGMENTS = ("healthcare_user", "role")
+
+_WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass(frozen=True)
+class _Terms:
+    values: Tuple[str, ...]
+    words: Tuple[str, ...]
+
+
+class TrigramIndex:
+    """
+    Prefix/trigram index over selected string fields of records.
+
+    Queries of three or more characters intersect trigram postings; shorter
+    queries use word-prefix postings. Candidates are verified against the
+    field values, so results are exact substring matches.
+    """
+
+    def __init__(self, fields: Tuple[str, ...], id_field: str, derived: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None):
+        self.fields = fields
+        self.id_field = id_field
+        self.derived = derived
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._terms: Dict[str, _Terms] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _extract(self, doc: Dict[str, Any]) -> _Terms:
+        values = [str(doc[name]).lower() for name in self.fields if doc.get(name)]
+        if self.derived is not None:
+            values.extend(value.lower() for value in self.derived(doc) if value)
+        words = {word for value in values for word in _WORD_SPLIT.split(value) if word}
+        return _Terms(values=tuple(values), words=tuple(sorted(words)))
+
+    @staticmethod
+    def _keys(terms: _Terms) -> Set[str]:
+        keys = set()
+        for value in terms.values:
+            keys |= _trigrams(value)
+        for word in terms.words:
+            keys.add("^" + word[:1])
+            if len(word) > 1:
+                keys.add("^" + word[:2])
+        return keys
+
+    def upsert(self, doc: Dict[str, Any]) -> bool:
+        """Add or replace a record; return False if it was unchanged."""
+        doc_id = doc.get(self.id_field)
+        if not doc_id:
+            return False
+        if self._docs.get(doc_id) == doc:
+            return False
+        self.remove(doc_id)
+        terms = self._extract(doc)
+        self._docs[doc_id] = doc
+        self._terms[doc_id] = terms
+        for key in self._keys(terms):
+            self._postings.setdefault(key, set()).add(doc_id)
+        return True
+
+    def remove(self, doc_id: str) -> bool:
+        terms = self._terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        del self._docs[doc_id]
+        for key in self._keys(terms):
+            posting = self._postings.get(key)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[key]
+        return True
+
+    def sync(self, docs: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Apply a full snapshot incrementally; return added/changed/removed counts."""
+        seen = set()
+        changed = 0
+        added = 0
+        for doc in docs:
+            doc_id = doc.get(self.id_field)
+            if not doc_id:
+                continue
+            seen.add(doc_id)
+            existed = doc_id in self._docs
+            if self.upsert(doc):
+                if existed:
+                    changed += 1
+                else:
+                    added += 1
+        removed = [doc_id for doc_id in self._docs if doc_id not in seen]
+        for doc_id in removed:
+            self.remove(doc_id)
+        return {"added": added, "changed": changed, "removed": len(removed)}
+
+    def _candidates(self, token: str) -> Set[str]:
+        if len(token) < 3:
+            return set(self._postings.get("^" + token, ()))
+        postings = [self._postings.get(gram) for gram in _trigrams(token)]
+        if any(posting is None for posting in postings):
+            return set()
+        postings.sort(key=len)
+        return set.intersection(*postings)
+
+    @staticmethod
+    def _score(token: str, terms: _Terms) -> Optional[int]:
+        best = None
+        for value in terms.values:
+            if value == token:
+                return 0
+            if value.startswith(token):
+                best = 1
+            elif token in value and best is None:
+                best = 3
+        if best != 1 and any(word.startswith(token) for word in terms.words):
+            best = 2
+        return best
+
+    def search(self, query: str, limit: int = DEFAULT_LOOKUP_LIMIT) -> List[Dict[str, Any]]:
+        """Return records matching every word of query, best matches first."""
+        tokens = [token for token in _WORD_SPLIT.split(query.lower()) if token]
+        if not tokens:
+            return []
+
+        candidates: Optional[Set[str]] = None
+        for token in sorted(tokens, key=len, reverse=True):
+            found = self._candidates(token)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+
+        ranked = []
+        for doc_id in candidates:
+            terms = self._terms[doc_id]
+            total = 0
+            for token in tokens:
+                score = self._score(token, terms)
+                if score is None:
+                    break
+                total += score
+            else:
+                ranked.append((total, terms.values[:1], doc_id))
+        ranked.sort()
+        return [self._docs[doc_id] for _, _, doc_id in ranked[:limit]]
+
+
+def _user_full_name(user: Dict[str, Any]) -> Iterable[str]:
+    if user.get("firstName") and user.get("lastName"):
+        yield f"{user['firstName']} {user['lastName']}"
+
+
+class CallerDirectory:
+    """Users and roles visible to one caller."""
+
+    def __init__(self):
+        self.users = TrigramIndex(USER_FIELDS, "id", derived=_user_full_name)
+        self.roles = TrigramIndex(ROLE_FIELDS, "name")
+        self.loaded_at: Optional[float] = None
+        self.stale = True
+        self.refresh_task: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()
+
+
+class DirectoryIndex:
+    """
+    Per-caller user/role indexes with scheduled and invalidation-driven refresh.
+
+    Args:
+        refresh_interval: Age after which a lookup triggers a background refresh
+        max_callers: Number of caller snapshots kept (least recently used dropped)
+    """
+
+    def __init__(self, refresh_interval: float = DEFAULT_REFRESH_INTERVAL, max_callers: int = DEFAULT_MAX_CALLERS):
+        self.refresh_interval = refresh_interval
+        self.max_callers = max_callers
+        self.refreshes = 0
+        self._callers: "OrderedDict[str, CallerDirectory]" = OrderedDict()
+
+    def _directory(self, caller: str) -> CallerDirectory:
+        directory = self._callers.get(caller)
+        if directory is None:
+            directory = CallerDirectory()
+            self._callers[caller] = directory
+            while len(self._callers) > self.max_callers:
+                self._callers.popitem(last=False)
+        self._callers.move_to_end(caller)
+        return directory
+
+    def invalidate(self) -> None:
+        """Mark every snapshot stale; the next lookup reloads before answering."""
+        for directory in self._callers.values():
+            directory.stale = True
+
+    @staticmethod
+    async def _fetch_users(headers: Dict[str, str]) -> List[Dict[str, Any]]:
+        users: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = await backend_json(
+                None, "GET", USERS_PATH,
+                params={"limit": SNAPSHOT_PAGE_SIZE, "offset": offset}, headers=headers,
+            ) or []
+            users.extend(page)
+            if len(page) < SNAPSHOT_PAGE_SIZE:
+                return users
+            offset += SNAPSHOT_PAGE_SIZE
+
+    async def _refresh(self, directory: CallerDirectory, token: Optional[str]) -> None:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        async with directory.lock:
+            # Clear the flag first: an invalidation during the fetch forces another reload
+            directory.stale = False
+            try:
+                users, roles = await asyncio.gather(
+                    self._fetch_users(headers),
+                    backend_json(None, "GET", ROLES_PATH, headers=headers),
+                )
+            except BaseException:
+                directory.stale = True
+                raise
+            user_changes = directory.users.sync(users)
+            role_changes = directory.roles.sync(roles or [])
+            directory.loaded_at = time.monotonic()
+            self.refreshes += 1
+            logger.debug("Directory refreshed: users %s, roles %s", user_changes, role_changes)
+
+    def _schedule_refresh(self, directory: CallerDirectory, token: Optional[str]) -> None:
+        if directory.refresh_task is not None and not directory.refresh_task.done():
+            return
+
+        async def refresh() -> None:
+            # Background work is not bound by the deadline of the call that started it
+            request_deadline.set(None)
+            try:
+                await self._refresh(directory, token)
+            except Exception as exc:
+                logger.warning("Background directory refresh failed: %s", exc)
+
+        directory.refresh_task = asyncio.get_running_loop().create_task(refresh())
+
+    async def _ready(self, ctx: Optional[Context]) -> CallerDirectory:
+        directory = self._directory(caller_fingerprint(ctx))
+        token = get_caller_token(ctx)
+        if directory.stale or directory.loaded_at is None:
+            async with directory.lock:
+                pass  # wait for a refresh already in progress
+            if directory.stale or directory.loaded_at is None:
+                await self._refresh(directory, token)
+        elif time.monotonic() - directory.loaded_at >= self.refresh_interval:
+            self._schedule_refresh(directory, token)
+        return directory
+
+    async def find_users(self, ctx: Optional[Context], query: str, limit: int = DEFAULT_LOOKUP_LIMIT) -> List[Dict[str, Any]]:
+        return (await self._ready(ctx)).users.search(query, limit)
+
+    async def find_roles(self, ctx: Optional[Context], query: str, limit: int = DEFAULT_LOOKUP_LIMIT) -> List[Dict[str, Any]]:
+        return (await self._ready(ctx)).roles.search(query, limit)
+
+    async def find_live(self, ctx: Optional[Context], kind: str, query: str, limit: int = DEFAULT_LOOKUP_LIMIT) -> List[Dict[str, Any]]:
+        """Reload the caller's snapshot from the backend, then search it."""
+        directory = self._directory(caller_fingerprint(ctx))
+        await self._refresh(directory, get_caller_token(ctx))
+        index = directory.users if kind == "users" else directory.roles
+        return index.search(query, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "callers": len(self._callers),
+            "refreshes": self.refreshes,
+            "users": sum(len(directory.users) for directory in self._callers.values()),
+            "roles": sum(len(directory.roles) for directory in self._callers.values()),
+        }
+
+
+def is_directory_mutation(tool_name: str) -> bool:
+    """Whether a tool name looks like a user or role mutation."""
+    name = tool_name.lower()
+    return any(fragment in name for fragment in DIRECTORY_FRAGMENTS) and not MUTATING_VERBS.isdisjoint(
+        name.split("_")
+    )
+
+
+class DirectoryInvalidationMiddleware(Middleware):
+    """Mark the directory stale after successful user/role mutations."""
+
+    def __init__(self, directory: DirectoryIndex):
+        self.directory = directory
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        result = await call_next(context)
+        if is_directory_mutation(context.message.name):
+            self.directory.invalidate()
+        return result
+
+
+_directory_index: Optional[DirectoryIndex] = None
+
+
+def get_directory_index() -> DirectoryIndex:
+    """Return the process-wide directory index."""
+    global _directory_index
+    if _directory_index is None:
+        _directory_index = DirectoryIndex()
+    return _directory_index
+
+
+def register_directory_tools(mcp: FastMCP, directory: Optional[DirectoryIndex] = None) -> DirectoryIndex:
+    """Register the lookup tools and the invalidation middleware."""
+    directory = directory or get_directory_index()
+
+    async def find_healthcare_users(
+        query: str,
+        ctx: Context,
+        limit: int = DEFAULT_LOOKUP_LIMIT,
+        live: bool = False,
+    ) -> Dict[str, Any]:
+        try:
+            if live:
+                users = await directory.find_live(ctx, "users", query, limit)
+            else:
+                users = await directory.find_users(ctx, query, limit)
+        except BackendError as exc:
+            raise ToolError(str(exc)) from exc
+        return {"result": users}
+
+    async def find_roles(
+        query: str,
+        ctx: Context,
+        limit: int = DEFAULT_LOOKUP_LIMIT,
+        live: bool = False,
+    ) -> Dict[str, Any]:
+        try:
+            if live:
+                roles = await directory.find_live(ctx, "roles", query, limit)
+            else:
+                roles = await directory.find_roles(ctx, query, limit)
+        except BackendError as exc:
+            raise ToolError(str(exc)) from exc
+        return {"result": roles}
+
+    mcp.tool(
+        find_healthcare_users,
+        name="find_healthcare_users",
+        description=(
+            "Find healthcare users by partial username, name, email or NPI from a local index "
+            "(every word of the query must match). Set live=true to reload from the backend first."
+        ),
+    )
+    mcp.tool(
+        find_roles,
+        name="find_roles",
+        description=(
+            "Find roles by partial name or description from a local index. "
+            "Set live=true to reload from the backend first."
+        ),
+    )
+    mcp.add_middleware(DirectoryInvalidationMiddleware(directory))
+    return directory
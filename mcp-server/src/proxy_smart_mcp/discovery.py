@@ -0,0 +1,414 @@
+"""
+Shared OAuth 2.0 / OpenID Connect discovery for the MCP server.
+
+Implements the MCP authorization discovery flow once for every consumer
+(authentication middleware, token acquisition, test utilities):
+
+1. Protected Resource Metadata (RFC 9728) names the authorization server(s)
+2. Authorization Server Metadata is read from OpenID Connect Discovery or
+   OAuth 2.0 AS Metadata (RFC 8414) - both are probed concurrently
+
+Documents are cached per URL and honour the backend's HTTP caching headers:
+``Cache-Control: max-age`` sets the freshness lifetime, ``no-store`` disables
+caching, and stale entries are revalidated with ``If-None-Match`` so an
+unchanged document costs a 304 instead of a full download. If revalidation
+fails (transport error or 5xx), the stale copy is served.
+
+``install_discovered_verifier`` hands the generated ApiClientContextMiddleware
+a JWT verifier built from the discovered issuer and JWKS URI when it
+validates tokens (``--validate-tokens``).
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from fastmcp import FastMCP
+
+from .fastpath import is_api_client_middleware
+
+logger = logging.getLogger(__name__)
+
+# Freshness lifetime used when the server sends no Cache-Control max-age
+DEFAULT_TTL_SECONDS = 300.0
+
+# Protected resource whose metadata names the token issuer
+RESOURCE_URL = os.getenv("MCP_RESOURCE_URL") or os.getenv("BACKEND_API_URL", "http://localhost:8445")
+TOKEN_AUDIENCE = os.getenv("MCP_TOKEN_AUDIENCE") or None
+
+_MAX_AGE_RE = re.compile(r"max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+class DiscoveryError(Exception):
+    """Raised when OAuth metadata cannot be discovered."""
+
+
+@dataclass
+class CachedDocument:
+    """A discovery document together with its HTTP cache validators."""
+
+    url: str
+    data: Dict[str, Any]
+    etag: Optional[str] = None
+    expires_at: float = 0.0
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) < self.expires_at
+
+
+@dataclass
+class AuthorizationServerMetadata:
+    """Resolved authorization server metadata for a protected resource."""
+
+    issuer: str
+    token_endpoint: str
+    jwks_uri: Optional[str] = None
+    authorization_servers: List[str] = field(default_factory=list)
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+
+def parse_cache_lifetime(headers: httpx.Headers, default_ttl: float) -> Optional[float]:
+    """
+    Derive the freshness lifetime of a response from its Cache-Control header.
+
+    Args:
+        headers: Response headers
+        default_ttl: Lifetime to use when no max-age directive is present
+
+    Returns:
+        Lifetime in seconds, or None if the response must not be stored
+    """
+    cache_control = headers.get("cache-control", "")
+    directives = cache_control.lower()
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        # Storable, but must be revalidated before every use
+        return 0.0
+    match = _MAX_AGE_RE.search(cache_control)
+    if match:
+        return float(match.group(1))
+    return default_ttl
+
+
+class DiscoveryResolver:
+    """
+    Cached, concurrency-safe resolver for OAuth/OIDC discovery metadata.
+
+    One resolver is shared per process (see ``get_discovery_resolver``) so
+    every client of the backend reuses the same cached documents. Concurrent
+    lookups of the same URL are coalesced into a single HTTP request.
+    """
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        default_ttl: float = DEFAULT_TTL_SECONDS,
+        timeout: float = 10.0,
+    ):
+        """
+        Initialize the resolver.
+
+        Args:
+            client: Optional HTTP client (a pooled client is created lazily)
+            default_ttl: Cache lifetime when the server sends no max-age
+            timeout: Per-request timeout in seconds
+        """
+        self._client = client
+        self._owns_client = client is None
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self._cache: Dict[str, CachedDocument] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> None:
+        # Locks and pooled connections belong to one event loop; the cached
+        # documents do not, so only the former are dropped on a loop change
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._locks = {}
+            if self._owns_client:
+                self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the HTTP client if it was created by the resolver."""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def invalidate(self, url: Optional[str] = None) -> None:
+        """Drop one cached document, or the whole cache when url is None."""
+        if url is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(url, None)
+
+    async def fetch_json(self, url: str) -> Dict[str, Any]:
+        """
+        Fetch a JSON discovery document, served from cache while fresh.
+
+        Args:
+            url: Absolute URL of the document
+
+        Returns:
+            Parsed JSON object
+
+        Raises:
+            httpx.HTTPError: If the request fails or the server answers 5xx and
+                no cached copy exists, or the server answers 4xx
+        """
+        cached = self._cache.get(url)
+        if cached and cached.is_fresh():
+            return cached.data
+
+        self._bind_loop()
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            # Another task may have refreshed the entry while we waited
+            cached = self._cache.get(url)
+            if cached and cached.is_fresh():
+                return cached.data
+
+            headers = {"Accept": "application/json"}
+            if cached and cached.etag:
+                headers["If-None-Match"] = cached.etag
+
+            try:
+                response = await self._get_client().get(url, headers=headers, timeout=self.timeout)
+            except httpx.HTTPError as exc:
+                if cached is None:
+                    raise
+                logger.warning("Revalidating %s failed, serving the stale copy: %s", url, exc)
+                return cached.data
+            lifetime = parse_cache_lifetime(response.headers, self.default_ttl)
+
+            if response.status_code == 304 and cached:
+                logger.debug("Discovery document not modified: %s", url)
+                cached.expires_at = time.monotonic() + (lifetime or 0.0)
+                return cached.data
+
+            if response.status_code >= 500 and cached:
+                logger.warning("Revalidating %s returned %d, serving the stale copy", url, response.status_code)
+                return cached.data
+            response.raise_for_status()
+            data = response.json()
+            if not isinstance(data, dict):
+                raise DiscoveryError(f"Discovery document at {url} is not a JSON object")
+
+            if lifetime is None:
+                self._cache.pop(url, None)
+            else:
+                self._cache[url] = CachedDocument(
+                    url=url,
+                    data=data,
+                    etag=response.headers.get("etag"),
+                    expires_at=time.monotonic() + lifetime,
+                )
+            return data
+
+    async def get_protected_resource_metadata(self, resource_url: str) -> Dict[str, Any]:
+        """Fetch Protected Resource Metadata (RFC 9728) for a resource server."""
+        base = resource_url.rstrip("/")
+        return await self.fetch_json(f"{base}/.well-known/oauth-protected-resource")
+
+    async def _try_metadata(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            metadata = await self.fetch_json(url)
+        except (httpx.HTTPError, ValueError, DiscoveryError) as exc:
+            logger.debug("Metadata probe failed for %s: %s", url, exc)
+            return None
+        return metadata if "token_endpoint" in metadata else None
+
+    async def get_authorization_server_metadata(self, issuer_url: str) -> Dict[str, Any]:
+        """
+        Fetch Authorization Server Metadata, probing both discovery endpoints.
+
+        OpenID Connect Discovery and OAuth 2.0 AS Metadata are requested
+        concurrently. OIDC is preferred when both answer, matching the order
+        mandated by the MCP authorization spec.
+
+        Args:
+            issuer_url: Authorization server (issuer) URL
+
+        Returns:
+            Metadata document containing at least ``token_endpoint``
+
+        Raises:
+            DiscoveryError: If neither endpoint yields usable metadata
+        """
+        base = issuer_url.rstrip("/")
+        oidc = asyncio.create_task(self._try_metadata(f"{base}/.well-known/openid-configuration"))
+        oauth = asyncio.create_task(self._try_metadata(f"{base}/.well-known/oauth-authorization-server"))
+
+        try:
+            metadata = await oidc
+            if metadata is not None:
+                return metadata
+            metadata = await oauth
+            if metadata is not None:
+                return metadata
+        finally:
+            if not oauth.done():
+                oauth.cancel()
+
+        raise DiscoveryError(
+            f"Could not discover token endpoint from authorization server {issuer_url}. "
+            "Tried both OpenID Connect Discovery and OAuth 2.0 AS Metadata endpoints."
+        )
+
+    async def discover(self, resource_url: str) -> AuthorizationServerMetadata:
+        """
+        Run the full MCP discovery flow for a protected resource.
+
+        Args:
+            resource_url: The MCP server (backend proxy) URL
+
+        Returns:
+            Resolved authorization server metadata
+        """
+        pr_metadata = await self.get_protected_resource_metadata(resource_url)
+        auth_servers = pr_metadata.get("authorization_servers") or []
+        if not auth_servers:
+            raise DiscoveryError("No authorization servers found in Protected Resource Metadata")
+
+        # First server wins (clients may select per RFC 9728 Section 7.6)
+        as_metadata = await self.get_authorization_server_metadata(auth_servers[0])
+        return AuthorizationServerMetadata(
+            issuer=as_metadata.get("issuer", auth_servers[0]),
+            token_endpoint=as_metadata["token_endpoint"],
+            jwks_uri=as_metadata.get("jwks_uri"),
+            authorization_servers=list(auth_servers),
+            raw=as_metadata,
+        )
+
+    async def token_endpoint(self, resource_url: str) -> str:
+        """Return the token endpoint of the resource's authorization server."""
+        return (await self.discover(resource_url)).token_endpoint
+
+
+_resolver: Optional[DiscoveryResolver] = None
+
+
+def get_discovery_resolver() -> DiscoveryResolver:
+    """Return the process-wide discovery resolver."""
+    global _resolver
+    if _resolver is None:
+        _resolver = DiscoveryResolver()
+    return _resolver
+
+
+async def discover_token_endpoint(resource_url: str) -> str:
+    """
+    Discover the token endpoint for a protected resource (cached).
+
+    Args:
+        resource_url: The MCP server (backend proxy) URL
+
+    Returns:
+        The authorization server's token endpoint URL
+    """
+    return await get_discovery_resolver().token_endpoint(resource_url)
+
+
+async def create_jwt_verifier(
+    resource_url: str,
+    audience: Optional[str] = None,
+    required_scopes: Optional[List[str]] = None,
+):
+    """
+    Build a JWTVerifier from discovered metadata for ApiClientContextMiddleware.
+
+    Args:
+        resource_url: The MCP server (backend proxy) URL
+        audience: Expected token audience
+        required_scopes: Scopes every token must carry
+
+    Returns:
+        JWTVerifier configured with the discovered issuer and JWKS URI
+    """
+    from fastmcp.server.auth import JWTVerifier
+
+    metadata = await get_discovery_resolver().discover(resource_url)
+    if not metadata.jwks_uri:
+        raise DiscoveryError(f"Authorization server {metadata.issuer} publishes no jwks_uri")
+
+    return JWTVerifier(
+        jwks_uri=metadata.jwks_uri,
+        issuer=metadata.issuer,
+        audience=audience,
+        required_scopes=required_scopes,
+    )
+
+
+class DiscoveredJWTVerifier:
+    """
+    Token verifier that discovers its issuer and JWKS URI on first use.
+
+    The generated middleware is built synchronously in ``main()``, before an
+    event loop runs, so discovery cannot happen up front. The JWTVerifier is
+    created on the first token; if discovery fails the token is rejected and
+    discovery is retried with the next one.
+    """
+
+    def __init__(
+        self,
+        resource_url: str = RESOURCE_URL,
+        audience: Optional[str] = TOKEN_AUDIENCE,
+        required_scopes: Optional[List[str]] = None,
+        factory: Callable[..., Any] = create_jwt_verifier,
+    ):
+        self.resource_url = resource_url
+        self.audience = audience
+        self.required_scopes = required_scopes
+        self._factory = factory
+        self._verifier: Any = None
+
+    async def verifier(self) -> Any:
+        if self._verifier is None:
+            self._verifier = await self._factory(
+                self.resource_url, audience=self.audience, required_scopes=self.required_scopes
+            )
+        return self._verifier
+
+    async def verify_token(self, token: str) -> Any:
+        """Return the AccessToken for a valid token, else None."""
+        try:
+            verifier = await self.verifier()
+        except (DiscoveryError, httpx.HTTPError, ValueError) as exc:
+            logger.error("Cannot validate tokens, discovery for %s failed: %s", self.resource_url, exc)
+            return None
+        return await verifier.verify_token(token)
+
+
+def install_discovered_verifier(mcp: FastMCP, verifier: Optional[DiscoveredJWTVerifier] = None) -> DiscoveredJWTVerifier:
+    """
+    Give the API-client middleware added by ``main()`` a discovered verifier.
+
+    Only middleware that validates tokens is changed; call before ``main()``.
+    """
+    if verifier is None:
+        verifier = DiscoveredJWTVerifier()
+    add_middleware = mcp.add_middleware
+
+    def add_middleware_with_verifier(middleware: Any) -> None:
+        if is_api_client_middleware(middleware) and getattr(middleware, "validate_tokens", False):
+            if not hasattr(middleware, "token_verifier"):
+                logger.warning("%s has no token_verifier; keeping its own verifier", type(middleware).__name__)
+            else:
+                middleware.token_verifier = verifier
+        add_middleware(middleware)
+
+    mcp.add_middleware = add_middleware_with_verifier
+    return verifier
@@ -0,0 +1,82 @@
+"""
+Install the hand-written extensions on the composed MCP server.
+
+``install_extensions`` is called by ``run.py`` with the generated
+``main_mcp`` before the generated ``main()`` starts the transport.
+"""
+
+import logging
+
+from fastmcp import FastMCP
+
+from .audit import register_audit_log
+from .authorization import register_scope_authorization
+from .broadcast import register_broadcast
+from .bulk import register_bulk_tools
+from .composite import register_composite_tool
+from .delta import DeltaSyncMiddleware
+from .directory import register_directory_tools
+from .fastpath import install_fast_path
+from .fhir import register_fhir_tools
+from .fhir_cache import register_resource_cache_tools
+from .fhir_capabilities import register_capability_tools
+from .fhir_search_cache import register_search_cache_tools
+from .limits import register_adaptive_concurrency
+from .metrics import register_metrics_tool
+from .oauth_aggregates import register_oauth_aggregate_tools
+from .paging import register_paging
+from .projection import FieldProjectionMiddleware
+from .request_logging import register_request_logging
+from .scheduling import register_priority_scheduling
+from .sessions import register_session_tracking
+from .timeouts import register_tool_timeouts
+from .validation import register_compiled_validation
+from .websocket import register_websocket_transport
+
+logger = logging.getLogger(__name__)
+
+
+def install_extensions(mcp: FastMCP) -> FastMCP:
+    """
+    Register extension tools and middleware on the composed server.
+
+    Args:
+        mcp: The main (composed) FastMCP server
+
+    Returns:
+        The same server, for chaining
+    """
+    register_composite_tool(mcp)
+    register_bulk_tools(mcp)
+    register_fhir_tools(mcp)
+    register_resource_cache_tools(mcp)
+    register_search_cache_tools(mcp)
+    register_capability_tools(mcp)
+    register_oauth_aggregate_tools(mcp)
+    register_metrics_tool(mcp)
+    # Middleware added first runs outermost: request logging times whole
+    # requests, the audit log sees every call (denied ones included), the
+    # API-client middleware added later by main() is moved in right here
+    # (install_fast_path) so authorization sees the validated token,
+    # authorization guards everything below it, timeouts bound the rest
+    # (queueing included), the AIMD limit samples service time inside the
+    # scheduler, paging must see projected results, and delta sync diffs
+    # projected items so deltas respect `fields`
+    register_request_logging(mcp)
+    register_audit_log(mcp)
+    register_scope_authorization(mcp)
+    register_tool_timeouts(mcp)
+    scheduling = register_priority_scheduling(mcp)
+    register_adaptive_concurrency(mcp, scheduling.scheduler, classify=scheduling.tool_class)
+    register_paging(mcp)
+    mcp.add_middleware(DeltaSyncMiddleware())
+    mcp.add_middleware(FieldProjectionMiddleware())
+    register_directory_tools(mcp)
+    registry = register_session_tracking(mcp)
+    register_broadcast(mcp, registry=registry)
+    register_websocket_transport(mcp)
+    install_fast_path(mcp)
+    # Last, so the tools registered above are compiled too
+    register_compiled_validation(mcp)
+    logger.info("Installed proxy_smart_mcp extensions on %s", mcp.name)
+    return mcp
@@ -0,0 +1,217 @@
+"""
+Fast path for MCP methods that never reach the backend.
+
+The generated ``ApiClientContextMiddleware`` runs on every request: it
+validates the bearer token and eagerly builds an OpenAPI ``ApiClient`` via
+``_build_http_client``, even for ``initialize`` (and, on FastMCP versions that
+route them through middleware, ``ping`` and ``notifications/*``), which
+never call the backend.
+
+``install_fast_path`` wraps that middleware (already registered or added
+later by the generated ``main()``) in ``FastPathMiddleware``:
+
+- fast-path methods bypass it entirely; ``initialize`` only when
+  ``MCP_FAST_PATH_INITIALIZE`` is enabled (off by default, so the token sent
+  with ``initialize`` is validated as before); on a connection authenticated
+  at upgrade (see below) ``initialize`` always bypasses it
+- for all other requests token validation is unchanged, but the API client
+  stored in ``api_client`` is a ``LazyApiClient`` built on first use, so
+  requests served by extension tools, caches or listings never build one
+
+Long-lived transports (WebSocket) validate the token once per connection and
+set ``current_connection``; requests on that connection then reuse its
+validated ``AccessToken`` and a single API client instead of validating and
+building per request.
+
+The wrapped middleware is also moved ahead of the first middleware marked
+``needs_access_token`` (scope authorization, session tracking), so those
+read the ``access_token`` it stores instead of running before it: the
+generated ``main()`` adds it after ``install_extensions``, which would make
+it the innermost middleware.
+
+The wrapper replaces the middleware's ``_build_http_client`` and ``_validate``
+methods. It recognizes the middleware by class name and raises at install
+time if either method is missing, rather than silently leaving it unwrapped.
+"""
+
+import logging
+import os
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+logger = logging.getLogger(__name__)
+
+FAST_PATH_INITIALIZE = os.getenv("MCP_FAST_PATH_INITIALIZE", "false").lower() not in ("0", "false", "no")
+
+FAST_PATH_METHODS = frozenset({"ping"})
+
+API_CLIENT_MIDDLEWARE = "ApiClientContextMiddleware"
+# Methods of the generated middleware the fast path replaces
+WRAPPED_METHODS = ("_build_http_client", "_validate")
+
+
+def is_fast_path(method: Optional[str], allow_initialize: bool = FAST_PATH_INITIALIZE) -> bool:
+    """True for MCP methods that never touch the backend."""
+    if not method:
+        return False
+    if method in FAST_PATH_METHODS or method.startswith("notifications/"):
+        return True
+    return allow_initialize and method == "initialize"
+
+
+class LazyApiClient:
+    """
+    Stand-in for the OpenAPI ``ApiClient`` that builds it on first use.
+
+    Attribute access (``configuration``, ``call_api``, ...) and the context
+    manager protocol are forwarded to the real client. Copies share it:
+    FastMCP deep-copies the request state into nested contexts (tools of
+    mounted servers), and one request must not build two clients.
+    """
+
+    __slots__ = ("_factory", "_client")
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client = None
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def resolve(self) -> Any:
+        if self._client is None:
+            self._client = self._factory()
+            self._factory = None
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__") or name in self.__slots__:
+            # Protocol lookups (copy, pickle) and unset slots are not forwarded
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __copy__(self) -> "LazyApiClient":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "LazyApiClient":
+        return self
+
+    def __enter__(self) -> Any:
+        return self.resolve().__enter__()
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return self.resolve().__exit__(*exc_info)
+
+
+class ConnectionScope:
+    """Identity and API client shared by all requests of one connection."""
+
+    __slots__ = ("token", "access_token", "_api_client")
+
+    def __init__(self, token: Optional[str], access_token: Any = None):
+        self.token = token
+        self.access_token = access_token
+        self._api_client: Optional[LazyApiClient] = None
+
+    def api_client(self, factory: Callable[[], Any]) -> LazyApiClient:
+        """The connection's API client, built by ``factory`` on first use."""
+        if self._api_client is None:
+            self._api_client = LazyApiClient(factory)
+        return self._api_client
+
+    def close(self) -> None:
+        client, self._api_client = self._api_client, None
+        if client is not None and client.built:
+            close = getattr(client.resolve(), "close", None)
+            if callable(close):
+                close()
+
+
+current_connection: ContextVar[Optional[ConnectionScope]] = ContextVar("current_connection", default=None)
+
+
+def is_api_client_middleware(middleware: Any) -> bool:
+    """True for the generated ApiClientContextMiddleware."""
+    return type(middleware).__name__ == API_CLIENT_MIDDLEWARE
+
+
+class FastPathMiddleware(Middleware):
+    """
+    Skip the wrapped API-client middleware for fast-path methods.
+
+    Raises:
+        TypeError: If the middleware lacks a method the fast path replaces
+    """
+
+    def __init__(self, inner: Any, allow_initialize: bool = FAST_PATH_INITIALIZE):
+        missing = [name for name in WRAPPED_METHODS if not callable(getattr(inner, name, None))]
+        if missing:
+            raise TypeError(
+                f"{type(inner).__name__} has no {', '.join(missing)}; the generated "
+                f"{API_CLIENT_MIDDLEWARE} changed and the fast path must be updated"
+            )
+        self.inner = inner
+        self.allow_initialize = allow_initialize
+        self.fast_path_hits = 0
+        build = inner._build_http_client
+        validate = inner._validate
+
+        def build_lazy(context: MiddlewareContext) -> LazyApiClient:
+            connection = current_connection.get()
+            if connection is not None:
+                return connection.api_client(lambda: build(context))
+            return LazyApiClient(lambda: build(context))
+
+        async def validate_once(token: str) -> Any:
+            connection = current_connection.get()
+            if connection is not None and connection.access_token is not None and connection.token == token:
+                return connection.access_token
+            return await validate(token)
+
+        inner._build_http_client = build_lazy
+        inner._validate = validate_once
+
+    async def __call__(self, context: MiddlewareContext, call_next):
+        allow_initialize = self.allow_initialize or current_connection.get() is not None
+        if is_fast_path(context.method, allow_initialize):
+            self.fast_path_hits += 1
+            return await call_next(context)
+        return await self.inner(context, call_next)
+
+
+def _wrap(middleware: Any) -> Any:
+    if isinstance(middleware, FastPathMiddleware) or not is_api_client_middleware(middleware):
+        return middleware
+    return FastPathMiddleware(middleware)
+
+
+def _place(middlewares: List[Any], api_client: FastPathMiddleware) -> None:
+    """Insert the API-client middleware before the first one that needs its token."""
+    for index, middleware in enumerate(middlewares):
+        if getattr(middleware, "needs_access_token", False):
+            middlewares.insert(index, api_client)
+            return
+    middlewares.append(api_client)
+
+
+def install_fast_path(mcp: FastMCP) -> None:
+    """Wrap registered and future API-client middleware in FastPathMiddleware."""
+    wrapped = [_wrap(middleware) for middleware in mcp.middleware]
+    mcp.middleware[:] = [middleware for middleware in wrapped if not isinstance(middleware, FastPathMiddleware)]
+    for middleware in wrapped:
+        if isinstance(middleware, FastPathMiddleware):
+            _place(mcp.middleware, middleware)
+    add_middleware = mcp.add_middleware
+
+    def add_wrapped(middleware: Middleware) -> None:
+        middleware = _wrap(middleware)
+        if isinstance(middleware, FastPathMiddleware):
+            _place(mcp.middleware, middleware)
+        else:
+            add_middleware(middleware)
+
+    mcp.add_middleware = add_wrapped
@@ -0,0 +1,348 @@
+"""
+Hand-written FHIR tools on top of the backend's FHIR proxy.
+
+The generated ``servers.fhir_server`` tools return each search Bundle as one
+fully decoded document. For large searches this module streams instead:
+``BundleStreamParser`` pulls ``Bundle.entry`` items out of the response body
+as it arrives, ``iter_bundle_entries`` follows ``Bundle.link[next]`` lazily
+up to a caller-specified limit, and the ``stream_fhir_search`` tool forwards
+entries to the client in chunks (log notifications, i.e. SSE events on the
+HTTP transport) with progress notifications. Peak memory is bounded by one
+entry plus one chunk, independent of the search size.
+"""
+
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+import httpx
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from .backend import BackendError, backend_stream, get_backend_client
+
+logger = logging.getLogger(__name__)
+
+# Backend route prefix of the FHIR proxy (backend config.name)
+FHIR_PROXY_NAME = os.getenv("FHIR_PROXY_NAME", "proxy-smart-backend")
+
+DEFAULT_STREAM_LIMIT = 1000
+MAX_STREAM_LIMIT = 100_000
+DEFAULT_CHUNK_SIZE = 50
+DEFAULT_MAX_PAGES = 100
+FHIR_JSON = "application/fhir+json"
+
+STREAM_LOGGER_NAME = "fhir.bundle"
+
+
+def fhir_path(server_name: str, fhir_version: str, *parts: str) -> str:
+    """
+    Build a backend path for the FHIR proxy.
+
+    Args:
+        server_name: Configured FHIR server name
+        fhir_version: FHIR version segment (e.g. "R4")
+        *parts: Path segments below the FHIR base (resource type, id, ...)
+
+    Returns:
+        Path relative to BACKEND_API_URL
+    """
+    segments = [FHIR_PROXY_NAME, server_name, fhir_version, *parts]
+    return "/" + "/".join(quote(str(segment), safe="$_-.") for segment in segments)
+
+
+_ENVELOPE, _ELEMENT, _SKIP = 0, 1, 2
+
+
+class BundleStreamParser:
+    """
+    Incremental parser that extracts ``entry`` items from a Bundle.
+
+    Feed it decoded text chunks; each call returns the entries completed in
+    that chunk. Everything outside the entry array (type, total, link, ...)
+    is retained and available from ``envelope()`` once the body is done.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._in_entries = False
+        self._element_open = False
+        self._element: List[str] = []
+        self._envelope: List[str] = []
+        self._mode = _ENVELOPE
+
+    def _region(self) -> int:
+        if self._element_open:
+            return _ELEMENT
+        return _SKIP if self._in_entries else _ENVELOPE
+
+    def _flush(self, text: str, start: int, end: int) -> None:
+        if end <= start:
+            return
+        if self._mode == _ENVELOPE:
+            self._envelope.append(text[start:end])
+        elif self._mode == _ELEMENT:
+            self._element.append(text[start:end])
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of the body and return the entries it completed."""
+        entries: List[Dict[str, Any]] = []
+        start = 0
+
+        for index, char in enumerate(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_string = "".join(self._key_chars)
+                        self._key_chars = None
+                    continue
+                if self._key_chars is not None:
+                    self._key_chars.append(char)
+                continue
+
+            mode = self._region()
+            completed = False
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and not self._in_entries:
+                    self._key_chars = []
+            elif char in "{[":
+                if self._in_entries and self._depth == 2 and not self._element_open:
+                    self._element_open = True
+                    mode = _ELEMENT
+                elif self._depth == 1 and char == "[" and self._key == "entry":
+                    self._in_entries = True
+                    mode = _ENVELOPE
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._element_open and self._depth == 2:
+                    completed = True
+                elif self._in_entries and self._depth == 1:
+                    self._in_entries = False
+                    mode = _ENVELOPE
+            elif char == ":" and self._depth == 1 and not self._in_entries:
+                self._key = self._last_string
+
+            if mode != self._mode:
+                self._flush(text, start, index)
+                self._mode = mode
+                start = index
+
+            if completed:
+                self._flush(text, start, index + 1)
+                start = index + 1
+                self._element_open = False
+                self._mode = _SKIP
+                entries.append(json.loads("".join(self._element)))
+                self._element = []
+
+        self._flush(text, start, len(text))
+        return entries
+
+    def envelope(self) -> Dict[str, Any]:
+        """Return the Bundle without its entries (valid once the body is complete)."""
+        text = "".join(self._envelope).strip()
+        if not text:
+            raise ValueError("Empty FHIR response")
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("FHIR response is not a JSON object")
+        return data
+
+
+def next_link(bundle: Dict[str, Any]) -> Optional[str]:
+    """Return the ``Bundle.link`` URL with relation ``next``, if any."""
+    for link in bundle.get("link") or []:
+        if isinstance(link, dict) and link.get("relation") == "next" and link.get("url"):
+            return link["url"]
+    return None
+
+
+def _same_origin(url: str, base: httpx.URL) -> bool:
+    parts = urlsplit(url)
+    if not parts.scheme:
+        return True
+    return (parts.scheme, parts.netloc) == (base.scheme, base.netloc.decode())
+
+
+class BundleStream:
+    """
+    Lazily iterate the entries of a FHIR search across pages.
+
+    After iteration, ``pages``, ``total`` (from the first Bundle) and
+    ``next_url`` (set when the limit stopped iteration early) describe what
+    was read. A next link to another origin is never followed (the caller's
+    token would go with it); it is kept in ``unfollowed_next`` so the result
+    does not look complete.
+    """
+
+    def __init__(
+        self,
+        ctx: Optional[Context],
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        *,
+        limit: int = DEFAULT_STREAM_LIMIT,
+        follow_next: bool = True,
+        max_pages: int = DEFAULT_MAX_PAGES,
+    ):
+        self.ctx = ctx
+        self.path = path
+        self.params = params
+        self.limit = limit
+        self.follow_next = follow_next
+        self.max_pages = max_pages
+        self.pages = 0
+        self.total: Optional[int] = None
+        self.next_url: Optional[str] = None
+        self.unfollowed_next: Optional[str] = None
+
+    @property
+    def truncated(self) -> bool:
+        """True if the search has entries that were not read."""
+        return self.next_url is not None or self.unfollowed_next is not None
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        url: Optional[str] = self.path
+        params = self.params
+        yielded = 0
+        base = get_backend_client().base_url
+
+        while url is not None and yielded < self.limit:
+            parser = BundleStreamParser()
+            try:
+                async with backend_stream(
+                    self.ctx, "GET", url, params=params, headers={"Accept": FHIR_JSON}
+                ) as response:
+                    async for text in response.aiter_text():
+                        for entry in parser.feed(text):
+                            if yielded < self.limit:
+                                yielded += 1
+                                yield entry
+            except httpx.HTTPError as exc:
+                raise BackendError(f"GET {url} failed while streaming: {exc}") from exc
+
+            bundle = parser.envelope()
+            if bundle.get("resourceType") == "OperationOutcome":
+                raise BackendError(f"FHIR server returned OperationOutcome: {bundle.get('issue')}")
+            self.pages += 1
+            if self.total is None:
+                self.total = bundle.get("total")
+
+            url = next_link(bundle)
+            params = None  # the next link carries the full query
+            if url and not _same_origin(url, base):
+                logger.warning("Not following Bundle next link to foreign origin: %s", url)
+                self.unfollowed_next = url
+                url = None
+
+            if url and (not self.follow_next or self.pages >= self.max_pages or yielded >= self.limit):
+                self.next_url = url
+                break
+
+    async def collect(self) -> List[Dict[str, Any]]:
+        return [entry async for entry in self]
+
+
+def iter_bundle_entries(
+    ctx: Optional[Context],
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    **kwargs: Any,
+) -> BundleStream:
+    """Shorthand for ``BundleStream(ctx, path, params, **kwargs)``."""
+    return BundleStream(ctx, path, params, **kwargs)
+
+
+def register_fhir_tools(mcp: FastMCP) -> None:
+    """Register the streaming FHIR tools."""
+
+    async def stream_fhir_search(
+        server_name: str,
+        fhir_version: str,
+        resource_type: str,
+        ctx: Context,
+        search_params: Optional[Dict[str, Any]] = None,
+        limit: int = DEFAULT_STREAM_LIMIT,
+        follow_next: bool = True,
+        emit_entries: bool = True,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Dict[str, Any]:
+        if not 1 <= limit <= MAX_STREAM_LIMIT:
+            raise ToolError(f"'limit' must be between 1 and {MAX_STREAM_LIMIT}")
+        chunk_size = max(1, chunk_size)
+
+        stream = iter_bundle_entries(
+            ctx,
+            fhir_path(server_name, fhir_version, resource_type),
+            search_params,
+            limit=limit,
+            follow_next=follow_next,
+        )
+        collected: List[Dict[str, Any]] = []
+        chunk: List[Dict[str, Any]] = []
+        count = 0
+
+        async def emit() -> None:
+            await ctx.log(
+                f"{resource_type} entries {count - len(chunk) + 1}-{count}",
+                level="info",
+                logger_name=STREAM_LOGGER_NAME,
+                extra={"entries": chunk},
+            )
+            await ctx.report_progress(count, limit, f"{count} {resource_type} entries streamed")
+
+        try:
+            async for entry in stream:
+                count += 1
+                if emit_entries:
+                    chunk.append(entry)
+                    if len(chunk) >= chunk_size:
+                        await emit()
+                        chunk = []
+                else:
+                    collected.append(entry)
+            if emit_entries and chunk:
+                await emit()
+        except (BackendError, ValueError) as exc:
+            raise ToolError(str(exc)) from exc
+
+        summary: Dict[str, Any] = {
+            "resource_type": resource_type,
+            "streamed": count,
+            "pages": stream.pages,
+            "total": stream.total,
+            "next_url": stream.next_url,
+            "unfollowed_next": stream.unfollowed_next,
+            "truncated": stream.truncated,
+        }
+        if not emit_entries:
+            summary["entries"] = collected
+        return summary
+
+    mcp.tool(
+        stream_fhir_search,
+        name="stream_fhir_search",
+        description=(
+            "Run a FHIR search through the proxy and stream the matching entries. "
+            "Entries are sent as log notifications (logger 'fhir.bundle', chunk_size entries each) "
+            "with progress updates; Bundle next links are followed lazily until 'limit' entries. "
+            "'truncated' is true when more entries exist: 'next_url' continues the search, "
+            "'unfollowed_next' is a next link to another origin that was not followed. "
+            "Set emit_entries=false to receive the entries in the result instead."
+        ),
+    )
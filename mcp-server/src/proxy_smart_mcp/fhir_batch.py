@@ -0,0 +1,254 @@
+"""
+Micro-batching of concurrent FHIR reads.
+
+When an agent reads many resources in parallel (50 Patients by id), each
+read would be its own HTTP request through the proxy. ``FhirReadBatcher``
+holds reads for the same caller and FHIR server for a short window and sends
+them as one FHIR ``batch`` Bundle, then splits the ``batch-response`` entries
+back out to the waiting callers. A window with a single read is sent as a
+plain GET. Conditional reads carry their validator as
+``entry.request.ifNoneMatch`` so cache revalidation still works.
+
+The proxy checks consent against the resource path of each request URL; a
+batch is POSTed to the FHIR base path, so per-resource consent checks do not
+apply to the reads inside it. The shared resource cache therefore only
+batches when ``FHIR_BATCH_READS`` is enabled, which is safe only while the
+proxy does not enforce consent (``CONSENT_MODE`` disabled).
+``batch_reads_enabled`` guards that at runtime: batching also needs the
+explicit acknowledgement ``FHIR_BATCH_READS_ALLOW_WITHOUT_CONSENT=true``, and
+is refused whenever ``CONSENT_MODE`` (shared with the backend) is
+``enforce`` or ``audit-only``.
+
+The batch request runs under the earliest deadline of the coalesced callers.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set, Tuple
+
+from fastmcp import Context
+
+from .backend import BackendError, backend_request, caller_fingerprint, get_caller_token, request_deadline
+from .fhir import FHIR_JSON, fhir_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WINDOW = float(os.getenv("FHIR_BATCH_WINDOW_MS", "5")) / 1000
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("FHIR_BATCH_MAX_SIZE", "50"))
+BATCH_READS = os.getenv("FHIR_BATCH_READS", "false").lower() not in ("0", "false", "no")
+BATCH_READS_ALLOW_WITHOUT_CONSENT = os.getenv("FHIR_BATCH_READS_ALLOW_WITHOUT_CONSENT", "false").lower() == "true"
+CONSENT_MODE = os.getenv("CONSENT_MODE", "disabled").lower()
+
+ReadKey = Tuple[str, str, Optional[str]]
+
+
+@dataclass
+class FhirReadResult:
+    """Outcome of one read: HTTP status, resource (None on 304) and validator."""
+
+    status: int
+    resource: Any = None
+    etag: Optional[str] = None
+
+
+@dataclass
+class _PendingBatch:
+    token: Optional[str]
+    reads: Dict[ReadKey, asyncio.Future] = field(default_factory=dict)
+    timer: Optional[asyncio.TimerHandle] = None
+    deadline: Optional[float] = None
+
+    def add_deadline(self, deadline: Optional[float]) -> None:
+        if deadline is not None and (self.deadline is None or deadline < self.deadline):
+            self.deadline = deadline
+
+
+def _parse_status(status: Any) -> int:
+    try:
+        return int(str(status).split(" ", 1)[0])
+    except ValueError:
+        return 500
+
+
+class FhirReadBatcher:
+    """
+    Coalesce concurrent reads per (caller, FHIR server) into batch Bundles.
+
+    Args:
+        window: Seconds to wait for more reads after the first one arrives
+        max_batch_size: Flush immediately once this many distinct reads are queued
+    """
+
+    def __init__(self, window: float = DEFAULT_BATCH_WINDOW, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches_sent = 0
+        self.batched_reads = 0
+        self.direct_reads = 0
+        self._pending: Dict[Tuple[str, str, str], _PendingBatch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def read(
+        self,
+        ctx: Optional[Context],
+        server_name: str,
+        fhir_version: str,
+        resource_type: str,
+        resource_id: str,
+        if_none_match: Optional[str] = None,
+    ) -> FhirReadResult:
+        """
+        Queue a read and wait for its result.
+
+        Raises:
+            BackendError: If the read (or the whole batch) fails
+        """
+        loop = asyncio.get_running_loop()
+        key = (caller_fingerprint(ctx), server_name, fhir_version)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _PendingBatch(token=get_caller_token(ctx))
+            batch.timer = loop.call_later(self.window, self._start_flush, key)
+            self._pending[key] = batch
+
+        batch.add_deadline(request_deadline.get())
+
+        read_key = (resource_type, resource_id, if_none_match)
+        future = batch.reads.get(read_key)
+        if future is None:
+            future = loop.create_future()
+            batch.reads[read_key] = future
+
+        if len(batch.reads) >= self.max_batch_size:
+            batch.timer.cancel()
+            self._start_flush(key)
+
+        return await asyncio.shield(future)
+
+    def _start_flush(self, key: Tuple[str, str, str]) -> None:
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._flush(key[1], key[2], batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, server_name: str, fhir_version: str, batch: _PendingBatch) -> None:
+        # The batch serves several callers: use the earliest of their deadlines
+        request_deadline.set(batch.deadline)
+        headers = {"Accept": FHIR_JSON}
+        if batch.token:
+            headers["Authorization"] = f"Bearer {batch.token}"
+        try:
+            if len(batch.reads) == 1:
+                await self._read_one(server_name, fhir_version, batch, headers)
+            else:
+                await self._read_batch(server_name, fhir_version, batch, headers)
+        except Exception as exc:
+            for future in batch.reads.values():
+                if not future.done():
+                    future.set_exception(exc)
+                    future.exception()
+
+    async def _read_one(self, server_name: str, fhir_version: str, batch: _PendingBatch,
+                        headers: Dict[str, str]) -> None:
+        (resource_type, resource_id, if_none_match), future = next(iter(batch.reads.items()))
+        if if_none_match:
+            headers["If-None-Match"] = if_none_match
+        self.direct_reads += 1
+        response = await backend_request(
+            None, "GET", fhir_path(server_name, fhir_version, resource_type, resource_id), headers=headers
+        )
+        resource = None if response.status_code == 304 else response.json()
+        if not future.done():
+            future.set_result(FhirReadResult(response.status_code, resource, response.headers.get("ETag")))
+
+    async def _read_batch(self, server_name: str, fhir_version: str, batch: _PendingBatch,
+                          headers: Dict[str, str]) -> None:
+        read_keys = list(batch.reads)
+        entries = []
+        for resource_type, resource_id, if_none_match in read_keys:
+            request: Dict[str, Any] = {"method": "GET", "url": f"{resource_type}/{resource_id}"}
+            if if_none_match:
+                request["ifNoneMatch"] = if_none_match
+            entries.append({"request": request})
+
+        self.batches_sent += 1
+        self.batched_reads += len(read_keys)
+        response = await backend_request(
+            None,
+            "POST",
+            fhir_path(server_name, fhir_version),
+            json={"resourceType": "Bundle", "type": "batch", "entry": entries},
+            headers={**headers, "Content-Type": FHIR_JSON},
+        )
+        response_entries = (response.json() or {}).get("entry") or []
+        if len(response_entries) != len(read_keys):
+            raise BackendError(
+                f"Batch response has {len(response_entries)} entries for {len(read_keys)} reads"
+            )
+
+        for read_key, entry in zip(read_keys, response_entries):
+            future = batch.reads[read_key]
+            if future.done():
+                continue
+            entry_response = entry.get("response") or {}
+            status = _parse_status(entry_response.get("status", "200"))
+            if status >= 400:
+                outcome = entry_response.get("outcome") or entry.get("resource")
+                future.set_exception(BackendError(
+                    f"GET {read_key[0]}/{read_key[1]} returned {status}: {outcome}", status_code=status
+                ))
+                future.exception()
+            else:
+                future.set_result(FhirReadResult(status, entry.get("resource"), entry_response.get("etag")))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches_sent": self.batches_sent,
+            "batched_reads": self.batched_reads,
+            "direct_reads": self.direct_reads,
+            "pending": sum(len(batch.reads) for batch in self._pending.values()),
+        }
+
+
+def batch_reads_enabled(
+    requested: bool = BATCH_READS,
+    acknowledged: bool = BATCH_READS_ALLOW_WITHOUT_CONSENT,
+    consent_mode: str = CONSENT_MODE,
+) -> bool:
+    """
+    Whether the shared resource cache may batch reads.
+
+    Batched reads bypass the proxy's per-resource consent checks, so
+    ``FHIR_BATCH_READS`` alone is not enough: the operator must acknowledge
+    that with ``FHIR_BATCH_READS_ALLOW_WITHOUT_CONSENT``, and batching is
+    refused while consent is enforced or audited.
+    """
+    if not requested:
+        return False
+    if consent_mode not in ("", "disabled"):
+        logger.error(
+            "FHIR_BATCH_READS ignored: CONSENT_MODE=%s needs per-resource consent checks", consent_mode
+        )
+        return False
+    if not acknowledged:
+        logger.error(
+            "FHIR_BATCH_READS ignored: batched reads bypass consent checks; "
+            "set FHIR_BATCH_READS_ALLOW_WITHOUT_CONSENT=true to confirm consent is not enforced"
+        )
+        return False
+    return True
+
+
+_read_batcher: Optional[FhirReadBatcher] = None
+
+
+def get_read_batcher() -> FhirReadBatcher:
+    """Return the process-wide FHIR read batcher."""
+    global _read_batcher
+    if _read_batcher is None:
+        _read_batcher = FhirReadBatcher()
+    return _read_batcher
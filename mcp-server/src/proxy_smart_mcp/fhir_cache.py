@@ -0,0 +1,179 @@
+"""
+ETag-aware cache for FHIR resource reads.
+
+Reads are keyed by caller, FHIR server, version, resource type and id. A
+cached resource is revalidated on every read with ``If-None-Match`` (the
+response ``ETag``, or a weak validator built from ``meta.versionId``), so an
+unchanged resource costs a 304 from the proxy instead of a full transfer.
+Entries are evicted by total size (LRU) and by TTL. With
+``FHIR_BATCH_READS`` enabled (and allowed by ``batch_reads_enabled``, see
+``fhir_batch``), the shared cache sends its reads through
+``FhirReadBatcher`` so concurrent reads share one request; otherwise every
+read is its own GET, so the proxy checks consent per resource.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import pydantic_core
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from .backend import BackendError, backend_request, caller_fingerprint
+from .cache import BoundedTTLCache
+from .fhir import FHIR_JSON, fhir_path
+from .fhir_batch import FhirReadBatcher, FhirReadResult, batch_reads_enabled, get_read_batcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESOURCE_TTL = float(os.getenv("FHIR_RESOURCE_CACHE_TTL", "600"))
+DEFAULT_RESOURCE_MAX_ENTRIES = 10_000
+DEFAULT_RESOURCE_MAX_BYTES = int(os.getenv("FHIR_RESOURCE_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+ResourceKey = Tuple[str, str, str, str, str]
+
+
+def resource_etag(response_etag: Optional[str], resource: Any) -> Optional[str]:
+    """Pick the validator for a resource: ETag header, else W/"<meta.versionId>"."""
+    if response_etag:
+        return response_etag
+    if isinstance(resource, dict):
+        version_id = (resource.get("meta") or {}).get("versionId")
+        if version_id:
+            return f'W/"{version_id}"'
+    return None
+
+
+class FhirResourceCache:
+    """Per-caller cache of FHIR resources with conditional revalidation."""
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_RESOURCE_TTL,
+        max_entries: int = DEFAULT_RESOURCE_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_RESOURCE_MAX_BYTES,
+        batcher: Optional[FhirReadBatcher] = None,
+    ):
+        self.cache = BoundedTTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        self.batcher = batcher
+        self.revalidated = 0
+
+    @staticmethod
+    def key(ctx: Optional[Context], server_name: str, fhir_version: str,
+            resource_type: str, resource_id: str) -> ResourceKey:
+        return (caller_fingerprint(ctx), server_name, fhir_version, resource_type, resource_id)
+
+    async def read(
+        self,
+        ctx: Optional[Context],
+        server_name: str,
+        fhir_version: str,
+        resource_type: str,
+        resource_id: str,
+    ) -> Any:
+        """
+        Read a resource, revalidating any cached copy with If-None-Match.
+
+        Raises:
+            BackendError: If the proxy read fails
+        """
+        key = self.key(ctx, server_name, fhir_version, resource_type, resource_id)
+        entry = self.cache.get(key)
+        if_none_match = entry.etag if entry is not None else None
+
+        if self.batcher is not None:
+            result = await self.batcher.read(
+                ctx, server_name, fhir_version, resource_type, resource_id, if_none_match
+            )
+            size = None
+        else:
+            result, size = await self._read_direct(
+                ctx, server_name, fhir_version, resource_type, resource_id, if_none_match
+            )
+
+        if result.status == 304 and entry is not None:
+            self.revalidated += 1
+            self.cache.touch(key)
+            return entry.value
+
+        resource = result.resource
+        etag = resource_etag(result.etag, resource)
+        if etag:
+            if size is None:
+                size = len(pydantic_core.to_json(resource))
+            self.cache.put(key, resource, size, etag=etag)
+        else:
+            self.cache.invalidate(key)
+        return resource
+
+    @staticmethod
+    async def _read_direct(
+        ctx: Optional[Context],
+        server_name: str,
+        fhir_version: str,
+        resource_type: str,
+        resource_id: str,
+        if_none_match: Optional[str],
+    ) -> Tuple[FhirReadResult, int]:
+        headers = {"Accept": FHIR_JSON}
+        if if_none_match:
+            headers["If-None-Match"] = if_none_match
+        response = await backend_request(
+            ctx, "GET", fhir_path(server_name, fhir_version, resource_type, resource_id), headers=headers
+        )
+        resource = None if response.status_code == 304 else response.json()
+        return FhirReadResult(response.status_code, resource, response.headers.get("ETag")), len(response.content)
+
+    def invalidate(self, server_name: str, fhir_version: str, resource_type: str, resource_id: str) -> int:
+        """Drop a resource for every caller (e.g. after an update or delete)."""
+        return self.cache.invalidate_where(
+            lambda key: key[1:] == (server_name, fhir_version, resource_type, resource_id)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats.as_dict(),
+            "revalidated": self.revalidated,
+            "entries": len(self.cache),
+            "bytes": self.cache.total_bytes,
+        }
+
+
+_resource_cache: Optional[FhirResourceCache] = None
+
+
+def get_resource_cache() -> FhirResourceCache:
+    """Return the process-wide FHIR resource cache."""
+    global _resource_cache
+    if _resource_cache is None:
+        _resource_cache = FhirResourceCache(batcher=get_read_batcher() if batch_reads_enabled() else None)
+    return _resource_cache
+
+
+def register_resource_cache_tools(mcp: FastMCP, cache: Optional[FhirResourceCache] = None) -> FhirResourceCache:
+    """Register the cached FHIR read tool."""
+    cache = cache or get_resource_cache()
+
+    async def read_fhir_resource(
+        server_name: str,
+        fhir_version: str,
+        resource_type: str,
+        resource_id: str,
+        ctx: Context,
+    ) -> Dict[str, Any]:
+        try:
+            resource = await cache.read(ctx, server_name, fhir_version, resource_type, resource_id)
+        except BackendError as exc:
+            raise ToolError(str(exc)) from exc
+        return {"result": resource}
+
+    mcp.tool(
+        read_fhir_resource,
+        name="read_fhir_resource",
+        description=(
+            "Read one FHIR resource (e.g. Patient/123) through the proxy. Repeated reads are "
+            "revalidated with If-None-Match and served from cache when unchanged."
+        ),
+    )
+    return cache
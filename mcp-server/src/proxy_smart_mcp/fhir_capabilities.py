@@ -0,0 +1,355 @@
+"""
+Per-FHIR-server cache of CapabilityStatement and SMART configuration.
+
+Both documents are large and almost static, yet tools that need to know
+whether a server supports a resource, interaction or search parameter would
+fetch ``/metadata`` and ``/.well-known/smart-configuration`` every time.
+``CapabilityCache`` fetches them once per server, refreshes them in the
+background and precomputes a ``CapabilityIndex`` so support checks are local
+set lookups. A failed refresh keeps serving the previous documents.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from .backend import BackendError, backend_json, request_deadline
+from .fhir import FHIR_JSON, fhir_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = float(os.getenv("FHIR_CAPABILITY_REFRESH_SECONDS", "900"))
+
+ServerKey = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class ResourceCapabilities:
+    """What a server supports for one resource type."""
+
+    interactions: FrozenSet[str]
+    search_params: FrozenSet[str]
+    operations: FrozenSet[str]
+    search_includes: FrozenSet[str] = frozenset()
+
+
+@dataclass
+class CapabilityIndex:
+    """Lookup tables precomputed from a CapabilityStatement and SMART config."""
+
+    fhir_version: Optional[str] = None
+    formats: FrozenSet[str] = frozenset()
+    resources: Dict[str, ResourceCapabilities] = field(default_factory=dict)
+    system_interactions: FrozenSet[str] = frozenset()
+    system_operations: FrozenSet[str] = frozenset()
+    smart_capabilities: FrozenSet[str] = frozenset()
+    smart_endpoints: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, capability: Optional[Dict[str, Any]], smart_config: Optional[Dict[str, Any]]) -> "CapabilityIndex":
+        """Index the server-mode ``rest`` entry and the SMART configuration."""
+        index = cls()
+        capability = capability or {}
+        index.fhir_version = capability.get("fhirVersion")
+        index.formats = frozenset(capability.get("format") or [])
+
+        for rest in capability.get("rest") or []:
+            if rest.get("mode", "server") != "server":
+                continue
+            index.system_interactions = frozenset(
+                item.get("code") for item in rest.get("interaction") or [] if item.get("code")
+            )
+            index.system_operations = frozenset(
+                item.get("name") for item in rest.get("operation") or [] if item.get("name")
+            )
+            for resource in rest.get("resource") or []:
+                resource_type = resource.get("type")
+                if not resource_type:
+                    continue
+                index.resources[resource_type] = ResourceCapabilities(
+                    interactions=frozenset(
+                        item.get("code") for item in resource.get("interaction") or [] if item.get("code")
+                    ),
+                    search_params=frozenset(
+                        item.get("name") for item in resource.get("searchParam") or [] if item.get("name")
+                    ),
+                    operations=frozenset(
+                        item.get("name") for item in resource.get("operation") or [] if item.get("name")
+                    ),
+                    search_includes=frozenset(resource.get("searchInclude") or []),
+                )
+
+        smart_config = smart_config or {}
+        index.smart_capabilities = frozenset(smart_config.get("capabilities") or [])
+        index.smart_endpoints = {
+            name: smart_config[name]
+            for name in ("authorization_endpoint", "token_endpoint", "introspection_endpoint",
+                         "revocation_endpoint", "management_endpoint")
+            if smart_config.get(name)
+        }
+        return index
+
+    def supports(
+        self,
+        resource_type: Optional[str] = None,
+        interaction: Optional[str] = None,
+        search_param: Optional[str] = None,
+        operation: Optional[str] = None,
+    ) -> bool:
+        """
+        Check support locally.
+
+        Without a resource type, interaction and operation are checked at
+        system level. Search parameters ignore modifiers (``name:exact``).
+
+        Raises:
+            ValueError: If a search parameter is checked without a resource type
+        """
+        if resource_type is None:
+            if search_param:
+                raise ValueError("Search parameters are declared per resource type")
+            if interaction and interaction not in self.system_interactions:
+                return False
+            if operation and operation.lstrip("$") not in self.system_operations:
+                return False
+            return True
+
+        resource = self.resources.get(resource_type)
+        if resource is None:
+            return False
+        if interaction and interaction not in resource.interactions:
+            return False
+        if search_param and search_param.split(":", 1)[0] not in resource.search_params:
+            return False
+        if operation and operation.lstrip("$") not in resource.operations | self.system_operations:
+            return False
+        return True
+
+    def summary(self, resource_type: Optional[str] = None) -> Dict[str, Any]:
+        if resource_type is not None:
+            resource = self.resources.get(resource_type)
+            if resource is None:
+                return {"resource_type": resource_type, "supported": False}
+            return {
+                "resource_type": resource_type,
+                "supported": True,
+                "interactions": sorted(resource.interactions),
+                "search_params": sorted(resource.search_params),
+                "operations": sorted(resource.operations),
+                "search_includes": sorted(resource.search_includes),
+            }
+        return {
+            "fhir_version": self.fhir_version,
+            "formats": sorted(self.formats),
+            "resource_types": sorted(self.resources),
+            "system_interactions": sorted(self.system_interactions),
+            "system_operations": sorted(self.system_operations),
+            "smart_capabilities": sorted(self.smart_capabilities),
+            "smart_endpoints": self.smart_endpoints,
+        }
+
+
+@dataclass
+class FhirServerMetadata:
+    """Cached metadata documents of one FHIR server."""
+
+    server_name: str
+    fhir_version: str
+    capability: Optional[Dict[str, Any]]
+    smart_config: Optional[Dict[str, Any]]
+    index: CapabilityIndex
+    fetched_at: float
+
+
+class CapabilityCache:
+    """
+    Background-refreshed CapabilityStatement/SMART configuration cache.
+
+    Args:
+        refresh_interval: Seconds between background refreshes of known servers
+    """
+
+    def __init__(self, refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.refresh_failures = 0
+        self._servers: Dict[ServerKey, FhirServerMetadata] = {}
+        self._loading: Dict[ServerKey, asyncio.Future] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def __contains__(self, key: ServerKey) -> bool:
+        return key in self._servers
+
+    async def _fetch(self, ctx: Optional[Context], server_name: str, fhir_version: str) -> FhirServerMetadata:
+        capability_path = fhir_path(server_name, fhir_version, "metadata")
+        smart_path = fhir_path(server_name, fhir_version, ".well-known", "smart-configuration")
+        capability, smart_config = await asyncio.gather(
+            backend_json(ctx, "GET", capability_path, headers={"Accept": FHIR_JSON}),
+            backend_json(ctx, "GET", smart_path),
+            return_exceptions=True,
+        )
+        if isinstance(capability, BaseException):
+            raise capability
+        if isinstance(smart_config, BaseException):
+            # Servers without SMART still have a usable CapabilityStatement
+            logger.debug("No SMART configuration for %s/%s: %s", server_name, fhir_version, smart_config)
+            smart_config = None
+
+        return FhirServerMetadata(
+            server_name=server_name,
+            fhir_version=fhir_version,
+            capability=capability,
+            smart_config=smart_config,
+            index=CapabilityIndex.build(capability, smart_config),
+            fetched_at=time.time(),
+        )
+
+    async def get(
+        self,
+        ctx: Optional[Context],
+        server_name: str,
+        fhir_version: str,
+        *,
+        refresh: bool = False,
+    ) -> FhirServerMetadata:
+        """
+        Return cached metadata, fetching it on first use (single-flight).
+
+        Raises:
+            BackendError: If the CapabilityStatement cannot be fetched and
+                nothing is cached
+        """
+        key = (server_name, fhir_version)
+        self._ensure_refresh_task()
+        cached = self._servers.get(key)
+        if cached is not None and not refresh:
+            return cached
+
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._fetch(ctx, server_name, fhir_version))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        try:
+            metadata = await asyncio.shield(loading)
+        except BackendError:
+            if cached is not None:
+                self.refresh_failures += 1
+                return cached
+            raise
+        self._servers[key] = metadata
+        return metadata
+
+    async def get_index(self, ctx: Optional[Context], server_name: str, fhir_version: str) -> CapabilityIndex:
+        return (await self.get(ctx, server_name, fhir_version)).index
+
+    async def refresh_all(self) -> None:
+        """Refresh every known server, keeping stale documents on failure."""
+        for server_name, fhir_version in list(self._servers):
+            try:
+                await self.get(None, server_name, fhir_version, refresh=True)
+            except Exception as exc:
+                self.refresh_failures += 1
+                logger.warning("Capability refresh for %s/%s failed: %s", server_name, fhir_version, exc)
+
+    async def _refresh_loop(self) -> None:
+        # Background work is not bound by the deadline of the call that started it
+        request_deadline.set(None)
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh_all()
+
+    def _ensure_refresh_task(self) -> None:
+        if self.refresh_interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._refresh_task = loop.create_task(self._refresh_loop())
+
+    def stop(self) -> None:
+        """Cancel the background refresh task."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+
+_capability_cache: Optional[CapabilityCache] = None
+
+
+def get_capability_cache() -> CapabilityCache:
+    """Return the process-wide capability cache."""
+    global _capability_cache
+    if _capability_cache is None:
+        _capability_cache = CapabilityCache()
+    return _capability_cache
+
+
+def register_capability_tools(mcp: FastMCP, cache: Optional[CapabilityCache] = None) -> CapabilityCache:
+    """Register the capability lookup tools."""
+    cache = cache or get_capability_cache()
+
+    async def _index(ctx: Context, server_name: str, fhir_version: str, refresh: bool = False) -> CapabilityIndex:
+        try:
+            return (await cache.get(ctx, server_name, fhir_version, refresh=refresh)).index
+        except BackendError as exc:
+            raise ToolError(str(exc)) from exc
+
+    async def get_fhir_server_capabilities(
+        server_name: str,
+        fhir_version: str,
+        ctx: Context,
+        resource_type: Optional[str] = None,
+        refresh: bool = False,
+    ) -> Dict[str, Any]:
+        index = await _index(ctx, server_name, fhir_version, refresh)
+        return {"result": index.summary(resource_type)}
+
+    async def check_fhir_support(
+        server_name: str,
+        fhir_version: str,
+        ctx: Context,
+        resource_type: Optional[str] = None,
+        interactions: Optional[List[str]] = None,
+        search_params: Optional[List[str]] = None,
+        operation: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if search_params and resource_type is None:
+            raise ToolError("search_params requires resource_type")
+        index = await _index(ctx, server_name, fhir_version)
+        unsupported: Set[str] = set()
+        if resource_type is not None and resource_type not in index.resources:
+            unsupported.add(f"resource:{resource_type}")
+        for interaction in interactions or []:
+            if not index.supports(resource_type, interaction=interaction):
+                unsupported.add(f"interaction:{interaction}")
+        for search_param in search_params or []:
+            if not index.supports(resource_type, search_param=search_param):
+                unsupported.add(f"searchParam:{search_param}")
+        if operation and not index.supports(resource_type, operation=operation):
+            unsupported.add(f"operation:{operation}")
+        return {"supported": not unsupported, "unsupported": sorted(unsupported)}
+
+    mcp.tool(
+        get_fhir_server_capabilities,
+        name="get_fhir_server_capabilities",
+        description=(
+            "Summarize a FHIR server's capabilities (resource types, interactions, search "
+            "parameters, operations, SMART capabilities) from the cached CapabilityStatement. "
+            "Pass resource_type for one resource; refresh=true re-fetches the documents."
+        ),
+    )
+    mcp.tool(
+        check_fhir_support,
+        name="check_fhir_support",
+        description=(
+            "Check locally whether a FHIR server supports a resource type, interactions "
+            "(read, search-type, create, ...), search parameters (of resource_type) or an operation."
+        ),
+    )
+    return cache
@@ -0,0 +1,243 @@
+"""
+Short-lived cache for FHIR search results keyed by a canonical query.
+
+Agents issue near-identical searches that differ only in parameter order,
+whitespace or the case of case-insensitive string parameters. Searches are
+canonicalized (sorted keys and values, trimmed and normalized values, an
+explicit ``_count``) and the canonical query is what is sent upstream, so
+equivalent searches share one cache entry per caller. Entries live for a
+short TTL; identical concurrent searches are coalesced into one request.
+Hit rates are tracked per resource type.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from .backend import BackendError, backend_request, caller_fingerprint
+from .cache import BoundedTTLCache, CacheStats
+from .fhir import FHIR_JSON, fhir_path
+from .fhir_batch import get_read_batcher
+from .fhir_cache import get_resource_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_TTL = float(os.getenv("FHIR_SEARCH_CACHE_TTL", "30"))
+DEFAULT_SEARCH_COUNT = int(os.getenv("FHIR_SEARCH_DEFAULT_COUNT", "50"))
+DEFAULT_SEARCH_MAX_ENTRIES = 2_000
+DEFAULT_SEARCH_MAX_BYTES = int(os.getenv("FHIR_SEARCH_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# String search parameters FHIR matches case-insensitively (without modifiers)
+CASE_INSENSITIVE_PARAMS = frozenset({
+    "name", "family", "given", "phonetic",
+    "address", "address-city", "address-state", "address-country", "address-postalcode",
+})
+
+# Parameters whose comma-separated values are ordered (not an OR list)
+ORDERED_PARAMS = frozenset({"_sort", "_elements"})
+
+_WHITESPACE = re.compile(r"\s+")
+
+CanonicalQuery = Tuple[Tuple[str, str], ...]
+
+
+def _normalize_value(name: str, value: Any) -> str:
+    if isinstance(value, bool):
+        text = "true" if value else "false"
+    else:
+        text = _WHITESPACE.sub(" ", str(value)).strip()
+    # Comma-separated values are ORed; their order does not matter
+    if "," in text and "\\," not in text and name not in ORDERED_PARAMS:
+        text = ",".join(sorted(part.strip() for part in text.split(",")))
+    if name in CASE_INSENSITIVE_PARAMS:
+        text = text.lower()
+    return text
+
+
+def canonicalize_search(
+    params: Optional[Mapping[str, Any]],
+    default_count: int = DEFAULT_SEARCH_COUNT,
+) -> CanonicalQuery:
+    """
+    Canonicalize FHIR search parameters.
+
+    Args:
+        params: Search parameters; values may be scalars or lists (repeated = AND)
+        default_count: ``_count`` added when the caller gave none
+
+    Returns:
+        Sorted tuple of (name, value) pairs, suitable as a cache key and as
+        query parameters
+    """
+    pairs: List[Tuple[str, str]] = []
+    for raw_name, raw_value in (params or {}).items():
+        name = str(raw_name).strip()
+        if not name or raw_value is None:
+            continue
+        values = raw_value if isinstance(raw_value, (list, tuple)) else [raw_value]
+        for value in values:
+            normalized = _normalize_value(name, value)
+            if normalized:
+                pairs.append((name, normalized))
+
+    if not any(name == "_count" for name, _ in pairs) and default_count:
+        pairs.append(("_count", str(default_count)))
+    return tuple(sorted(pairs))
+
+
+class _LeaderCancelled(Exception):
+    """Set on a shared search when the request running it is cancelled."""
+
+
+class FhirSearchCache:
+    """Per-caller FHIR search cache with per-resource-type hit rates."""
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_SEARCH_TTL,
+        max_entries: int = DEFAULT_SEARCH_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_SEARCH_MAX_BYTES,
+        default_count: int = DEFAULT_SEARCH_COUNT,
+    ):
+        self.cache = BoundedTTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        self.default_count = default_count
+        self.by_type: Dict[str, CacheStats] = defaultdict(CacheStats)
+        self._in_flight: Dict[Any, asyncio.Future] = {}
+
+    async def search(
+        self,
+        ctx: Optional[Context],
+        server_name: str,
+        fhir_version: str,
+        resource_type: str,
+        params: Optional[Mapping[str, Any]] = None,
+        *,
+        use_cache: bool = True,
+    ) -> Any:
+        """
+        Run a search, serving equivalent recent searches from cache.
+
+        Raises:
+            BackendError: If the proxy search fails
+        """
+        query = canonicalize_search(params, self.default_count)
+        key = (caller_fingerprint(ctx), server_name, fhir_version, resource_type, query)
+        stats = self.by_type[resource_type]
+
+        if use_cache:
+            entry = self.cache.get(key)
+            if entry is not None:
+                stats.hits += 1
+                return entry.value
+            while (in_flight := self._in_flight.get(key)) is not None:
+                try:
+                    bundle = await asyncio.shield(in_flight)
+                except _LeaderCancelled:
+                    # The caller running the search went away; run it ourselves
+                    continue
+                stats.hits += 1
+                return bundle
+        stats.misses += 1
+
+        future = asyncio.get_running_loop().create_future()
+        if use_cache:
+            self._in_flight[key] = future
+        try:
+            response = await backend_request(
+                ctx,
+                "GET",
+                fhir_path(server_name, fhir_version, resource_type),
+                params=list(query),
+                headers={"Accept": FHIR_JSON},
+            )
+            bundle = response.json()
+            self.cache.put(key, bundle, len(response.content))
+            future.set_result(bundle)
+            return bundle
+        except asyncio.CancelledError:
+            # Waiters were not cancelled: hand the search to one of them
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody is waiting
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.cache),
+            "bytes": self.cache.total_bytes,
+            "evictions": self.cache.stats.evictions,
+            "by_resource_type": {
+                resource_type: {"hits": s.hits, "misses": s.misses, "hit_rate": round(s.hit_rate, 4)}
+                for resource_type, s in sorted(self.by_type.items())
+            },
+        }
+
+
+_search_cache: Optional[FhirSearchCache] = None
+
+
+def get_search_cache() -> FhirSearchCache:
+    """Return the process-wide FHIR search cache."""
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = FhirSearchCache()
+    return _search_cache
+
+
+def register_search_cache_tools(mcp: FastMCP, cache: Optional[FhirSearchCache] = None) -> FhirSearchCache:
+    """Register the cached FHIR search tool and the cache statistics tool."""
+    cache = cache or get_search_cache()
+
+    async def search_fhir_resources(
+        server_name: str,
+        fhir_version: str,
+        resource_type: str,
+        ctx: Context,
+        search_params: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        try:
+            bundle = await cache.search(
+                ctx, server_name, fhir_version, resource_type, search_params, use_cache=use_cache
+            )
+        except BackendError as exc:
+            raise ToolError(str(exc)) from exc
+        return {"result": bundle}
+
+    async def get_fhir_cache_stats() -> Dict[str, Any]:
+        return {
+            "search": cache.stats(),
+            "resources": get_resource_cache().stats(),
+            "read_batching": get_read_batcher().stats(),
+        }
+
+    mcp.tool(
+        search_fhir_resources,
+        name="search_fhir_resources",
+        description=(
+            "Search FHIR resources through the proxy (returns one Bundle page). Equivalent "
+            "searches by the same caller within a short window are served from cache; "
+            "set use_cache=false to force a fresh search."
+        ),
+    )
+    mcp.tool(
+        get_fhir_cache_stats,
+        name="get_fhir_cache_stats",
+        description=(
+            "Report FHIR search and resource cache statistics (including hit rates per "
+            "resource type) and read batching counters."
+        ),
+    )
+    return cache
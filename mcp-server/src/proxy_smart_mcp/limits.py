@@ -0,0 +1,225 @@
+"""
+Adaptive (AIMD) concurrency limit for backend-bound tool calls.
+
+A static concurrency cap is either too low (wasted throughput) or too high
+(the backend is overloaded during slowdowns). ``AIMDLimit`` adjusts the
+limit from observed calls, like Netflix's concurrency-limits ``AIMDLimit``:
+
+- a healthy sample (no overload error, latency under
+  ``MCP_AIMD_LATENCY_MS``) while at least half the limit is in use raises
+  the limit by one
+- an overload sample (timeout, 429, 5xx, transport error, or latency over
+  the threshold) multiplies it by ``backoff_ratio``, at most once per
+  observed round trip so one burst of failures counts as one signal
+
+``AdaptiveConcurrencyMiddleware`` samples tool calls (service time, not
+queue time) and applies the limit to the ``PriorityScheduler`` capacity, so
+the generated tools, whose synchronous backend client cannot be wrapped
+directly, are bounded by it too. Calls in the bulk priority class
+(``bulk_*``, ``stream_*``, analytics) are long by design and are judged
+against ``MCP_AIMD_BULK_LATENCY_MS`` instead. An ``execute_tool_plan`` call
+is not sampled itself; its steps are. The current limit is the
+``concurrency.limit`` gauge.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import mcp.types as mt
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .backend import BackendError, request_deadline
+from .composite import COMPOSITE_TOOL_NAME
+from .metrics import ServerMetrics, get_metrics
+from .scheduling import BULK, PriorityScheduler, class_by_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_LIMIT = int(os.getenv("MCP_AIMD_MIN_LIMIT", "1"))
+DEFAULT_MAX_LIMIT = int(os.getenv("MCP_AIMD_MAX_LIMIT", "256"))
+DEFAULT_LATENCY_THRESHOLD = float(os.getenv("MCP_AIMD_LATENCY_MS", "2000")) / 1000
+DEFAULT_BULK_LATENCY_THRESHOLD = float(os.getenv("MCP_AIMD_BULK_LATENCY_MS", "30000")) / 1000
+DEFAULT_BACKOFF_RATIO = 0.9
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """True if an exception (or its cause chain) signals backend overload."""
+    seen = 0
+    while exc is not None and seen < 8:
+        if isinstance(exc, (TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+            return True
+        if isinstance(exc, BackendError):
+            return exc.status_code is None or exc.status_code == 429 or exc.status_code >= 500
+        # Generated OpenAPI client errors carry the HTTP status as `status`
+        status = getattr(exc, "status", None)
+        if isinstance(status, int):
+            return status == 429 or status >= 500
+        exc = exc.__cause__ or exc.__context__
+        seen += 1
+    return False
+
+
+class AIMDLimit:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    Args:
+        initial_limit: Starting limit
+        min_limit: Lower bound
+        max_limit: Upper bound
+        backoff_ratio: Factor applied on overload (0.5 - 1.0)
+        latency_threshold: Seconds above which a sample counts as overload
+        on_change: Called with the new limit whenever it changes
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = DEFAULT_MIN_LIMIT,
+        max_limit: int = DEFAULT_MAX_LIMIT,
+        backoff_ratio: float = DEFAULT_BACKOFF_RATIO,
+        latency_threshold: float = DEFAULT_LATENCY_THRESHOLD,
+        on_change: Optional[Callable[[int], Any]] = None,
+    ):
+        if not 0.5 <= backoff_ratio < 1.0:
+            raise ValueError("backoff_ratio must be in [0.5, 1.0)")
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.backoff_ratio = backoff_ratio
+        self.latency_threshold = latency_threshold
+        self.on_change = on_change
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = -math.inf
+
+    def sample(
+        self,
+        rtt: float,
+        in_flight: int,
+        dropped: bool,
+        now: Optional[float] = None,
+        latency_threshold: Optional[float] = None,
+    ) -> int:
+        """
+        Feed one completed call; returns the (possibly updated) limit.
+
+        latency_threshold overrides the limit's threshold for this sample.
+        """
+        now = time.monotonic() if now is None else now
+        if latency_threshold is None:
+            latency_threshold = self.latency_threshold
+        new_limit = self.limit
+        if dropped or rtt > latency_threshold:
+            # One decrease per round trip: calls that were already in flight
+            # when we backed off report the same overload
+            if now - self._last_decrease >= rtt:
+                new_limit = max(self.min_limit, int(self.limit * self.backoff_ratio))
+                self._last_decrease = now
+                self.decreases += 1
+        elif in_flight * 2 >= self.limit:
+            new_limit = min(self.max_limit, self.limit + 1)
+            if new_limit != self.limit:
+                self.increases += 1
+
+        if new_limit != self.limit:
+            self.limit = new_limit
+            if self.on_change is not None:
+                self.on_change(new_limit)
+        return self.limit
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class AdaptiveConcurrencyMiddleware(Middleware):
+    """
+    Sample tool calls into an AIMDLimit that drives scheduler capacity.
+
+    Args:
+        scheduler: Scheduler whose capacity follows the limit
+        limit: AIMD limit (a new one starting at the scheduler capacity by default)
+        metrics: Metrics registry
+        classify: Async tool name -> priority class (the scheduling
+            middleware's ``tool_class``); name rules by default
+        bulk_latency_threshold: Latency threshold in seconds for bulk-class calls
+    """
+
+    def __init__(
+        self,
+        scheduler: PriorityScheduler,
+        limit: Optional[AIMDLimit] = None,
+        metrics: Optional[ServerMetrics] = None,
+        classify: Optional[Callable[[str], Awaitable[str]]] = None,
+        bulk_latency_threshold: float = DEFAULT_BULK_LATENCY_THRESHOLD,
+    ):
+        self.scheduler = scheduler
+        self.classify = classify
+        self.bulk_latency_threshold = bulk_latency_threshold
+        self.limit = limit or AIMDLimit(initial_limit=scheduler.capacity)
+        self.limit.on_change = self._apply
+        self.scheduler.capacity = self.limit.limit
+        self.in_flight = 0
+        self.metrics = metrics or get_metrics()
+        self.metrics.gauge("concurrency.limit", lambda: self.limit.limit)
+
+    def _apply(self, limit: int) -> None:
+        self.scheduler.capacity = limit
+
+    async def latency_threshold(self, name: str) -> Optional[float]:
+        """Threshold override for a tool, or None for the limit's own."""
+        tool_class = await self.classify(name) if self.classify is not None else class_by_name(name)
+        return self.bulk_latency_threshold if tool_class == BULK else None
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        if context.message.name == COMPOSITE_TOOL_NAME:
+            # Its steps come back through this middleware and are sampled each
+            return await call_next(context)
+        latency_threshold = await self.latency_threshold(context.message.name)
+        self.in_flight += 1
+        in_flight = self.in_flight
+        started = time.monotonic()
+        dropped = False
+        try:
+            return await call_next(context)
+        except asyncio.CancelledError:
+            deadline = request_deadline.get()
+            if deadline is not None and time.monotonic() >= deadline:
+                # Cancelled by the tool timeout: an overload signal
+                dropped = True
+            else:
+                # Client cancellations say nothing about backend health
+                started = None
+            raise
+        except Exception as exc:
+            dropped = is_overload_error(exc)
+            raise
+        finally:
+            self.in_flight -= 1
+            if started is not None:
+                self.limit.sample(
+                    time.monotonic() - started, in_flight, dropped, latency_threshold=latency_threshold,
+                )
+
+
+def register_adaptive_concurrency(
+    mcp: FastMCP,
+    scheduler: PriorityScheduler,
+    **kwargs: Any,
+) -> AdaptiveConcurrencyMiddleware:
+    """Drive the scheduler's capacity with an AIMD limit."""
+    middleware = AdaptiveConcurrencyMiddleware(scheduler, **kwargs)
+    mcp.add_middleware(middleware)
+    return middleware
@@ -0,0 +1,120 @@
+"""
+In-process metrics for the extension middleware.
+
+Counters and latency summaries keyed by metric name and an optional label
+(usually the tool name), e.g. ``tool.validation`` per tool, plus gauges read
+from a callback at snapshot time (queue depths, current limits). They are
+cheap to update on the request path and exposed through the
+``get_server_metrics`` tool.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastmcp import FastMCP
+
+MetricKey = Tuple[str, Optional[str]]
+
+
+class LatencyStat:
+    """Count, error count, total and maximum of observed durations."""
+
+    __slots__ = ("count", "errors", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "total_ms": round(self.total * 1000, 3),
+        }
+
+
+class ServerMetrics:
+    """Registry of counters and latency stats."""
+
+    def __init__(self) -> None:
+        self.counters: Dict[MetricKey, int] = {}
+        self.latencies: Dict[MetricKey, LatencyStat] = {}
+        self.gauges: Dict[str, Callable[[], Any]] = {}
+
+    def incr(self, name: str, label: Optional[str] = None, amount: int = 1) -> None:
+        key = (name, label)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, label: Optional[str], seconds: float, error: bool = False) -> None:
+        stat = self.latencies.get((name, label))
+        if stat is None:
+            stat = self.latencies[(name, label)] = LatencyStat()
+        stat.observe(seconds, error)
+
+    def gauge(self, name: str, read: Callable[[], Any]) -> None:
+        """Register a gauge whose value is read when a snapshot is taken."""
+        self.gauges[name] = read
+
+    def counter(self, name: str, label: Optional[str] = None) -> int:
+        return self.counters.get((name, label), 0)
+
+    def latency(self, name: str, label: Optional[str] = None) -> Optional[LatencyStat]:
+        return self.latencies.get((name, label))
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Nested ``{name: {label: value}}`` view; unlabeled values use ``"*"``."""
+        result: Dict[str, Dict[str, Any]] = {}
+        for (name, label), value in self.counters.items():
+            if prefix is None or name.startswith(prefix):
+                result.setdefault(name, {})[label or "*"] = value
+        for (name, label), stat in self.latencies.items():
+            if prefix is None or name.startswith(prefix):
+                result.setdefault(name, {})[label or "*"] = stat.as_dict()
+        for name, read in self.gauges.items():
+            if prefix is None or name.startswith(prefix):
+                result[name] = read()
+        return result
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.latencies.clear()
+
+
+_metrics: Optional[ServerMetrics] = None
+
+
+def get_metrics() -> ServerMetrics:
+    """Return the process-wide metrics registry."""
+    global _metrics
+    if _metrics is None:
+        _metrics = ServerMetrics()
+    return _metrics
+
+
+def register_metrics_tool(mcp: FastMCP, metrics: Optional[ServerMetrics] = None) -> ServerMetrics:
+    """Register the metrics snapshot tool."""
+    metrics = metrics or get_metrics()
+
+    async def get_server_metrics(prefix: Optional[str] = None) -> Dict[str, Any]:
+        return {"result": metrics.snapshot(prefix)}
+
+    mcp.tool(
+        get_server_metrics,
+        name="get_server_metrics",
+        description=(
+            "Server-side metrics of the MCP server (argument validation time, timeouts, "
+            "cancellations, scheduling) per tool. Optionally filter by metric name prefix."
+        ),
+    )
+    return metrics
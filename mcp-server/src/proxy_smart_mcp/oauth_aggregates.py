@@ -0,0 +1,539 @@
+"""
+Incremental OAuth monitoring aggregates.
+
+The generated ``oauth_monitoring`` tools re-fetch the backend's full
+analytics snapshot on every call. ``OAuthEventSubscriber`` instead follows
+the backend's OAuth event stream (``/monitoring/oauth/events/stream``, the
+SSE feed the UI uses), backfilling the window from ``/monitoring/oauth/events``
+on (re)connect, and feeds each event into ``OAuthAggregator``.
+
+The aggregator keeps time buckets over a rolling window plus running totals
+that are adjusted as events arrive and buckets expire: request counts, error
+counts and a fixed latency histogram, overall and per client. Rates, error
+ratios and latency percentiles are then computed in time independent of the
+number of events.
+
+The shared subscription runs on a dedicated service credential, never on a
+caller's token. With ``OAUTH_MONITORING_CLIENT_ID`` and
+``OAUTH_MONITORING_CLIENT_SECRET`` it obtains its access token with the client
+credentials grant (from ``OAUTH_MONITORING_TOKEN_URL``, or the token endpoint
+discovered for ``BACKEND_API_URL``) and refreshes it before it expires and
+whenever the backend answers 401; ``OAUTH_MONITORING_TOKEN`` is a static
+fallback that is re-read from the environment on 401. The tool result reports
+whether the stream is connected, how long it has been down and its last
+error, so callers can tell live aggregates from stale ones. Callers of the tool are
+authorized the way the ``/monitoring/oauth`` routes authorize them: their
+token must be accepted by ``/monitoring/oauth/events``. The check is cached
+per caller for ``OAUTH_MONITORING_AUTH_TTL`` seconds.
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from .backend import (
+    BACKEND_API_URL,
+    BackendError,
+    backend_json,
+    backend_stream,
+    caller_fingerprint,
+    get_backend_client,
+    get_caller_token,
+    request_deadline,
+)
+from .cache import BoundedTTLCache
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = "/monitoring/oauth/events"
+EVENTS_STREAM_PATH = "/monitoring/oauth/events/stream"
+
+DEFAULT_WINDOW_SECONDS = float(os.getenv("OAUTH_AGGREGATE_WINDOW_SECONDS", "3600"))
+DEFAULT_BUCKET_SECONDS = 10.0
+BACKFILL_LIMIT = 1000
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+DEFAULT_TOP_CLIENTS = 10
+
+SERVICE_TOKEN = os.getenv("OAUTH_MONITORING_TOKEN", "")
+SERVICE_CLIENT_ID = os.getenv("OAUTH_MONITORING_CLIENT_ID", "")
+SERVICE_CLIENT_SECRET = os.getenv("OAUTH_MONITORING_CLIENT_SECRET", "")
+SERVICE_TOKEN_URL = os.getenv("OAUTH_MONITORING_TOKEN_URL", "")
+# Service tokens are renewed this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 30.0
+AUTHORIZATION_TTL = float(os.getenv("OAUTH_MONITORING_AUTH_TTL", "60"))
+AUTHORIZATION_CACHE_SIZE = 1024
+# How long the first call waits for the subscription's backfill
+BACKFILL_WAIT_SECONDS = 5.0
+
+# Upper bounds (ms) of the latency histogram bins; the last bin is open-ended
+LATENCY_BOUNDS_MS = (
+    1, 2, 3, 5, 7, 10, 15, 20, 30, 50, 70, 100, 150, 200, 300, 500, 700,
+    1000, 1500, 2000, 3000, 5000, 7000, 10000, 15000, 30000, 60000,
+)
+_NUM_BINS = len(LATENCY_BOUNDS_MS) + 1
+
+# Stream control messages that are not OAuth events
+CONTROL_TYPES = frozenset({"connection", "keepalive"})
+
+
+@dataclass
+class _Counts:
+    count: int = 0
+    errors: int = 0
+    latency: List[int] = field(default_factory=lambda: [0] * _NUM_BINS)
+
+    def add(self, error: bool, bin_index: int, sign: int = 1) -> None:
+        self.count += sign
+        if error:
+            self.errors += sign
+        self.latency[bin_index] += sign
+
+    def merge(self, other: "_Counts", sign: int = 1) -> None:
+        self.count += sign * other.count
+        self.errors += sign * other.errors
+        for index, value in enumerate(other.latency):
+            self.latency[index] += sign * value
+
+
+@dataclass
+class _Bucket:
+    totals: _Counts = field(default_factory=_Counts)
+    clients: Dict[str, _Counts] = field(default_factory=dict)
+
+
+def latency_percentile(histogram: List[int], count: int, quantile: float) -> Optional[float]:
+    """Estimate a latency percentile (ms) from histogram counts by linear interpolation."""
+    if count <= 0:
+        return None
+    rank = quantile * count
+    seen = 0
+    for index, bin_count in enumerate(histogram):
+        if bin_count and seen + bin_count >= rank:
+            lower = LATENCY_BOUNDS_MS[index - 1] if index > 0 else 0
+            upper = LATENCY_BOUNDS_MS[index] if index < len(LATENCY_BOUNDS_MS) else lower * 2
+            fraction = (rank - seen) / bin_count
+            return round(lower + (upper - lower) * fraction, 1)
+        seen += bin_count
+    return float(LATENCY_BOUNDS_MS[-1])
+
+
+def _event_time(event: Dict[str, Any], now: float) -> float:
+    timestamp = event.get("timestamp")
+    if isinstance(timestamp, str):
+        try:
+            return min(now, datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+        except ValueError:
+            pass
+    return now
+
+
+class OAuthAggregator:
+    """
+    Rolling-window OAuth flow aggregates, updated per event.
+
+    Args:
+        window_seconds: Length of the rolling window
+        bucket_seconds: Time resolution of expiry
+    """
+
+    def __init__(self, window_seconds: float = DEFAULT_WINDOW_SECONDS, bucket_seconds: float = DEFAULT_BUCKET_SECONDS):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.events_seen = 0
+        self._buckets: Dict[int, _Bucket] = {}
+        self._totals = _Counts()
+        self._clients: Dict[str, _Counts] = {}
+        self._seen_ids: Dict[str, int] = {}
+        self._oldest_allowed = 0
+
+    def _expire(self, now: float) -> None:
+        oldest_allowed = int((now - self.window_seconds) // self.bucket_seconds) + 1
+        if oldest_allowed <= self._oldest_allowed:
+            return
+        self._oldest_allowed = oldest_allowed
+        for index in [index for index in self._buckets if index < oldest_allowed]:
+            bucket = self._buckets.pop(index)
+            self._totals.merge(bucket.totals, sign=-1)
+            for client_id, counts in bucket.clients.items():
+                client_totals = self._clients[client_id]
+                client_totals.merge(counts, sign=-1)
+                if client_totals.count <= 0:
+                    del self._clients[client_id]
+        self._seen_ids = {
+            event_id: index for event_id, index in self._seen_ids.items() if index >= oldest_allowed
+        }
+
+    def add(self, event: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """
+        Fold one OAuth event into the aggregates.
+
+        Returns:
+            False if the event was a control message, a duplicate or outside the window
+        """
+        if event.get("type") in CONTROL_TYPES or not event.get("clientId"):
+            return False
+        now = time.time() if now is None else now
+        self._expire(now)
+
+        index = int(_event_time(event, now) // self.bucket_seconds)
+        if index < self._oldest_allowed:
+            return False
+        event_id = event.get("id")
+        if event_id is not None:
+            if event_id in self._seen_ids:
+                return False
+            self._seen_ids[event_id] = index
+
+        error = event.get("status") == "error"
+        try:
+            latency = float(event.get("responseTime") or 0)
+        except (TypeError, ValueError):
+            latency = 0.0
+        bin_index = bisect.bisect_left(LATENCY_BOUNDS_MS, latency)
+        client_id = str(event["clientId"])
+
+        bucket = self._buckets.setdefault(index, _Bucket())
+        bucket.totals.add(error, bin_index)
+        bucket.clients.setdefault(client_id, _Counts()).add(error, bin_index)
+        self._totals.add(error, bin_index)
+        self._clients.setdefault(client_id, _Counts()).add(error, bin_index)
+        self.events_seen += 1
+        return True
+
+    def _describe(self, counts: _Counts) -> Dict[str, Any]:
+        minutes = self.window_seconds / 60
+        return {
+            "requests": counts.count,
+            "errors": counts.errors,
+            "rate_per_minute": round(counts.count / minutes, 3),
+            "error_ratio": round(counts.errors / counts.count, 4) if counts.count else 0.0,
+            "latency_ms": {
+                "p50": latency_percentile(counts.latency, counts.count, 0.50),
+                "p90": latency_percentile(counts.latency, counts.count, 0.90),
+                "p99": latency_percentile(counts.latency, counts.count, 0.99),
+            },
+        }
+
+    def snapshot(
+        self,
+        client_id: Optional[str] = None,
+        top_clients: int = DEFAULT_TOP_CLIENTS,
+        now: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Return the current aggregates (overall and per client)."""
+        self._expire(time.time() if now is None else now)
+        if client_id is not None:
+            counts = self._clients.get(client_id) or _Counts()
+            return {"window_seconds": self.window_seconds, "client_id": client_id, **self._describe(counts)}
+
+        busiest = sorted(self._clients.items(), key=lambda item: item[1].count, reverse=True)[:top_clients]
+        return {
+            "window_seconds": self.window_seconds,
+            **self._describe(self._totals),
+            "clients": {client: self._describe(counts) for client, counts in busiest},
+            "client_count": len(self._clients),
+        }
+
+
+class ServiceCredential:
+    """
+    Access token of the shared subscription.
+
+    With a client id and secret the token comes from the client credentials
+    grant and is cached until shortly before ``expires_in``; otherwise the
+    static token is used. ``invalidate`` is called when the backend rejects
+    the token: the grant is repeated, and a static token from the
+    environment is re-read.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        token_url: Optional[str] = None,
+        from_env: bool = False,
+    ):
+        self.token = token or None
+        self.client_id = client_id or None
+        self.client_secret = client_secret or None
+        self.token_url = token_url or None
+        self.from_env = from_env
+        self.expires_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_environment(cls) -> "ServiceCredential":
+        return cls(
+            token=SERVICE_TOKEN,
+            client_id=SERVICE_CLIENT_ID,
+            client_secret=SERVICE_CLIENT_SECRET,
+            token_url=SERVICE_TOKEN_URL,
+            from_env=True,
+        )
+
+    @property
+    def uses_client_credentials(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    @property
+    def configured(self) -> bool:
+        return self.uses_client_credentials or bool(self.token)
+
+    def invalidate(self) -> None:
+        """Drop a token the backend rejected."""
+        if self.uses_client_credentials:
+            self.token = None
+            self.expires_at = 0.0
+        elif self.from_env:
+            self.token = os.getenv("OAUTH_MONITORING_TOKEN") or None
+
+    async def get(self) -> Optional[str]:
+        """
+        Return a usable access token, requesting a new one when needed.
+
+        Raises:
+            BackendError: If the token request fails
+        """
+        if not self.uses_client_credentials:
+            return self.token
+        if self.token and time.monotonic() < self.expires_at:
+            return self.token
+        # Concurrent callers share one token request; the lock belongs to one loop
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        async with self._lock:
+            if not (self.token and time.monotonic() < self.expires_at):
+                await self._request_token()
+        return self.token
+
+    async def _request_token(self) -> None:
+        token_url = self.token_url
+        if token_url is None:
+            from .discovery import DiscoveryError, discover_token_endpoint
+
+            try:
+                token_url = await discover_token_endpoint(BACKEND_API_URL)
+            except (DiscoveryError, httpx.HTTPError) as exc:
+                raise BackendError(f"Token endpoint discovery failed: {exc}") from exc
+        try:
+            response = await get_backend_client().post(
+                token_url,
+                data={"grant_type": "client_credentials"},
+                auth=(self.client_id, self.client_secret),
+                headers={"Accept": "application/json"},
+            )
+        except httpx.HTTPError as exc:
+            raise BackendError(f"Service token request failed: {exc}") from exc
+        if response.status_code >= 400:
+            raise BackendError(
+                f"Service token request returned {response.status_code}", status_code=response.status_code
+            )
+        body = response.json()
+        expires_in = float(body.get("expires_in") or 300)
+        self.token = body["access_token"]
+        self.expires_at = time.monotonic() + max(expires_in - TOKEN_REFRESH_MARGIN, expires_in / 2)
+
+
+class OAuthEventSubscriber:
+    """
+    Keep an OAuthAggregator fed from the backend's OAuth event stream.
+
+    The stream is authenticated with the service credential; a 401 renews
+    it, and reconnects back off exponentially.
+    """
+
+    def __init__(
+        self,
+        aggregator: OAuthAggregator,
+        token: Optional[str] = None,
+        credential: Optional[ServiceCredential] = None,
+    ):
+        self.aggregator = aggregator
+        if credential is None:
+            credential = ServiceCredential(token=token) if token else ServiceCredential.from_environment()
+        self.credential = credential
+        self.connected = False
+        self.connects = 0
+        self.last_error: Optional[str] = None
+        self.disconnected_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    def ensure_started(self) -> None:
+        """Start the subscription unless it is already running."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._ready = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def wait_ready(self, timeout: float = BACKFILL_WAIT_SECONDS) -> bool:
+        """
+        Wait until the first backfill has completed (or the first attempt failed).
+
+        Returns:
+            False if it did not finish within timeout
+        """
+        if self._ready is None:
+            return False
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.connected = False
+
+    async def _headers(self) -> Dict[str, str]:
+        token = await self.credential.get()
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    async def backfill(self) -> int:
+        """Load events from the window that happened before the stream connected."""
+        since = datetime.fromtimestamp(time.time() - self.aggregator.window_seconds).astimezone().isoformat()
+        response = await backend_json(
+            None, "GET", EVENTS_PATH,
+            params={"limit": BACKFILL_LIMIT, "since": since}, headers=await self._headers(),
+        ) or {}
+        return sum(1 for event in response.get("events") or [] if self.aggregator.add(event))
+
+    async def _consume(self) -> None:
+        async with backend_stream(
+            None, "GET", EVENTS_STREAM_PATH, headers={**(await self._headers()), "Accept": "text/event-stream"}
+        ) as response:
+            await self.backfill()
+            self.connected = True
+            self.connects += 1
+            self.last_error = None
+            self.disconnected_at = None
+            self._ready.set()
+            data_lines: List[str] = []
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    data_lines.append(line[5:].lstrip())
+                elif not line and data_lines:
+                    payload = "\n".join(data_lines)
+                    data_lines = []
+                    try:
+                        event = json.loads(payload)
+                    except ValueError:
+                        continue
+                    if isinstance(event, dict):
+                        self.aggregator.add(event)
+
+    async def _run(self) -> None:
+        # Background work is not bound by the deadline of the call that started it
+        request_deadline.set(None)
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                await self._consume()
+                delay = RECONNECT_MIN_DELAY
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.last_error = str(exc)
+                logger.warning("OAuth event stream disconnected: %s", exc)
+                if isinstance(exc, BackendError) and exc.status_code == 401:
+                    self.credential.invalidate()
+            if self.connected or self.disconnected_at is None:
+                self.disconnected_at = time.time()
+            self.connected = False
+            # Callers waiting for the first backfill get what is there
+            self._ready.set()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def status(self) -> Dict[str, Any]:
+        """Stream health; ``stale`` means the aggregates are not being updated."""
+        disconnected_for = None
+        if not self.connected and self.disconnected_at is not None:
+            disconnected_for = round(time.time() - self.disconnected_at, 1)
+        return {
+            "connected": self.connected,
+            "stale": not self.connected,
+            "disconnected_seconds": disconnected_for,
+            "connects": self.connects,
+            "events_seen": self.aggregator.events_seen,
+            "last_error": self.last_error,
+        }
+
+
+_subscriber: Optional[OAuthEventSubscriber] = None
+
+
+def get_oauth_subscriber() -> OAuthEventSubscriber:
+    """Return the process-wide OAuth event subscriber."""
+    global _subscriber
+    if _subscriber is None:
+        _subscriber = OAuthEventSubscriber(OAuthAggregator())
+    return _subscriber
+
+
+def register_oauth_aggregate_tools(mcp: FastMCP, subscriber: Optional[OAuthEventSubscriber] = None) -> OAuthEventSubscriber:
+    """Register the incremental OAuth metrics tool."""
+    if subscriber is None:
+        subscriber = get_oauth_subscriber()
+    authorized = BoundedTTLCache(
+        max_entries=AUTHORIZATION_CACHE_SIZE, max_bytes=AUTHORIZATION_CACHE_SIZE, ttl=AUTHORIZATION_TTL
+    )
+
+    async def authorize(ctx: Context) -> None:
+        if not get_caller_token(ctx):
+            raise ToolError("OAuth monitoring requires an authenticated caller")
+        caller = caller_fingerprint(ctx)
+        if authorized.get(caller) is not None:
+            return
+        try:
+            await backend_json(ctx, "GET", EVENTS_PATH, params={"limit": 1})
+        except BackendError as exc:
+            raise ToolError(f"Not authorized for OAuth monitoring: {exc}") from exc
+        authorized.put(caller, True, 1)
+
+    async def get_oauth_live_metrics(
+        ctx: Context,
+        client_id: Optional[str] = None,
+        top_clients: int = DEFAULT_TOP_CLIENTS,
+    ) -> Dict[str, Any]:
+        await authorize(ctx)
+        if not subscriber.credential.configured:
+            raise ToolError(
+                "Live OAuth metrics are not configured (set OAUTH_MONITORING_CLIENT_ID and "
+                "OAUTH_MONITORING_CLIENT_SECRET, or OAUTH_MONITORING_TOKEN)"
+            )
+        subscriber.ensure_started()
+        await subscriber.wait_ready()
+        return {
+            "result": subscriber.aggregator.snapshot(client_id=client_id, top_clients=top_clients),
+            "stream": subscriber.status(),
+        }
+
+    mcp.tool(
+        get_oauth_live_metrics,
+        name="get_oauth_live_metrics",
+        description=(
+            "OAuth flow metrics over a rolling window (default 1 hour), maintained incrementally "
+            "from the backend's OAuth event stream: request rate, error ratio and latency "
+            "percentiles overall and for the busiest clients (or one client_id). 'stream' tells "
+            "whether the event stream is connected; when 'stale' is true the numbers stopped "
+            "updating 'disconnected_seconds' ago (see 'last_error')."
+        ),
+    )
+    return subscriber
@@ -0,0 +1,302 @@
+"""
+Cursor-based paging for oversized tool results.
+
+A large user list or FHIR search Bundle is otherwise sent as a single
+JSON-RPC result. ``ResultPagingMiddleware`` looks for a pageable list in each
+structured result; when it is longer than a page and its estimated size
+(extrapolated from a sample of items) is above the threshold, it parks the
+list in a bounded, TTL'd ``ResultStore`` and returns only the first page plus
+a ``_page`` block:
+
+    {"result": [...first page...],
+     "_page": {"total": 5000, "offset": 0, "limit": 100,
+               "next_cursor": "3f9c...:100",
+               "resource_uri": "mcp-results://3f9c.../100"}}
+
+Follow-up pages come from the ``get_result_page`` tool (or by reading the
+resource URI) and are served from the store without calling the backend.
+Stored results are bound to the caller that produced them. Steps of an
+``execute_tool_plan`` are never paged, so later steps see the whole list.
+"""
+
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import mcp.types as mt
+import pydantic_core
+from fastmcp import Context, FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+
+from .backend import caller_fingerprint
+from .cache import BoundedTTLCache
+from .composite import plan_step
+
+logger = logging.getLogger(__name__)
+
+PAGE_TOOL_NAME = "get_result_page"
+RESOURCE_SCHEME = "mcp-results"
+
+# Results whose pageable list is estimated larger than this (serialized bytes) are paged
+DEFAULT_THRESHOLD_BYTES = int(os.getenv("MCP_RESULT_PAGE_THRESHOLD", str(256 * 1024)))
+DEFAULT_PAGE_SIZE = int(os.getenv("MCP_RESULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 1000
+# Items serialized to estimate the size of a pageable list
+SIZE_SAMPLE = 16
+
+# Store bounds
+DEFAULT_STORE_TTL = 300.0
+DEFAULT_STORE_MAX_ENTRIES = 128
+DEFAULT_STORE_MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class StoredResult:
+    """A paged result parked in the store."""
+
+    handle: str
+    owner: str
+    envelope: Any
+    path: Tuple[str, ...]
+    items: List[Any]
+    page_size: int
+    size: int
+    expires_at: float
+
+
+class ResultStore:
+    """
+    In-memory result store bounded by entry count, total bytes and TTL.
+
+    Entries live in a ``BoundedTTLCache``, so they are evicted
+    least-recently-used first once either bound is hit.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_STORE_TTL,
+        max_entries: int = DEFAULT_STORE_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_STORE_MAX_BYTES,
+    ):
+        self._cache = BoundedTTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._cache.total_bytes
+
+    def put(
+        self,
+        owner: str,
+        envelope: Any,
+        path: Tuple[str, ...],
+        items: List[Any],
+        page_size: int,
+        size: int,
+    ) -> Optional[StoredResult]:
+        """
+        Store a result and return its entry.
+
+        Returns:
+            The stored entry, or None if the result alone exceeds max_bytes
+        """
+        stored = StoredResult(
+            handle=secrets.token_hex(12),
+            owner=owner,
+            envelope=envelope,
+            path=path,
+            items=items,
+            page_size=page_size,
+            size=size,
+            expires_at=0.0,
+        )
+        entry = self._cache.put(stored.handle, stored, size)
+        if entry is None:
+            return None
+        stored.expires_at = entry.expires_at
+        return stored
+
+    def get(self, handle: str, owner: str) -> Optional[StoredResult]:
+        """Return a live entry owned by owner (and mark it recently used)."""
+        entry = self._cache.get(handle)
+        if entry is None or entry.value.owner != owner:
+            return None
+        return entry.value
+
+
+def find_pageable(data: Any) -> Optional[Tuple[Tuple[str, ...], List[Any]]]:
+    """
+    Locate the list to page in a tool result.
+
+    Recognizes a bare list, the generated ``{"result": [...]}`` envelope and
+    FHIR Bundles (``entry``), either bare or inside ``result``.
+    """
+    candidates = [(), ("result",), ("entry",), ("result", "entry")]
+    for path in candidates:
+        node = data
+        for key in path:
+            node = node.get(key) if isinstance(node, dict) else None
+        if isinstance(node, list):
+            return path, node
+    return None
+
+
+def estimate_size(items: List[Any]) -> int:
+    """Estimate the serialized size of a list from an evenly spaced sample of its items."""
+    if not items:
+        return 0
+    step = max(1, len(items) // SIZE_SAMPLE)
+    sample = items[::step][:SIZE_SAMPLE]
+    sampled = sum(len(pydantic_core.to_json(item, fallback=str)) + 1 for item in sample)
+    return sampled * len(items) // len(sample)
+
+
+def _with_items(envelope: Any, path: Tuple[str, ...], items: List[Any]) -> Any:
+    if not path:
+        return items
+    rebuilt = dict(envelope)
+    rebuilt[path[0]] = _with_items(envelope[path[0]], path[1:], items)
+    return rebuilt
+
+
+def format_cursor(handle: str, offset: int) -> str:
+    return f"{handle}:{offset}"
+
+
+def parse_cursor(cursor: str) -> Tuple[str, int]:
+    handle, _, offset = cursor.partition(":")
+    if not handle or not offset.isdigit():
+        raise ToolError(f"Invalid result cursor '{cursor}'")
+    return handle, int(offset)
+
+
+def build_page(entry: StoredResult, offset: int, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Render one page of a stored result in its original envelope."""
+    limit = max(1, min(limit or entry.page_size, MAX_PAGE_SIZE))
+    total = len(entry.items)
+    page_items = entry.items[offset:offset + limit]
+    next_offset = offset + limit
+
+    page = _with_items(entry.envelope, entry.path, page_items)
+    if not isinstance(page, dict):
+        page = {"result": page}
+    page["_page"] = {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": format_cursor(entry.handle, next_offset) if next_offset < total else None,
+        "resource_uri": f"{RESOURCE_SCHEME}://{entry.handle}/{next_offset}" if next_offset < total else None,
+        "expires_in": max(0, round(entry.expires_at - time.monotonic())),
+    }
+    return page
+
+
+class ResultPagingMiddleware(Middleware):
+    """Page structured tool results that exceed a size threshold."""
+
+    def __init__(
+        self,
+        store: ResultStore,
+        threshold_bytes: int = DEFAULT_THRESHOLD_BYTES,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ):
+        self.store = store
+        self.threshold_bytes = threshold_bytes
+        self.page_size = page_size
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        result = await call_next(context)
+        if context.message.name == PAGE_TOOL_NAME or plan_step.get() is not None:
+            return result
+
+        data = result.structured_content
+        if data is None:
+            return result
+
+        pageable = find_pageable(data)
+        if pageable is None or len(pageable[1]) <= self.page_size:
+            return result
+
+        path, items = pageable
+        size = estimate_size(items)
+        if size <= self.threshold_bytes:
+            return result
+
+        entry = self.store.put(
+            owner=caller_fingerprint(context.fastmcp_context),
+            envelope=data,
+            path=path,
+            items=items,
+            page_size=self.page_size,
+            size=size,
+        )
+        if entry is None:
+            logger.warning(
+                "Result of %s (~%d bytes) exceeds the result store; returning it unpaged",
+                context.message.name, size,
+            )
+            return result
+
+        logger.debug(
+            "Paged result of %s: %d items, ~%d bytes, handle %s",
+            context.message.name, len(items), size, entry.handle,
+        )
+        return ToolResult(structured_content=build_page(entry, 0))
+
+
+def register_paging(mcp: FastMCP, store: Optional[ResultStore] = None, **kwargs: Any) -> ResultStore:
+    """
+    Install result paging on a server.
+
+    Adds the paging middleware, the ``get_result_page`` tool and the
+    ``mcp-results://{handle}/{offset}`` resource template.
+
+    Args:
+        mcp: Server to extend
+        store: Result store to use (a new one by default)
+        **kwargs: Passed to ResultPagingMiddleware (threshold_bytes, page_size)
+
+    Returns:
+        The result store
+    """
+    if store is None:
+        store = ResultStore()
+
+    def _load(handle: str, ctx: Context) -> StoredResult:
+        entry = store.get(handle, caller_fingerprint(ctx))
+        if entry is None:
+            raise ToolError("Result cursor expired or unknown; re-run the original tool call")
+        return entry
+
+    async def get_result_page(cursor: str, ctx: Context, limit: Optional[int] = None) -> Dict[str, Any]:
+        handle, offset = parse_cursor(cursor)
+        return build_page(_load(handle, ctx), offset, limit)
+
+    async def read_result_page(handle: str, offset: str, ctx: Context) -> Dict[str, Any]:
+        if not offset.isdigit():
+            raise ToolError(f"Invalid result offset '{offset}'")
+        return build_page(_load(handle, ctx), int(offset))
+
+    mcp.tool(
+        get_result_page,
+        name=PAGE_TOOL_NAME,
+        description=(
+            "Fetch the next page of a large tool result. Pass the 'next_cursor' from the "
+            "'_page' block of a previous result; optionally override the page size with 'limit'."
+        ),
+    )
+    mcp.resource(
+        f"{RESOURCE_SCHEME}://{{handle}}/{{offset}}",
+        name="result_page",
+        description="A page of a large tool result held by the server.",
+        mime_type="application/json",
+    )(read_result_page)
+    mcp.add_middleware(ResultPagingMiddleware(store, **kwargs))
+    return store
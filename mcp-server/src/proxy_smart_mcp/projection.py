@@ -0,0 +1,288 @@
+"""
+Field projection for tool results.
+
+User, role and FHIR tools return every field of every record, although most
+agent calls need only a few. ``FieldProjectionMiddleware`` adds an optional
+``fields`` argument to those tools (and ``_elements`` / ``_summary`` to FHIR
+tools), strips it before the tool runs and trims the structured result before
+it is serialized into the JSON-RPC response.
+
+Projections are compiled once per distinct field list into a path trie and
+kept in an LRU cache, so repeated calls with the same ``fields`` only pay for
+the walk over the data.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import mcp.types as mt
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+
+logger = logging.getLogger(__name__)
+
+FIELDS_ARG = "fields"
+ELEMENTS_ARG = "_elements"
+SUMMARY_ARG = "_summary"
+
+# Tool name fragments whose results support projection
+DEFAULT_PROJECTABLE_TOOLS = ("healthcare_users", "roles", "fhir")
+FHIR_TOOL_FRAGMENT = "fhir"
+
+# Elements FHIR requires in every _elements-projected resource
+FHIR_MANDATORY_ELEMENTS = ("resourceType", "id", "meta")
+# Bundle envelope kept around projected entries
+FHIR_BUNDLE_ELEMENTS = ("resourceType", "id", "meta", "type", "total", "link")
+# _summary=true needs the server's summary element definitions and is rejected
+FHIR_SUMMARY_MODES = ("false", "text", "data", "count")
+
+PROJECTION_CACHE_SIZE = 256
+
+
+class Projection:
+    """A compiled field projection (a trie of dotted paths)."""
+
+    __slots__ = ("fields", "_trie")
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = fields
+        self._trie: Dict[str, Any] = {}
+        for path in fields:
+            node = self._trie
+            segments = [segment for segment in path.split(".") if segment]
+            for index, segment in enumerate(segments):
+                if node.get(segment) is True:
+                    break  # A shorter path already selects the whole subtree
+                if index == len(segments) - 1:
+                    node[segment] = True
+                else:
+                    node = node.setdefault(segment, {})
+
+    def apply(self, data: Any) -> Any:
+        """Return a copy of data containing only the projected paths."""
+        return _project(data, self._trie)
+
+
+def _project(data: Any, trie: Dict[str, Any]) -> Any:
+    if isinstance(data, list):
+        return [_project(item, trie) for item in data]
+    if not isinstance(data, dict):
+        return data
+    projected = {}
+    for key, sub in trie.items():
+        if key in data:
+            projected[key] = data[key] if sub is True else _project(data[key], sub)
+    return projected
+
+
+# Keys whose values are literal data, not sub-schemas
+_SCHEMA_LITERAL_KEYS = ("const", "default", "enum", "examples")
+# Keys whose values map arbitrary names to sub-schemas
+_SCHEMA_MAPPING_KEYS = ("properties", "patternProperties", "$defs", "definitions")
+
+
+def projection_output_schema(schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Relax a tool output schema so projected results still validate.
+
+    A projection drops fields, so every ``required`` list and every
+    ``additionalProperties: false`` is removed recursively; types and
+    descriptions are kept for the fields that remain.
+    """
+    if schema is None:
+        return None
+    return _relax_schema(schema)
+
+
+def _relax_schema(schema: Any) -> Any:
+    if isinstance(schema, list):
+        return [_relax_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    relaxed = {}
+    for key, value in schema.items():
+        if key == "required" and isinstance(value, list):
+            continue
+        if key == "additionalProperties" and value is False:
+            continue
+        if key in _SCHEMA_LITERAL_KEYS:
+            relaxed[key] = value
+        elif key in _SCHEMA_MAPPING_KEYS and isinstance(value, dict):
+            relaxed[key] = {name: _relax_schema(sub) for name, sub in value.items()}
+        else:
+            relaxed[key] = _relax_schema(value)
+    return relaxed
+
+
+def _normalize_fields(fields: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(sorted({field.strip() for field in fields if field and field.strip()}))
+
+
+@lru_cache(maxsize=PROJECTION_CACHE_SIZE)
+def _compile(fields: Tuple[str, ...]) -> Projection:
+    return Projection(fields)
+
+
+def compile_projection(fields: Sequence[str]) -> Projection:
+    """Compile (or fetch from cache) the projection for a field list."""
+    return _compile(_normalize_fields(fields))
+
+
+def parse_field_list(value: Any) -> Optional[List[str]]:
+    """Accept a list of paths or a comma-separated string; None if empty."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        items = value.split(",")
+    elif isinstance(value, (list, tuple)):
+        items = [str(item) for item in value]
+    else:
+        raise ToolError(f"'{FIELDS_ARG}' must be a list of field paths or a comma-separated string")
+    items = [item.strip() for item in items if item.strip()]
+    return items or None
+
+
+def _is_resource(data: Any) -> bool:
+    return isinstance(data, dict) and "resourceType" in data
+
+
+def _project_fhir_resource(resource: Dict[str, Any], projection: Optional[Projection], summary: Optional[str]) -> Dict[str, Any]:
+    if summary == "text":
+        kept = {key: resource[key] for key in ("resourceType", "id", "meta", "text") if key in resource}
+        return kept
+    if summary == "data":
+        resource = {key: value for key, value in resource.items() if key != "text"}
+    if projection is not None:
+        projected = projection.apply(resource)
+        for key in FHIR_MANDATORY_ELEMENTS:
+            if key in resource:
+                projected[key] = resource[key]
+        return projected
+    return resource
+
+
+def project_fhir(data: Any, projection: Optional[Projection], summary: Optional[str]) -> Any:
+    """
+    Apply FHIR ``_elements`` / ``_summary`` semantics to a resource or Bundle.
+
+    Bundles keep their envelope (type, total, link, entry.fullUrl/search)
+    and each ``entry.resource`` is projected individually.
+    """
+    if isinstance(data, list):
+        return [project_fhir(item, projection, summary) for item in data]
+    if not _is_resource(data):
+        return projection.apply(data) if projection is not None else data
+
+    if data.get("resourceType") == "Bundle":
+        bundle = {key: data[key] for key in FHIR_BUNDLE_ELEMENTS if key in data}
+        if summary == "count":
+            return bundle
+        entries = []
+        for entry in data.get("entry") or []:
+            projected_entry = {key: value for key, value in entry.items() if key != "resource"}
+            if "resource" in entry:
+                projected_entry["resource"] = _project_fhir_resource(entry["resource"], projection, summary)
+            entries.append(projected_entry)
+        bundle["entry"] = entries
+        return bundle
+
+    return _project_fhir_resource(data, projection, summary)
+
+
+def project_result(data: Any, projection: Projection) -> Any:
+    """Project a generated tool result, looking inside the {"result": ...} envelope."""
+    if isinstance(data, dict) and set(data) == {"result"}:
+        return {"result": projection.apply(data["result"])}
+    return projection.apply(data)
+
+
+class FieldProjectionMiddleware(Middleware):
+    """Trim tool results to the fields the caller asked for."""
+
+    def __init__(self, tool_fragments: Sequence[str] = DEFAULT_PROJECTABLE_TOOLS):
+        self.tool_fragments = tuple(tool_fragments)
+
+    def supports(self, tool_name: str) -> bool:
+        return any(fragment in tool_name for fragment in self.tool_fragments)
+
+    @staticmethod
+    def is_fhir_tool(tool_name: str) -> bool:
+        return FHIR_TOOL_FRAGMENT in tool_name
+
+    def _extend_schema(self, tool):
+        parameters = dict(tool.parameters or {})
+        properties = dict(parameters.get("properties") or {})
+        if FIELDS_ARG in properties:
+            return tool
+
+        properties[FIELDS_ARG] = {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": (
+                "Optional projection: dotted field paths to keep in the result "
+                "(e.g. [\"id\", \"username\", \"attributes.npi\"]). Omit for all fields."
+            ),
+        }
+        if self.is_fhir_tool(tool.name):
+            properties.setdefault(ELEMENTS_ARG, {
+                "type": "string",
+                "description": "FHIR _elements: comma-separated elements to keep in each resource.",
+            })
+            properties.setdefault(SUMMARY_ARG, {
+                "type": "string",
+                "enum": list(FHIR_SUMMARY_MODES),
+                "description": "FHIR _summary mode (count, text, data, false).",
+            })
+        parameters["properties"] = properties
+        return tool.model_copy(update={
+            "parameters": parameters,
+            "output_schema": projection_output_schema(tool.output_schema),
+        })
+
+    async def on_list_tools(self, context: MiddlewareContext, call_next):
+        tools = await call_next(context)
+        return [self._extend_schema(tool) if self.supports(tool.name) else tool for tool in tools]
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        name = context.message.name
+        arguments = dict(context.message.arguments or {})
+        if not self.supports(name) or not any(
+            key in arguments for key in (FIELDS_ARG, ELEMENTS_ARG, SUMMARY_ARG)
+        ):
+            return await call_next(context)
+
+        fields = parse_field_list(arguments.pop(FIELDS_ARG, None))
+        is_fhir = self.is_fhir_tool(name)
+        elements = parse_field_list(arguments.pop(ELEMENTS_ARG, None)) if is_fhir else None
+        summary = arguments.pop(SUMMARY_ARG, None) if is_fhir else None
+        if summary is not None:
+            summary = str(summary).lower()
+            if summary == "true":
+                raise ToolError("_summary=true needs server-side summary definitions; use _elements instead")
+            if summary not in FHIR_SUMMARY_MODES:
+                raise ToolError(f"Unsupported _summary mode '{summary}'")
+
+        context = context.copy(message=mt.CallToolRequestParams(
+            name=name, arguments=arguments, _meta=context.message.meta
+        ))
+        result = await call_next(context)
+
+        data = result.structured_content
+        if data is None:
+            return result
+
+        if is_fhir and (elements or fields or summary):
+            # _elements and fields select the same thing; keep the union
+            paths = list(dict.fromkeys((elements or []) + (fields or [])))
+            projection = compile_projection(paths) if paths else None
+            if isinstance(data, dict) and set(data) == {"result"}:
+                projected = {"result": project_fhir(data["result"], projection, summary)}
+            else:
+                projected = project_fhir(data, projection, summary)
+        elif fields:
+            projected = project_result(data, compile_projection(fields))
+        else:
+            return result
+
+        return ToolResult(structured_content=projected)
@@ -0,0 +1,282 @@
+"""
+Sampled, structured per-request logging with an asynchronous writer.
+
+``RequestLoggingMiddleware`` logs one structured event per MCP request
+(``mcp.request``: method, tool or resource, outcome, duration, caller). At
+high request rates the cost is kept off the request path:
+
+- nothing is built when the ``proxy_smart_mcp.requests`` logger is disabled
+  for the event's level
+- successful requests are sampled by ``LogSampler``: with probability
+  ``MCP_LOG_SAMPLE_RATE`` and at most ``MCP_LOG_MAX_PER_SECOND`` (token
+  bucket; 0 disables the cap). Errors and requests slower than
+  ``MCP_LOG_SLOW_MS`` are always logged
+- field values may be callables, evaluated only for events that are emitted
+- ``install_async_logging`` moves the root handlers behind a bounded
+  in-memory queue drained by a ``QueueListener`` thread, so message
+  formatting and I/O happen off the event loop; a full queue drops records
+  (counted) instead of blocking
+
+``MCP_LOG_FORMAT=json`` writes one JSON object per line with the event's
+fields as top-level keys.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .backend import caller_fingerprint
+from .metrics import ServerMetrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LOGGER = "proxy_smart_mcp.requests"
+
+DEFAULT_SAMPLE_RATE = float(os.getenv("MCP_LOG_SAMPLE_RATE", "1.0"))
+DEFAULT_MAX_PER_SECOND = float(os.getenv("MCP_LOG_MAX_PER_SECOND", "50"))
+DEFAULT_SLOW_THRESHOLD = float(os.getenv("MCP_LOG_SLOW_MS", "1000")) / 1000
+DEFAULT_LOG_QUEUE_SIZE = int(os.getenv("MCP_LOG_QUEUE_SIZE", "10000"))
+LOG_ASYNC = os.getenv("MCP_LOG_ASYNC", "true").lower() == "true"
+LOG_FORMAT = os.getenv("MCP_LOG_FORMAT", "text").lower()
+
+
+class LogSampler:
+    """
+    Probability and rate sampling of successful-request events.
+
+    Args:
+        probability: Chance that an event is considered at all (0.0 - 1.0)
+        per_second: Token-bucket cap on sampled events (<= 0: no cap)
+    """
+
+    def __init__(self, probability: float = DEFAULT_SAMPLE_RATE, per_second: float = DEFAULT_MAX_PER_SECOND):
+        self.probability = min(max(probability, 0.0), 1.0)
+        self.per_second = per_second
+        self.sampled = 0
+        self.skipped = 0
+        self._tokens = max(per_second, 1.0)
+        self._refilled = time.monotonic()
+
+    def sample(self, now: Optional[float] = None) -> bool:
+        """Decide whether to emit the next successful-request event."""
+        if self.probability < 1.0 and random.random() >= self.probability:
+            self.skipped += 1
+            return False
+        if self.per_second > 0:
+            now = time.monotonic() if now is None else now
+            elapsed = max(0.0, now - self._refilled)
+            self._tokens = min(max(self.per_second, 1.0), self._tokens + elapsed * self.per_second)
+            self._refilled = now
+            if self._tokens < 1.0:
+                self.skipped += 1
+                return False
+            self._tokens -= 1.0
+        self.sampled += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "probability": self.probability,
+            "per_second": self.per_second,
+            "sampled": self.sampled,
+            "skipped": self.skipped,
+        }
+
+
+def resolve_fields(fields: Mapping[str, Any]) -> Dict[str, Any]:
+    """Evaluate callable field values; a failing field is logged as its error."""
+    resolved = {}
+    for key, value in fields.items():
+        if callable(value):
+            try:
+                value = value()
+            except Exception as exc:
+                value = f"<{type(exc).__name__}>"
+        resolved[key] = value
+    return resolved
+
+
+def log_event(log: logging.Logger, level: int, event: str, fields: Mapping[str, Any],
+              exc_info: Any = None) -> None:
+    """Emit a structured event; lazy fields are evaluated only if it is enabled."""
+    if log.isEnabledFor(level):
+        log.log(level, event, exc_info=exc_info, extra={"fields": resolve_fields(fields)})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event and its fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, separators=(",", ":"))
+
+
+class TextFormatter(logging.Formatter):
+    """Standard line format with the event's fields appended as ``key=value``."""
+
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class AsyncLogHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when its bounded queue is full."""
+
+    def __init__(self, queue_size: int = DEFAULT_LOG_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize=max(1, queue_size)))
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue is in-process: leave formatting to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_async_handler: Optional[AsyncLogHandler] = None
+
+
+def install_async_logging(
+    queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+    log_format: str = LOG_FORMAT,
+    metrics: Optional[ServerMetrics] = None,
+) -> AsyncLogHandler:
+    """
+    Route root logging through an AsyncLogHandler and a listener thread.
+
+    The root handlers present now are served by the listener; if logging is
+    not configured yet, a stderr handler at ``MCP_LOG_LEVEL`` (default INFO)
+    is set up first, since a later ``basicConfig`` is a no-op once the root
+    logger has a handler. Calling it again returns the installed handler.
+    """
+    global _listener, _async_handler
+    if _async_handler is not None:
+        return _async_handler
+
+    root = logging.getLogger()
+    configured_here = not root.handlers
+    if configured_here:
+        logging.basicConfig(level=os.getenv("MCP_LOG_LEVEL", "INFO").upper(), stream=sys.stderr)
+    handlers = list(root.handlers)
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter()
+    for handler in handlers:
+        if configured_here or log_format == "json":
+            handler.setFormatter(formatter)
+        root.removeHandler(handler)
+
+    _async_handler = AsyncLogHandler(queue_size)
+    root.addHandler(_async_handler)
+    _listener = logging.handlers.QueueListener(_async_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_async_logging)
+
+    handler = _async_handler
+    (metrics or get_metrics()).gauge("log.queue", lambda: {"queued": handler.queue.qsize(),
+                                                          "dropped": handler.dropped})
+    return handler
+
+
+def stop_async_logging() -> None:
+    """Flush queued records and restore the listener's handlers on the root logger."""
+    global _listener, _async_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_async_handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
+    _async_handler = None
+
+
+def _request_target(message: Any) -> Optional[str]:
+    return getattr(message, "name", None) or (str(message.uri) if getattr(message, "uri", None) else None)
+
+
+class RequestLoggingMiddleware(Middleware):
+    """
+    Log one sampled structured event per request.
+
+    Args:
+        log: Logger for the events (``proxy_smart_mcp.requests``)
+        sampler: Sampler for successful requests
+        slow_threshold: Seconds above which a request is always logged
+    """
+
+    def __init__(
+        self,
+        log: Optional[logging.Logger] = None,
+        sampler: Optional[LogSampler] = None,
+        slow_threshold: float = DEFAULT_SLOW_THRESHOLD,
+    ):
+        self.log = log or logging.getLogger(REQUEST_LOGGER)
+        self.sampler = sampler or LogSampler()
+        self.slow_threshold = slow_threshold
+
+    def _fields(self, context: MiddlewareContext, duration: float, outcome: str) -> Dict[str, Any]:
+        ctx = context.fastmcp_context
+        return {
+            "method": context.method,
+            "target": lambda: _request_target(context.message),
+            "outcome": outcome,
+            "duration_ms": round(duration * 1000, 3),
+            "caller": lambda: caller_fingerprint(ctx),
+            "session": lambda: ctx.session_id if ctx is not None else None,
+        }
+
+    async def on_request(self, context: MiddlewareContext, call_next):
+        if not self.log.isEnabledFor(logging.WARNING):
+            return await call_next(context)
+        started = time.monotonic()
+        try:
+            result = await call_next(context)
+        except Exception as exc:
+            fields = self._fields(context, time.monotonic() - started, "error")
+            fields["error"] = lambda: f"{type(exc).__name__}: {exc}"
+            log_event(self.log, logging.WARNING, "mcp.request", fields)
+            raise
+        duration = time.monotonic() - started
+        if duration >= self.slow_threshold:
+            log_event(self.log, logging.WARNING, "mcp.request", self._fields(context, duration, "slow"))
+        elif self.log.isEnabledFor(logging.INFO) and self.sampler.sample():
+            log_event(self.log, logging.INFO, "mcp.request", self._fields(context, duration, "ok"))
+        return result
+
+
+def register_request_logging(mcp: FastMCP, async_writer: bool = LOG_ASYNC, **kwargs: Any) -> RequestLoggingMiddleware:
+    """Add sampled request logging, optionally with the asynchronous writer."""
+    if async_writer:
+        install_async_logging()
+    middleware = RequestLoggingMiddleware(**kwargs)
+    mcp.add_middleware(middleware)
+    return middleware
@@ -0,0 +1,274 @@
+"""
+Priority classes with weighted fair concurrency for tool calls.
+
+Bulk provisioning and analytics tools compete with interactive ``get_*``
+calls for the same backend connection pool. ``PriorityScheduler`` admits
+tool calls into a shared number of slots (``capacity``) by priority class:
+
+- each class has a weight and its own concurrency cap (a share of capacity)
+- when a slot frees, the waiting class with the lowest virtual time gets it;
+  a grant advances the class's virtual time by ``1 / weight``, so under
+  contention classes receive slots in proportion to their weights and a bulk
+  import cannot starve interactive calls (nor the reverse)
+
+Calls are classified by tool ``meta={"priority": ...}``, ``MCP_TOOL_PRIORITIES``
+(JSON name glob -> class) or name conventions (``get_*``/``find_*`` are
+interactive, ``bulk_*``/``stream_*``/analytics are bulk). A client may send
+``_meta.priority`` to demote a call, never to promote it. Calls made from
+inside a scheduled call (composite plans) reuse the parent's slot.
+"""
+
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import mcp.types as mt
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .metrics import ServerMetrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+DEFAULT = "default"
+BULK = "bulk"
+
+# Highest priority first; a client hint may only move a call rightwards
+PRIORITY_ORDER = (INTERACTIVE, DEFAULT, BULK)
+
+DEFAULT_CAPACITY = int(os.getenv("MCP_SCHEDULER_CONCURRENCY", "32"))
+
+# class -> (weight, share of capacity it may occupy)
+DEFAULT_CLASSES: Dict[str, Tuple[float, float]] = {
+    INTERACTIVE: (6.0, 1.0),
+    DEFAULT: (3.0, 0.75),
+    BULK: (1.0, 0.5),
+}
+
+DEFAULT_PRIORITY_RULES: List[Tuple[str, str]] = [
+    ("bulk_*", BULK),
+    ("*_bulk_*", BULK),
+    ("stream_*", BULK),
+    ("*analytics*", BULK),
+    ("get_*", INTERACTIVE),
+    ("find_*", INTERACTIVE),
+    ("read_*", INTERACTIVE),
+    ("check_*", INTERACTIVE),
+    ("*_get_*", INTERACTIVE),
+]
+
+_scheduled: ContextVar[bool] = ContextVar("scheduled_tool_call", default=False)
+
+
+def class_by_name(name: str, rules: List[Tuple[str, str]] = DEFAULT_PRIORITY_RULES) -> str:
+    """Priority class of a tool name by the first matching (glob, class) rule."""
+    return next((cls for pattern, cls in rules if fnmatch.fnmatchcase(name, pattern)), DEFAULT)
+
+
+@dataclass
+class _ClassState:
+    weight: float
+    share: float
+    in_flight: int = 0
+    vtime: float = 0.0
+    granted: int = 0
+    waiters: Deque[asyncio.Future] = field(default_factory=deque)
+
+
+class PriorityScheduler:
+    """
+    Weighted fair admission of work into a shared number of slots.
+
+    Args:
+        capacity: Total concurrent slots (adjustable at runtime)
+        classes: Class name -> (weight, share of capacity)
+        metrics: Metrics registry (``scheduler.wait`` per class)
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        classes: Optional[Dict[str, Tuple[float, float]]] = None,
+        metrics: Optional[ServerMetrics] = None,
+    ):
+        self._capacity = max(1, capacity)
+        self.metrics = metrics or get_metrics()
+        self.classes: Dict[str, _ClassState] = {
+            name: _ClassState(weight, share) for name, (weight, share) in (classes or DEFAULT_CLASSES).items()
+        }
+        self.in_flight = 0
+        self.metrics.gauge("scheduler.state", self.stats)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, value: int) -> None:
+        self._capacity = max(1, int(value))
+        self._dispatch()
+
+    def class_limit(self, name: str) -> int:
+        return max(1, int(self._capacity * self.classes[name].share))
+
+    def _eligible(self, name: str, state: _ClassState) -> bool:
+        return state.in_flight < self.class_limit(name)
+
+    def _grant(self, state: _ClassState) -> None:
+        state.in_flight += 1
+        state.granted += 1
+        state.vtime += 1.0 / state.weight
+        self.in_flight += 1
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self._capacity:
+            candidates = [
+                (state.vtime, name, state) for name, state in self.classes.items()
+                if state.waiters and self._eligible(name, state)
+            ]
+            if not candidates:
+                return
+            _, _, state = min(candidates, key=lambda candidate: candidate[:2])
+            future = state.waiters.popleft()
+            if future.done():
+                continue
+            self._grant(state)
+            future.set_result(None)
+
+    async def acquire(self, name: str) -> None:
+        state = self.classes[name]
+        if not state.waiters and self.in_flight < self._capacity and self._eligible(name, state):
+            if state.in_flight == 0:
+                self._catch_up(state)
+            self._grant(state)
+            return
+
+        if not state.waiters and state.in_flight == 0:
+            self._catch_up(state)
+        future = asyncio.get_running_loop().create_future()
+        state.waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before cancellation: hand the slot on
+                self.release(name)
+            else:
+                try:
+                    state.waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def _catch_up(self, state: _ClassState) -> None:
+        # A class returning from idle must not spend credit saved while idle
+        busy = [other.vtime for other in self.classes.values() if other.in_flight or other.waiters]
+        if busy:
+            state.vtime = max(state.vtime, min(busy))
+
+    def release(self, name: str) -> None:
+        self.classes[name].in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[None]:
+        started = time.monotonic()
+        await self.acquire(name)
+        self.metrics.observe("scheduler.wait", name, time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self._capacity,
+            "in_flight": self.in_flight,
+            "classes": {
+                name: {
+                    "weight": state.weight,
+                    "limit": self.class_limit(name),
+                    "in_flight": state.in_flight,
+                    "waiting": len(state.waiters),
+                    "granted": state.granted,
+                }
+                for name, state in self.classes.items()
+            },
+        }
+
+
+def load_priority_rules(raw: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Parse ``MCP_TOOL_PRIORITIES`` into (glob, class) rules, most specific first."""
+    raw = os.getenv("MCP_TOOL_PRIORITIES", "") if raw is None else raw
+    if not raw.strip():
+        return []
+    try:
+        rules = {pattern: str(priority) for pattern, priority in json.loads(raw).items()}
+    except (ValueError, AttributeError):
+        logger.warning("Ignoring MCP_TOOL_PRIORITIES: expected a JSON object of glob -> class")
+        return []
+    return sorted(rules.items(), key=lambda rule: len(rule[0]), reverse=True)
+
+
+class PrioritySchedulingMiddleware(Middleware):
+    """Admit tools/call through a PriorityScheduler by priority class."""
+
+    def __init__(
+        self,
+        mcp: FastMCP,
+        scheduler: Optional[PriorityScheduler] = None,
+        rules: Optional[List[Tuple[str, str]]] = None,
+    ):
+        self.mcp = mcp
+        self.scheduler = scheduler or PriorityScheduler()
+        self.rules = (load_priority_rules() if rules is None else rules) + DEFAULT_PRIORITY_RULES
+        self._classes: Dict[str, str] = {}
+
+    async def tool_class(self, name: str) -> str:
+        """Resolve (and cache) the priority class of a tool."""
+        if name in self._classes:
+            return self._classes[name]
+        try:
+            tool = await self.mcp.get_tool(name)
+        except Exception:
+            return DEFAULT
+        priority = (tool.meta or {}).get("priority")
+        if priority not in self.scheduler.classes:
+            priority = class_by_name(name, [rule for rule in self.rules if rule[1] in self.scheduler.classes])
+        self._classes[name] = priority
+        return priority
+
+    def _apply_hint(self, priority: str, meta: Any) -> str:
+        hint = getattr(meta, "priority", None) if meta is not None else None
+        if hint in PRIORITY_ORDER and priority in PRIORITY_ORDER:
+            if PRIORITY_ORDER.index(hint) > PRIORITY_ORDER.index(priority):
+                return hint
+        return priority
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        if _scheduled.get():
+            return await call_next(context)
+        priority = self._apply_hint(await self.tool_class(context.message.name), context.message.meta)
+        async with self.scheduler.slot(priority):
+            token = _scheduled.set(True)
+            try:
+                return await call_next(context)
+            finally:
+                _scheduled.reset(token)
+
+
+def register_priority_scheduling(mcp: FastMCP, **kwargs: Any) -> PrioritySchedulingMiddleware:
+    """Add priority scheduling of tool calls to the server."""
+    middleware = PrioritySchedulingMiddleware(mcp, **kwargs)
+    mcp.add_middleware(middleware)
+    return middleware
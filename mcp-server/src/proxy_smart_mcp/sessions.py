@@ -0,0 +1,448 @@
+"""
+Compact bookkeeping and idle eviction of streamable HTTP sessions.
+
+The MCP SDK keeps every session's transport (and the server task behind it)
+until the client sends DELETE, so idle agents accumulate without bound, and
+transports terminated by DELETE are never removed from its table.
+``SessionRegistry`` tracks sessions in LRU order with small ``__slots__``
+records whose common strings (caller, client id) and scope sets are
+interned, and evicts the least recently used idle sessions when:
+
+- there are more than ``MCP_MAX_SESSIONS`` sessions (0: no count limit)
+- the estimated session memory, ``MCP_SESSION_OVERHEAD_KB`` per session
+  (measure it with ``benchmarks/bench_sessions.py``), exceeds
+  ``MCP_SESSION_MEMORY_MB``
+- a session has been idle longer than ``MCP_SESSION_IDLE_SECONDS``
+
+Sessions are tracked from the ``initialize`` response on, so sessions that
+never send another request count against the limits too, and the idle
+sweep runs on a timer every ``sweep_interval`` seconds. Eviction terminates
+the transport, so the client's next request gets a 404 and it
+re-initializes; terminated transports are dropped from the SDK's table by
+the next sweep. Sessions with a request in flight are never evicted.
+
+Each HTTP session also gets a ``SessionEventStore``, which makes its streams
+resumable (``Last-Event-ID``). Its buffers are allocated lazily, per stream
+on the stream's first event, so an idle session pays only for the empty
+store; ``MCP_EVENT_BUFFER_SIZE`` events are kept for each of the session's
+``MCP_EVENT_BUFFER_STREAMS`` most recent streams (size 0 disables them).
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import mcp.types as mt
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from mcp.server.streamable_http import EventCallback, EventId, EventMessage, EventStore, StreamId
+from starlette.datastructures import Headers
+from starlette.middleware import Middleware as ASGIMiddleware
+
+from .backend import caller_access_token, caller_fingerprint
+from .metrics import ServerMetrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+SESSION_HEADER = "mcp-session-id"
+
+DEFAULT_MAX_SESSIONS = int(os.getenv("MCP_MAX_SESSIONS", "0"))
+DEFAULT_MEMORY_CAP = int(os.getenv("MCP_SESSION_MEMORY_MB", "1024")) * 1024 * 1024
+DEFAULT_SESSION_OVERHEAD = int(os.getenv("MCP_SESSION_OVERHEAD_KB", "48")) * 1024
+DEFAULT_IDLE_TIMEOUT = float(os.getenv("MCP_SESSION_IDLE_SECONDS", "3600"))
+DEFAULT_SWEEP_INTERVAL = 30.0
+DEFAULT_EVENT_BUFFER_SIZE = int(os.getenv("MCP_EVENT_BUFFER_SIZE", "32"))
+DEFAULT_EVENT_BUFFER_STREAMS = int(os.getenv("MCP_EVENT_BUFFER_STREAMS", "4"))
+
+
+class SessionState:
+    """Per-session record: identity, interned caller data and activity."""
+
+    __slots__ = ("session_id", "caller", "client_id", "scopes", "created", "last_seen", "active")
+
+    def __init__(self, session_id: str, caller: Optional[str], client_id: Optional[str],
+                 scopes: FrozenSet[str], now: float):
+        self.session_id = session_id
+        self.caller = caller
+        self.client_id = client_id
+        self.scopes = scopes
+        self.created = now
+        self.last_seen = now
+        self.active = 0
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else None
+
+
+class SessionEventStore(EventStore):
+    """
+    Replay buffers of one session, allocated per stream on its first event.
+
+    Event ids are ``<sequence>/<stream id>``, so a replay finds its stream
+    without an index. Only the ``max_streams`` most recently written streams
+    are kept, each with its last ``max_events`` events (plain lists: most
+    streams hold a single response).
+
+    Args:
+        max_events: Events kept per stream
+        max_streams: Streams kept per session
+    """
+
+    __slots__ = ("max_events", "max_streams", "_sequence", "_streams")
+
+    def __init__(self, max_events: int = DEFAULT_EVENT_BUFFER_SIZE,
+                 max_streams: int = DEFAULT_EVENT_BUFFER_STREAMS):
+        self.max_events = max(1, max_events)
+        self.max_streams = max(1, max_streams)
+        self._sequence = 0
+        self._streams: Optional[Dict[StreamId, List[Tuple[int, mt.JSONRPCMessage]]]] = None
+
+    async def store_event(self, stream_id: StreamId, message: mt.JSONRPCMessage) -> EventId:
+        if self._streams is None:
+            self._streams = {}
+        # Re-inserted on every write, so the dict is in least recently written order
+        events = self._streams.pop(stream_id, None)
+        if events is None:
+            events = []
+            if len(self._streams) >= self.max_streams:
+                del self._streams[next(iter(self._streams))]
+        self._streams[stream_id] = events
+        self._sequence += 1
+        events.append((self._sequence, message))
+        if len(events) > self.max_events:
+            del events[0]
+        return f"{self._sequence}/{stream_id}"
+
+    async def replay_events_after(self, last_event_id: EventId, send_callback: EventCallback) -> Optional[StreamId]:
+        sequence, _, stream_id = last_event_id.partition("/")
+        events = self._streams.get(stream_id) if self._streams and sequence.isdigit() else None
+        if events is None:
+            return None
+        after = int(sequence)
+        for event_sequence, message in list(events):
+            if event_sequence > after:
+                await send_callback(EventMessage(message, f"{event_sequence}/{stream_id}"))
+        return stream_id
+
+
+class SessionRegistry:
+    """
+    LRU registry of sessions with count, memory and idle limits.
+
+    Args:
+        max_sessions: Most sessions kept (<= 0: limited by memory only)
+        memory_cap: Bytes of estimated session memory (<= 0: no cap)
+        session_overhead: Estimated bytes per session (transport, server task, state)
+        idle_timeout: Seconds after which an idle session is evicted (<= 0: never)
+        sweep_interval: Seconds between idle sweeps
+        metrics: Metrics registry
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        memory_cap: int = DEFAULT_MEMORY_CAP,
+        session_overhead: int = DEFAULT_SESSION_OVERHEAD,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+        metrics: Optional[ServerMetrics] = None,
+    ):
+        limits = []
+        if max_sessions > 0:
+            limits.append(max_sessions)
+        if memory_cap > 0:
+            limits.append(max(1, memory_cap // max(1, session_overhead)))
+        self.limit: Optional[int] = min(limits) if limits else None
+        self.session_overhead = session_overhead
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.metrics = metrics or get_metrics()
+        self.evicted = 0
+        self.on_evict: List[Callable[[str], Any]] = []
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._scope_sets: Dict[FrozenSet[str], FrozenSet[str]] = {}
+        self._managers: List[Any] = []
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.metrics.gauge("sessions", self.stats)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        return self._sessions.get(session_id)
+
+    def touch(
+        self,
+        session_id: str,
+        caller: Optional[str] = None,
+        client_id: Optional[str] = None,
+        scopes: Iterable[str] = (),
+        now: Optional[float] = None,
+    ) -> SessionState:
+        """Record activity on a session, creating its record (and evicting) if new."""
+        now = time.monotonic() if now is None else now
+        state = self._sessions.get(session_id)
+        if state is None:
+            scope_set = frozenset(scopes)
+            state = SessionState(
+                sys.intern(session_id), _intern(caller), _intern(client_id),
+                self._scope_sets.setdefault(scope_set, scope_set), now,
+            )
+            self._sessions[state.session_id] = state
+            self._enforce_limit()
+        else:
+            state.last_seen = now
+            self._sessions.move_to_end(session_id)
+        return state
+
+    def remove(self, session_id: str) -> Optional[SessionState]:
+        return self._sessions.pop(session_id, None)
+
+    def _enforce_limit(self) -> None:
+        if self.limit is None or len(self._sessions) <= self.limit:
+            return
+        excess = len(self._sessions) - self.limit
+        victims = []
+        for state in self._sessions.values():
+            if len(victims) >= excess:
+                break
+            if not state.active:
+                victims.append(state.session_id)
+        for session_id in victims:
+            self.evict(session_id, "capacity")
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Evict sessions idle longer than the timeout and drop terminated transports."""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        for manager in self._managers:
+            instances = manager._server_instances
+            for session_id, transport in list(instances.items()):
+                if transport.is_terminated:
+                    del instances[session_id]
+                    self._sessions.pop(session_id, None)
+                    removed += 1
+                elif session_id not in self._sessions:
+                    # Created without a request we saw (initialize only): start its idle clock
+                    self.touch(session_id, now=now)
+        if self.idle_timeout > 0:
+            cutoff = now - self.idle_timeout
+            idle = []
+            for state in self._sessions.values():
+                if state.last_seen > cutoff:
+                    break
+                if not state.active:
+                    idle.append(state.session_id)
+            for session_id in idle:
+                self.evict(session_id, "idle")
+                removed += 1
+        return removed
+
+    def evict(self, session_id: str, reason: str = "capacity") -> None:
+        """Forget a session, terminate its transport and notify ``on_evict`` callbacks."""
+        if self._sessions.pop(session_id, None) is None:
+            return
+        self.evicted += 1
+        self.metrics.incr("sessions.evicted", reason)
+        for manager in self._managers:
+            # Terminated transports stay in the table until the next sweep so
+            # the client's next request gets a 404 and re-initializes
+            transport = manager._server_instances.get(session_id)
+            if transport is not None and not transport.is_terminated:
+                try:
+                    asyncio.get_running_loop().create_task(transport.terminate())
+                except RuntimeError:
+                    pass
+        for callback in self.on_evict:
+            try:
+                callback(session_id)
+            except Exception as exc:
+                logger.debug("Session eviction callback failed: %s", exc)
+
+    def attach(self, manager: Any) -> None:
+        """Manage the transports of a ``StreamableHTTPSessionManager``."""
+        if manager not in self._managers:
+            self._managers.append(manager)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as exc:
+                logger.warning("Session sweep failed: %s", exc)
+
+    def ensure_sweeping(self) -> None:
+        """Start the periodic sweep on the running loop, if not already running."""
+        if self.sweep_interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        task = self._sweep_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._sweep_task = loop.create_task(self._sweep_loop())
+
+    def stop(self) -> None:
+        """Cancel the periodic sweep."""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        clients: Set[Optional[str]] = {state.client_id for state in self._sessions.values()}
+        return {
+            "sessions": len(self._sessions),
+            "limit": self.limit,
+            "estimated_bytes": len(self._sessions) * self.session_overhead,
+            "clients": len(clients),
+            "evicted": self.evicted,
+        }
+
+
+def find_session_manager(request: Any) -> Any:
+    """The StreamableHTTPSessionManager serving a Starlette request, if any."""
+    return app_session_manager(request.scope.get("app") if request is not None else None)
+
+
+def app_session_manager(app: Any) -> Any:
+    """The StreamableHTTPSessionManager behind a Starlette app's routes, if any."""
+    for route in getattr(app, "routes", ()):
+        endpoint = getattr(route, "endpoint", None)
+        # RequireAuthMiddleware wraps the ASGI app as `.app`
+        for candidate in (endpoint, getattr(endpoint, "app", None)):
+            manager = getattr(candidate, "session_manager", None)
+            if manager is not None and hasattr(manager, "_server_instances"):
+                return manager
+    return None
+
+
+class SessionTrackingMiddleware(Middleware):
+    """Touch the session of every request and attach the HTTP session manager."""
+
+    # Records the caller's validated token (see fastpath.install_fast_path)
+    needs_access_token = True
+
+    def __init__(self, registry: SessionRegistry):
+        self.registry = registry
+        self._attached = False
+
+    async def on_request(self, context: MiddlewareContext, call_next):
+        ctx = context.fastmcp_context
+        try:
+            request = ctx.request_context.request if ctx is not None else None
+        except Exception:
+            request = None
+        session_id = request.headers.get(SESSION_HEADER) if request is not None else None
+        if session_id is None:
+            # STDIO, or initialize (the transport assigns the id in the response)
+            return await call_next(context)
+
+        self.registry.ensure_sweeping()
+        if not self._attached:
+            # Retried on later requests until the session manager is found
+            manager = find_session_manager(request)
+            if manager is not None:
+                self.registry.attach(manager)
+                self._attached = True
+
+        state = self.registry.get(session_id)
+        if state is None or state.caller is None:
+            access_token = caller_access_token(ctx)
+            if state is not None:
+                self.registry.remove(session_id)
+            state = self.registry.touch(
+                session_id,
+                caller=caller_fingerprint(ctx),
+                client_id=getattr(access_token, "client_id", None),
+                scopes=getattr(access_token, "scopes", None) or (),
+            )
+        else:
+            self.registry.touch(session_id)
+        state.active += 1
+        try:
+            return await call_next(context)
+        finally:
+            state.active -= 1
+
+
+class SessionStartMiddleware:
+    """
+    ASGI middleware that sets up each streamable HTTP session as it is created.
+
+    When an ``initialize`` response assigns a session id, the session is
+    tracked (and counted against the limits) and its transport gets a
+    ``SessionEventStore``.
+    """
+
+    def __init__(self, app: Any, registry: "SessionRegistry", event_buffer_size: int = DEFAULT_EVENT_BUFFER_SIZE,
+                 event_buffer_streams: int = DEFAULT_EVENT_BUFFER_STREAMS):
+        self.app = app
+        self.registry = registry
+        self.event_buffer_size = event_buffer_size
+        self.event_buffer_streams = event_buffer_streams
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or Headers(scope=scope).get(SESSION_HEADER):
+            return await self.app(scope, receive, send)
+
+        session_ids = []
+
+        async def send_and_capture(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                session_ids.extend(Headers(raw=message.get("headers") or []).getlist(SESSION_HEADER))
+            await send(message)
+
+        await self.app(scope, receive, send_and_capture)
+        # After the initialize response, so it is not buffered for replay
+        for session_id in session_ids:
+            self.start(scope.get("app"), session_id)
+
+    def start(self, app: Any, session_id: str) -> None:
+        manager = app_session_manager(app)
+        if manager is None:
+            return
+        self.registry.attach(manager)
+        self.registry.ensure_sweeping()
+        transport = manager._server_instances.get(session_id)
+        # The SDK passes one store to every transport, keyed only by stream
+        # id (shared by all sessions' GET streams); give each its own
+        if transport is not None and transport._event_store is None and self.event_buffer_size > 0:
+            transport._event_store = SessionEventStore(self.event_buffer_size, self.event_buffer_streams)
+        if self.registry.get(session_id) is None:
+            self.registry.touch(session_id)
+
+
+_registry: Optional[SessionRegistry] = None
+
+
+def get_session_registry() -> SessionRegistry:
+    """Return the process-wide session registry."""
+    global _registry
+    if _registry is None:
+        _registry = SessionRegistry()
+    return _registry
+
+
+def register_session_tracking(
+    mcp: FastMCP,
+    registry: Optional[SessionRegistry] = None,
+    event_buffer_size: int = DEFAULT_EVENT_BUFFER_SIZE,
+) -> SessionRegistry:
+    """Track and evict idle sessions of this server, and make its HTTP streams resumable."""
+    if registry is None:
+        registry = get_session_registry()
+    mcp.add_middleware(SessionTrackingMiddleware(registry))
+    http_app = mcp.http_app
+
+    def http_app_with_sessions(*args: Any, middleware: Optional[list] = None, **kwargs: Any) -> Any:
+        middleware = [*(middleware or []), ASGIMiddleware(
+            SessionStartMiddleware, registry=registry, event_buffer_size=event_buffer_size
+        )]
+        return http_app(*args, middleware=middleware, **kwargs)
+
+    mcp.http_app = http_app_with_sessions
+    return registry
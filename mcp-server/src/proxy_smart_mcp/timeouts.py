@@ -0,0 +1,130 @@
+"""
+Per-tool timeouts and cancellation accounting.
+
+``ToolTimeoutMiddleware`` bounds every ``tools/call`` by a timeout resolved
+once per tool name from, in order:
+
+- the tool's ``meta={"timeout": seconds}``
+- ``MCP_TOOL_TIMEOUTS``: JSON object of name glob -> seconds; sub-server
+  modules are matched by their mount prefix, e.g. ``{"fhir_*": 120}``
+- ``MCP_TOOL_TIMEOUT_SECONDS`` (default 60; 0 disables)
+
+The deadline is published in ``backend.request_deadline`` so backend
+requests made by the call use the remaining time as their HTTP timeout.
+Nested calls (``execute_tool_plan`` steps) never outlive the enclosing
+call's deadline.
+When the deadline passes, or the client sends ``notifications/cancelled``
+(which cancels the request task), the awaiting backend request is cancelled
+and httpx closes its connection, freeing the pool slot. Timed-out and
+cancelled calls are counted as ``tool.timeout`` / ``tool.cancelled`` per tool.
+"""
+
+import asyncio
+import fnmatch
+import json
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import mcp.types as mt
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+from .backend import request_deadline
+from .metrics import ServerMetrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT_SECONDS", "60"))
+
+
+def load_timeout_rules(raw: Optional[str] = None) -> List[Tuple[str, float]]:
+    """Parse ``MCP_TOOL_TIMEOUTS`` into (glob, seconds) rules, most specific first."""
+    raw = os.getenv("MCP_TOOL_TIMEOUTS", "") if raw is None else raw
+    if not raw.strip():
+        return []
+    try:
+        rules = {pattern: float(seconds) for pattern, seconds in json.loads(raw).items()}
+    except (ValueError, TypeError, AttributeError):
+        logger.warning("Ignoring MCP_TOOL_TIMEOUTS: expected a JSON object of glob -> seconds")
+        return []
+    return sorted(rules.items(), key=lambda rule: len(rule[0]), reverse=True)
+
+
+class ToolTimeoutMiddleware(Middleware):
+    """
+    Apply per-tool timeouts and count timeouts and cancellations.
+
+    Args:
+        mcp: Server whose tools' meta may carry a ``timeout``
+        default_timeout: Seconds for tools without a rule (<= 0: no timeout)
+        rules: (glob, seconds) rules; defaults to ``MCP_TOOL_TIMEOUTS``
+        metrics: Metrics registry
+    """
+
+    def __init__(
+        self,
+        mcp: FastMCP,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+        rules: Optional[List[Tuple[str, float]]] = None,
+        metrics: Optional[ServerMetrics] = None,
+    ):
+        self.mcp = mcp
+        self.default_timeout = default_timeout
+        self.rules = load_timeout_rules() if rules is None else rules
+        self.metrics = metrics or get_metrics()
+        self._timeouts: Dict[str, Optional[float]] = {}
+
+    async def timeout_for(self, name: str) -> Optional[float]:
+        """Resolve (and cache) the timeout of a tool; None means unbounded."""
+        if name in self._timeouts:
+            return self._timeouts[name]
+
+        timeout: Optional[float] = None
+        try:
+            tool = await self.mcp.get_tool(name)
+            timeout = (tool.meta or {}).get("timeout")
+        except Exception:
+            tool = None
+        if timeout is None:
+            timeout = next((seconds for pattern, seconds in self.rules if fnmatch.fnmatchcase(name, pattern)),
+                           self.default_timeout)
+        timeout = float(timeout) if timeout and float(timeout) > 0 else None
+        if tool is not None:
+            # Unknown names are not cached so they cannot grow the table
+            self._timeouts[name] = timeout
+        return timeout
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        name = context.message.name
+        timeout = await self.timeout_for(name)
+        started = time.monotonic()
+        outer_deadline = request_deadline.get()
+        if outer_deadline is not None:
+            timeout = max(0.0, min(timeout or math.inf, outer_deadline - started))
+        deadline_token = request_deadline.set(started + timeout if timeout else None)
+        scope = asyncio.timeout(timeout)
+        try:
+            async with scope:
+                return await call_next(context)
+        except TimeoutError:
+            if not scope.expired():
+                raise
+            self.metrics.incr("tool.timeout", name)
+            raise ToolError(f"Tool '{name}' timed out after {timeout:g}s") from None
+        except asyncio.CancelledError:
+            self.metrics.incr("tool.cancelled", name)
+            raise
+        finally:
+            request_deadline.reset(deadline_token)
+            self.metrics.observe("tool.duration", name, time.monotonic() - started)
+
+
+def register_tool_timeouts(mcp: FastMCP, **kwargs: Any) -> ToolTimeoutMiddleware:
+    """Add per-tool timeouts to the server."""
+    middleware = ToolTimeoutMiddleware(mcp, **kwargs)
+    mcp.add_middleware(middleware)
+    return middleware
@@ -0,0 +1,100 @@
+"""
+Unix domain socket listener for co-located clients.
+
+The backend and local agent runners share a host with the MCP server; over a
+Unix socket their requests skip the TCP stack and need no port. With
+``--uds PATH`` (or ``MCP_UDS_PATH``) the streamable HTTP server listens on
+the socket instead of ``--host``/``--port``; the protocol, path and
+middleware are unchanged. Clients connect with e.g. httpx's
+``AsyncHTTPTransport(uds=PATH)`` or undici's ``Agent({ connect: { socketPath } })``.
+
+The socket is created by us rather than uvicorn so it is never reachable
+with uvicorn's default 0o666 permissions: it is bound, given
+``MCP_UDS_MODE`` (octal, default 660) and only then handed to uvicorn as a
+file descriptor. A stale socket file is replaced; the file is removed on
+shutdown.
+
+This hooks ``FastMCP.run_http_async``, which ``main()`` reaches through
+``mcp.run(transport="http")``.
+"""
+
+import logging
+import os
+import socket
+import stat
+from typing import Any, Dict, List, Optional
+
+from fastmcp import FastMCP
+
+logger = logging.getLogger(__name__)
+
+UDS_PATH = os.getenv("MCP_UDS_PATH", "")
+UDS_MODE = int(os.getenv("MCP_UDS_MODE", "660"), 8)
+UDS_BACKLOG = 2048
+
+
+def pop_uds_argument(argv: List[str]) -> Optional[str]:
+    """
+    Remove ``--uds PATH`` / ``--uds=PATH`` from ``argv`` and return PATH.
+
+    The generated CLI does not know the flag, so it must be taken out before
+    ``main()`` parses the arguments.
+    """
+    for index, arg in enumerate(argv):
+        if arg == "--uds":
+            if index + 1 >= len(argv):
+                raise SystemExit("--uds requires a socket path")
+            path = argv[index + 1]
+            del argv[index:index + 2]
+            return path
+        if arg.startswith("--uds="):
+            del argv[index]
+            return arg.split("=", 1)[1]
+    return None
+
+
+def bind_unix_socket(path: str, mode: int = UDS_MODE) -> socket.socket:
+    """
+    Bind a listening Unix socket at ``path`` with ``mode`` permissions.
+
+    Raises:
+        FileExistsError: If ``path`` exists and is not a socket
+    """
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise FileExistsError(f"{path} exists and is not a socket")
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Restrictive umask so the socket never exists with wider permissions
+        previous_umask = os.umask(0o777 & ~mode)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(path, mode)
+        sock.listen(UDS_BACKLOG)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def install_uds_listener(mcp: FastMCP, path: str, mode: int = UDS_MODE) -> None:
+    """Serve the server's HTTP transport on the Unix socket at ``path``."""
+    run_http_async = mcp.run_http_async
+
+    async def run_http_async_on_socket(*args: Any, uvicorn_config: Optional[Dict[str, Any]] = None,
+                                       **kwargs: Any) -> None:
+        sock = bind_unix_socket(path, mode)
+        logger.info("Serving MCP over Unix socket %s (mode %o)", path, mode)
+        try:
+            await run_http_async(*args, uvicorn_config={**(uvicorn_config or {}), "fd": sock.fileno()}, **kwargs)
+        finally:
+            sock.close()
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    mcp.run_http_async = run_http_async_on_socket
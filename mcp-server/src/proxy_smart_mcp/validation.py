@@ -0,0 +1,230 @@
+"""
+Compiled, reused argument validators for function tools.
+
+``FunctionTool.run`` resolves the tool function's type hints and signature to
+find its Context parameter, then validates and calls the function in one
+``TypeAdapter.validate_python`` step on every call. For the generated tools
+with nested admin payloads (smart app registration, launch contexts) that
+per-call work shows up, and validation time cannot be told apart from the
+tool's own time.
+
+``compile_tools`` replaces each function tool (on the server and on mounted
+sub-servers) with a ``CompiledFunctionTool`` carrying a ``ToolValidator``
+built once: a TypeAdapter over a TypedDict of the tool's parameters
+(``Field(...)`` defaults filled in by the adapter) plus the resolved Context
+parameter. Each call validates through it, records the time as
+``tool.validation`` (errors included) in the metrics registry, and then calls
+the function with the validated arguments. The return value goes through the
+public ``ToolResult`` constructor, which converts it as ``FunctionTool.run``
+does for tools with an output schema and the default serializer, so only
+those tools are compiled. Tools whose signature cannot be compiled keep
+FastMCP's own validation.
+
+FastMCP has no public API to enumerate a server's own tools and its mounted
+servers; ``_local_tools`` and ``_servers`` read them and, if FastMCP's
+layout changes, log a warning and leave every tool to FastMCP.
+"""
+
+import inspect
+import logging
+import math
+import time
+from typing import Annotated, Any, Dict, FrozenSet, Iterator, Optional, get_type_hints
+
+import mcp.types as mt
+from fastmcp import Context, FastMCP
+from fastmcp.server.dependencies import get_context
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from fastmcp.tools.tool import FunctionTool, ToolResult
+from fastmcp.utilities.types import find_kwarg_by_type
+from pydantic import ConfigDict, PrivateAttr, TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
+from typing_extensions import NotRequired, Required, TypedDict
+
+from .metrics import ServerMetrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_METRIC = "tool.validation"
+# Minimum seconds between rescans triggered by tool names not seen yet
+DEFAULT_RESCAN_INTERVAL = 5.0
+
+
+class ToolValidator:
+    """Argument validator compiled once from a tool function's signature."""
+
+    __slots__ = ("name", "adapter", "context_kwarg")
+
+    def __init__(self, name: str, adapter: TypeAdapter, context_kwarg: Optional[str]):
+        self.name = name
+        self.adapter = adapter
+        self.context_kwarg = context_kwarg
+
+    @classmethod
+    def compile(cls, name: str, fn: Any) -> "ToolValidator":
+        """
+        Build the validator for a tool function.
+
+        Raises:
+            TypeError: If the signature has *args/**kwargs or cannot be typed
+        """
+        context_kwarg = find_kwarg_by_type(fn, kwarg_type=Context)
+        try:
+            hints = get_type_hints(fn, include_extras=True)
+        except Exception:
+            hints = getattr(fn, "__annotations__", {})
+
+        fields: Dict[str, Any] = {}
+        for param_name, param in inspect.signature(fn).parameters.items():
+            if param_name == context_kwarg:
+                continue
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                raise TypeError(f"{name}: variadic parameters are not supported")
+            annotation = hints.get(param_name, Any)
+            if annotation is inspect.Parameter.empty:
+                annotation = Any
+            if param.default is inspect.Parameter.empty:
+                fields[param_name] = Required[annotation]
+            elif isinstance(param.default, FieldInfo):
+                # ``limit: int = Field(10)``: the adapter fills in the default
+                fields[param_name] = NotRequired[Annotated[annotation, param.default]]
+            else:
+                fields[param_name] = NotRequired[annotation]
+
+        arguments_type = TypedDict(f"{name}_arguments", fields)  # type: ignore[misc]
+        arguments_type.__pydantic_config__ = ConfigDict(extra="forbid", arbitrary_types_allowed=True)
+        return cls(name, TypeAdapter(arguments_type), context_kwarg)
+
+    def validate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return self.adapter.validate_python(arguments)
+
+
+class CompiledFunctionTool(FunctionTool):
+    """FunctionTool that validates with a precompiled ToolValidator."""
+
+    _validator: Optional[ToolValidator] = PrivateAttr(default=None)
+    _metrics: Optional[ServerMetrics] = PrivateAttr(default=None)
+
+    async def run(self, arguments: Dict[str, Any]) -> ToolResult:
+        validator = self._validator
+        metrics = self._metrics or get_metrics()
+        started = time.perf_counter()
+        try:
+            kwargs = validator.validate(arguments)
+        except ValidationError:
+            metrics.observe(VALIDATION_METRIC, self.name, time.perf_counter() - started, error=True)
+            raise
+        metrics.observe(VALIDATION_METRIC, self.name, time.perf_counter() - started)
+
+        if validator.context_kwarg:
+            kwargs[validator.context_kwarg] = get_context()
+        result = self.fn(**kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        if isinstance(result, ToolResult):
+            return result
+        structured = {"result": result} if self.output_schema.get("x-fastmcp-wrap-result") else result
+        return ToolResult(content=[] if result is None else result, structured_content=structured)
+
+    @classmethod
+    def compile(cls, tool: FunctionTool, metrics: Optional[ServerMetrics] = None) -> "CompiledFunctionTool":
+        """
+        Build the compiled replacement of a function tool.
+
+        Raises:
+            TypeError: If the tool has no output schema, a custom serializer,
+                or a signature that cannot be compiled
+        """
+        if tool.output_schema is None or tool.serializer is not None:
+            raise TypeError(f"{tool.name}: result conversion needs FunctionTool.run")
+        validator = ToolValidator.compile(tool.name, tool.fn)
+        compiled = cls(key=tool.key, **dict(tool))
+        compiled._validator = validator
+        compiled._metrics = metrics
+        return compiled
+
+
+def _local_tools(server: FastMCP) -> Optional[Dict[str, Any]]:
+    """The server's own tool registry (key -> tool), or None if FastMCP changed."""
+    tools = getattr(getattr(server, "_tool_manager", None), "_tools", None)
+    return tools if isinstance(tools, dict) else None
+
+
+def _servers(mcp: FastMCP) -> Iterator[FastMCP]:
+    yield mcp
+    for mounted in getattr(mcp, "_mounted_servers", None) or ():
+        server = getattr(mounted, "server", None)
+        if isinstance(server, FastMCP):
+            yield from _servers(server)
+
+
+def compile_tools(mcp: FastMCP, metrics: Optional[ServerMetrics] = None) -> int:
+    """
+    Swap function tools of the server and its mounted servers for compiled ones.
+
+    Returns:
+        Number of tools compiled by this call
+    """
+    compiled = 0
+    for server in _servers(mcp):
+        tools = _local_tools(server)
+        if tools is None:
+            logger.warning("Cannot reach the tools of %s; keeping FastMCP validation", server.name)
+            continue
+        for key, tool in list(tools.items()):
+            if type(tool) is not FunctionTool:
+                continue
+            try:
+                tools[key] = CompiledFunctionTool.compile(tool, metrics)
+            except Exception as exc:
+                logger.debug("Keeping FastMCP validation for %s: %s", key, exc)
+                continue
+            compiled += 1
+    return compiled
+
+
+class ValidatorCompilationMiddleware(Middleware):
+    """
+    Compile validators for tools added after startup.
+
+    A call to a tool name not seen in the last scan rescans the servers, at
+    most once per rescan_interval; until then such tools (and names that do
+    not exist at all) run with FastMCP's validation.
+    """
+
+    def __init__(
+        self,
+        mcp: FastMCP,
+        metrics: Optional[ServerMetrics] = None,
+        rescan_interval: float = DEFAULT_RESCAN_INTERVAL,
+    ):
+        self.mcp = mcp
+        self.metrics = metrics
+        self.rescan_interval = rescan_interval
+        self.rescans = 0
+        self._known: FrozenSet[str] = frozenset()
+        self._scanned_at = -math.inf
+
+    async def on_call_tool(self, context: MiddlewareContext[mt.CallToolRequestParams], call_next):
+        if (
+            context.message.name not in self._known
+            and time.monotonic() - self._scanned_at >= self.rescan_interval
+        ):
+            # Stamped before the await so concurrent misses do not all rescan
+            self._scanned_at = time.monotonic()
+            compile_tools(self.mcp, self.metrics)
+            self._known = frozenset(await self.mcp.get_tools())
+            self.rescans += 1
+        return await call_next(context)
+
+
+def register_compiled_validation(
+    mcp: FastMCP,
+    metrics: Optional[ServerMetrics] = None,
+    **kwargs: Any,
+) -> ValidatorCompilationMiddleware:
+    """Compile validators for the current tools and for tools added later."""
+    compile_tools(mcp, metrics)
+    middleware = ValidatorCompilationMiddleware(mcp, metrics, **kwargs)
+    mcp.add_middleware(middleware)
+    return middleware
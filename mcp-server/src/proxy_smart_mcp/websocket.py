@@ -0,0 +1,202 @@
+"""
+WebSocket transport alongside streamable HTTP.
+
+Agents that hold a session open for hours pay for streamable HTTP on every
+request: a new POST, header parsing, token validation and an API client per
+call. ``register_websocket_transport`` adds a WebSocket endpoint at
+``MCP_WS_PATH`` (default ``/mcp``, next to the streamable HTTP route; the two
+match different ASGI scope types) speaking the SDK's WebSocket transport
+(subprotocol ``mcp``, one JSON-RPC message per text frame):
+
+- the caller authenticates once, at upgrade time, with the usual
+  ``Authorization: Bearer`` header: via FastMCP's auth provider when one is
+  configured, otherwise via the generated API-client middleware's token
+  validation (when enabled). Rejected upgrades are closed with 1008 before
+  they are accepted; without a token they are rejected unless
+  ``MCP_WS_REQUIRE_AUTH`` is disabled
+- the validated identity and a single API client are kept for the life of
+  the connection (``fastpath.ConnectionScope``), so requests on it skip
+  re-validation and client construction
+- every message carries the upgrade request as its request context, so
+  header-based code (``get_caller_token``, ``get_http_headers``) works
+  unchanged
+- requests are multiplexed: the server handles each in its own task and
+  responses are written as they complete, in any order
+- the connection is closed when the validated token expires
+
+One connection is one MCP session; middleware, tools and notifications are
+shared with the HTTP transport.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Optional
+
+import anyio
+import mcp.types as types
+from fastmcp import FastMCP
+from mcp.server.auth.middleware.auth_context import auth_context_var
+from mcp.server.auth.middleware.bearer_auth import AuthenticatedUser
+from mcp.shared.message import ServerMessageMetadata, SessionMessage
+from pydantic import ValidationError
+from starlette.routing import WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from .fastpath import ConnectionScope, current_connection, is_api_client_middleware
+from .metrics import ServerMetrics, get_metrics
+
+logger = logging.getLogger(__name__)
+
+WS_PATH = os.getenv("MCP_WS_PATH", "/mcp")
+WS_REQUIRE_AUTH = os.getenv("MCP_WS_REQUIRE_AUTH", "true").lower() not in ("0", "false", "no")
+WS_SUBPROTOCOL = "mcp"
+
+POLICY_VIOLATION = 1008
+
+
+def _bearer_token(websocket: WebSocket) -> Optional[str]:
+    header = websocket.headers.get("authorization", "")
+    if header.lower().startswith("bearer ") and header[7:].strip():
+        return header[7:].strip()
+    return None
+
+
+def _token_validator(mcp: FastMCP) -> Any:
+    """``_validate`` of the generated API-client middleware, if it validates tokens."""
+    for middleware in mcp.middleware:
+        inner = getattr(middleware, "inner", middleware)
+        if is_api_client_middleware(inner) and getattr(inner, "validate_tokens", False):
+            validate = getattr(inner, "_validate", None)
+            if callable(validate):
+                return validate
+    return None
+
+
+class WebSocketTransport:
+    """ASGI WebSocket endpoint serving one MCP session per connection."""
+
+    def __init__(self, mcp: FastMCP, require_auth: bool = WS_REQUIRE_AUTH,
+                 metrics: Optional[ServerMetrics] = None):
+        self.mcp = mcp
+        self.require_auth = require_auth
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.connections = 0
+        self.metrics.gauge("websocket.connections", lambda: self.connections)
+
+    async def authenticate(self, websocket: WebSocket) -> Optional[ConnectionScope]:
+        """
+        Validate the upgrade request.
+
+        Returns:
+            The connection's identity, or None if the upgrade is rejected
+        """
+        token = _bearer_token(websocket)
+        user = websocket.scope.get("user")
+        if self.mcp.auth is not None:
+            # AuthenticationMiddleware has already validated the header
+            if not isinstance(user, AuthenticatedUser):
+                return None
+            return ConnectionScope(token, user.access_token)
+
+        if token is None:
+            return None if self.require_auth else ConnectionScope(None)
+        validate = _token_validator(self.mcp)
+        if validate is None:
+            return ConnectionScope(token)
+        try:
+            access_token = await validate(token)
+        except Exception as exc:
+            logger.info("WebSocket token validation failed: %s", exc)
+            return None
+        if access_token is None:
+            return None
+        return ConnectionScope(token, access_token)
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        websocket = WebSocket(scope, receive, send)
+        connection = await self.authenticate(websocket)
+        if connection is None:
+            self.metrics.incr("websocket.rejected")
+            await websocket.close(code=POLICY_VIOLATION)
+            return
+
+        offered = websocket.scope.get("subprotocols") or []
+        await websocket.accept(subprotocol=WS_SUBPROTOCOL if WS_SUBPROTOCOL in offered else None)
+        self.connections += 1
+        self.metrics.incr("websocket.accepted")
+        connection_token = current_connection.set(connection)
+        auth_token = None
+        if connection.access_token is not None and auth_context_var.get() is None:
+            auth_token = auth_context_var.set(AuthenticatedUser(connection.access_token))
+        try:
+            await self._serve(websocket, connection)
+        finally:
+            if auth_token is not None:
+                auth_context_var.reset(auth_token)
+            current_connection.reset(connection_token)
+            connection.close()
+            self.connections -= 1
+
+    async def _serve(self, websocket: WebSocket, connection: ConnectionScope) -> None:
+        server = self.mcp._mcp_server
+        metadata = ServerMessageMetadata(request_context=websocket)
+        read_writer, read_stream = anyio.create_memory_object_stream(0)
+        write_stream, write_reader = anyio.create_memory_object_stream(0)
+
+        async def reader() -> None:
+            async with read_writer:
+                try:
+                    while True:
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            return
+                        data = message.get("text")
+                        if data is None:
+                            data = message.get("bytes") or b""
+                        try:
+                            parsed = types.JSONRPCMessage.model_validate_json(data)
+                        except ValidationError as exc:
+                            await read_writer.send(exc)
+                            continue
+                        await read_writer.send(SessionMessage(parsed, metadata=metadata))
+                except (WebSocketDisconnect, anyio.ClosedResourceError):
+                    return
+
+        async def writer() -> None:
+            async with write_reader:
+                try:
+                    async for session_message in write_reader:
+                        await websocket.send_text(
+                            session_message.message.model_dump_json(by_alias=True, exclude_none=True))
+                except (WebSocketDisconnect, RuntimeError, anyio.ClosedResourceError):
+                    # Client gone; the reader sees the disconnect and ends the session
+                    return
+
+        async def expire() -> None:
+            expires_at = getattr(connection.access_token, "expires_at", None)
+            if not expires_at:
+                await anyio.sleep_forever()
+            await anyio.sleep(max(0.0, expires_at - time.time()))
+            self.metrics.incr("websocket.expired")
+            await websocket.close(code=POLICY_VIOLATION, reason="token expired")
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(writer)
+            tg.start_soon(expire)
+
+            async def run_server() -> None:
+                await server.run(read_stream, write_stream, server.create_initialization_options())
+
+            tg.start_soon(run_server)
+            await reader()
+            tg.cancel_scope.cancel()
+
+
+def register_websocket_transport(mcp: FastMCP, path: str = WS_PATH,
+                                 transport: Optional[WebSocketTransport] = None) -> WebSocketTransport:
+    """Serve this server over WebSocket at ``path`` of its HTTP app."""
+    if transport is None:
+        transport = WebSocketTransport(mcp)
+    mcp._additional_http_routes.append(WebSocketRoute(path, transport))
+    return transport
@@ -19,6 +19,22 @@ if str(generated_mcp_path) not in sys.path:
     sys.path.insert(0, str(generated_mcp_path))
 
 
+@pytest.fixture
+def main_order():
+    """Install the extensions, then the API-client middleware, as run.py and main() do."""
+    from proxy_smart_mcp.extensions import install_extensions
+    from proxy_smart_mcp.request_logging import stop_async_logging
+
+    def install(mcp, api_client_middleware):
+        install_extensions(mcp)
+        mcp.add_middleware(api_client_middleware)
+        return mcp
+
+    yield install
+    # install_extensions routes root logging through a listener thread
+    stop_async_logging()
+
+
 @pytest.fixture(scope="session")
 def backend_api_url():
     """Backend API base URL."""
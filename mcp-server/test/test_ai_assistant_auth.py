@@ -21,6 +21,9 @@ import httpx
 import jwt
 import pytest
 
+# Shared, cached discovery resolver (repeated calls reuse the fetched metadata)
+from proxy_smart_mcp.discovery import discover_token_endpoint
+
 
 # Test configuration
 AI_ASSISTANT_CLIENT_ID = "ai-assistant-agent"
@@ -28,75 +31,6 @@ BACKEND_PROXY_URL = "http://localhost:8445"
 MCP_SERVER_URL = "http://localhost:8000/mcp"
 
 
-async def discover_token_endpoint(backend_url: str) -> str:
-    """
-    Discover the token endpoint following MCP authorization spec.
-    
-    This implements the proper MCP discovery flow:
-    1. Fetch Protected Resource Metadata (RFC 9728) to get authorization server(s)
-    2. Fetch Authorization Server Metadata to get token endpoint
-    
-    The token endpoint URL is needed for the JWT assertion's audience (aud) claim.
-    
-    Args:
-        backend_url: The MCP server (backend proxy) URL
-        
-    Returns:
-        The authorization server's token endpoint URL
-    """
-    async with httpx.AsyncClient() as client:
-        # Step 1: Get Protected Resource Metadata (RFC 9728)
-        # This tells us which authorization server(s) to use
-        pr_response = await client.get(
-            f"{backend_url}/.well-known/oauth-protected-resource",
-            timeout=10.0
-        )
-        pr_response.raise_for_status()
-        pr_metadata = pr_response.json()
-        
-        # Extract authorization server(s)
-        auth_servers = pr_metadata.get("authorization_servers", [])
-        if not auth_servers:
-            raise ValueError("No authorization servers found in Protected Resource Metadata")
-        
-        # Use the first authorization server
-        # (In production, client should select appropriate server per RFC 9728 Section 7.6)
-        auth_server_url = auth_servers[0]
-        
-        # Step 2: Get Authorization Server Metadata
-        # Try OpenID Connect Discovery first, then OAuth 2.0 AS Metadata
-        # Per MCP spec: clients MUST support both discovery mechanisms
-        
-        # Try OpenID Connect Discovery
-        try:
-            oidc_response = await client.get(
-                f"{auth_server_url}/.well-known/openid-configuration",
-                timeout=10.0
-            )
-            oidc_response.raise_for_status()
-            as_metadata = oidc_response.json()
-            return as_metadata["token_endpoint"]
-        except (httpx.HTTPError, KeyError):
-            pass
-        
-        # Try OAuth 2.0 Authorization Server Metadata
-        try:
-            oauth_response = await client.get(
-                f"{auth_server_url}/.well-known/oauth-authorization-server",
-                timeout=10.0
-            )
-            oauth_response.raise_for_status()
-            as_metadata = oauth_response.json()
-            return as_metadata["token_endpoint"]
-        except (httpx.HTTPError, KeyError):
-            pass
-        
-        raise ValueError(
-            f"Could not discover token endpoint from authorization server {auth_server_url}. "
-            "Tried both OpenID Connect Discovery and OAuth 2.0 AS Metadata endpoints."
-        )
-
-
 def load_private_key() -> str:
     """Load the AI assistant's private key for JWT signing."""
     # Try to find the private key in the keys directory
@@ -0,0 +1,159 @@
+"""
+Tests for the asynchronous audit log.
+
+Tests audit behaviour including:
+- Tool calls recorded with caller, redacted arguments and outcome
+- Batched writes and flush
+- Rotation into compressed segments
+- Drop policies and backpressure when the queue is full
+- Validated client identity recorded in the production middleware order
+"""
+
+import asyncio
+import gzip
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware
+
+from proxy_smart_mcp.audit import AuditLog, redact, register_audit_log
+from proxy_smart_mcp.metrics import ServerMetrics
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_redact():
+    assert redact({"clientId": "app", "clientSecret": "s3cr3t", "users": [{"password": "x", "name": "a"}]}) == {
+        "clientId": "app",
+        "clientSecret": "[redacted]",
+        "users": [{"password": "[redacted]", "name": "a"}],
+    }
+
+
+async def test_tool_calls_audited(tmp_path):
+    mcp = FastMCP("audit-test")
+
+    @mcp.tool
+    async def create_app(client_id: str, client_secret: str) -> str:
+        return client_id
+
+    @mcp.tool
+    async def broken() -> str:
+        raise ToolError("backend unavailable")
+
+    audit = register_audit_log(mcp, AuditLog(path=str(tmp_path / "audit.jsonl"), metrics=ServerMetrics()))
+    async with Client(mcp) as client:
+        await client.call_tool("create_app", {"client_id": "app", "client_secret": "s3cr3t"})
+        with pytest.raises(ToolError):
+            await client.call_tool("broken", {})
+    await audit.close()
+
+    records = _lines(tmp_path / "audit.jsonl")
+    assert [(r["tool"], r["outcome"]) for r in records] == [("create_app", "ok"), ("broken", "error")]
+    assert records[0]["arguments"] == {"client_id": "app", "client_secret": "[redacted]"}
+    assert records[0]["caller"] == "anonymous"
+    assert records[1]["error"] == "backend unavailable"
+
+
+async def test_register_without_path_is_disabled():
+    assert register_audit_log(FastMCP("audit-off")) is None
+
+
+async def test_rotation_compresses_segments(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    audit = AuditLog(path=str(path), batch_size=10, max_bytes=200, backups=2, metrics=ServerMetrics())
+    for batch in range(4):
+        for i in range(10):
+            audit.submit({"tool": "t", "batch": batch, "i": i})
+        await audit.flush()
+    await audit.close()
+
+    assert audit.rotations == 4
+    assert not path.exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["audit.jsonl.1.gz", "audit.jsonl.2.gz"]
+    with gzip.open(tmp_path / "audit.jsonl.1.gz", "rt") as newest:
+        assert json.loads(newest.readline())["batch"] == 3
+
+
+async def test_drop_policies(tmp_path):
+    metrics = ServerMetrics()
+    oldest = AuditLog(path=str(tmp_path / "a.jsonl"), queue_size=2, flush_interval=10, metrics=metrics)
+    newest = AuditLog(path=str(tmp_path / "b.jsonl"), queue_size=2, flush_interval=10,
+                      drop_policy="drop_newest", metrics=metrics)
+    for audit in (oldest, newest):
+        # The writer is not scheduled yet, so the queue holds everything
+        results = [audit.submit({"i": i}) for i in range(4)]
+        await audit.close()
+        assert audit.dropped == 2
+
+    assert [r["i"] for r in _lines(tmp_path / "a.jsonl")] == [2, 3]
+    assert [r["i"] for r in _lines(tmp_path / "b.jsonl")] == [0, 1]
+    assert results == [True, True, False, False]
+    assert metrics.counter("audit.dropped", "drop_oldest") == 2
+
+    with pytest.raises(ValueError):
+        AuditLog(path=str(tmp_path / "c.jsonl"), drop_policy="spill")
+
+
+async def test_block_policy_applies_backpressure(tmp_path):
+    metrics = ServerMetrics()
+    audit = AuditLog(path=str(tmp_path / "audit.jsonl"), queue_size=2, batch_size=2,
+                     drop_policy="block", metrics=metrics)
+    await asyncio.gather(*(audit.record({"i": i}) for i in range(10)))
+    await audit.close()
+
+    assert audit.dropped == 0
+    assert sorted(r["i"] for r in _lines(tmp_path / "audit.jsonl")) == list(range(10))
+    assert metrics.latency("audit.backpressure").count > 0
+
+
+class ApiClientContextMiddleware(Middleware):
+    """Stand-in for the generated ApiClientContextMiddleware, validating one token."""
+
+    validate_tokens = True
+
+    async def _validate(self, token):
+        return SimpleNamespace(token=token, client_id="agent", scopes=["openid"], expires_at=None)
+
+    def _build_http_client(self, context):
+        return SimpleNamespace(configuration=SimpleNamespace(access_token="token"))
+
+    async def on_request(self, context, call_next):
+        context.fastmcp_context.set_state("access_token", await self._validate("token"))
+        context.fastmcp_context.set_state("api_client", self._build_http_client(context))
+        return await call_next(context)
+
+
+async def test_client_id_recorded_in_main_order(tmp_path, main_order):
+    mcp = FastMCP("audit-order-test")
+
+    @mcp.tool
+    async def list_things() -> str:
+        return "things"
+
+    @mcp.tool(tags={"scope:admin"})
+    async def delete_things() -> str:
+        return "deleted"
+
+    audit = AuditLog(path=str(tmp_path / "audit.jsonl"), metrics=ServerMetrics())
+    with patch("proxy_smart_mcp.extensions.register_audit_log", lambda server: register_audit_log(server, audit)):
+        main_order(mcp, ApiClientContextMiddleware())
+
+    async with Client(mcp) as client:
+        await client.call_tool("list_things", {})
+        with pytest.raises(ToolError):
+            await client.call_tool("delete_things", {})
+    await audit.close()
+
+    records = _lines(tmp_path / "audit.jsonl")
+    # The audit middleware runs outside token validation, denials included
+    assert [(r["tool"], r["outcome"], r["client_id"]) for r in records] == [
+        ("list_things", "ok", "agent"),
+        ("delete_things", "error", "agent"),
+    ]
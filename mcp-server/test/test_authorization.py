@@ -0,0 +1,193 @@
+"""
+Tests for the precomputed scope-to-tool authorization index.
+
+Tests authorization behaviour including:
+- Requirements from meta, scope tags and name rules
+- Bitset checks and cached allowed-tool sets
+- tools/list filtering and tools/call rejection by caller scopes
+- Index rebuild when tools are added, rate-limited for unknown names
+- Prefixed tools of mounted servers
+- Scopes of the token validated by the API-client middleware main() adds last
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware
+
+from proxy_smart_mcp.authorization import ScopeIndex, load_scope_rules, register_scope_authorization, required_scopes
+from proxy_smart_mcp.fastpath import FastPathMiddleware, install_fast_path
+
+
+class ApiClientContextMiddleware(Middleware):
+    """Stand-in for the generated ApiClientContextMiddleware, validating one token."""
+
+    def __init__(self, scopes):
+        self.validate_tokens = True
+        self.scopes = scopes
+
+    async def _validate(self, token):
+        return SimpleNamespace(token=token, client_id="agent", scopes=self.scopes, expires_at=None)
+
+    def _build_http_client(self, context):
+        return SimpleNamespace(configuration=SimpleNamespace(access_token="token"))
+
+    async def on_request(self, context, call_next):
+        context.fastmcp_context.set_state("access_token", await self._validate("token"))
+        context.fastmcp_context.set_state("api_client", self._build_http_client(context))
+        return await call_next(context)
+
+
+def test_required_scopes_sources():
+    mcp = FastMCP("scopes")
+
+    @mcp.tool(tags={"scope:admin", "users"}, meta={"required_scopes": ["user/*.read"]})
+    def delete_thing() -> str:
+        return "ok"
+
+    rules = load_scope_rules('{"delete_*": ["write"]}')
+    assert required_scopes(delete_thing, rules) == {"admin", "user/*.read", "write"}
+    assert load_scope_rules("not json") == []
+    assert load_scope_rules('["admin"]') == []
+    assert load_scope_rules('{"delete_*": "admin"}') == []
+
+
+def test_scope_index_bitsets():
+    index = ScopeIndex({"read": ["read"], "admin": ["read", "admin"], "open": []})
+    reader = index.mask(frozenset({"read", "unrelated"}))
+
+    assert index.allows("read", reader)
+    assert not index.allows("admin", reader)
+    assert index.allows("open", 0)
+    assert index.missing("admin", reader) == ["admin"]
+    assert index.allowed_tools(reader) == {"read", "open"}
+    assert index.allowed_tools(reader) is index.allowed_tools(reader)
+
+
+@pytest.fixture
+def scoped_server():
+    """Create a server with open and admin-only tools."""
+    mcp = FastMCP("authorization-test")
+
+    @mcp.tool
+    def list_things() -> str:
+        return "things"
+
+    @mcp.tool(tags={"scope:admin"})
+    def delete_things() -> str:
+        return "deleted"
+
+    return mcp, register_scope_authorization(mcp, rules=[], rebuild_interval=0)
+
+
+async def test_tools_filtered_and_calls_rejected(scoped_server):
+    mcp, _ = scoped_server
+    async with Client(mcp) as client:
+        names = {tool.name for tool in await client.list_tools()}
+        assert names == {"list_things"}
+        with pytest.raises(ToolError, match="requires scope"):
+            await client.call_tool("delete_things", {})
+
+
+async def test_scoped_caller_allowed(scoped_server):
+    mcp, _ = scoped_server
+    install_fast_path(mcp)
+    # Added last, as the generated main() does
+    mcp.add_middleware(ApiClientContextMiddleware(["admin"]))
+    async with Client(mcp) as client:
+        names = {tool.name for tool in await client.list_tools()}
+        result = await client.call_tool("delete_things", {})
+    assert names == {"list_things", "delete_things"}
+    assert result.data == "deleted"
+
+
+@pytest.mark.parametrize("scopes", [["admin"], ["openid"]])
+async def test_validated_scopes_in_main_order(scopes, main_order):
+    mcp = FastMCP("main-order-test")
+
+    @mcp.tool(tags={"scope:admin"})
+    def delete_things() -> str:
+        return "deleted"
+
+    main_order(mcp, ApiClientContextMiddleware(scopes))
+    kinds = [type(middleware).__name__ for middleware in mcp.middleware]
+    assert kinds.index("FastPathMiddleware") < kinds.index("ScopeAuthorizationMiddleware")
+    assert isinstance(mcp.middleware[kinds.index("FastPathMiddleware")], FastPathMiddleware)
+
+    async with Client(mcp) as client:
+        names = {tool.name for tool in await client.list_tools()}
+        if "admin" in scopes:
+            assert "delete_things" in names
+            assert (await client.call_tool("delete_things", {})).data == "deleted"
+        else:
+            assert "delete_things" not in names
+            with pytest.raises(ToolError, match="requires scope"):
+                await client.call_tool("delete_things", {})
+
+
+async def test_index_rebuilt_for_new_tools(scoped_server):
+    mcp, middleware = scoped_server
+    async with Client(mcp) as client:
+        await client.list_tools()
+        builds = middleware.rebuilds
+
+        @mcp.tool(tags={"scope:admin"})
+        def purge_things() -> str:
+            return "purged"
+
+        names = {tool.name for tool in await client.list_tools()}
+        assert "purge_things" not in names
+        assert middleware.rebuilds == builds + 1
+
+
+async def test_unknown_tool_rebuilds_rate_limited():
+    mcp = FastMCP("rate-limit-test")
+
+    @mcp.tool
+    def list_things() -> str:
+        return "things"
+
+    middleware = register_scope_authorization(mcp, rules=[], rebuild_interval=60)
+    async with Client(mcp) as client:
+        await client.list_tools()
+
+        @mcp.tool(tags={"scope:admin"})
+        def purge_things() -> str:
+            return "purged"
+
+        for name in ("purge_things", "missing_1", "missing_2"):
+            with pytest.raises(ToolError, match="Unknown tool"):
+                await client.call_tool(name, {})
+        names = {tool.name for tool in await client.list_tools()}
+
+    assert names == {"list_things"}
+    assert middleware.rebuilds == 1
+
+
+async def test_mounted_tools_matched_by_key():
+    main = FastMCP("main")
+    sub = FastMCP("roles")
+
+    @sub.tool
+    def get_thing() -> str:
+        return "thing"
+
+    @sub.tool(tags={"scope:admin"})
+    def delete_thing() -> str:
+        return "deleted"
+
+    main.mount(sub, prefix="roles")
+    middleware = register_scope_authorization(main, rules=load_scope_rules('{"roles_get_*": ["read"]}'))
+    install_fast_path(main)
+    main.add_middleware(ApiClientContextMiddleware(["read"]))
+    async with Client(main) as client:
+        names = {tool.name for tool in await client.list_tools()}
+        result = await client.call_tool("roles_get_thing", {})
+        with pytest.raises(ToolError, match="requires scope"):
+            await client.call_tool("roles_delete_thing", {})
+
+    assert names == {"roles_get_thing"}
+    assert result.data == "thing"
+    assert middleware.rebuilds == 1
@@ -0,0 +1,164 @@
+"""
+Tests for the notification broadcast hub.
+
+Tests broadcast behaviour including:
+- One serialized payload shared by all subscribers
+- Scope filtering of broadcasts
+- Drop-oldest on full subscriber queues
+- Subscriber queues allocated lazily, scope sets shared
+- Removal of subscribers whose sink fails
+- add_tool / remove_tool publishing to streamable HTTP GET streams
+"""
+
+import asyncio
+import json
+
+import httpx
+from fastmcp import FastMCP
+from fastmcp.tools import Tool
+
+from proxy_smart_mcp.broadcast import TOOLS_LIST_CHANGED, BroadcastHub, register_broadcast, sse_frame
+from proxy_smart_mcp.metrics import ServerMetrics
+from proxy_smart_mcp.sessions import SessionRegistry
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+               "clientInfo": {"name": "test", "version": "1"}},
+}
+
+
+async def test_publish_shares_one_payload():
+    hub = BroadcastHub()
+    first, second = hub.subscribe(), hub.subscribe()
+
+    assert hub.publish("notifications/message", {"level": "info", "data": "hi"}) == 2
+    a, b = await first.get(), await second.get()
+
+    assert a is b
+    assert json.loads(a.payload) == {
+        "jsonrpc": "2.0",
+        "method": "notifications/message",
+        "params": {"level": "info", "data": "hi"},
+    }
+    assert a.frame == sse_frame(a.payload)
+
+
+async def test_scope_filter():
+    hub = BroadcastHub()
+    admin = hub.subscribe(["openid", "admin"])
+    user = hub.subscribe(["openid"])
+
+    assert hub.tools_changed(required_scopes=["admin"]) == 1
+    assert admin.queue.qsize() == 1
+    assert user.queue.qsize() == 0
+
+    assert hub.tools_changed() == 2
+    assert hub.publish("notifications/x", required_scopes=["missing"]) == 0
+
+
+async def test_lazy_queue_and_shared_scopes():
+    hub = BroadcastHub()
+    first = hub.subscribe(["openid", "admin"])
+    second = hub.subscribe(("admin", "openid"))
+
+    assert first.scopes is second.scopes
+    assert first._queue is None
+    hub.tools_changed()
+    assert first._queue is not None and first.queue.qsize() == 1
+
+
+async def test_full_queue_drops_oldest():
+    hub = BroadcastHub(queue_size=2)
+    subscription = hub.subscribe()
+    for index in range(3):
+        hub.publish("notifications/x", {"n": index})
+
+    assert subscription.dropped == 1
+    assert json.loads((await subscription.get()).payload)["params"] == {"n": 1}
+    assert hub.stats()["dropped"] == 1
+
+
+async def test_failing_sink_is_unsubscribed():
+    hub = BroadcastHub()
+    received = []
+
+    async def good(broadcast):
+        received.append(broadcast.method)
+
+    async def broken(broadcast):
+        raise ConnectionError("gone")
+
+    hub.subscribe(sink=good)
+    hub.subscribe(sink=broken)
+    hub.tools_changed()
+    await asyncio.sleep(0.01)
+
+    assert received == [TOOLS_LIST_CHANGED]
+    assert len(hub) == 1
+
+
+async def _wait_for(predicate, attempts=100):
+    for _ in range(attempts):
+        if predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return predicate()
+
+
+async def test_get_streams_receive_tool_list_changes():
+    mcp = FastMCP("broadcast-test")
+
+    @mcp.tool
+    def echo(value: str) -> str:
+        return value
+
+    registry = SessionRegistry(max_sessions=0, memory_cap=0, idle_timeout=0, metrics=ServerMetrics())
+    hub = register_broadcast(mcp, BroadcastHub(), registry=registry)
+    app = mcp.http_app(path="/mcp")
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+            session_id = response.headers["mcp-session-id"]
+            registry.touch(session_id, scopes=["openid"])
+            await client.post(
+                "/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"},
+                headers=dict(HEADERS, **{"mcp-session-id": session_id}),
+            )
+
+        # Drive the GET stream directly: httpx's ASGI transport buffers whole responses
+        chunks = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                chunks.append(message["body"])
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/mcp", "raw_path": b"/mcp", "query_string": b"",
+            "root_path": "", "server": ("test", 80), "client": ("127.0.0.1", 1),
+            "headers": [(b"accept", b"text/event-stream"), (b"mcp-session-id", session_id.encode())],
+        }
+        stream = asyncio.create_task(app(scope, receive, send))
+        assert await _wait_for(lambda: len(hub) == 1)
+
+        mcp.add_tool(Tool.from_function(lambda: "hidden", name="admin_only", meta={"required_scopes": ["admin"]}))
+        mcp.remove_tool("echo")
+        assert await _wait_for(lambda: chunks)
+        await asyncio.sleep(0.05)
+
+        disconnect.set()
+        await asyncio.wait_for(stream, 5)
+
+    frames = [chunk for chunk in chunks if b"list_changed" in chunk]
+    # Registering admin_only published for "admin" holders only; the removal reached everyone
+    assert frames == [sse_frame(json.dumps({"jsonrpc": "2.0", "method": TOOLS_LIST_CHANGED},
+                                           separators=(",", ":")).encode())]
+    assert len(hub) == 0
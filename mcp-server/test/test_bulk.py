@@ -0,0 +1,169 @@
+"""
+Tests for the bulk-operation tools.
+
+Tests bulk behaviour including:
+- Tool registration for healthcare users, roles and SMART apps
+- Bounded fan-out concurrency
+- Per-item success/failure reporting
+- Progress notifications
+- Caller token forwarding to the backend
+"""
+
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp.backend import set_backend_client
+from proxy_smart_mcp.bulk import register_bulk_tools, run_bulk
+
+
+@pytest.fixture
+def bulk_server():
+    """Create a server with only the bulk tools registered."""
+    mcp = FastMCP("bulk-test")
+    register_bulk_tools(mcp)
+    return mcp
+
+
+@pytest.fixture
+def backend_calls():
+    """Install a mock backend and record every request it receives."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if request.method == "POST":
+            body = json.loads(request.content)
+            if body.get("username") == "duplicate":
+                return httpx.Response(409, json={"error": "User already exists"})
+            return httpx.Response(200, json={"id": f"id-{body['username']}", **body})
+        if request.method == "DELETE":
+            return httpx.Response(200, json={"success": True})
+        return httpx.Response(200, json={"success": True})
+
+    async def install():
+        set_backend_client(httpx.AsyncClient(
+            base_url="http://backend.test",
+            transport=httpx.MockTransport(handler),
+        ))
+
+    return calls, install
+
+
+class TestRunBulk:
+    """Test the bounded fan-out helper."""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Test no more than `concurrency` operations run at once."""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def operation(item):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return item * 2
+
+        summary = await run_bulk(list(range(20)), operation, concurrency=4)
+
+        assert max_in_flight == 4
+        assert summary["succeeded"] == 20
+        assert [entry["result"] for entry in summary["results"]] == [i * 2 for i in range(20)]
+
+    @pytest.mark.asyncio
+    async def test_failures_reported_per_item(self):
+        """Test a failing item does not abort the others."""
+        async def operation(item):
+            if item == 2:
+                raise ValueError("bad item")
+            return item
+
+        summary = await run_bulk([1, 2, 3], operation)
+
+        assert summary["failed"] == 1
+        assert summary["results"][1]["ok"] is False
+        assert summary["results"][1]["error"] == "bad item"
+        assert summary["results"][2]["ok"] is True
+
+
+class TestBulkTools:
+    """Test bulk tools through the MCP protocol."""
+
+    @pytest.mark.asyncio
+    async def test_tools_registered(self, bulk_server):
+        """Test create/update/delete variants exist for every resource."""
+        async with Client(bulk_server) as client:
+            names = {tool.name for tool in await client.list_tools()}
+
+        for resource in ("healthcare_users", "roles", "smart_apps"):
+            for verb in ("create", "update", "delete"):
+                assert f"bulk_{verb}_{resource}" in names
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_users(self, bulk_server, backend_calls):
+        """Test bulk create reports per-item outcomes and streams progress."""
+        calls, install = backend_calls
+        await install()
+        progress = []
+
+        async def on_progress(value, total, message):
+            progress.append((value, total))
+
+        users = [
+            {"username": "alice", "email": "a@example.org", "firstName": "A", "lastName": "L"},
+            {"username": "duplicate", "email": "d@example.org", "firstName": "D", "lastName": "U"},
+            {"username": "bob", "email": "b@example.org", "firstName": "B", "lastName": "O"},
+        ]
+
+        with patch.dict(os.environ, {"BACKEND_API_TOKEN": "bulk-token"}):
+            async with Client(bulk_server, progress_handler=on_progress) as client:
+                result = await client.call_tool("bulk_create_healthcare_users", {"items": users})
+
+        summary = result.structured_content
+        assert summary["total"] == 3
+        assert summary["failed"] == 1
+        assert summary["results"][1]["status_code"] == 409
+        assert "User already exists" in summary["results"][1]["error"]
+        assert summary["results"][0]["result"]["id"] == "id-alice"
+
+        assert all(call.url.path == "/admin/healthcare-users" for call in calls)
+        assert all(call.headers["Authorization"] == "Bearer bulk-token" for call in calls)
+        assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+    @pytest.mark.asyncio
+    async def test_bulk_delete_roles_quotes_ids(self, bulk_server, backend_calls):
+        """Test ids are URL-encoded into the item path."""
+        calls, install = backend_calls
+        await install()
+
+        async with Client(bulk_server) as client:
+            result = await client.call_tool("bulk_delete_roles", {"ids": ["nurse", "ward/admin"]})
+
+        assert result.structured_content["succeeded"] == 2
+        paths = sorted(call.url.raw_path.decode() for call in calls)
+        assert paths == ["/admin/roles/nurse", "/admin/roles/ward%2Fadmin"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_update_requires_id(self, bulk_server, backend_calls):
+        """Test update items without an id fail individually."""
+        calls, install = backend_calls
+        await install()
+
+        async with Client(bulk_server) as client:
+            result = await client.call_tool("bulk_update_smart_apps", {"items": [
+                {"id": "app-1", "data": {"name": "Renamed"}},
+                {"data": {"name": "No id"}},
+            ]})
+
+        summary = result.structured_content
+        assert summary["succeeded"] == 1
+        assert "clientId" in summary["results"][1]["error"]
+        assert [call.url.path for call in calls] == ["/admin/smart-apps/app-1"]
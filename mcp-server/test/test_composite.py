@@ -0,0 +1,262 @@
+"""
+Tests for the composite execute_tool_plan tool.
+
+Tests plan execution including:
+- Plan validation (duplicate ids, unknown references, cycles, recursion)
+- $ref substitution and for_each fan-out
+- Concurrent execution of independent branches
+- Error isolation and skipping of dependent steps
+- Nested step results not paged
+- Remaining for_each calls cancelled after the first failure
+- The private FastMCP hook behind call_tool_with_middleware
+"""
+
+import asyncio
+import inspect
+from typing import Any, Dict, List
+
+import pytest
+from fastmcp import Client, Context, FastMCP
+from fastmcp.server.middleware import Middleware
+
+from proxy_smart_mcp.composite import (
+    COMPOSITE_TOOL_NAME,
+    PlanError,
+    call_tool_with_middleware,
+    lookup_path,
+    parse_plan,
+    register_composite_tool,
+)
+from proxy_smart_mcp.paging import register_paging
+
+
+@pytest.fixture
+def plan_server():
+    """Create a small server with admin-like tools and the composite tool."""
+    mcp = FastMCP("plan-test")
+    state = {"in_flight": 0, "max_in_flight": 0}
+
+    @mcp.tool
+    async def list_smart_apps() -> Dict[str, Any]:
+        return {"result": [{"clientId": "app-1"}, {"clientId": "app-2"}]}
+
+    @mcp.tool
+    async def get_smart_app(client_id: str) -> Dict[str, Any]:
+        return {"result": {"clientId": client_id, "name": f"App {client_id}"}}
+
+    @mcp.tool
+    async def slow_echo(value: str) -> Dict[str, Any]:
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.05)
+        state["in_flight"] -= 1
+        return {"result": value}
+
+    @mcp.tool
+    async def broken() -> Dict[str, Any]:
+        raise ValueError("backend unavailable")
+
+    register_composite_tool(mcp)
+    mcp.test_state = state
+    return mcp
+
+
+async def run_plan(server: FastMCP, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async with Client(server) as client:
+        result = await client.call_tool(COMPOSITE_TOOL_NAME, {"plan": {"steps": steps}})
+        return result.structured_content
+
+
+class TestPlanValidation:
+    """Test plan parsing and validation."""
+
+    def test_infers_dependencies_from_refs(self):
+        """Test $ref and for_each add dependencies."""
+        steps = parse_plan({"steps": [
+            {"id": "apps", "tool": "list_smart_apps"},
+            {"id": "details", "tool": "get_smart_app", "for_each": "apps.result",
+             "arguments": {"client_id": {"$ref": "$item.clientId"}}},
+        ]})
+
+        assert steps[1].depends_on == {"apps"}
+
+    def test_duplicate_ids_rejected(self):
+        """Test duplicate step ids are rejected."""
+        with pytest.raises(PlanError, match="Duplicate"):
+            parse_plan({"steps": [
+                {"id": "a", "tool": "x"},
+                {"id": "a", "tool": "y"},
+            ]})
+
+    def test_unknown_reference_rejected(self):
+        """Test references to undeclared steps are rejected."""
+        with pytest.raises(PlanError, match="unknown step"):
+            parse_plan({"steps": [
+                {"id": "a", "tool": "x", "arguments": {"v": {"$ref": "missing.result"}}},
+            ]})
+
+    def test_cycle_rejected(self):
+        """Test dependency cycles are rejected."""
+        with pytest.raises(PlanError, match="cycle"):
+            parse_plan({"steps": [
+                {"id": "a", "tool": "x", "depends_on": ["b"]},
+                {"id": "b", "tool": "y", "depends_on": ["a"]},
+            ]})
+
+    def test_recursion_rejected(self):
+        """Test a plan cannot call the composite tool itself."""
+        with pytest.raises(PlanError, match="recursively"):
+            parse_plan({"steps": [{"id": "a", "tool": COMPOSITE_TOOL_NAME}]})
+
+    def test_item_ref_requires_for_each(self):
+        """Test $item references outside for_each are rejected."""
+        with pytest.raises(PlanError, match="for_each"):
+            parse_plan({"steps": [
+                {"id": "a", "tool": "x", "arguments": {"v": {"$ref": "$item.id"}}},
+            ]})
+
+    def test_depends_on_must_list_step_ids(self):
+        """Test a malformed depends_on is rejected instead of split or hashed."""
+        for depends_on in ("ab", [["a"]], {"a": 1}):
+            with pytest.raises(PlanError, match="depends_on"):
+                parse_plan({"steps": [
+                    {"id": "a", "tool": "x"},
+                    {"id": "b", "tool": "y", "depends_on": depends_on},
+                ]})
+
+    def test_lookup_path(self):
+        """Test dotted path lookup through dicts and lists."""
+        data = {"result": [{"clientId": "app-1"}]}
+        assert lookup_path(data, "result.0.clientId") == "app-1"
+
+        with pytest.raises(PlanError):
+            lookup_path(data, "result.5.clientId")
+
+
+class TestPlanExecution:
+    """Test executing plans through the MCP protocol."""
+
+    @pytest.mark.asyncio
+    async def test_chained_fan_out(self, plan_server):
+        """Test list -> get each chain in one request."""
+        result = await run_plan(plan_server, [
+            {"id": "apps", "tool": "list_smart_apps"},
+            {"id": "details", "tool": "get_smart_app", "for_each": "apps.result",
+             "arguments": {"client_id": {"$ref": "$item.clientId"}}},
+        ])
+
+        assert result["errors"] == {}
+        names = [entry["result"]["name"] for entry in result["results"]["details"]]
+        assert names == ["App app-1", "App app-2"]
+
+    @pytest.mark.asyncio
+    async def test_independent_steps_run_concurrently(self, plan_server):
+        """Test independent branches overlap in time."""
+        result = await run_plan(plan_server, [
+            {"id": "a", "tool": "slow_echo", "arguments": {"value": "a"}},
+            {"id": "b", "tool": "slow_echo", "arguments": {"value": "b"}},
+            {"id": "c", "tool": "slow_echo", "arguments": {"value": "c"}},
+        ])
+
+        assert result["errors"] == {}
+        assert plan_server.test_state["max_in_flight"] == 3
+
+    @pytest.mark.asyncio
+    async def test_failed_step_skips_dependents(self, plan_server):
+        """Test a failing step does not abort unrelated branches."""
+        result = await run_plan(plan_server, [
+            {"id": "bad", "tool": "broken"},
+            {"id": "after", "tool": "slow_echo", "depends_on": ["bad"],
+             "arguments": {"value": "never"}},
+            {"id": "ok", "tool": "slow_echo", "arguments": {"value": "fine"}},
+        ])
+
+        assert "backend unavailable" in result["errors"]["bad"]
+        assert result["errors"]["after"].startswith("Skipped")
+        assert result["results"]["ok"] == {"result": "fine"}
+
+    @pytest.mark.asyncio
+    async def test_nested_results_not_paged(self):
+        """Test for_each sees the whole list even when paging would cut it."""
+        mcp = FastMCP("plan-paging-test")
+
+        @mcp.tool
+        def list_ids() -> Dict[str, Any]:
+            return {"result": [{"id": i} for i in range(30)]}
+
+        @mcp.tool
+        def echo(value: int) -> Dict[str, Any]:
+            return {"result": value}
+
+        register_composite_tool(mcp)
+        register_paging(mcp, threshold_bytes=100, page_size=10)
+        result = await run_plan(mcp, [
+            {"id": "ids", "tool": "list_ids"},
+            {"id": "each", "tool": "echo", "for_each": "ids.result",
+             "arguments": {"value": {"$ref": "$item.id"}}},
+        ])
+
+        assert result["errors"] == {}
+        assert len(result["results"]["each"]) == 30
+        assert "_page" not in result["results"]["ids"]
+
+    @pytest.mark.asyncio
+    async def test_fan_out_cancelled_on_first_failure(self):
+        """Test a failing for_each item cancels the calls still running for the others."""
+        mcp = FastMCP("plan-cancel-test")
+        finished = []
+
+        @mcp.tool
+        def ids() -> Dict[str, Any]:
+            return {"result": [0, 1, 2, 3]}
+
+        @mcp.tool
+        async def fetch(value: int) -> Dict[str, Any]:
+            if value == 0:
+                raise ValueError("item 0 failed")
+            await asyncio.sleep(0.2)
+            finished.append(value)
+            return {"result": value}
+
+        register_composite_tool(mcp)
+        result = await run_plan(mcp, [
+            {"id": "ids", "tool": "ids"},
+            {"id": "each", "tool": "fetch", "for_each": "ids.result",
+             "arguments": {"value": {"$ref": "$item"}}},
+        ])
+        await asyncio.sleep(0.3)
+
+        assert "item 0 failed" in result["errors"]["each"]
+        assert finished == []
+
+
+class TestMiddlewareAdapter:
+    """Test the one place plans depend on FastMCP internals."""
+
+    def test_fastmcp_hook_signature(self):
+        """Fails when a FastMCP upgrade renames or reshapes _call_tool_middleware."""
+        hook = getattr(FastMCP, "_call_tool_middleware", None)
+        assert hook is not None
+        assert list(inspect.signature(hook).parameters) == ["self", "key", "arguments"]
+
+    @pytest.mark.asyncio
+    async def test_calls_run_through_middleware(self):
+        """Test adapter calls pass the server middleware."""
+        mcp = FastMCP("adapter-test")
+        seen = []
+
+        class Recorder(Middleware):
+            async def on_call_tool(self, context, call_next):
+                seen.append(context.message.name)
+                return await call_next(context)
+
+        @mcp.tool
+        def echo(value: str) -> str:
+            return value
+
+        mcp.add_middleware(Recorder())
+        async with Context(mcp):
+            result = await call_tool_with_middleware(mcp, "echo", {"value": "hi"})
+
+        assert result.structured_content == {"result": "hi"}
+        assert seen == ["echo"]
@@ -0,0 +1,146 @@
+"""
+Tests for delta sync of collection list tools.
+
+Tests delta behaviour including:
+- Added / changed / removed items between versions
+- Full sync for empty, foreign and expired cursors
+- `since_cursor` schema injection and argument stripping
+- Plain calls without a cursor are untouched
+- Output schema of list-typed tools widened to admit the delta
+"""
+
+from typing import Any, Dict, List
+
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp.delta import DeltaSyncMiddleware, VersionedSnapshot, delta_id_field
+
+APPS = [
+    {"clientId": "app-1", "name": "Viewer"},
+    {"clientId": "app-2", "name": "Scheduler"},
+]
+
+
+def test_snapshot_reports_changes_since_cursor():
+    snapshot = VersionedSnapshot("clientId")
+    snapshot.apply(APPS)
+    cursor = snapshot.cursor()
+
+    snapshot.apply([
+        {"clientId": "app-1", "name": "Viewer v2"},
+        {"clientId": "app-3", "name": "Billing"},
+    ])
+    delta = snapshot.changes_since(cursor)
+
+    assert delta["full_sync"] is False
+    assert delta["added"] == [{"clientId": "app-3", "name": "Billing"}]
+    assert delta["changed"] == [{"clientId": "app-1", "name": "Viewer v2"}]
+    assert delta["removed"] == ["app-2"]
+    assert delta["cursor"] != cursor
+
+
+def test_snapshot_unchanged_collection_keeps_cursor():
+    snapshot = VersionedSnapshot("clientId")
+    snapshot.apply(APPS)
+    cursor = snapshot.cursor()
+    snapshot.apply(list(reversed(APPS)))
+
+    delta = snapshot.changes_since(cursor)
+    assert delta["cursor"] == cursor
+    assert delta["added"] == delta["changed"] == delta["removed"] == []
+
+
+def test_snapshot_full_sync_for_unknown_cursors():
+    snapshot = VersionedSnapshot("clientId")
+    snapshot.apply(APPS)
+
+    for cursor in (None, "", "other-epoch.1", f"{snapshot.epoch}.99", "garbage"):
+        delta = snapshot.changes_since(cursor)
+        assert delta["full_sync"] is True
+        assert len(delta["added"]) == 2
+
+
+def test_snapshot_expired_tombstones_force_full_sync():
+    snapshot = VersionedSnapshot("clientId", tombstone_limit=1)
+    snapshot.apply(APPS)
+    cursor = snapshot.cursor()
+    snapshot.apply([APPS[0]])
+    snapshot.apply([])
+
+    assert snapshot.changes_since(cursor)["full_sync"] is True
+
+
+def test_delta_id_field():
+    assert delta_id_field("list_admin_smart_apps") == "clientId"
+    assert delta_id_field("list_admin_launch_contexts") == "userId"
+    assert delta_id_field("list_admin_idps") == "alias"
+    assert delta_id_field("list_admin_healthcare_users") == "id"
+    assert delta_id_field("delete_admin_smart_apps_by_client_id") is None
+    assert delta_id_field("list_admin_roles") is None
+
+
+@pytest.fixture
+def delta_server():
+    """Create a server with a mutable smart-apps list tool."""
+    mcp = FastMCP("delta-test")
+    state = {"apps": list(APPS), "arguments": None}
+
+    @mcp.tool
+    def list_admin_smart_apps(max: int = 100) -> dict:
+        state["arguments"] = {"max": max}
+        return {"result": state["apps"]}
+
+    mcp.add_middleware(DeltaSyncMiddleware())
+    return mcp, state
+
+
+async def test_list_tools_advertise_since_cursor(delta_server):
+    mcp, _ = delta_server
+    async with Client(mcp) as client:
+        tools = {tool.name: tool for tool in await client.list_tools()}
+    assert "since_cursor" in tools["list_admin_smart_apps"].inputSchema["properties"]
+
+
+async def test_delta_sync_through_tool(delta_server):
+    mcp, state = delta_server
+    async with Client(mcp) as client:
+        first = await client.call_tool("list_admin_smart_apps", {"since_cursor": "", "max": 10})
+        initial = first.structured_content["result"]
+        assert initial["full_sync"] is True
+        assert len(initial["added"]) == 2
+        assert state["arguments"] == {"max": 10}
+
+        state["apps"] = [APPS[0], {"clientId": "app-4", "name": "Labs"}]
+        second = await client.call_tool(
+            "list_admin_smart_apps", {"since_cursor": initial["cursor"], "max": 10}
+        )
+        delta = second.structured_content["result"]
+        assert delta["full_sync"] is False
+        assert [app["clientId"] for app in delta["added"]] == ["app-4"]
+        assert delta["removed"] == ["app-2"]
+
+        plain = await client.call_tool("list_admin_smart_apps", {})
+        assert len(plain.structured_content["result"]) == 2
+
+
+async def test_delta_sync_list_typed_tool():
+    mcp = FastMCP("delta-list-test")
+
+    @mcp.tool
+    def list_admin_idps() -> List[Dict[str, Any]]:
+        return [{"alias": "google"}, {"alias": "okta"}]
+
+    mcp.add_middleware(DeltaSyncMiddleware())
+    async with Client(mcp) as client:
+        tools = {tool.name: tool for tool in await client.list_tools()}
+        schema = tools["list_admin_idps"].outputSchema["properties"]["result"]
+        assert len(schema["anyOf"]) == 2
+
+        result = await client.call_tool("list_admin_idps", {"since_cursor": ""})
+        delta = result.structured_content["result"]
+        assert delta["full_sync"] is True
+        assert [idp["alias"] for idp in delta["added"]] == ["google", "okta"]
+
+        plain = await client.call_tool("list_admin_idps", {})
+        assert len(plain.structured_content["result"]) == 2
@@ -0,0 +1,155 @@
+"""
+Tests for the in-memory user and role lookup index.
+
+Tests directory behaviour including:
+- Prefix and trigram matching with ranking
+- Incremental snapshot sync (added/changed/removed)
+- Snapshot paging from the backend
+- Invalidation by mutating tools and forced live lookups
+- Per-caller snapshots
+"""
+
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp import directory as directory_module
+from proxy_smart_mcp.backend import set_backend_client
+from proxy_smart_mcp.directory import DirectoryIndex, TrigramIndex, is_directory_mutation, register_directory_tools
+
+USERS = [
+    {"id": "1", "username": "jdoe", "firstName": "Jane", "lastName": "Doe", "email": "jane.doe@example.org", "npi": "1234567890"},
+    {"id": "2", "username": "jdorian", "firstName": "John", "lastName": "Dorian", "email": "jd@sacred-heart.org"},
+    {"id": "3", "username": "pcox", "firstName": "Perry", "lastName": "Cox", "email": "cox@sacred-heart.org"},
+]
+ROLES = [
+    {"name": "physician", "description": "Attending physician"},
+    {"name": "nurse", "description": "Registered nurse"},
+]
+
+
+@pytest.fixture
+def directory_backend():
+    """Serve users (paged) and roles; record requests."""
+    state = {"users": list(USERS), "requests": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(request)
+        if request.url.path == "/admin/roles":
+            return httpx.Response(200, json=ROLES)
+        offset = int(request.url.params.get("offset", 0))
+        limit = int(request.url.params.get("limit", 50))
+        return httpx.Response(200, json=state["users"][offset:offset + limit])
+
+    async def install():
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+
+    return state, install
+
+
+class TestTrigramIndex:
+    """Test the index structure."""
+
+    @pytest.fixture
+    def index(self):
+        index = TrigramIndex(("username", "firstName", "lastName", "email"), "id")
+        index.sync(USERS)
+        return index
+
+    def test_prefix_and_substring(self, index):
+        """Test short prefixes and infix substrings both match."""
+        assert [user["id"] for user in index.search("do")] == ["1", "2"]
+        assert [user["id"] for user in index.search("rian")] == ["2"]
+        assert index.search("sacred heart cox")[0]["id"] == "3"
+        assert index.search("zzz") == []
+
+    def test_ranking_prefers_exact(self, index):
+        """Test an exact field match ranks above a prefix match."""
+        assert index.search("jdoe")[0]["id"] == "1"
+
+    def test_incremental_sync(self, index):
+        """Test sync only touches changed records."""
+        changes = index.sync([
+            {**USERS[0], "lastName": "Smith"},
+            USERS[1],
+            {"id": "4", "username": "new"},
+        ])
+        assert changes == {"added": 1, "changed": 1, "removed": 1}
+        assert index.search("smith")[0]["id"] == "1"
+        assert index.search("cox") == []
+
+
+class TestDirectoryIndex:
+    """Test snapshot loading, refresh and invalidation."""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_paged_and_cached(self, directory_backend):
+        """Test the snapshot pages through users and later lookups stay local."""
+        state, install = directory_backend
+        await install()
+        directory = DirectoryIndex()
+
+        with patch.object(directory_module, "SNAPSHOT_PAGE_SIZE", 2):
+            first = await directory.find_users(None, "sacred")
+            await directory.find_users(None, "jane")
+            roles = await directory.find_roles(None, "nur")
+
+        assert {user["id"] for user in first} == {"2", "3"}
+        assert roles[0]["name"] == "nurse"
+        user_requests = [r for r in state["requests"] if r.url.path == "/admin/healthcare-users"]
+        assert [r.url.params["offset"] for r in user_requests] == ["0", "2"]
+        assert len(state["requests"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_per_caller_snapshots(self, directory_backend):
+        """Test callers do not share snapshots."""
+        state, install = directory_backend
+        await install()
+        directory = DirectoryIndex()
+
+        for token in ("alice", "bob"):
+            with patch.dict(os.environ, {"BACKEND_API_TOKEN": token}):
+                await directory.find_users(None, "jane")
+
+        assert directory.stats()["callers"] == 2
+        assert {r.headers["Authorization"] for r in state["requests"]} == {"Bearer alice", "Bearer bob"}
+
+    def test_mutation_detection(self):
+        """Test mutating user/role tools are recognized."""
+        assert is_directory_mutation("create_admin_healthcare_users")
+        assert is_directory_mutation("bulk_delete_roles")
+        assert is_directory_mutation("put_admin_roles_by_role_name")
+        assert not is_directory_mutation("list_admin_roles")
+        assert not is_directory_mutation("create_smart_app")
+
+
+class TestDirectoryTools:
+    """Test the lookup tools through MCP."""
+
+    @pytest.mark.asyncio
+    async def test_invalidation_and_live(self, directory_backend):
+        """Test a mutating tool forces a reload and live=true queries the backend."""
+        state, install = directory_backend
+        await install()
+        mcp = FastMCP("directory-test")
+
+        @mcp.tool
+        def create_admin_healthcare_users(username: str) -> dict:
+            state["users"].append({"id": "9", "username": username})
+            return {"result": {"id": "9"}}
+
+        register_directory_tools(mcp, DirectoryIndex())
+
+        async with Client(mcp) as client:
+            before = await client.call_tool("find_healthcare_users", {"query": "elliot"})
+            await client.call_tool("create_admin_healthcare_users", {"username": "elliot"})
+            after = await client.call_tool("find_healthcare_users", {"query": "elliot"})
+            requests_before_live = len(state["requests"])
+            await client.call_tool("find_roles", {"query": "phys", "live": True})
+
+        assert before.structured_content["result"] == []
+        assert after.structured_content["result"][0]["id"] == "9"
+        assert len(state["requests"]) > requests_before_live
@@ -0,0 +1,316 @@
+"""
+Tests for the shared OAuth/OIDC discovery resolver.
+
+Tests discovery behaviour including:
+- Protected Resource Metadata -> Authorization Server Metadata flow
+- Cache-Control max-age / no-store handling
+- ETag revalidation with If-None-Match
+- Concurrent probing of OIDC and OAuth AS metadata endpoints
+- Coalescing of concurrent lookups
+- Stale copy served when revalidation fails
+- Discovered JWT verifier handed to the validating API-client middleware
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware
+
+from proxy_smart_mcp.discovery import (
+    DiscoveredJWTVerifier,
+    DiscoveryError,
+    DiscoveryResolver,
+    install_discovered_verifier,
+    parse_cache_lifetime,
+)
+
+
+RESOURCE_URL = "http://localhost:8445"
+AUTH_SERVER_URL = "http://localhost:8445/auth"
+
+PR_METADATA = {
+    "resource": f"{RESOURCE_URL}/mcp",
+    "authorization_servers": [AUTH_SERVER_URL],
+}
+
+AS_METADATA = {
+    "issuer": "http://localhost:8080/realms/proxy-smart",
+    "token_endpoint": "http://localhost:8080/realms/proxy-smart/protocol/openid-connect/token",
+    "jwks_uri": "http://localhost:8080/realms/proxy-smart/protocol/openid-connect/certs",
+}
+
+
+def make_resolver(handler) -> DiscoveryResolver:
+    """Create a resolver backed by an httpx MockTransport."""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return DiscoveryResolver(client=client)
+
+
+class TestCacheLifetime:
+    """Test Cache-Control parsing."""
+
+    def test_max_age(self):
+        """Test max-age sets the lifetime."""
+        headers = httpx.Headers({"Cache-Control": "public, max-age=120"})
+        assert parse_cache_lifetime(headers, 300.0) == 120.0
+
+    def test_no_store(self):
+        """Test no-store disables caching."""
+        headers = httpx.Headers({"Cache-Control": "no-store"})
+        assert parse_cache_lifetime(headers, 300.0) is None
+
+    def test_default_ttl(self):
+        """Test default lifetime without Cache-Control."""
+        assert parse_cache_lifetime(httpx.Headers(), 300.0) == 300.0
+
+
+class TestDiscoveryFlow:
+    """Test the full discovery flow."""
+
+    @pytest.mark.asyncio
+    async def test_discover_token_endpoint(self):
+        """Test discovery resolves the token endpoint via OIDC."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/.well-known/oauth-protected-resource":
+                return httpx.Response(200, json=PR_METADATA)
+            if request.url.path == "/auth/.well-known/openid-configuration":
+                return httpx.Response(200, json=AS_METADATA)
+            return httpx.Response(404)
+
+        resolver = make_resolver(handler)
+        metadata = await resolver.discover(RESOURCE_URL)
+
+        assert metadata.token_endpoint == AS_METADATA["token_endpoint"]
+        assert metadata.jwks_uri == AS_METADATA["jwks_uri"]
+        assert metadata.issuer == AS_METADATA["issuer"]
+
+    @pytest.mark.asyncio
+    async def test_fallback_to_oauth_metadata(self):
+        """Test OAuth AS metadata is used when OIDC discovery fails."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/.well-known/oauth-protected-resource":
+                return httpx.Response(200, json=PR_METADATA)
+            if request.url.path == "/auth/.well-known/oauth-authorization-server":
+                return httpx.Response(200, json=AS_METADATA)
+            return httpx.Response(404)
+
+        resolver = make_resolver(handler)
+
+        assert await resolver.token_endpoint(RESOURCE_URL) == AS_METADATA["token_endpoint"]
+
+    @pytest.mark.asyncio
+    async def test_fallback_endpoints_probed_concurrently(self):
+        """Test both AS metadata endpoints are in flight at the same time."""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, max_in_flight
+            if request.url.path == "/.well-known/oauth-protected-resource":
+                return httpx.Response(200, json=PR_METADATA)
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            if request.url.path.endswith("oauth-authorization-server"):
+                return httpx.Response(200, json=AS_METADATA)
+            return httpx.Response(404)
+
+        resolver = make_resolver(handler)
+        await resolver.discover(RESOURCE_URL)
+
+        assert max_in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_no_authorization_servers(self):
+        """Test an error is raised when no authorization server is advertised."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"resource": RESOURCE_URL})
+
+        resolver = make_resolver(handler)
+
+        with pytest.raises(DiscoveryError):
+            await resolver.discover(RESOURCE_URL)
+
+    @pytest.mark.asyncio
+    async def test_no_metadata_endpoint(self):
+        """Test an error is raised when neither metadata endpoint answers."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/.well-known/oauth-protected-resource":
+                return httpx.Response(200, json=PR_METADATA)
+            return httpx.Response(404)
+
+        resolver = make_resolver(handler)
+
+        with pytest.raises(DiscoveryError, match="Could not discover token endpoint"):
+            await resolver.discover(RESOURCE_URL)
+
+
+class TestDiscoveryCaching:
+    """Test HTTP cache-aware document caching."""
+
+    @pytest.mark.asyncio
+    async def test_fresh_document_served_from_cache(self):
+        """Test repeated lookups within max-age do not hit the network."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            return httpx.Response(200, json=AS_METADATA, headers={"Cache-Control": "max-age=60"})
+
+        resolver = make_resolver(handler)
+        url = f"{AUTH_SERVER_URL}/.well-known/openid-configuration"
+
+        await resolver.fetch_json(url)
+        await resolver.fetch_json(url)
+
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_no_store_is_not_cached(self):
+        """Test no-store responses are fetched every time."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            return httpx.Response(200, json=AS_METADATA, headers={"Cache-Control": "no-store"})
+
+        resolver = make_resolver(handler)
+        url = f"{AUTH_SERVER_URL}/.well-known/openid-configuration"
+
+        await resolver.fetch_json(url)
+        await resolver.fetch_json(url)
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_document_revalidated_with_etag(self):
+        """Test stale entries are revalidated with If-None-Match."""
+        seen_validators = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen_validators.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304, headers={"Cache-Control": "max-age=60"})
+            return httpx.Response(
+                200,
+                json=AS_METADATA,
+                headers={"Cache-Control": "no-cache", "ETag": '"v1"'}
+            )
+
+        resolver = make_resolver(handler)
+        url = f"{AUTH_SERVER_URL}/.well-known/openid-configuration"
+
+        first = await resolver.fetch_json(url)
+        second = await resolver.fetch_json(url)
+        third = await resolver.fetch_json(url)
+
+        assert first == second == third == AS_METADATA
+        # Initial fetch, one 304 revalidation, then fresh for max-age=60
+        assert seen_validators == [None, '"v1"']
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_coalesced(self):
+        """Test concurrent lookups of the same URL share one request."""
+        calls = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=AS_METADATA)
+
+        resolver = make_resolver(handler)
+        url = f"{AUTH_SERVER_URL}/.well-known/openid-configuration"
+
+        results = await asyncio.gather(*(resolver.fetch_json(url) for _ in range(10)))
+
+        assert all(result == AS_METADATA for result in results)
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self):
+        """Test invalidation forces a refetch."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            return httpx.Response(200, json=AS_METADATA)
+
+        resolver = make_resolver(handler)
+        url = f"{AUTH_SERVER_URL}/.well-known/openid-configuration"
+
+        await resolver.fetch_json(url)
+        resolver.invalidate(url)
+        await resolver.fetch_json(url)
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_stale_copy_served_when_revalidation_fails(self):
+        """Test a failed revalidation serves the stale copy; without one it raises."""
+        responses = [httpx.Response(200, json=AS_METADATA, headers={"Cache-Control": "no-cache"}),
+                     httpx.Response(503), httpx.ConnectError("down")]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        resolver = make_resolver(handler)
+        url = f"{AUTH_SERVER_URL}/.well-known/openid-configuration"
+
+        assert await resolver.fetch_json(url) == AS_METADATA
+        assert await resolver.fetch_json(url) == AS_METADATA
+        assert await resolver.fetch_json(url) == AS_METADATA
+
+        resolver.invalidate()
+        responses.append(httpx.ConnectError("down"))
+        with pytest.raises(httpx.ConnectError):
+            await resolver.fetch_json(url)
+
+
+class ApiClientContextMiddleware(Middleware):
+    """Stand-in for the generated ApiClientContextMiddleware."""
+
+    def __init__(self, validate_tokens, token_verifier=None):
+        self.validate_tokens = validate_tokens
+        self.token_verifier = token_verifier
+
+
+class TestDiscoveredVerifier:
+    """Test wiring the discovered JWT verifier into the API-client middleware."""
+
+    @pytest.mark.asyncio
+    async def test_verifier_built_on_first_token(self):
+        """Test discovery runs once, and a failed discovery rejects the token and is retried."""
+        calls = []
+
+        async def factory(resource_url, audience=None, required_scopes=None):
+            calls.append(resource_url)
+            if len(calls) == 1:
+                raise DiscoveryError("no metadata")
+            return SimpleNamespace(verify_token=lambda token: asyncio.sleep(0, result=f"access:{token}"))
+
+        verifier = DiscoveredJWTVerifier(RESOURCE_URL, factory=factory)
+
+        assert await verifier.verify_token("a") is None
+        assert await verifier.verify_token("b") == "access:b"
+        assert await verifier.verify_token("c") == "access:c"
+        assert calls == [RESOURCE_URL, RESOURCE_URL]
+
+    def test_installed_on_validating_middleware(self):
+        """Test only a token-validating API-client middleware gets the verifier."""
+        mcp = FastMCP("verifier-test")
+        verifier = install_discovered_verifier(mcp)
+        validating, open_ = ApiClientContextMiddleware(True), ApiClientContextMiddleware(False)
+
+        mcp.add_middleware(validating)
+        mcp.add_middleware(open_)
+
+        assert validating.token_verifier is verifier
+        assert open_.token_verifier is None
+        assert mcp.middleware[-2:] == [validating, open_]
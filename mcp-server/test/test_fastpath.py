@@ -0,0 +1,158 @@
+"""
+Tests for the fast path around the API-client middleware.
+
+Tests fast-path behaviour including:
+- Method classification (ping, notifications, initialize)
+- initialize bypassing the API-client middleware only when enabled
+- Failing loudly when the wrapped middleware lacks a replaced method
+- Lazy API client construction on first use
+- Wrapping middleware registered after installation
+- Caller token lookup without building the client
+- Lazy API client shared by the state copies of mounted servers
+"""
+
+import copy
+from types import SimpleNamespace
+
+import pytest
+from fastmcp import Client, Context, FastMCP
+from fastmcp.server.middleware import Middleware
+
+from proxy_smart_mcp.backend import get_caller_token
+from proxy_smart_mcp.fastpath import FastPathMiddleware, LazyApiClient, install_fast_path, is_fast_path
+
+
+class ApiClientContextMiddleware(Middleware):
+    """Same shape as the generated ApiClientContextMiddleware."""
+
+    def __init__(self):
+        self.methods = []
+        self.builds = 0
+
+    async def _validate(self, token):
+        return SimpleNamespace(token=token, scopes=[])
+
+    def _build_http_client(self, context):
+        self.builds += 1
+        return SimpleNamespace(configuration=SimpleNamespace(access_token="token"))
+
+    async def on_request(self, context, call_next):
+        self.methods.append(context.method)
+        context.fastmcp_context.set_state("api_client", self._build_http_client(context))
+        return await call_next(context)
+
+
+def test_is_fast_path():
+    assert is_fast_path("ping")
+    assert is_fast_path("notifications/initialized")
+    assert not is_fast_path("initialize")
+    assert is_fast_path("initialize", allow_initialize=True)
+    assert not is_fast_path("tools/call")
+    assert not is_fast_path(None)
+
+
+def test_lazy_api_client_shared_by_copies():
+    calls = []
+    lazy = LazyApiClient(lambda: calls.append(1) or SimpleNamespace(configuration="config"))
+    assert copy.deepcopy({"api_client": lazy})["api_client"] is lazy
+    assert copy.copy(lazy) is lazy and calls == []
+    with pytest.raises(AttributeError):
+        lazy.__missing_protocol__
+
+
+def test_lazy_api_client_builds_once():
+    calls = []
+    lazy = LazyApiClient(lambda: calls.append(1) or SimpleNamespace(configuration="config"))
+    assert not lazy.built
+    assert lazy.configuration == "config"
+    assert lazy.configuration == "config"
+    assert lazy.built and calls == [1]
+
+
+def _server():
+    mcp = FastMCP("fastpath-test")
+
+    @mcp.tool
+    def cached_answer() -> str:
+        return "42"
+
+    @mcp.tool
+    def backend_answer(ctx: Context) -> str:
+        return ctx.get_state("api_client").configuration.access_token
+
+    return mcp
+
+
+async def test_fast_path_and_lazy_client():
+    mcp = _server()
+    auth = ApiClientContextMiddleware()
+    mcp.add_middleware(auth)
+    install_fast_path(mcp)
+    assert isinstance(mcp.middleware[0], FastPathMiddleware)
+    mcp.middleware[0].allow_initialize = True
+
+    async with Client(mcp) as client:
+        assert "initialize" not in auth.methods
+        await client.call_tool("cached_answer", {})
+        assert auth.builds == 0
+        result = await client.call_tool("backend_answer", {})
+        assert result.data == "token"
+        assert auth.builds == 1
+
+    assert mcp.middleware[0].fast_path_hits == 1
+
+
+async def test_mounted_tools_with_lazy_client():
+    mcp = _server()
+    sub = FastMCP("sub")
+
+    @sub.tool
+    def sub_answer(ctx: Context) -> str:
+        return ctx.get_state("api_client").configuration.access_token
+
+    mcp.mount(sub, prefix="sub")
+    auth = ApiClientContextMiddleware()
+    mcp.add_middleware(auth)
+    install_fast_path(mcp)
+
+    async with Client(mcp) as client:
+        names = {tool.name for tool in await client.list_tools()}
+        result = await client.call_tool("sub_sub_answer", {})
+
+    assert "sub_sub_answer" in names
+    assert result.data == "token"
+    assert auth.builds == 1
+
+
+async def test_wraps_middleware_added_later():
+    mcp = _server()
+    install_fast_path(mcp)
+    auth = ApiClientContextMiddleware()
+    mcp.add_middleware(auth)
+
+    assert isinstance(mcp.middleware[-1], FastPathMiddleware)
+    assert mcp.middleware[-1].inner is auth
+
+
+async def test_initialize_validated_by_default():
+    mcp = _server()
+    auth = ApiClientContextMiddleware()
+    mcp.add_middleware(auth)
+    install_fast_path(mcp)
+
+    async with Client(mcp):
+        assert "initialize" in auth.methods
+
+
+def test_missing_wrapped_method_fails_loudly():
+    auth = ApiClientContextMiddleware()
+    auth._validate = None
+    with pytest.raises(TypeError, match="_validate"):
+        FastPathMiddleware(auth)
+
+
+def test_caller_token_does_not_build_lazy_client():
+    lazy = LazyApiClient(lambda: SimpleNamespace(configuration=SimpleNamespace(access_token="built")))
+    ctx = SimpleNamespace(get_state=lambda key: lazy)
+    get_caller_token(ctx)
+    assert not lazy.built
@@ -0,0 +1,179 @@
+"""
+Tests for micro-batching of concurrent FHIR reads.
+
+Tests batching behaviour including:
+- Concurrent reads combined into one batch Bundle
+- Single reads sent as plain GETs
+- Per-entry errors delivered to the right caller
+- Deduplication of identical reads
+- Earliest caller deadline applied to the batch request
+- Batching disabled by default in the shared resource cache
+- Batching refused without the consent acknowledgement or under CONSENT_MODE
+- Conditional reads (ifNoneMatch) through the resource cache
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from proxy_smart_mcp.backend import BackendError, request_deadline, set_backend_client
+from proxy_smart_mcp.fhir_batch import FhirReadBatcher, batch_reads_enabled
+from proxy_smart_mcp.fhir_cache import FhirResourceCache, get_resource_cache
+
+
+def patient(resource_id):
+    return {"resourceType": "Patient", "id": resource_id, "meta": {"versionId": "1"}}
+
+
+@pytest.fixture
+def batch_backend():
+    """Answer batch Bundles and single reads; record requests."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.method == "GET":
+            return httpx.Response(200, json=patient(request.url.path.rsplit("/", 1)[-1]), headers={"ETag": 'W/"1"'})
+
+        bundle = json.loads(request.content)
+        entries = []
+        for entry in bundle["entry"]:
+            resource_type, resource_id = entry["request"]["url"].split("/")
+            if resource_id == "missing":
+                entries.append({"response": {"status": "404 Not Found",
+                                             "outcome": {"resourceType": "OperationOutcome"}}})
+            elif entry["request"].get("ifNoneMatch") == 'W/"1"':
+                entries.append({"response": {"status": "304 Not Modified"}})
+            else:
+                entries.append({"resource": patient(resource_id),
+                                "response": {"status": "200 OK", "etag": 'W/"1"'}})
+        return httpx.Response(200, json={"resourceType": "Bundle", "type": "batch-response", "entry": entries})
+
+    async def install():
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+
+    return requests, install
+
+
+class TestFhirReadBatcher:
+    """Test read coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reads_batched(self, batch_backend):
+        """Test parallel reads become one batch request split back per caller."""
+        requests, install = batch_backend
+        await install()
+        batcher = FhirReadBatcher(window=0.01)
+
+        results = await asyncio.gather(*(
+            batcher.read(None, "hapi", "R4", "Patient", f"p{i}") for i in range(20)
+        ))
+
+        assert [result.resource["id"] for result in results] == [f"p{i}" for i in range(20)]
+        assert len(requests) == 1
+        assert requests[0].method == "POST"
+        assert requests[0].url.path == "/proxy-smart-backend/hapi/R4"
+        assert json.loads(requests[0].content)["type"] == "batch"
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_flushes_early(self, batch_backend):
+        """Test a full batch is sent without waiting for the window."""
+        requests, install = batch_backend
+        await install()
+        batcher = FhirReadBatcher(window=10, max_batch_size=5)
+
+        results = await asyncio.wait_for(asyncio.gather(*(
+            batcher.read(None, "hapi", "R4", "Patient", f"p{i}") for i in range(5)
+        )), timeout=1)
+
+        assert len(results) == 5
+        assert batcher.stats()["batches_sent"] == 1
+
+    @pytest.mark.asyncio
+    async def test_single_read_and_duplicates(self, batch_backend):
+        """Test a lone read is a plain GET and duplicates share one entry."""
+        requests, install = batch_backend
+        await install()
+        batcher = FhirReadBatcher(window=0.01)
+
+        first, second = await asyncio.gather(
+            batcher.read(None, "hapi", "R4", "Patient", "p1"),
+            batcher.read(None, "hapi", "R4", "Patient", "p1"),
+        )
+
+        assert first is second
+        assert [request.method for request in requests] == ["GET"]
+        assert batcher.direct_reads == 1
+
+    @pytest.mark.asyncio
+    async def test_entry_errors_isolated(self, batch_backend):
+        """Test a failed entry raises only for its caller."""
+        requests, install = batch_backend
+        await install()
+        batcher = FhirReadBatcher(window=0.01)
+
+        results = await asyncio.gather(
+            batcher.read(None, "hapi", "R4", "Patient", "p1"),
+            batcher.read(None, "hapi", "R4", "Patient", "missing"),
+            return_exceptions=True,
+        )
+
+        assert results[0].resource["id"] == "p1"
+        assert isinstance(results[1], BackendError)
+        assert results[1].status_code == 404
+
+
+    @pytest.mark.asyncio
+    async def test_earliest_deadline_applies(self, batch_backend):
+        """Test the batch request times out with the most urgent caller."""
+        requests, install = batch_backend
+        await install()
+        batcher = FhirReadBatcher(window=0.01)
+
+        async def read(resource_id, timeout):
+            request_deadline.set(time.monotonic() + timeout if timeout else None)
+            return await batcher.read(None, "hapi", "R4", "Patient", resource_id)
+
+        await asyncio.gather(read("p1", None), read("p2", 2.0), read("p3", 20.0))
+
+        assert requests[0].method == "POST"
+        assert requests[0].extensions["timeout"]["read"] <= 2.0
+
+
+class TestBatchedResourceCache:
+    """Test the resource cache on top of the batcher."""
+
+    @pytest.mark.asyncio
+    async def test_revalidation_inside_batch(self, batch_backend):
+        """Test cached entries revalidate via ifNoneMatch and 304 entries."""
+        requests, install = batch_backend
+        await install()
+        cache = FhirResourceCache(batcher=FhirReadBatcher(window=0.01))
+
+        async def read_all():
+            return await asyncio.gather(*(
+                cache.read(None, "hapi", "R4", "Patient", f"p{i}") for i in range(3)
+            ))
+
+        first = await read_all()
+        second = await read_all()
+
+        assert first == second
+        second_batch = json.loads(requests[1].content)
+        assert all(entry["request"]["ifNoneMatch"] == 'W/"1"' for entry in second_batch["entry"])
+        assert cache.revalidated == 3
+
+    def test_shared_cache_does_not_batch_by_default(self):
+        """Test reads stay individual GETs so the proxy checks consent per resource."""
+        assert get_resource_cache().batcher is None
+
+    def test_batching_needs_consent_acknowledgement(self):
+        """Test FHIR_BATCH_READS alone does not batch, and consent enforcement always wins."""
+        assert not batch_reads_enabled(requested=True, acknowledged=False, consent_mode="disabled")
+        assert not batch_reads_enabled(requested=True, acknowledged=True, consent_mode="enforce")
+        assert not batch_reads_enabled(requested=True, acknowledged=True, consent_mode="audit-only")
+        assert not batch_reads_enabled(requested=False, acknowledged=True, consent_mode="disabled")
+        assert batch_reads_enabled(requested=True, acknowledged=True, consent_mode="disabled")
@@ -0,0 +1,133 @@
+"""
+Tests for the ETag-aware FHIR resource cache.
+
+Tests caching behaviour including:
+- If-None-Match revalidation and 304 handling
+- meta.versionId fallback validators
+- Per-caller isolation
+- Size and TTL eviction of the bounded cache
+- Invalidation across callers
+"""
+
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp.backend import set_backend_client
+from proxy_smart_mcp.cache import BoundedTTLCache
+from proxy_smart_mcp.fhir_cache import FhirResourceCache, register_resource_cache_tools
+
+PATIENT = {"resourceType": "Patient", "id": "p1", "meta": {"versionId": "2"}, "gender": "female"}
+
+
+@pytest.fixture
+def fhir_backend():
+    """Serve Patient/p1 with ETag support; record requests."""
+    state = {"requests": [], "etag": '"v2"', "send_etag": True}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(request)
+        if state["send_etag"] and request.headers.get("If-None-Match") == state["etag"]:
+            return httpx.Response(304)
+        if not state["send_etag"] and request.headers.get("If-None-Match") == 'W/"2"':
+            return httpx.Response(304)
+        headers = {"ETag": state["etag"]} if state["send_etag"] else {}
+        return httpx.Response(200, json=PATIENT, headers=headers)
+
+    async def install():
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+
+    return state, install
+
+
+class TestBoundedTTLCache:
+    """Test the shared bounded cache."""
+
+    def test_evicts_by_size(self):
+        """Test LRU entries are evicted to respect max_bytes."""
+        cache = BoundedTTLCache(max_entries=10, max_bytes=100, ttl=60)
+        cache.put("a", 1, 50)
+        cache.put("b", 2, 50)
+        cache.get("a")
+        cache.put("c", 3, 50)
+
+        assert "a" in cache and "c" in cache and "b" not in cache
+        assert cache.total_bytes == 100
+        assert cache.stats.evictions == 1
+
+    def test_expires_by_ttl(self):
+        """Test expired entries count as misses."""
+        cache = BoundedTTLCache(max_entries=10, max_bytes=100, ttl=0)
+        cache.put("a", 1, 1)
+
+        assert cache.get("a") is None
+        assert cache.stats.expirations == 1
+        assert len(cache) == 0
+
+
+class TestFhirResourceCache:
+    """Test conditional reads against the proxy."""
+
+    @pytest.mark.asyncio
+    async def test_revalidates_with_etag(self, fhir_backend):
+        """Test the second read sends If-None-Match and uses the cached body on 304."""
+        state, install = fhir_backend
+        await install()
+        cache = FhirResourceCache()
+
+        first = await cache.read(None, "hapi", "R4", "Patient", "p1")
+        second = await cache.read(None, "hapi", "R4", "Patient", "p1")
+
+        assert first == second == PATIENT
+        assert "If-None-Match" not in state["requests"][0].headers
+        assert state["requests"][1].headers["If-None-Match"] == '"v2"'
+        assert state["requests"][1].url.path == "/proxy-smart-backend/hapi/R4/Patient/p1"
+        assert cache.stats()["revalidated"] == 1
+
+    @pytest.mark.asyncio
+    async def test_version_id_fallback(self, fhir_backend):
+        """Test meta.versionId is used when the proxy sends no ETag."""
+        state, install = fhir_backend
+        state["send_etag"] = False
+        await install()
+        cache = FhirResourceCache()
+
+        await cache.read(None, "hapi", "R4", "Patient", "p1")
+        await cache.read(None, "hapi", "R4", "Patient", "p1")
+
+        assert state["requests"][1].headers["If-None-Match"] == 'W/"2"'
+        assert cache.revalidated == 1
+
+    @pytest.mark.asyncio
+    async def test_callers_isolated_and_invalidate(self, fhir_backend):
+        """Test callers get separate entries and invalidation drops all of them."""
+        state, install = fhir_backend
+        await install()
+        cache = FhirResourceCache()
+
+        for token in ("alice", "bob"):
+            with patch.dict(os.environ, {"BACKEND_API_TOKEN": token}):
+                await cache.read(None, "hapi", "R4", "Patient", "p1")
+
+        assert all("If-None-Match" not in request.headers for request in state["requests"])
+        assert cache.invalidate("hapi", "R4", "Patient", "p1") == 2
+        assert len(cache.cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_tool_returns_resource(self, fhir_backend):
+        """Test read_fhir_resource through the MCP protocol."""
+        state, install = fhir_backend
+        await install()
+        mcp = FastMCP("fhir-cache-test")
+        register_resource_cache_tools(mcp, FhirResourceCache())
+        arguments = {"server_name": "hapi", "fhir_version": "R4", "resource_type": "Patient", "resource_id": "p1"}
+
+        async with Client(mcp) as client:
+            await client.call_tool("read_fhir_resource", arguments)
+            result = await client.call_tool("read_fhir_resource", arguments)
+
+        assert result.structured_content == {"result": PATIENT}
+        assert len(state["requests"]) == 2
@@ -0,0 +1,159 @@
+"""
+Tests for the per-FHIR-server capability cache.
+
+Tests capability caching behaviour including:
+- CapabilityStatement and SMART configuration indexing
+- Local support checks (resource types, interactions, search params, operations)
+- Search params checked only against a resource type
+- Single fetch per server and background refresh
+- Stale documents served when a refresh fails
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+
+from proxy_smart_mcp.backend import set_backend_client
+from proxy_smart_mcp.fhir_capabilities import CapabilityCache, CapabilityIndex, register_capability_tools
+
+CAPABILITY = {
+    "resourceType": "CapabilityStatement",
+    "fhirVersion": "4.0.1",
+    "format": ["json"],
+    "rest": [{
+        "mode": "server",
+        "interaction": [{"code": "batch"}, {"code": "transaction"}],
+        "operation": [{"name": "export"}],
+        "resource": [
+            {"type": "Patient",
+             "interaction": [{"code": "read"}, {"code": "search-type"}],
+             "searchParam": [{"name": "name"}, {"name": "birthdate"}],
+             "operation": [{"name": "everything"}]},
+            {"type": "Observation", "interaction": [{"code": "read"}]},
+        ],
+    }],
+}
+
+SMART_CONFIG = {
+    "token_endpoint": "http://auth.test/token",
+    "capabilities": ["launch-ehr", "client-confidential-symmetric"],
+}
+
+
+@pytest.fixture
+def metadata_backend():
+    """Serve /metadata and SMART configuration; allow failures to be switched on."""
+    state = {"requests": [], "fail": False}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(request.url.path)
+        if state["fail"]:
+            return httpx.Response(503, json={"error": "down"})
+        if request.url.path.endswith("/metadata"):
+            return httpx.Response(200, json=CAPABILITY)
+        return httpx.Response(200, json=SMART_CONFIG)
+
+    async def install():
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+
+    return state, install
+
+
+class TestCapabilityIndex:
+    """Test index construction and support checks."""
+
+    def test_support_checks(self):
+        """Test resource, interaction, search param and operation lookups."""
+        index = CapabilityIndex.build(CAPABILITY, SMART_CONFIG)
+
+        assert index.supports("Patient", interaction="search-type")
+        assert not index.supports("Observation", interaction="search-type")
+        assert index.supports("Patient", search_param="name:exact")
+        assert not index.supports("Patient", search_param="gender")
+        assert index.supports("Patient", operation="$everything")
+        assert index.supports("Patient", operation="$export")
+        assert index.supports(interaction="transaction")
+        assert not index.supports("Encounter")
+        with pytest.raises(ValueError):
+            index.supports(search_param="name")
+        assert "launch-ehr" in index.smart_capabilities
+        assert index.smart_endpoints == {"token_endpoint": "http://auth.test/token"}
+
+
+class TestCapabilityCache:
+    """Test fetching, caching and refresh."""
+
+    @pytest.mark.asyncio
+    async def test_fetched_once(self, metadata_backend):
+        """Test concurrent and repeated lookups share one fetch per document."""
+        state, install = metadata_backend
+        await install()
+        cache = CapabilityCache(refresh_interval=0)
+
+        await asyncio.gather(*(cache.get_index(None, "hapi", "R4") for _ in range(5)))
+        await cache.get_index(None, "hapi", "R4")
+
+        assert sorted(state["requests"]) == [
+            "/proxy-smart-backend/hapi/R4/.well-known/smart-configuration",
+            "/proxy-smart-backend/hapi/R4/metadata",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_stale_served_on_refresh_failure(self, metadata_backend):
+        """Test a failed refresh keeps the previous documents."""
+        state, install = metadata_backend
+        await install()
+        cache = CapabilityCache(refresh_interval=0)
+        await cache.get(None, "hapi", "R4")
+
+        state["fail"] = True
+        await cache.refresh_all()
+        index = await cache.get_index(None, "hapi", "R4")
+
+        assert cache.refresh_failures == 1
+        assert "Patient" in index.resources
+
+    @pytest.mark.asyncio
+    async def test_background_refresh(self, metadata_backend):
+        """Test known servers are refreshed on the interval."""
+        state, install = metadata_backend
+        await install()
+        cache = CapabilityCache(refresh_interval=0.02)
+        try:
+            first = await cache.get(None, "hapi", "R4")
+            await asyncio.sleep(0.07)
+            second = await cache.get(None, "hapi", "R4")
+        finally:
+            cache.stop()
+
+        assert second.fetched_at > first.fetched_at
+
+    @pytest.mark.asyncio
+    async def test_tools(self, metadata_backend):
+        """Test check_fhir_support answers from the index."""
+        state, install = metadata_backend
+        await install()
+        mcp = FastMCP("capability-test")
+        register_capability_tools(mcp, CapabilityCache(refresh_interval=0))
+
+        async with Client(mcp) as client:
+            result = await client.call_tool("check_fhir_support", {
+                "server_name": "hapi", "fhir_version": "R4", "resource_type": "Patient",
+                "interactions": ["read", "delete"], "search_params": ["name", "gender"],
+            })
+            summary = await client.call_tool("get_fhir_server_capabilities", {
+                "server_name": "hapi", "fhir_version": "R4",
+            })
+            with pytest.raises(ToolError, match="resource_type"):
+                await client.call_tool("check_fhir_support", {
+                    "server_name": "hapi", "fhir_version": "R4", "search_params": ["gender"],
+                })
+
+        assert result.structured_content == {
+            "supported": False, "unsupported": ["interaction:delete", "searchParam:gender"],
+        }
+        assert summary.structured_content["result"]["resource_types"] == ["Observation", "Patient"]
+        assert len(state["requests"]) == 2
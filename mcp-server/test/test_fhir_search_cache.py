@@ -0,0 +1,143 @@
+"""
+Tests for the canonicalized FHIR search cache.
+
+Tests search caching behaviour including:
+- Canonicalization of parameter order, whitespace, case and OR lists
+- Explicit default `_count`
+- Cache hits for equivalent searches and per-caller isolation
+- Coalescing of identical concurrent searches, surviving cancellation of the first caller
+- Per-resource-type hit rates
+"""
+
+import asyncio
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp.backend import set_backend_client
+from proxy_smart_mcp.fhir_search_cache import FhirSearchCache, canonicalize_search, register_search_cache_tools
+
+
+@pytest.fixture
+def search_backend():
+    """Serve searchset Bundles after a short delay; record requests."""
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"resourceType": "Bundle", "type": "searchset", "total": len(requests)})
+
+    async def install():
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+
+    return requests, install
+
+
+class TestCanonicalize:
+    """Test search canonicalization."""
+
+    def test_equivalent_searches_match(self):
+        """Test order, whitespace, case and OR-list order do not matter."""
+        first = canonicalize_search({"name": "  Jane   Doe ", "gender": "female,male", "birthdate": "ge1970"})
+        second = canonicalize_search({"birthdate": "ge1970", "gender": "male, female", "name": "jane doe"})
+        assert first == second
+
+    def test_explicit_count_and_ordered_params(self):
+        """Test _count is added by default and _sort keeps its order."""
+        query = dict(canonicalize_search({"_sort": "-date,name"}, default_count=20))
+        assert query == {"_count": "20", "_sort": "-date,name"}
+        assert dict(canonicalize_search({"_count": 5}))["_count"] == "5"
+
+    def test_case_sensitive_tokens_kept(self):
+        """Test token parameters are not lowercased."""
+        assert canonicalize_search({"identifier": "MRN|ABC"}, default_count=0) == (("identifier", "MRN|ABC"),)
+
+
+class TestFhirSearchCache:
+    """Test caching against the proxy."""
+
+    @pytest.mark.asyncio
+    async def test_equivalent_search_served_from_cache(self, search_backend):
+        """Test an equivalent search does not go upstream and hit rates are tracked."""
+        requests, install = search_backend
+        await install()
+        cache = FhirSearchCache()
+
+        await cache.search(None, "hapi", "R4", "Patient", {"family": "Doe", "given": "Jane"})
+        await cache.search(None, "hapi", "R4", "Patient", {"given": "jane", "family": " doe"})
+        await cache.search(None, "hapi", "R4", "Observation", {"code": "1234-5"})
+
+        assert len(requests) == 2
+        assert requests[0].url.params["_count"] == "50"
+        stats = cache.stats()["by_resource_type"]
+        assert stats["Patient"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+        assert stats["Observation"]["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_coalesced(self, search_backend):
+        """Test identical in-flight searches share one upstream request."""
+        requests, install = search_backend
+        await install()
+        cache = FhirSearchCache()
+
+        results = await asyncio.gather(*(
+            cache.search(None, "hapi", "R4", "Patient", {"name": "doe"}) for _ in range(5)
+        ))
+
+        assert len(requests) == 1
+        assert all(result == results[0] for result in results)
+
+    @pytest.mark.asyncio
+    async def test_waiter_takes_over_cancelled_search(self, search_backend):
+        """Test coalesced callers are not cancelled along with the caller running the search."""
+        requests, install = search_backend
+        await install()
+        cache = FhirSearchCache()
+
+        leader = asyncio.create_task(cache.search(None, "hapi", "R4", "Patient", {"name": "doe"}))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.search(None, "hapi", "R4", "Patient", {"name": "doe"}))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        bundle = await waiter
+        assert bundle["resourceType"] == "Bundle"
+        assert leader.cancelled()
+        assert len(requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_callers_and_bypass(self, search_backend):
+        """Test callers do not share entries and use_cache=False forces a search."""
+        requests, install = search_backend
+        await install()
+        cache = FhirSearchCache()
+
+        for token in ("alice", "bob"):
+            with patch.dict(os.environ, {"BACKEND_API_TOKEN": token}):
+                await cache.search(None, "hapi", "R4", "Patient", {"name": "doe"})
+        with patch.dict(os.environ, {"BACKEND_API_TOKEN": "bob"}):
+            await cache.search(None, "hapi", "R4", "Patient", {"name": "doe"}, use_cache=False)
+
+        assert len(requests) == 3
+
+    @pytest.mark.asyncio
+    async def test_tools(self, search_backend):
+        """Test search_fhir_resources and get_fhir_cache_stats through MCP."""
+        requests, install = search_backend
+        await install()
+        mcp = FastMCP("search-cache-test")
+        register_search_cache_tools(mcp, FhirSearchCache())
+        arguments = {"server_name": "hapi", "fhir_version": "R4", "resource_type": "Patient",
+                     "search_params": {"name": "Doe"}}
+
+        async with Client(mcp) as client:
+            await client.call_tool("search_fhir_resources", arguments)
+            result = await client.call_tool("search_fhir_resources", arguments)
+            stats = await client.call_tool("get_fhir_cache_stats", {})
+
+        assert result.structured_content["result"]["total"] == 1
+        assert stats.structured_content["search"]["by_resource_type"]["Patient"]["hits"] == 1
@@ -0,0 +1,168 @@
+"""
+Tests for streaming FHIR Bundle handling.
+
+Tests streaming behaviour including:
+- Incremental extraction of Bundle entries across arbitrary chunk boundaries
+- Bundle envelope (total, link) recovery
+- Lazy Bundle.link[next] following with a limit
+- Foreign-origin next links reported, not followed
+- Entry chunks and progress notifications from stream_fhir_search
+"""
+
+import json
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp.backend import set_backend_client
+from proxy_smart_mcp.fhir import BundleStreamParser, fhir_path, iter_bundle_entries, register_fhir_tools
+
+BASE = "http://backend.test"
+
+
+def make_bundle(start, count, total, next_url=None):
+    bundle = {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "total": total,
+        "link": [{"relation": "self", "url": f"{BASE}/page"}],
+        "entry": [
+            {"fullUrl": f"{BASE}/Patient/p{i}",
+             "resource": {"resourceType": "Patient", "id": f"p{i}", "name": [{"text": "A \"quoted\" [name]"}]}}
+            for i in range(start, start + count)
+        ],
+    }
+    if next_url:
+        bundle["link"].append({"relation": "next", "url": next_url})
+    return bundle
+
+
+@pytest.fixture
+def paged_backend():
+    """Serve a 3-page Patient search (5 entries per page) and record requests."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        page = int(request.url.params.get("page", "0"))
+        next_url = f"{BASE}{fhir_path('hapi', 'R4', 'Patient')}?page={page + 1}" if page < 2 else None
+        return httpx.Response(200, json=make_bundle(page * 5, 5, 15, next_url))
+
+    async def install():
+        set_backend_client(httpx.AsyncClient(base_url=BASE, transport=httpx.MockTransport(handler)))
+
+    return requests, install
+
+
+class TestBundleStreamParser:
+    """Test the incremental entry parser."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 100_000])
+    def test_entries_extracted_for_any_chunking(self, chunk_size):
+        """Test entries and envelope are recovered regardless of chunk boundaries."""
+        bundle = make_bundle(0, 4, 4, next_url=f"{BASE}/next")
+        body = json.dumps(bundle, indent=1)
+        parser = BundleStreamParser()
+        entries = []
+        for offset in range(0, len(body), chunk_size):
+            entries.extend(parser.feed(body[offset:offset + chunk_size]))
+
+        assert entries == bundle["entry"]
+        envelope = parser.envelope()
+        assert envelope["entry"] == []
+        assert envelope["total"] == 4
+        assert envelope["link"] == bundle["link"]
+
+    def test_non_bundle_passes_through_envelope(self):
+        """Test an OperationOutcome is returned whole from the envelope."""
+        parser = BundleStreamParser()
+        assert parser.feed('{"resourceType": "OperationOutcome", "issue": []}') == []
+        assert parser.envelope()["resourceType"] == "OperationOutcome"
+
+
+class TestBundleStream:
+    """Test lazy paging over the backend."""
+
+    @pytest.mark.asyncio
+    async def test_follows_next_links(self, paged_backend):
+        """Test all pages are read when the limit allows it."""
+        requests, install = paged_backend
+        await install()
+
+        stream = iter_bundle_entries(None, fhir_path("hapi", "R4", "Patient"), limit=100)
+        entries = await stream.collect()
+
+        assert [entry["resource"]["id"] for entry in entries] == [f"p{i}" for i in range(15)]
+        assert stream.pages == 3
+        assert stream.total == 15
+        assert stream.next_url is None
+        assert not stream.truncated
+
+    @pytest.mark.asyncio
+    async def test_limit_stops_paging(self, paged_backend):
+        """Test pages beyond the limit are never requested."""
+        requests, install = paged_backend
+        await install()
+
+        stream = iter_bundle_entries(None, fhir_path("hapi", "R4", "Patient"), limit=7)
+        entries = await stream.collect()
+
+        assert len(entries) == 7
+        assert len(requests) == 2
+        assert stream.next_url.endswith("page=2")
+        assert stream.truncated
+
+    @pytest.mark.asyncio
+    async def test_foreign_next_link_reported(self):
+        """Test a next link to another origin is not followed but marks the result truncated."""
+        requests = []
+        foreign = "https://elsewhere.test/fhir/Patient?page=1"
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json=make_bundle(0, 5, 15, foreign))
+
+        set_backend_client(httpx.AsyncClient(base_url=BASE, transport=httpx.MockTransport(handler)))
+        stream = iter_bundle_entries(None, fhir_path("hapi", "R4", "Patient"), limit=100)
+        entries = await stream.collect()
+
+        assert len(entries) == 5
+        assert len(requests) == 1
+        assert stream.next_url is None
+        assert stream.unfollowed_next == foreign
+        assert stream.truncated
+
+
+class TestStreamTool:
+    """Test the stream_fhir_search tool through the MCP protocol."""
+
+    @pytest.mark.asyncio
+    async def test_entries_emitted_in_chunks(self, paged_backend):
+        """Test entries arrive as log chunks with progress, not in the result."""
+        requests, install = paged_backend
+        await install()
+        mcp = FastMCP("fhir-test")
+        register_fhir_tools(mcp)
+        chunks, progress = [], []
+
+        async def on_log(message):
+            chunks.append(message.data["extra"]["entries"])
+
+        async def on_progress(value, total, message):
+            progress.append(value)
+
+        async with Client(mcp, log_handler=on_log, progress_handler=on_progress) as client:
+            result = await client.call_tool("stream_fhir_search", {
+                "server_name": "hapi", "fhir_version": "R4", "resource_type": "Patient",
+                "search_params": {"name": "doe"}, "chunk_size": 4,
+            })
+
+        summary = result.structured_content
+        assert summary["streamed"] == 15
+        assert summary["pages"] == 3
+        assert "entries" not in summary
+        assert [len(chunk) for chunk in chunks] == [4, 4, 4, 3]
+        assert progress == [4, 8, 12, 15]
+        assert requests[0].url.params["name"] == "doe"
+        assert requests[0].url.path == "/proxy-smart-backend/hapi/R4/Patient"
@@ -0,0 +1,132 @@
+"""
+Tests for the adaptive (AIMD) concurrency limit.
+
+Tests limiter behaviour including:
+- Additive increase while healthy and busy
+- Multiplicative decrease on overload, once per round trip
+- Overload classification of errors
+- Scheduler capacity and metrics following the limit
+- Separate latency threshold for bulk calls; composite plans sampled per step
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+
+from proxy_smart_mcp.backend import BackendError
+from proxy_smart_mcp.composite import COMPOSITE_TOOL_NAME, register_composite_tool
+from proxy_smart_mcp.limits import AIMDLimit, is_overload_error, register_adaptive_concurrency
+from proxy_smart_mcp.metrics import ServerMetrics
+from proxy_smart_mcp.scheduling import PriorityScheduler
+
+
+def test_additive_increase_when_busy():
+    limit = AIMDLimit(initial_limit=10, latency_threshold=1.0)
+    assert limit.sample(0.01, in_flight=2, dropped=False) == 10
+    assert limit.sample(0.01, in_flight=5, dropped=False) == 11
+    assert limit.increases == 1
+
+
+def test_multiplicative_decrease_once_per_rtt():
+    limit = AIMDLimit(initial_limit=100, backoff_ratio=0.5, latency_threshold=1.0)
+    assert limit.sample(0.2, in_flight=50, dropped=True, now=10.0) == 50
+    assert limit.sample(0.2, in_flight=50, dropped=True, now=10.1) == 50
+    assert limit.sample(2.0, in_flight=50, dropped=False, now=11.0) == 50
+    assert limit.sample(2.0, in_flight=50, dropped=False, now=12.5) == 25
+    assert limit.decreases == 2
+
+
+def test_limit_bounds():
+    limit = AIMDLimit(initial_limit=2, min_limit=2, max_limit=3, backoff_ratio=0.5)
+    assert limit.sample(0.0, in_flight=3, dropped=False) == 3
+    assert limit.sample(0.0, in_flight=3, dropped=False) == 3
+    assert limit.sample(0.0, in_flight=3, dropped=True, now=1e9) == 2
+    with pytest.raises(ValueError):
+        AIMDLimit(backoff_ratio=0.1)
+
+
+def test_is_overload_error():
+    assert is_overload_error(BackendError("down", status_code=503))
+    assert is_overload_error(BackendError("refused"))
+    assert not is_overload_error(BackendError("missing", status_code=404))
+    assert is_overload_error(httpx.ConnectTimeout("slow"))
+
+    try:
+        try:
+            raise BackendError("busy", status_code=429)
+        except BackendError as exc:
+            raise ToolError("call failed") from exc
+    except ToolError as wrapped:
+        assert is_overload_error(wrapped)
+    assert not is_overload_error(ValueError("bad input"))
+
+
+async def test_middleware_drives_scheduler_capacity():
+    mcp = FastMCP("limits-test")
+
+    @mcp.tool
+    async def overloaded() -> str:
+        raise BackendError("backend unavailable", status_code=503)
+
+    @mcp.tool
+    async def healthy() -> str:
+        await asyncio.sleep(0)
+        return "ok"
+
+    metrics = ServerMetrics()
+    scheduler = PriorityScheduler(capacity=10, metrics=metrics)
+    middleware = register_adaptive_concurrency(
+        mcp, scheduler, limit=AIMDLimit(initial_limit=10, backoff_ratio=0.5), metrics=metrics,
+    )
+
+    async with Client(mcp) as client:
+        with pytest.raises(ToolError):
+            await client.call_tool("overloaded", {})
+        assert scheduler.capacity == 5
+        assert metrics.snapshot("concurrency")["concurrency.limit"] == 5
+
+        await client.call_tool("healthy", {})
+    assert middleware.limit.limit == 5
+    assert middleware.in_flight == 0
+
+
+async def test_bulk_and_composite_sampling():
+    mcp = FastMCP("limits-classes-test")
+
+    @mcp.tool
+    async def bulk_create_users() -> str:
+        await asyncio.sleep(0.06)
+        return "created"
+
+    @mcp.tool
+    async def get_user(step: int) -> int:
+        await asyncio.sleep(0.03)
+        return step
+
+    @mcp.tool
+    async def slow_report() -> str:
+        await asyncio.sleep(0.06)
+        return "done"
+
+    register_composite_tool(mcp)
+    middleware = register_adaptive_concurrency(
+        mcp, PriorityScheduler(capacity=10, metrics=ServerMetrics()),
+        limit=AIMDLimit(initial_limit=10, latency_threshold=0.05),
+        metrics=ServerMetrics(), bulk_latency_threshold=1.0,
+    )
+
+    async with Client(mcp) as client:
+        await client.call_tool("bulk_create_users", {})
+        # Three sequential steps under the threshold; the plan as a whole is over it
+        await client.call_tool(COMPOSITE_TOOL_NAME, {"plan": {"steps": [
+            {"id": "a", "tool": "get_user", "arguments": {"step": 1}},
+            {"id": "b", "tool": "get_user", "depends_on": ["a"], "arguments": {"step": 2}},
+            {"id": "c", "tool": "get_user", "depends_on": ["b"], "arguments": {"step": 3}},
+        ]}})
+        assert middleware.limit.decreases == 0
+
+        await client.call_tool("slow_report", {})
+    assert middleware.limit.decreases == 1
@@ -0,0 +1,241 @@
+"""
+Tests for incremental OAuth monitoring aggregates.
+
+Tests aggregation behaviour including:
+- Rolling-window counts, error ratios and per-client breakdown
+- Bucket expiry adjusting running totals
+- Latency percentiles from the histogram
+- Duplicate and control message handling
+- Event stream subscription with backfill
+- Caller authorization and the service credential of the shared stream
+- Client-credentials service tokens renewed after a 401
+- Stream staleness and last error in the tool result
+"""
+
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp.backend import set_backend_client
+from proxy_smart_mcp.oauth_aggregates import (
+    OAuthAggregator,
+    OAuthEventSubscriber,
+    ServiceCredential,
+    latency_percentile,
+    register_oauth_aggregate_tools,
+)
+
+NOW = 1_700_000_000.0
+
+
+def event(event_id, client="app-a", status="success", latency=100, timestamp=None):
+    data = {"id": event_id, "type": "token", "status": status, "clientId": client, "responseTime": latency}
+    if timestamp is not None:
+        data["timestamp"] = timestamp
+    return data
+
+
+class TestOAuthAggregator:
+    """Test the rolling-window aggregates."""
+
+    def test_counts_and_clients(self):
+        """Test totals, error ratio and per-client numbers."""
+        aggregator = OAuthAggregator(window_seconds=600)
+        for i in range(8):
+            aggregator.add(event(f"a{i}", status="error" if i < 2 else "success"), now=NOW)
+        aggregator.add(event("b0", client="app-b"), now=NOW)
+
+        snapshot = aggregator.snapshot(now=NOW)
+        assert snapshot["requests"] == 9
+        assert snapshot["errors"] == 2
+        assert snapshot["rate_per_minute"] == 0.9
+        assert list(snapshot["clients"]) == ["app-a", "app-b"]
+        assert snapshot["clients"]["app-a"]["error_ratio"] == 0.25
+        assert aggregator.snapshot(client_id="app-b", now=NOW)["requests"] == 1
+
+    def test_expiry_subtracts_buckets(self):
+        """Test events leave the totals once their bucket leaves the window."""
+        aggregator = OAuthAggregator(window_seconds=60, bucket_seconds=10)
+        aggregator.add(event("old", client="gone"), now=NOW)
+        aggregator.add(event("new"), now=NOW + 55)
+
+        snapshot = aggregator.snapshot(now=NOW + 65)
+        assert snapshot["requests"] == 1
+        assert "gone" not in snapshot["clients"]
+
+    def test_duplicates_and_control_messages(self):
+        """Test repeated ids and keepalives are ignored."""
+        aggregator = OAuthAggregator()
+        assert aggregator.add(event("x"), now=NOW)
+        assert not aggregator.add(event("x"), now=NOW)
+        assert not aggregator.add({"type": "keepalive", "timestamp": "2024-01-01T00:00:00Z"}, now=NOW)
+        assert aggregator.events_seen == 1
+
+    def test_event_timestamps_outside_window_dropped(self):
+        """Test events older than the window do not count."""
+        aggregator = OAuthAggregator(window_seconds=60)
+        assert not aggregator.add(event("x", timestamp="2000-01-01T00:00:00Z"), now=NOW)
+
+    def test_percentiles(self):
+        """Test percentile interpolation over the histogram."""
+        aggregator = OAuthAggregator()
+        for i in range(100):
+            aggregator.add(event(f"e{i}", latency=50 if i < 90 else 2000), now=NOW)
+
+        latency = aggregator.snapshot(now=NOW)["latency_ms"]
+        assert 30 <= latency["p50"] <= 50
+        assert 1500 <= latency["p99"] <= 2000
+        assert latency_percentile([0] * 28, 0, 0.5) is None
+
+
+class TestOAuthEventSubscriber:
+    """Test the event stream subscription."""
+
+    @pytest.mark.asyncio
+    async def test_stream_and_backfill(self):
+        """Test backfilled and streamed events both reach the aggregator once."""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            if request.url.path.endswith("/stream"):
+                body = "".join(
+                    f"data: {json.dumps(message)}\n\n"
+                    for message in [{"type": "connection"}, event("s1"), event("s2", status="error"), event("b1")]
+                )
+                return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+            return httpx.Response(200, json={"events": [event("b1"), event("b2")], "total": 2})
+
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+        subscriber = OAuthEventSubscriber(OAuthAggregator(), token="monitor-token")
+        subscriber.ensure_started()
+        try:
+            for _ in range(100):
+                if subscriber.aggregator.events_seen >= 4:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            subscriber.stop()
+
+        snapshot = subscriber.aggregator.snapshot()
+        assert snapshot["requests"] == 4
+        assert snapshot["errors"] == 1
+        assert all(r.headers["Authorization"] == "Bearer monitor-token" for r in requests)
+
+    @pytest.mark.asyncio
+    async def test_tool_authorizes_caller(self):
+        """Test callers are checked with the backend and the stream uses the service token."""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            token = request.headers.get("Authorization")
+            if token not in ("Bearer caller", "Bearer service"):
+                return httpx.Response(401, json={"error": "Unauthorized"})
+            if request.url.path.endswith("/stream"):
+                return httpx.Response(200, text="", headers={"Content-Type": "text/event-stream"})
+            return httpx.Response(200, json={"events": [event("b1")], "total": 1})
+
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+        mcp = FastMCP("oauth-aggregate-test")
+        subscriber = OAuthEventSubscriber(OAuthAggregator(), token="service")
+        register_oauth_aggregate_tools(mcp, subscriber)
+
+        try:
+            async with Client(mcp) as client:
+                results = {}
+                for token in ("", "forged", "caller", "caller"):
+                    with patch.dict(os.environ, {"BACKEND_API_TOKEN": token}):
+                        results[token] = await client.call_tool("get_oauth_live_metrics", {}, raise_on_error=False)
+        finally:
+            subscriber.stop()
+
+        assert results[""].is_error and results["forged"].is_error
+        # The first authorized call already sees the backfill
+        assert results["caller"].structured_content["result"]["requests"] == 1
+        probes = [r for r in requests if r.headers["Authorization"] == "Bearer caller"]
+        assert len(probes) == 1
+        assert {r.headers["Authorization"] for r in requests if r.url.path.endswith("/stream")} == {"Bearer service"}
+
+    @pytest.mark.asyncio
+    async def test_tool_requires_service_token(self):
+        """Test the tool refuses to run the shared stream without a service token."""
+        set_backend_client(httpx.AsyncClient(
+            base_url="http://backend.test",
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"events": []})),
+        ))
+        mcp = FastMCP("oauth-aggregate-test")
+        register_oauth_aggregate_tools(mcp, OAuthEventSubscriber(OAuthAggregator(), token=None))
+
+        async with Client(mcp) as client:
+            with patch.dict(os.environ, {"BACKEND_API_TOKEN": "caller"}):
+                result = await client.call_tool("get_oauth_live_metrics", {}, raise_on_error=False)
+
+        assert result.is_error
+        assert "OAUTH_MONITORING_TOKEN" in result.content[0].text
+
+    @pytest.mark.asyncio
+    async def test_rejected_token_renewed_with_client_credentials(self):
+        """Test a 401 from the stream requests a fresh service token instead of retrying the old one."""
+        issued = []
+        accepted = {"token-2"}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/token":
+                assert request.headers["Authorization"].startswith("Basic ")
+                issued.append(f"token-{len(issued) + 1}")
+                return httpx.Response(200, json={"access_token": issued[-1], "expires_in": 300})
+            if request.headers.get("Authorization", "")[len("Bearer "):] not in accepted:
+                return httpx.Response(401, json={"error": "Unauthorized"})
+            if request.url.path.endswith("/stream"):
+                return httpx.Response(200, text=f"data: {json.dumps(event('s1'))}\n\n",
+                                      headers={"Content-Type": "text/event-stream"})
+            return httpx.Response(200, json={"events": []})
+
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+        credential = ServiceCredential(client_id="monitor", client_secret="secret",
+                                       token_url="http://backend.test/token")
+        subscriber = OAuthEventSubscriber(OAuthAggregator(), credential=credential)
+        with patch("proxy_smart_mcp.oauth_aggregates.RECONNECT_MIN_DELAY", 0.01):
+            subscriber.ensure_started()
+            try:
+                for _ in range(200):
+                    if subscriber.aggregator.events_seen:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                subscriber.stop()
+
+        assert issued[:2] == ["token-1", "token-2"]
+        assert subscriber.aggregator.events_seen == 1
+        # The token is reused until it nears expiry
+        assert await credential.get() == "token-2"
+
+    @pytest.mark.asyncio
+    async def test_tool_reports_stale_stream(self):
+        """Test a failing stream shows up as stale with its last error in the tool result."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.headers["Authorization"] == "Bearer caller":
+                return httpx.Response(200, json={"events": []})
+            return httpx.Response(401, json={"error": "token expired"})
+
+        set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+        mcp = FastMCP("oauth-aggregate-test")
+        subscriber = register_oauth_aggregate_tools(mcp, OAuthEventSubscriber(OAuthAggregator(), token="expired"))
+
+        try:
+            async with Client(mcp) as client:
+                with patch.dict(os.environ, {"BACKEND_API_TOKEN": "caller"}):
+                    result = await client.call_tool("get_oauth_live_metrics", {})
+        finally:
+            subscriber.stop()
+
+        stream = result.structured_content["stream"]
+        assert stream["stale"] is True and stream["connected"] is False
+        assert stream["disconnected_seconds"] is not None
+        assert "401" in stream["last_error"]
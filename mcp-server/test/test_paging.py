@@ -0,0 +1,149 @@
+"""
+Tests for cursor-based paging of oversized tool results.
+
+Tests paging behaviour including:
+- Threshold detection and first-page responses
+- Follow-up pages served from the store without re-running the tool
+- FHIR Bundle entry paging
+- Store TTL, LRU and byte bounds
+- Sampled size estimate of pageable lists
+- Caller isolation of stored results
+"""
+
+import os
+from unittest.mock import patch
+
+import pydantic_core
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+
+from proxy_smart_mcp.paging import ResultStore, estimate_size, find_pageable, register_paging
+
+
+@pytest.fixture
+def paging_server():
+    """Create a server with large list and Bundle tools and paging installed."""
+    mcp = FastMCP("paging-test")
+    calls = {"users": 0}
+
+    @mcp.tool
+    def list_healthcare_users() -> dict:
+        calls["users"] += 1
+        return {"result": [{"id": f"u{i}", "username": f"user{i}"} for i in range(25)]}
+
+    @mcp.tool
+    def search_fhir() -> dict:
+        return {"result": {
+            "resourceType": "Bundle",
+            "total": 12,
+            "entry": [{"resource": {"resourceType": "Patient", "id": f"p{i}"}} for i in range(12)],
+        }}
+
+    @mcp.tool
+    def small() -> dict:
+        return {"result": [1, 2, 3]}
+
+    store = register_paging(mcp, threshold_bytes=200, page_size=10)
+    mcp.calls = calls
+    mcp.store = store
+    return mcp
+
+
+class TestResultStore:
+    """Test store bounds."""
+
+    def test_lru_eviction_by_entries(self):
+        """Test the least recently used entry is evicted first."""
+        store = ResultStore(max_entries=2)
+        first = store.put("o", {}, (), [1], 10, 10)
+        second = store.put("o", {}, (), [2], 10, 10)
+        store.get(first.handle, "o")
+        store.put("o", {}, (), [3], 10, 10)
+
+        assert store.get(first.handle, "o") is not None
+        assert store.get(second.handle, "o") is None
+
+    def test_byte_bound_and_oversized(self):
+        """Test total bytes stay under the cap and huge results are refused."""
+        store = ResultStore(max_bytes=100)
+        store.put("o", {}, (), [1], 10, 60)
+        store.put("o", {}, (), [2], 10, 60)
+
+        assert len(store) == 1
+        assert store.total_bytes == 60
+        assert store.put("o", {}, (), [3], 10, 101) is None
+
+    def test_ttl_expiry(self):
+        """Test expired entries are not served."""
+        store = ResultStore(ttl=0)
+        entry = store.put("o", {}, (), [1], 10, 10)
+        assert store.get(entry.handle, "o") is None
+
+    def test_estimate_size(self):
+        """Test the sampled estimate tracks the serialized size of uniform lists."""
+        items = [{"id": f"u{i:05d}", "username": f"user{i:05d}"} for i in range(5000)]
+        actual = len(pydantic_core.to_json(items))
+        assert abs(estimate_size(items) - actual) / actual < 0.01
+        assert estimate_size([]) == 0
+
+    def test_find_pageable_bundle(self):
+        """Test Bundle entries inside the result envelope are found."""
+        path, items = find_pageable({"result": {"resourceType": "Bundle", "entry": [1, 2]}})
+        assert path == ("result", "entry")
+        assert items == [1, 2]
+
+
+class TestPagingMiddleware:
+    """Test paging through the MCP protocol."""
+
+    @pytest.mark.asyncio
+    async def test_small_results_untouched(self, paging_server):
+        """Test results under the threshold are returned as-is."""
+        async with Client(paging_server) as client:
+            result = await client.call_tool("small", {})
+        assert result.structured_content == {"result": [1, 2, 3]}
+
+    @pytest.mark.asyncio
+    async def test_pages_served_from_store(self, paging_server):
+        """Test walking the cursor returns every item exactly once."""
+        async with Client(paging_server) as client:
+            result = await client.call_tool("list_healthcare_users", {})
+            page = result.structured_content
+            ids = [user["id"] for user in page["result"]]
+            assert page["_page"]["total"] == 25
+
+            while page["_page"]["next_cursor"]:
+                result = await client.call_tool("get_result_page", {"cursor": page["_page"]["next_cursor"]})
+                page = result.structured_content
+                ids.extend(user["id"] for user in page["result"])
+
+        assert ids == [f"u{i}" for i in range(25)]
+        assert paging_server.calls["users"] == 1
+
+    @pytest.mark.asyncio
+    async def test_bundle_envelope_kept(self, paging_server):
+        """Test Bundle metadata survives and entries are paged."""
+        async with Client(paging_server) as client:
+            result = await client.call_tool("search_fhir", {})
+            bundle = result.structured_content["result"]
+            assert bundle["total"] == 12
+            assert len(bundle["entry"]) == 10
+
+            uri = result.structured_content["_page"]["resource_uri"]
+            contents = await client.read_resource(uri)
+
+        assert '"p11"' in contents[0].text
+
+    @pytest.mark.asyncio
+    async def test_other_caller_cannot_read(self, paging_server):
+        """Test a cursor is bound to the caller that produced it."""
+        with patch.dict(os.environ, {"BACKEND_API_TOKEN": "alice"}):
+            async with Client(paging_server) as client:
+                result = await client.call_tool("list_healthcare_users", {})
+        cursor = result.structured_content["_page"]["next_cursor"]
+
+        with patch.dict(os.environ, {"BACKEND_API_TOKEN": "mallory"}):
+            async with Client(paging_server) as client:
+                with pytest.raises(ToolError):
+                    await client.call_tool("get_result_page", {"cursor": cursor})
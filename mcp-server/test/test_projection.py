@@ -0,0 +1,246 @@
+"""
+Tests for field projection of tool results.
+
+Tests projection behaviour including:
+- Compiled projection caching
+- Nested and list-valued field paths
+- `fields` schema injection and argument stripping
+- FHIR `_elements` / `_summary` on resources and Bundles
+- Relaxed output schemas for tools with typed results
+"""
+
+from typing import List
+
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+from pydantic import BaseModel
+
+from proxy_smart_mcp.projection import (
+    FieldProjectionMiddleware,
+    compile_projection,
+    project_fhir,
+    projection_output_schema,
+)
+
+USERS = [
+    {"id": "u1", "username": "alice", "email": "a@example.org", "attributes": {"npi": "1", "dept": "icu"}},
+    {"id": "u2", "username": "bob", "email": "b@example.org", "attributes": {"npi": "2", "dept": "er"}},
+]
+
+BUNDLE = {
+    "resourceType": "Bundle",
+    "type": "searchset",
+    "total": 1,
+    "link": [{"relation": "self", "url": "http://fhir.test/Patient"}],
+    "entry": [{
+        "fullUrl": "http://fhir.test/Patient/p1",
+        "resource": {
+            "resourceType": "Patient",
+            "id": "p1",
+            "meta": {"versionId": "3"},
+            "text": {"status": "generated", "div": "<div/>"},
+            "name": [{"family": "Doe", "given": ["Jane"]}],
+            "birthDate": "1970-01-01",
+        },
+    }],
+}
+
+
+class Role(BaseModel):
+    id: str
+    name: str
+    description: str = ""
+
+
+ROLES = [Role(id="r1", name="admin", description="Administrators"), Role(id="r2", name="viewer")]
+
+
+@pytest.fixture
+def projection_server():
+    """Create a server with projectable user and FHIR tools."""
+    mcp = FastMCP("projection-test")
+    seen = {}
+
+    @mcp.tool
+    def list_healthcare_users(max: int = 100) -> dict:
+        seen["arguments"] = {"max": max}
+        return {"result": USERS}
+
+    @mcp.tool
+    def search_fhir_resources(resource_type: str) -> dict:
+        return {"result": BUNDLE}
+
+    @mcp.tool
+    def list_roles() -> List[Role]:
+        return ROLES
+
+    @mcp.tool
+    def get_roles_by_id(role_id: str) -> Role:
+        return next(role for role in ROLES if role.id == role_id)
+
+    @mcp.tool
+    def list_smart_apps() -> dict:
+        return {"result": [{"clientId": "a", "name": "App"}]}
+
+    mcp.add_middleware(FieldProjectionMiddleware())
+    mcp.seen = seen
+    return mcp
+
+
+class TestCompileProjection:
+    """Test projection compilation and application."""
+
+    def test_projection_cached_per_field_set(self):
+        """Test equivalent field lists share one compiled projection."""
+        first = compile_projection(["username", "id"])
+        second = compile_projection([" id", "username", "id"])
+        assert first is second
+
+    def test_nested_paths_through_lists(self):
+        """Test dotted paths descend into dicts and lists."""
+        projection = compile_projection(["id", "attributes.npi"])
+        assert projection.apply(USERS) == [
+            {"id": "u1", "attributes": {"npi": "1"}},
+            {"id": "u2", "attributes": {"npi": "2"}},
+        ]
+
+    def test_prefix_path_keeps_subtree(self):
+        """Test a shorter path wins over a longer one below it."""
+        projection = compile_projection(["attributes", "attributes.npi"])
+        assert projection.apply(USERS[0]) == {"attributes": USERS[0]["attributes"]}
+
+
+class TestFhirProjection:
+    """Test FHIR _elements and _summary semantics."""
+
+    def test_elements_keep_mandatory_and_envelope(self):
+        """Test Bundle envelope and resource id/meta survive _elements."""
+        projected = project_fhir(BUNDLE, compile_projection(["birthDate"]), None)
+        resource = projected["entry"][0]["resource"]
+        assert projected["total"] == 1
+        assert projected["entry"][0]["fullUrl"] == "http://fhir.test/Patient/p1"
+        assert resource == {"resourceType": "Patient", "id": "p1", "meta": {"versionId": "3"}, "birthDate": "1970-01-01"}
+
+    def test_summary_modes(self):
+        """Test count drops entries, text keeps narrative, data drops it."""
+        assert "entry" not in project_fhir(BUNDLE, None, "count")
+        text = project_fhir(BUNDLE, None, "text")["entry"][0]["resource"]
+        assert set(text) == {"resourceType", "id", "meta", "text"}
+        data = project_fhir(BUNDLE, None, "data")["entry"][0]["resource"]
+        assert "text" not in data and "name" in data
+
+
+class TestProjectionMiddleware:
+    """Test projection through the MCP protocol."""
+
+    @pytest.mark.asyncio
+    async def test_schema_advertises_fields(self, projection_server):
+        """Test only matching tools gain the projection parameters."""
+        async with Client(projection_server) as client:
+            tools = {tool.name: tool for tool in await client.list_tools()}
+
+        assert "fields" in tools["list_healthcare_users"].inputSchema["properties"]
+        assert "_elements" not in tools["list_healthcare_users"].inputSchema["properties"]
+        assert "_elements" in tools["search_fhir_resources"].inputSchema["properties"]
+        assert "fields" not in tools["list_smart_apps"].inputSchema["properties"]
+
+    @pytest.mark.asyncio
+    async def test_fields_projected_and_stripped(self, projection_server):
+        """Test fields is removed from the tool arguments and applied to the result."""
+        async with Client(projection_server) as client:
+            result = await client.call_tool(
+                "list_healthcare_users", {"max": 5, "fields": ["id", "username"]}
+            )
+
+        assert projection_server.seen["arguments"] == {"max": 5}
+        assert result.structured_content == {
+            "result": [{"id": "u1", "username": "alice"}, {"id": "u2", "username": "bob"}]
+        }
+        assert "email" not in result.content[0].text
+
+    @pytest.mark.asyncio
+    async def test_fhir_elements_through_tool(self, projection_server):
+        """Test _elements accepts the FHIR comma-separated form."""
+        async with Client(projection_server) as client:
+            result = await client.call_tool(
+                "search_fhir_resources", {"resource_type": "Patient", "_elements": "name"}
+            )
+
+        resource = result.structured_content["result"]["entry"][0]["resource"]
+        assert set(resource) == {"resourceType", "id", "meta", "name"}
+
+    @pytest.mark.asyncio
+    async def test_fhir_elements_and_fields_merged(self, projection_server):
+        """Test _elements and fields given together select the union."""
+        async with Client(projection_server) as client:
+            result = await client.call_tool(
+                "search_fhir_resources", {"resource_type": "Patient", "_elements": "name", "fields": ["birthDate"]}
+            )
+
+        resource = result.structured_content["result"]["entry"][0]["resource"]
+        assert set(resource) == {"resourceType", "id", "meta", "name", "birthDate"}
+
+    @pytest.mark.asyncio
+    async def test_unsupported_summary_rejected(self, projection_server):
+        """Test _summary=true is rejected rather than silently ignored."""
+        async with Client(projection_server) as client:
+            with pytest.raises(ToolError):
+                await client.call_tool(
+                    "search_fhir_resources", {"resource_type": "Patient", "_summary": "true"}
+                )
+
+            tools = {tool.name: tool for tool in await client.list_tools()}
+        summary_schema = tools["search_fhir_resources"].inputSchema["properties"]["_summary"]
+        assert "true" not in summary_schema["enum"]
+
+    @pytest.mark.asyncio
+    async def test_typed_output_schema_relaxed(self, projection_server):
+        """Test typed tools advertise an output schema projected results satisfy."""
+        async with Client(projection_server) as client:
+            tools = {tool.name: tool for tool in await client.list_tools()}
+
+        schema = tools["get_roles_by_id"].outputSchema
+        assert "required" not in schema
+        assert set(schema["properties"]) == {"id", "name", "description"}
+        assert "required" not in str(tools["list_roles"].outputSchema)
+        assert tools["list_roles"].outputSchema["x-fastmcp-wrap-result"] is True
+
+    @pytest.mark.asyncio
+    async def test_typed_output_projected(self, projection_server):
+        """Test fields works on tools returning pydantic models and lists of them."""
+        async with Client(projection_server) as client:
+            listed = await client.call_tool("list_roles", {"fields": ["id"]})
+            single = await client.call_tool("get_roles_by_id", {"role_id": "r1", "fields": ["id", "name"]})
+
+        assert listed.structured_content == {"result": [{"id": "r1"}, {"id": "r2"}]}
+        assert single.structured_content == {"id": "r1", "name": "admin"}
+
+
+class TestProjectionOutputSchema:
+    """Test output schema relaxation."""
+
+    def test_required_and_closed_objects_dropped(self):
+        """Test required lists and additionalProperties: false are removed at every level."""
+        schema = {
+            "type": "object",
+            "properties": {
+                "required": {"type": "string"},
+                "items": {"type": "array", "items": {"$ref": "#/$defs/Role"}},
+            },
+            "required": ["items"],
+            "additionalProperties": False,
+            "$defs": {"Role": {
+                "type": "object",
+                "properties": {"id": {"type": "string", "default": {"required": ["x"]}}},
+                "required": ["id"],
+            }},
+        }
+
+        relaxed = projection_output_schema(schema)
+
+        assert "required" not in relaxed and "additionalProperties" not in relaxed
+        assert relaxed["properties"]["required"] == {"type": "string"}
+        assert "required" not in relaxed["$defs"]["Role"]
+        assert relaxed["$defs"]["Role"]["properties"]["id"]["default"] == {"required": ["x"]}
+        assert projection_output_schema(None) is None
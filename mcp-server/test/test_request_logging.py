@@ -0,0 +1,100 @@
+"""
+Tests for sampled structured request logging.
+
+Tests logging behaviour including:
+- Probability and rate sampling of successful requests
+- Errors always logged
+- Lazy fields evaluated only for emitted events
+- JSON formatting and the bounded asynchronous writer
+"""
+
+import json
+import logging
+import logging.handlers
+
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+
+from proxy_smart_mcp.request_logging import (
+    REQUEST_LOGGER,
+    AsyncLogHandler,
+    JsonFormatter,
+    LogSampler,
+    log_event,
+    register_request_logging,
+)
+
+
+def test_sampler_rate_and_probability():
+    sampler = LogSampler(probability=1.0, per_second=2)
+    assert [sampler.sample(now=100.0) for _ in range(3)] == [True, True, False]
+    assert sampler.sample(now=100.5) is True
+    assert sampler.stats()["skipped"] == 1
+
+    never = LogSampler(probability=0.0, per_second=0)
+    assert not any(never.sample() for _ in range(100))
+
+
+def test_lazy_fields_skipped_when_disabled():
+    log = logging.getLogger("proxy_smart_mcp.test_lazy")
+    log.setLevel(logging.WARNING)
+    evaluated = []
+    log_event(log, logging.INFO, "event", {"expensive": lambda: evaluated.append(1)})
+    assert evaluated == []
+
+
+async def test_middleware_logs_errors_despite_sampling(caplog):
+    mcp = FastMCP("logging-test")
+
+    @mcp.tool
+    async def ok() -> str:
+        return "ok"
+
+    @mcp.tool
+    async def fails() -> str:
+        raise ToolError("nope")
+
+    register_request_logging(mcp, async_writer=False, sampler=LogSampler(probability=0.0))
+    with caplog.at_level(logging.INFO, logger=REQUEST_LOGGER):
+        async with Client(mcp) as client:
+            for _ in range(3):
+                await client.call_tool("ok", {})
+            for _ in range(2):
+                with pytest.raises(ToolError):
+                    await client.call_tool("fails", {})
+
+    calls = [r for r in caplog.records if r.name == REQUEST_LOGGER and r.fields["method"] == "tools/call"]
+    assert [(r.fields["target"], r.fields["outcome"]) for r in calls] == [("fails", "error"), ("fails", "error")]
+    assert calls[0].levelno == logging.WARNING
+    assert calls[0].fields["error"].endswith("nope")
+    assert calls[0].fields["caller"] == "anonymous"
+
+
+def test_json_formatter():
+    record = logging.LogRecord(REQUEST_LOGGER, logging.INFO, __file__, 1, "mcp.request", None, None)
+    record.fields = {"method": "tools/call", "duration_ms": 1.5}
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["event"] == "mcp.request"
+    assert payload["method"] == "tools/call" and payload["duration_ms"] == 1.5
+
+
+def test_async_handler_drops_when_full():
+    handler = AsyncLogHandler(queue_size=2)
+    log = logging.getLogger("proxy_smart_mcp.test_async")
+    log.propagate = False
+    log.addHandler(handler)
+    try:
+        for i in range(5):
+            log.warning("record %d", i)
+    finally:
+        log.removeHandler(handler)
+    assert handler.dropped == 3
+
+    lines = []
+    target = logging.Handler()
+    target.emit = lambda record: lines.append(record.getMessage())
+    listener = logging.handlers.QueueListener(handler.queue, target)
+    listener.start()
+    listener.stop()
+    assert lines == ["record 0", "record 1"]
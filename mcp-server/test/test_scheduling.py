@@ -0,0 +1,135 @@
+"""
+Tests for priority scheduling of tool calls.
+
+Tests scheduling behaviour including:
+- Weighted fair sharing of slots between waiting classes
+- Per-class concurrency caps
+- Cancellation of queued waiters
+- Tool classification from meta, rules, names and client hints
+- Nested calls reusing the parent's slot
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastmcp import Client, FastMCP
+
+from proxy_smart_mcp.composite import call_tool_with_middleware
+from proxy_smart_mcp.metrics import ServerMetrics
+from proxy_smart_mcp.scheduling import (
+    BULK,
+    DEFAULT,
+    INTERACTIVE,
+    PriorityScheduler,
+    register_priority_scheduling,
+)
+
+
+async def _fill(scheduler, name, count, order, hold):
+    async def job():
+        async with scheduler.slot(name):
+            order.append(name)
+            await hold.wait()
+
+    return [asyncio.create_task(job()) for _ in range(count)]
+
+
+async def test_weighted_fair_share():
+    scheduler = PriorityScheduler(capacity=1, metrics=ServerMetrics(),
+                                  classes={INTERACTIVE: (3.0, 1.0), BULK: (1.0, 1.0)})
+    await scheduler.acquire(BULK)
+    order = []
+
+    async def job(name):
+        async with scheduler.slot(name):
+            order.append(name)
+
+    tasks = [asyncio.create_task(job(BULK)) for _ in range(8)]
+    tasks += [asyncio.create_task(job(INTERACTIVE)) for _ in range(8)]
+    await asyncio.sleep(0)
+    scheduler.release(BULK)
+    await asyncio.gather(*tasks)
+
+    first_eight = order[:8]
+    assert first_eight.count(INTERACTIVE) == 6
+    assert first_eight.count(BULK) == 2
+
+
+async def test_class_cap():
+    scheduler = PriorityScheduler(capacity=4, metrics=ServerMetrics())
+    hold = asyncio.Event()
+    order = []
+    tasks = await _fill(scheduler, BULK, 4, order, hold)
+    await asyncio.sleep(0.01)
+
+    assert scheduler.classes[BULK].in_flight == 2
+    assert len(scheduler.classes[BULK].waiters) == 2
+    await scheduler.acquire(INTERACTIVE)
+    assert scheduler.stats()["classes"][INTERACTIVE]["in_flight"] == 1
+
+    scheduler.release(INTERACTIVE)
+    hold.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.in_flight == 0
+
+
+async def test_cancelled_waiter_leaves_queue():
+    scheduler = PriorityScheduler(capacity=1, metrics=ServerMetrics())
+    await scheduler.acquire(DEFAULT)
+    waiter = asyncio.create_task(scheduler.acquire(DEFAULT))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert not scheduler.classes[DEFAULT].waiters
+    scheduler.release(DEFAULT)
+    assert scheduler.in_flight == 0
+
+
+@pytest.fixture
+def scheduled_server():
+    """Create a server with tools of each priority class."""
+    mcp = FastMCP("scheduling-test")
+
+    @mcp.tool
+    def get_smart_app() -> str:
+        return "app"
+
+    @mcp.tool
+    def bulk_create_healthcare_users() -> str:
+        return "created"
+
+    @mcp.tool(meta={"priority": BULK})
+    def export_audit() -> str:
+        return "exported"
+
+    @mcp.tool
+    async def plan() -> str:
+        # Re-enter the middleware the way composite plans do
+        result = await call_tool_with_middleware(mcp, "get_smart_app", {})
+        return result.structured_content["result"]
+
+    scheduler = PriorityScheduler(capacity=1, metrics=ServerMetrics())
+    return mcp, register_priority_scheduling(mcp, scheduler=scheduler, rules=[])
+
+
+async def test_tool_classes(scheduled_server):
+    _, middleware = scheduled_server
+    assert await middleware.tool_class("get_smart_app") == INTERACTIVE
+    assert await middleware.tool_class("bulk_create_healthcare_users") == BULK
+    assert await middleware.tool_class("export_audit") == BULK
+    assert await middleware.tool_class("plan") == DEFAULT
+    assert middleware._apply_hint(INTERACTIVE, SimpleNamespace(priority=BULK)) == BULK
+    assert middleware._apply_hint(BULK, SimpleNamespace(priority=INTERACTIVE)) == BULK
+
+
+async def test_calls_scheduled(scheduled_server):
+    mcp, middleware = scheduled_server
+    async with Client(mcp) as client:
+        assert (await client.call_tool("get_smart_app", {})).data == "app"
+        assert (await client.call_tool("plan", {})).data == "app"
+    granted = middleware.scheduler.stats()["classes"]
+    assert granted[INTERACTIVE]["granted"] == 1
+    assert granted[DEFAULT]["granted"] == 1
+    assert middleware.scheduler.in_flight == 0
@@ -0,0 +1,210 @@
+"""
+Tests for session bookkeeping and eviction.
+
+Tests session behaviour including:
+- LRU eviction by session count and estimated memory
+- Sessions with requests in flight kept
+- Idle sweeps and removal of terminated transports
+- Interned client ids and shared scope sets
+- Eviction of real streamable HTTP sessions
+- Session manager attach retried until it is found
+- Initialize-only sessions counted and swept on a timer
+- Per-session event buffers allocated per stream on the first event
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+import mcp.types as mt
+from fastmcp import FastMCP
+
+from proxy_smart_mcp.metrics import ServerMetrics
+from proxy_smart_mcp.sessions import (
+    SessionEventStore,
+    SessionRegistry,
+    SessionTrackingMiddleware,
+    register_session_tracking,
+)
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "t", "version": "1"}},
+}
+LIST_TOOLS = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+
+def _registry(**kwargs):
+    kwargs.setdefault("max_sessions", 0)
+    kwargs.setdefault("memory_cap", 0)
+    kwargs.setdefault("idle_timeout", 0)
+    kwargs.setdefault("sweep_interval", 0)
+    return SessionRegistry(metrics=ServerMetrics(), **kwargs)
+
+
+def test_lru_eviction_skips_active_sessions():
+    registry = _registry(max_sessions=2)
+    registry.touch("a").active = 1
+    registry.touch("b")
+    registry.touch("c")
+    assert registry.get("a") is not None and registry.get("b") is None
+
+    registry.touch("a")
+    registry.touch("d")
+    assert sorted(s.session_id for s in registry._sessions.values()) == ["a", "d"]
+    assert registry.evicted == 2
+
+
+def test_memory_cap_sets_limit():
+    assert _registry(memory_cap=10 * 1024, session_overhead=1024).limit == 10
+    assert _registry(max_sessions=5, memory_cap=10 * 1024, session_overhead=1024).limit == 5
+    assert _registry().limit is None
+
+
+def test_idle_sweep():
+    registry = _registry(idle_timeout=60)
+    registry.touch("old", now=0.0)
+    registry.touch("busy", now=10.0).active = 1
+    registry.touch("fresh", now=100.0)
+    assert registry.sweep(now=130.0) == 1
+    assert registry.get("old") is None
+    assert registry.get("busy") is not None and registry.get("fresh") is not None
+
+
+def test_interned_fields_are_shared():
+    registry = _registry()
+    first = registry.touch("a", caller="".join(["cal", "ler"]), client_id="".join(["app", "-1"]),
+                           scopes=["openid", "admin"])
+    second = registry.touch("b", caller="".join(["cal", "ler"]), client_id="".join(["app", "-1"]),
+                            scopes=("admin", "openid"))
+    assert first.client_id is second.client_id
+    assert first.caller is second.caller
+    assert first.scopes is second.scopes
+    assert registry.stats()["clients"] == 1
+
+
+async def test_http_sessions_evicted_and_swept():
+    mcp = FastMCP("sessions-test")
+
+    @mcp.tool
+    def ping() -> str:
+        return "pong"
+
+    registry = register_session_tracking(mcp, _registry(max_sessions=1))
+    app = mcp.http_app(path="/mcp")
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            ids = []
+            for _ in range(2):
+                response = await client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+                ids.append(response.headers["mcp-session-id"])
+                listed = await client.post("/mcp", json=LIST_TOOLS, headers=dict(HEADERS, **{"mcp-session-id": ids[-1]}))
+                assert listed.status_code == 200
+
+            assert registry.get(ids[0]) is None and registry.get(ids[1]) is not None
+            evicted = await client.post("/mcp", json=LIST_TOOLS, headers=dict(HEADERS, **{"mcp-session-id": ids[0]}))
+            assert evicted.status_code == 404
+
+            manager = registry._managers[0]
+            assert ids[0] in manager._server_instances
+            registry.sweep()
+            assert list(manager._server_instances) == [ids[1]]
+
+
+async def test_attach_retried_until_manager_found():
+    registry = _registry()
+    middleware = SessionTrackingMiddleware(registry)
+    request = SimpleNamespace(headers={"mcp-session-id": "s1"})
+    ctx = SimpleNamespace(request_context=SimpleNamespace(request=request), get_state=lambda key: None)
+    context = SimpleNamespace(fastmcp_context=ctx)
+
+    async def call_next(context):
+        return "ok"
+
+    manager = SimpleNamespace(_server_instances={})
+    with patch("proxy_smart_mcp.sessions.find_session_manager", side_effect=[None, manager]):
+        await middleware.on_request(context, call_next)
+        assert registry._managers == []
+        await middleware.on_request(context, call_next)
+    assert registry._managers == [manager]
+
+
+def _notification(index):
+    return mt.JSONRPCMessage(mt.JSONRPCNotification(jsonrpc="2.0", method="notifications/x", params={"n": index}))
+
+
+async def test_event_store_allocates_per_stream_lazily():
+    store = SessionEventStore(max_events=2, max_streams=2)
+    assert store._streams is None
+
+    first = await store.store_event("_GET_stream", _notification(1))
+    await store.store_event("_GET_stream", _notification(2))
+    await store.store_event("_GET_stream", _notification(3))
+    assert list(store._streams) == ["_GET_stream"] and len(store._streams["_GET_stream"]) == 2
+
+    replayed = []
+
+    async def collect(event):
+        replayed.append((event.event_id, event.message.root.params["n"]))
+
+    assert await store.replay_events_after(first, collect) == "_GET_stream"
+    assert replayed == [("2/_GET_stream", 2), ("3/_GET_stream", 3)]
+    assert await store.replay_events_after("1/unknown", collect) is None
+
+    await store.store_event("7", _notification(4))
+    await store.store_event("8", _notification(5))
+    assert list(store._streams) == ["7", "8"]
+
+
+def _app(registry):
+    mcp = FastMCP("sessions-test")
+
+    @mcp.tool
+    def ping() -> str:
+        return "pong"
+
+    register_session_tracking(mcp, registry)
+    return mcp.http_app(path="/mcp")
+
+
+async def test_initialize_only_sessions_tracked_with_lazy_event_store():
+    registry = _registry(max_sessions=1)
+    app = _app(registry)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            ids = []
+            for _ in range(2):
+                response = await client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+                ids.append(response.headers["mcp-session-id"])
+
+            assert registry.get(ids[0]) is None and registry.get(ids[1]) is not None
+            manager = registry._managers[0]
+            store = manager._server_instances[ids[1]]._event_store
+            assert isinstance(store, SessionEventStore) and store._streams is None
+
+            listed = await client.post("/mcp", json=LIST_TOOLS, headers=dict(HEADERS, **{"mcp-session-id": ids[1]}))
+            assert listed.status_code == 200 and "id: 1/2" in listed.text
+            assert list(store._streams) == ["2"]
+
+
+async def test_idle_sessions_swept_on_timer():
+    registry = _registry(idle_timeout=0.05, sweep_interval=0.02)
+    app = _app(registry)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+            session_id = response.headers["mcp-session-id"]
+            assert registry.get(session_id) is not None
+
+            for _ in range(50):
+                if registry.get(session_id) is None:
+                    break
+                await asyncio.sleep(0.02)
+            assert registry.get(session_id) is None
+            assert registry.evicted == 1
+            await asyncio.sleep(0.05)
+            # Terminated by the eviction, then dropped from the SDK's table by a later sweep
+            assert session_id not in registry._managers[0]._server_instances
+    registry.stop()
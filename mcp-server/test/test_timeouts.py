@@ -0,0 +1,115 @@
+"""
+Tests for per-tool timeouts and cancellation.
+
+Tests timeout behaviour including:
+- Timeout resolution from tool meta, glob rules and the default
+- Timed-out calls failing with a tool error and cancelling backend requests
+- Backend request timeouts bounded by the call deadline
+- Cancelled calls counted
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastmcp import Client, Context, FastMCP
+from fastmcp.exceptions import ToolError
+
+from proxy_smart_mcp.backend import _request_timeout, backend_json, request_deadline, set_backend_client
+from proxy_smart_mcp.metrics import ServerMetrics, get_metrics
+from proxy_smart_mcp.timeouts import ToolTimeoutMiddleware, load_timeout_rules, register_tool_timeouts
+
+
+@pytest.fixture
+async def slow_backend():
+    """Install a mock backend whose responses take one second."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return httpx.Response(200, json={"ok": True})
+
+    set_backend_client(httpx.AsyncClient(base_url="http://backend.test", transport=httpx.MockTransport(handler)))
+    get_metrics().reset()
+    yield
+    set_backend_client(None)
+
+
+@pytest.fixture
+def timeout_server():
+    """Create a server with fast, slow and backend-bound tools."""
+    mcp = FastMCP("timeouts-test")
+
+    @mcp.tool
+    async def quick() -> str:
+        return "done"
+
+    @mcp.tool(meta={"timeout": 0.05})
+    async def slow() -> str:
+        await asyncio.sleep(1)
+        return "late"
+
+    @mcp.tool
+    async def fhir_read(ctx: Context) -> dict:
+        return await backend_json(ctx, "GET", "/fhir/Patient/1")
+
+    metrics = ServerMetrics()
+    middleware = register_tool_timeouts(mcp, default_timeout=5, rules=[("fhir_*", 0.05)], metrics=metrics)
+    return mcp, middleware, metrics
+
+
+def test_load_timeout_rules():
+    assert load_timeout_rules('{"fhir_*": 120, "fhir_search_*": 30}') == [("fhir_search_*", 30.0), ("fhir_*", 120.0)]
+    assert load_timeout_rules("[1, 2]") == []
+
+
+async def test_timeout_resolution(timeout_server):
+    _, middleware, _ = timeout_server
+    assert await middleware.timeout_for("quick") == 5
+    assert await middleware.timeout_for("slow") == 0.05
+    assert await middleware.timeout_for("fhir_read") == 0.05
+    assert await ToolTimeoutMiddleware(middleware.mcp, default_timeout=0, rules=[]).timeout_for("quick") is None
+
+
+async def test_timed_out_call(timeout_server):
+    mcp, _, metrics = timeout_server
+    async with Client(mcp) as client:
+        assert (await client.call_tool("quick", {})).data == "done"
+        with pytest.raises(ToolError, match="timed out after 0.05s"):
+            await client.call_tool("slow", {})
+    assert metrics.counter("tool.timeout", "slow") == 1
+    assert metrics.latency("tool.duration", "quick").count == 1
+
+
+async def test_timeout_cancels_backend_request(timeout_server, slow_backend):
+    mcp, _, metrics = timeout_server
+    async with Client(mcp) as client:
+        with pytest.raises(ToolError, match="timed out"):
+            await client.call_tool("fhir_read", {})
+    assert metrics.counter("tool.timeout", "fhir_read") == 1
+    assert get_metrics().counter("backend.cancelled") == 1
+
+
+def test_request_timeout_follows_deadline():
+    assert _request_timeout().read == 30.0
+    token = request_deadline.set(time.monotonic() + 2)
+    try:
+        timeout = _request_timeout()
+    finally:
+        request_deadline.reset(token)
+    assert timeout.read <= 2 and timeout.connect <= 2
+
+
+async def test_cancelled_call_counted(timeout_server):
+    _, middleware, metrics = timeout_server
+    context = SimpleNamespace(message=SimpleNamespace(name="quick"))
+
+    async def never(_):
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(middleware.on_call_tool(context, never))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert metrics.counter("tool.cancelled", "quick") == 1
@@ -0,0 +1,95 @@
+"""
+Tests for the Unix domain socket listener.
+
+Tests listener behaviour including:
+- Removal of the --uds flag before the generated CLI parses arguments
+- Socket permissions and replacement of stale sockets
+- Streamable HTTP served over the socket and cleanup on shutdown
+"""
+
+import asyncio
+import os
+import socket
+import stat
+import tempfile
+
+import httpx
+import pytest
+from fastmcp import FastMCP
+
+from proxy_smart_mcp.uds import bind_unix_socket, install_uds_listener, pop_uds_argument
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "t", "version": "1"}},
+}
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are limited to ~100 bytes; pytest's tmp_path can be longer
+    with tempfile.TemporaryDirectory(prefix="mcp-uds-") as directory:
+        yield os.path.join(directory, "mcp.sock")
+
+
+def test_pop_uds_argument():
+    argv = ["run.py", "--transport", "http", "--uds", "/tmp/mcp.sock", "--port", "8000"]
+    assert pop_uds_argument(argv) == "/tmp/mcp.sock"
+    assert argv == ["run.py", "--transport", "http", "--port", "8000"]
+
+    argv = ["run.py", "--uds=/run/mcp.sock"]
+    assert pop_uds_argument(argv) == "/run/mcp.sock" and argv == ["run.py"]
+    assert pop_uds_argument(["run.py"]) is None
+    with pytest.raises(SystemExit):
+        pop_uds_argument(["run.py", "--uds"])
+
+
+def test_bind_unix_socket(socket_path):
+    stale = bind_unix_socket(socket_path, 0o600)
+    stale.close()
+    sock = bind_unix_socket(socket_path, 0o660)
+    try:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o660
+    finally:
+        sock.close()
+
+    os.unlink(socket_path)
+    with open(socket_path, "w") as regular:
+        regular.write("not a socket")
+    with pytest.raises(FileExistsError):
+        bind_unix_socket(socket_path)
+
+
+async def test_serves_streamable_http(socket_path):
+    mcp = FastMCP("uds-test")
+
+    @mcp.tool
+    def ping() -> str:
+        return "pong"
+
+    install_uds_listener(mcp, socket_path)
+    server = asyncio.create_task(mcp.run_http_async(show_banner=False, log_level="warning"))
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                probe = socket.socket(socket.AF_UNIX)
+                try:
+                    probe.connect(socket_path)
+                    break
+                except OSError:
+                    pass
+                finally:
+                    probe.close()
+            await asyncio.sleep(0.02)
+
+        transport = httpx.AsyncHTTPTransport(uds=socket_path)
+        async with httpx.AsyncClient(transport=transport, base_url="http://mcp") as client:
+            response = await client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+        assert response.status_code == 200
+        assert response.headers["mcp-session-id"]
+    finally:
+        server.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,162 @@
+"""
+Tests for compiled argument validators.
+
+Tests validation behaviour including:
+- Validators compiled once per tool, Context parameter resolved up front
+- Nested pydantic payloads and defaults, including Field(...) defaults
+- Validation errors surfaced and counted
+- Validation time recorded per tool
+- Tools on mounted servers and tools added later
+- Tools without an output schema left to FastMCP
+- Rescans for unknown tool names rate-limited
+"""
+
+from typing import Annotated, List, Optional
+
+import pytest
+from fastmcp import Client, Context, FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.tools.tool import FunctionTool
+from pydantic import BaseModel, Field
+
+from proxy_smart_mcp.metrics import ServerMetrics
+from proxy_smart_mcp.validation import (
+    VALIDATION_METRIC,
+    CompiledFunctionTool,
+    ToolValidator,
+    compile_tools,
+    register_compiled_validation,
+)
+
+
+class LaunchContext(BaseModel):
+    patient: str
+    encounter: Optional[str] = None
+
+
+class SmartApp(BaseModel):
+    client_id: str
+    redirect_uris: List[str]
+    launch_context: Optional[LaunchContext] = None
+
+
+@pytest.fixture
+def validated_server():
+    """Create a server whose tools take nested payloads."""
+    mcp = FastMCP("validation-test")
+
+    @mcp.tool
+    def register_smart_app(app: SmartApp, ctx: Context, dry_run: bool = False) -> dict:
+        assert ctx is not None
+        return {"client_id": app.client_id, "patient": app.launch_context.patient, "dry_run": dry_run}
+
+    metrics = ServerMetrics()
+    register_compiled_validation(mcp, metrics)
+    return mcp, metrics
+
+
+def test_validator_compile():
+    def tool(app: SmartApp, ctx: Context, limit: int = 10) -> None:
+        pass
+
+    validator = ToolValidator.compile("tool", tool)
+    assert validator.context_kwarg == "ctx"
+    validated = validator.validate({"app": {"client_id": "a", "redirect_uris": []}, "limit": "5"})
+    assert isinstance(validated["app"], SmartApp)
+    assert validated["limit"] == 5
+
+
+def test_validator_resolves_field_defaults():
+    def tool(
+        limit: int = Field(10, description="Page size"),
+        offset: Annotated[int, Field(description="Start")] = 0,
+        tags: List[str] = Field(default_factory=list),
+    ) -> None:
+        pass
+
+    # Plain defaults are left to the function; FieldInfo defaults must be filled in
+    assert ToolValidator.compile("tool", tool).validate({}) == {"limit": 10, "tags": []}
+
+
+async def test_calls_use_compiled_validator(validated_server):
+    mcp, metrics = validated_server
+    assert isinstance(mcp._tool_manager._tools["register_smart_app"], CompiledFunctionTool)
+
+    async with Client(mcp) as client:
+        result = await client.call_tool("register_smart_app", {
+            "app": {"client_id": "app-1", "redirect_uris": ["https://a"], "launch_context": {"patient": "p1"}},
+        })
+    assert result.structured_content == {"client_id": "app-1", "patient": "p1", "dry_run": False}
+
+    stat = metrics.latency(VALIDATION_METRIC, "register_smart_app")
+    assert stat.count == 1 and stat.errors == 0
+
+
+async def test_validation_errors_counted(validated_server):
+    mcp, metrics = validated_server
+    async with Client(mcp) as client:
+        with pytest.raises(ToolError):
+            await client.call_tool("register_smart_app", {"app": {"client_id": "app-1"}})
+        with pytest.raises(ToolError):
+            await client.call_tool("register_smart_app", {
+                "app": {"client_id": "a", "redirect_uris": []}, "unexpected": 1,
+            })
+    assert metrics.latency(VALIDATION_METRIC, "register_smart_app").errors == 2
+
+
+async def test_mounted_and_late_tools_compiled(validated_server):
+    mcp, metrics = validated_server
+    child = FastMCP("child")
+
+    @child.tool
+    def list_roles(limit: int = 10) -> list:
+        return list(range(limit))
+
+    mcp.mount(child, prefix="admin")
+
+    @mcp.tool
+    def ping_backend() -> str:
+        return "pong"
+
+    async with Client(mcp) as client:
+        await client.call_tool("admin_list_roles", {"limit": 2})
+        await client.call_tool("ping_backend", {})
+
+    assert isinstance(child._tool_manager._tools["list_roles"], CompiledFunctionTool)
+    assert metrics.latency(VALIDATION_METRIC, "list_roles").count == 1
+    assert metrics.latency(VALIDATION_METRIC, "ping_backend").count == 1
+    assert compile_tools(mcp, metrics) == 0
+
+
+async def test_field_default_reaches_function():
+    mcp = FastMCP("field-default-test")
+
+    @mcp.tool
+    def list_users(limit: int = Field(10, description="Page size")) -> List[int]:
+        return list(range(limit))
+
+    @mcp.tool
+    def untyped_result():
+        return "no output schema"
+
+    register_compiled_validation(mcp, ServerMetrics())
+    async with Client(mcp) as client:
+        result = await client.call_tool("list_users", {})
+        untyped = await client.call_tool("untyped_result", {})
+    assert result.structured_content == {"result": list(range(10))}
+    # Without an output schema the result conversion stays with FastMCP
+    assert type(mcp._tool_manager._tools["untyped_result"]) is FunctionTool
+    assert untyped.content[0].text == "no output schema"
+
+
+async def test_unknown_names_rescan_rate_limited(validated_server):
+    mcp, metrics = validated_server
+    middleware = register_compiled_validation(mcp, metrics, rescan_interval=60)
+    async with Client(mcp) as client:
+        for name in ("missing_1", "missing_2", "missing_3"):
+            with pytest.raises(ToolError):
+                await client.call_tool(name, {})
+        await client.call_tool("register_smart_app", {
+            "app": {"client_id": "a", "redirect_uris": [], "launch_context": {"patient": "p1"}},
+        })
+    assert middleware.rescans == 1
@@ -0,0 +1,141 @@
+"""
+Tests for the WebSocket transport.
+
+Tests transport behaviour including:
+- Upgrades without a valid bearer token rejected before accept
+- Concurrent requests multiplexed over one socket
+- Caller token visible to tools through the upgrade request
+- Token validated once and one API client per connection
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastmcp import Context, FastMCP
+from fastmcp.server.dependencies import get_http_headers
+from fastmcp.server.middleware import Middleware
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from proxy_smart_mcp.backend import get_caller_token
+from proxy_smart_mcp.fastpath import install_fast_path
+from proxy_smart_mcp.metrics import ServerMetrics
+from proxy_smart_mcp.websocket import WebSocketTransport, register_websocket_transport
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": {"name": "t", "version": "1"}},
+}
+AUTH = {"Authorization": "Bearer secret-token"}
+
+
+class ApiClientContextMiddleware(Middleware):
+    """Stand-in for the generated ApiClientContextMiddleware."""
+
+    def __init__(self):
+        self.validate_tokens = True
+        self.validations = 0
+        self.builds = 0
+
+    async def _validate(self, token):
+        self.validations += 1
+        return SimpleNamespace(token=token, client_id="agent", scopes=["read"], expires_at=None) \
+            if token == "secret-token" else None
+
+    def _build_http_client(self, context):
+        self.builds += 1
+        return SimpleNamespace(configuration=SimpleNamespace(access_token="secret-token"))
+
+    async def on_request(self, context, call_next):
+        token = get_http_headers(include_all=True).get("authorization", "")[7:]
+        access_token = await self._validate(token)
+        if access_token is None:
+            raise PermissionError("invalid token")
+        context.fastmcp_context.set_state("access_token", access_token)
+        context.fastmcp_context.set_state("api_client", self._build_http_client(context))
+        return await call_next(context)
+
+
+def _server(metrics):
+    mcp = FastMCP("ws-test")
+
+    @mcp.tool
+    async def slow() -> str:
+        await asyncio.sleep(0.3)
+        return "slow"
+
+    @mcp.tool
+    def whoami(ctx: Context) -> str:
+        return get_caller_token(ctx) or ""
+
+    @mcp.tool
+    def client_token(ctx: Context) -> str:
+        return ctx.get_state("api_client").configuration.access_token
+
+    register_websocket_transport(mcp, transport=WebSocketTransport(mcp, metrics=metrics))
+    return mcp
+
+
+def _call(request_id, name):
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": name, "arguments": {}}}
+
+
+def _open_session(ws):
+    ws.send_text(json.dumps(INITIALIZE))
+    assert json.loads(ws.receive_text())["result"]["serverInfo"]["name"] == "ws-test"
+    ws.send_text(json.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}))
+
+
+def test_upgrade_without_token_rejected():
+    metrics = ServerMetrics()
+    app = _server(metrics).http_app(path="/mcp")
+    with TestClient(app) as client:
+        with pytest.raises(WebSocketDisconnect) as rejected:
+            with client.websocket_connect("/mcp", subprotocols=["mcp"]):
+                pass
+    assert rejected.value.code == 1008
+    assert metrics.counter("websocket.rejected") == 1
+
+
+def test_concurrent_requests_multiplexed():
+    metrics = ServerMetrics()
+    app = _server(metrics).http_app(path="/mcp")
+    with TestClient(app) as client:
+        with client.websocket_connect("/mcp", subprotocols=["mcp"], headers=AUTH) as ws:
+            assert ws.accepted_subprotocol == "mcp"
+            _open_session(ws)
+            ws.send_text(json.dumps(_call(2, "slow")))
+            ws.send_text(json.dumps(_call(3, "whoami")))
+            first, second = json.loads(ws.receive_text()), json.loads(ws.receive_text())
+            assert metrics.snapshot()["websocket.connections"] == 1
+
+    # The fast call overtakes the slow one and sees the upgrade's token
+    assert first["id"] == 3 and first["result"]["content"][0]["text"] == "secret-token"
+    assert second["id"] == 2 and second["result"]["content"][0]["text"] == "slow"
+    assert metrics.snapshot()["websocket.connections"] == 0
+
+
+def test_token_validated_once_per_connection():
+    metrics = ServerMetrics()
+    mcp = _server(metrics)
+    api = ApiClientContextMiddleware()
+    mcp.add_middleware(api)
+    install_fast_path(mcp)
+    app = mcp.http_app(path="/mcp")
+    with TestClient(app) as client:
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/mcp", headers={"Authorization": "Bearer forged"}):
+                pass
+        assert api.validations == 1
+
+        with client.websocket_connect("/mcp", subprotocols=["mcp"], headers=AUTH) as ws:
+            _open_session(ws)
+            for request_id in range(2, 5):
+                ws.send_text(json.dumps(_call(request_id, "client_token")))
+                assert json.loads(ws.receive_text())["result"]["content"][0]["text"] == "secret-token"
+
+    # One validation at upgrade, one API client for the three calls
+    assert api.validations == 2
+    assert api.builds == 1